@@ -0,0 +1,312 @@
+"""DataTable 性能基准测试
+
+使用 data_generator 构建 1 万到 1000 万行的表格，测量热点操作：
+- add_data 批量写入、小批量写入（逐次写入与经写入队列合并）、update_dataframe（追加和整体替换）
+- get_list：无筛选、每种筛选类型、排序、深分页
+- get_row_position、get_row_detail、_update_column_options、generate_columns_config_from_dataframe
+
+每个数据量在独立的子进程中运行，以便准确统计峰值内存（peak RSS）。
+结果输出为 JSON（吞吐量、延迟分位数、峰值内存），可以与保存的基线比较。
+--engine 选择存储引擎（pandas、polars、sqlite），与 pandas 的基线比较即可看到其他引擎的加速比。
+
+用法：
+    python benchmark.py --sizes 10000 100000 --output baseline.json
+    python benchmark.py --sizes 10000 100000 --compare baseline.json
+    python benchmark.py --sizes 5000000 --engine polars --compare baseline.json
+"""
+
+import argparse
+import json
+import logging
+import platform
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from multiprocessing import get_context
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from data_generator import generate_batch_dataframe, generate_batch_records
+from data_table import DataTable, FilterGroup, FilterParams, NumberFilter, generate_columns_config_from_dataframe
+from ingest import IngestQueue
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+ENGINES = ('pandas', 'polars', 'sqlite')
+# 生成数据时每批的行数（限制生成过程中的临时内存）
+_GENERATE_CHUNK = 1_000_000
+# 小批量写入场景中每次提交的行数
+_SMALL_BATCH = 10
+
+
+def peak_rss_mb() -> float:
+    """当前进程的峰值常驻内存（MB）"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 上单位为 KB，macOS 上为字节
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def summarize(samples: List[float], rows: Optional[int] = None) -> Dict[str, float]:
+    """将耗时样本（秒）汇总为延迟分位数（毫秒）和吞吐量"""
+    values = np.asarray(samples, dtype=float)
+    total = float(values.sum())
+    result = {
+        'count': len(values),
+        'mean_ms': float(values.mean() * 1000),
+        'p50_ms': float(np.percentile(values, 50) * 1000),
+        'p90_ms': float(np.percentile(values, 90) * 1000),
+        'p99_ms': float(np.percentile(values, 99) * 1000),
+        'max_ms': float(values.max() * 1000),
+        'ops_per_sec': len(values) / total if total > 0 else float('inf'),
+    }
+    if rows is not None:
+        result['rows_per_sec'] = rows * len(values) / total if total > 0 else float('inf')
+    return result
+
+
+def _time(func: Callable[[], Any], repeat: int, warmup: int = 1) -> List[float]:
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def build_dataframe(size: int, start_id: int = 1, seed: Optional[int] = None) -> pd.DataFrame:
+    frames = []
+    for i, offset in enumerate(range(0, size, _GENERATE_CHUNK)):
+        count = min(_GENERATE_CHUNK, size - offset)
+        chunk_seed = None if seed is None else seed + i
+        frames.append(generate_batch_dataframe(start_id + offset, count, seed=chunk_seed))
+    return pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+
+
+def build_table(df: pd.DataFrame, engine: str = 'pandas') -> DataTable:
+    """按存储引擎构建表格：pandas（DataTable）、polars（PolarsDataTable）或 sqlite（内存中的 SqliteDataTable）"""
+    columns_config = generate_columns_config_from_dataframe(df)
+    if engine == 'polars':
+        from polars_table import PolarsDataTable
+        return PolarsDataTable(df, columns_config, copy=False)
+    if engine == 'sqlite':
+        from sqlite_table import SqliteDataTable
+        return SqliteDataTable(':memory:', df, columns_config)
+    if engine != 'pandas':
+        raise ValueError(f'未知的存储引擎: {engine}')
+    return DataTable(df, columns_config, copy=False)
+
+
+def representative_filters(table: DataTable) -> Dict[str, FilterParams]:
+    """为每种筛选类型（ts、bytes 列单独计）各选一列，根据数据构造有代表性的筛选条件"""
+    df = table.dataframe
+    filters = {}
+    for col in table.columns_config:
+        if not col.filterable or col.prop not in df.columns:
+            continue
+        key = 'ts' if col.prop == 'ts' else ('bytes' if col.type == 'bytes' else col.filterType)
+        if any(name.startswith(key + ':') for name in filters):
+            continue
+        sample = df[col.prop].dropna()
+        if sample.empty:
+            continue
+        value = sample.iloc[len(sample) // 2]
+        if col.filterType == 'number':
+            condition = FilterGroup(filters=[NumberFilter(operator='>', value=float(sample.median()))])
+        elif col.filterType in ('multi-select', 'select'):
+            condition = (col.options or [str(value)])[:2]
+        elif col.prop == 'ts':
+            condition = table._timestamp_to_str(value)[:7]
+        elif col.filterType == 'date':
+            condition = str(value)
+        elif col.type == 'bytes':
+            condition = table._bytes_to_hex(value)[:5] if isinstance(value, bytes) else str(value)[:5]
+        else:
+            condition = str(value)[-4:]
+        filters[f"{key}:{col.prop}"] = FilterParams(**{col.prop: condition})
+    return filters
+
+
+def run_size(size: int, repeat: int = 5, batch_size: int = 1000, seed: int = 0,
+             engine: str = 'pandas') -> Dict[str, Any]:
+    """在当前进程中对 size 行的表格运行全部基准，返回结果字典"""
+    logging.getLogger('data_table').setLevel(logging.ERROR)
+    rng = np.random.default_rng(seed)
+
+    start = time.perf_counter()
+    df = build_dataframe(size, seed=seed)
+    generate_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    table = build_table(df, engine)
+    build_seconds = time.perf_counter() - start
+
+    operations: Dict[str, Dict[str, float]] = {}
+    page_size = 100
+    last_page = max((size + page_size - 1) // page_size, 1)
+
+    operations['get_list:unfiltered'] = summarize(_time(lambda: table.get_list(None, 1, page_size), repeat))
+    operations['get_list:deep_page'] = summarize(_time(lambda: table.get_list(None, last_page, page_size), repeat))
+    for sort_by in ['order_amount', 'order_number']:
+        operations[f'get_list:sorted:{sort_by}'] = summarize(
+            _time(lambda: table.get_list(None, 1, page_size, sort_by, 'descending'), repeat))
+    operations['get_list:sorted_deep_page'] = summarize(
+        _time(lambda: table.get_list(None, last_page, page_size, 'order_amount', 'ascending'), repeat))
+    for name, filters in representative_filters(table).items():
+        operations[f'get_list:filter:{name}'] = summarize(_time(lambda: table.get_list(filters, 1, page_size), repeat))
+
+    ids = rng.integers(1, size + 1, repeat + 1)
+    position_filters = FilterParams(order_status=['已付款', '已发货', '已完成'])
+    id_iter = iter(ids.tolist() * 2)
+    operations['get_row_position'] = summarize(
+        _time(lambda: table.get_row_position(next(id_iter), position_filters), repeat))
+    id_iter = iter(ids.tolist() * 2)
+    operations['get_row_detail'] = summarize(_time(lambda: table.get_row_detail(next(id_iter)), repeat))
+    operations['_update_column_options'] = summarize(_time(table._update_column_options, repeat))
+    operations['generate_columns_config'] = summarize(_time(lambda: generate_columns_config_from_dataframe(df), repeat))
+
+    # 写入操作放在最后（会改变表的大小）
+    batches = [generate_batch_records(size + 1 + i * batch_size, batch_size, seed=seed + i)
+               for i in range(repeat + 1)]
+    batch_iter = iter(batches)
+    operations['add_data'] = summarize(_time(lambda: table.add_data(next(batch_iter)), repeat), rows=batch_size)
+
+    # 大量小批量提交：逐次 add_data，与经写入队列合并后写入
+    def small_batches(offset: int):
+        records = generate_batch_records(offset, batch_size, seed=seed)
+        return [records[i:i + _SMALL_BATCH] for i in range(0, batch_size, _SMALL_BATCH)]
+
+    def add_small(chunks):
+        for chunk in chunks:
+            table.add_data(chunk)
+
+    def add_queued(queue: IngestQueue, chunks):
+        futures = [queue.submit(chunk, block=True) for chunk in chunks]
+        for future in futures:
+            future.result()
+
+    small_iter = iter([small_batches(size + 1 + i * batch_size) for i in range(repeat + 1)])
+    operations['add_data:small'] = summarize(_time(lambda: add_small(next(small_iter)), repeat), rows=batch_size)
+    queue = IngestQueue(table.add_data, name='benchmark')
+    queued_iter = iter([small_batches(size + 1 + i * batch_size) for i in range(repeat + 1)])
+    operations['add_data:queued'] = summarize(
+        _time(lambda: add_queued(queue, next(queued_iter)), repeat), rows=batch_size)
+    queue.close()
+
+    # 外部数据源不断增长（只追加行）时的增量更新，以及整体替换
+    grown = [table.dataframe]
+    for batch in batches[:repeat + 1]:
+        grown.append(pd.concat([grown[-1], pd.DataFrame(batch)], ignore_index=True))
+    grown_iter = iter(grown[1:])
+    operations['update_dataframe'] = summarize(
+        _time(lambda: table.update_dataframe(next(grown_iter)), repeat), rows=batch_size)
+    operations['update_dataframe:replace'] = summarize(
+        _time(lambda: table.update_dataframe(grown[-1], append_only=False), repeat), rows=len(grown[-1]))
+
+    return {
+        'rows': size,
+        'generate_seconds': generate_seconds,
+        'build_seconds': build_seconds,
+        'peak_rss_mb': peak_rss_mb(),
+        'operations': operations,
+    }
+
+
+def run_benchmarks(sizes: List[int], repeat: int = 5, batch_size: int = 1000, seed: int = 0,
+                   isolate: bool = True, engine: str = 'pandas') -> Dict[str, Any]:
+    """运行所有数据量的基准；isolate 为 True 时每个数据量使用新的子进程"""
+    results = {}
+    for size in sizes:
+        print(f"运行基准: {size} 行 ...", file=sys.stderr)
+        if isolate:
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as executor:
+                results[str(size)] = executor.submit(run_size, size, repeat, batch_size, seed, engine).result()
+        else:
+            results[str(size)] = run_size(size, repeat, batch_size, seed, engine)
+    return {
+        'meta': {
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'repeat': repeat,
+            'batch_size': batch_size,
+            'seed': seed,
+            'engine': engine,
+        },
+        'results': results,
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float = 0.2) -> List[Dict[str, Any]]:
+    """比较两次结果的 p50 延迟和峰值内存，返回每项的变化（ratio > 1 表示变慢/变大）"""
+    rows = []
+    for size, result in current['results'].items():
+        base = baseline['results'].get(size)
+        if base is None:
+            continue
+        metrics = [(name, 'p50_ms', stats['p50_ms'], base['operations'][name]['p50_ms'])
+                   for name, stats in result['operations'].items() if name in base['operations']]
+        metrics.append(('peak_rss_mb', 'mb', result['peak_rss_mb'], base['peak_rss_mb']))
+        for name, unit, value, base_value in metrics:
+            ratio = value / base_value if base_value > 0 else float('inf')
+            rows.append({
+                'rows': int(size),
+                'operation': name,
+                'unit': unit,
+                'baseline': base_value,
+                'current': value,
+                'ratio': ratio,
+                'regression': ratio > 1 + threshold,
+            })
+    return rows
+
+
+def print_comparison(rows: List[Dict[str, Any]]):
+    print(f"{'行数':>10}  {'操作':<44} {'基线':>10} {'当前':>10} {'比例':>7}")
+    for row in rows:
+        flag = '  <-- 回退' if row['regression'] else ''
+        print(f"{row['rows']:>10}  {row['operation']:<44} {row['baseline']:>10.2f} "
+              f"{row['current']:>10.2f} {row['ratio']:>7.2f}{flag}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='DataTable 性能基准测试')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='表格行数（可多个）')
+    parser.add_argument('--repeat', type=int, default=5, help='每个操作的测量次数')
+    parser.add_argument('--batch-size', type=int, default=1000, help='add_data 每批的行数')
+    parser.add_argument('--seed', type=int, default=0, help='随机种子')
+    parser.add_argument('--output', help='将结果保存为 JSON 文件（可作为基线）')
+    parser.add_argument('--compare', help='与保存的基线 JSON 比较')
+    parser.add_argument('--threshold', type=float, default=0.2, help='p50 变慢超过该比例视为回退')
+    parser.add_argument('--no-isolate', action='store_true', help='不使用子进程（峰值内存为累计值）')
+    parser.add_argument('--engine', choices=ENGINES, default='pandas', help='存储引擎')
+    args = parser.parse_args(argv)
+
+    result = run_benchmarks(args.sizes, args.repeat, args.batch_size, args.seed,
+                            isolate=not args.no_isolate, engine=args.engine)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+    if not args.compare:
+        if not args.output:
+            print(json.dumps(result, ensure_ascii=False, indent=2))
+        return 0
+
+    with open(args.compare, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    rows = compare(result, baseline, args.threshold)
+    print_comparison(rows)
+    regressions = [r for r in rows if r['regression']]
+    if regressions:
+        print(f"\n发现 {len(regressions)} 项回退（阈值 {args.threshold:.0%}）")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
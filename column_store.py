@@ -0,0 +1,477 @@
+"""列式存储 - 基于内存映射文件的列缓冲区
+
+将表格数据按列写入一个目录中的二进制文件，供一个或多个进程通过 mmap 读取：
+- 定长列（整数、浮点、布尔、datetime64）以原始数组存储，读取时零拷贝映射
+- 变长列（字符串、bytes）以 offsets + data 两个缓冲区存储，另有一个有效位文件记录空值
+- header.bin 记录版本号、行数和 schema 版本，写入方追加数据后才发布新版本
+
+目录结构：
+    schema.json   列定义（名称、存储类型、dtype、文件名前缀）、列配置和待删除的旧文件
+    header.bin    发布头：seq / row_count / schema_version（seqlock 方式读写）
+    c0.data ...   每列的数据文件（变长列还有 .offsets 和 .valid；整数列提升为浮点后为 c0_v3.data 等）
+
+同一时间只允许一个写入方；读取方可以有任意多个（包括其他进程）。
+在 Linux 上可以把目录放在 /dev/shm 下，效果等同于共享内存。
+"""
+
+import json
+import mmap
+import os
+import struct
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+# seq, row_count, schema_version, reserved
+_HEADER_FORMAT = '<QQQQ'
+_HEADER_SIZE = struct.calcsize(_HEADER_FORMAT)
+_SCHEMA_FILE = 'schema.json'
+_HEADER_FILE = 'header.bin'
+# 列的数据文件被替换后保留旧文件的秒数：仍按旧 schema 读取的进程在此期间切换到新文件
+RETIRED_FILE_GRACE = 60.0
+
+KIND_FIXED = 'fixed'    # 定长数值列
+KIND_UTF8 = 'utf8'      # 变长字符串列
+KIND_BINARY = 'binary'  # 变长 bytes 列
+
+
+def infer_column_kind(series: pd.Series) -> Tuple[str, Optional[str]]:
+    """根据 Series 推断存储类型，返回 (kind, dtype)"""
+    dtype = series.dtype
+    if dtype.kind in 'biufM' and not isinstance(dtype, pd.api.extensions.ExtensionDtype):
+        return KIND_FIXED, dtype.str
+    # object 列中可能是数字（如 add_data 补齐的 None 使整数列变为 object）
+    inferred = pd.api.types.infer_dtype(series, skipna=True)
+    if inferred == 'integer':
+        has_null = series.isna().any()
+        return KIND_FIXED, np.dtype(np.float64 if has_null else np.int64).str
+    if inferred in ('floating', 'mixed-integer-float'):
+        return KIND_FIXED, np.dtype(np.float64).str
+    sample = series.dropna()
+    if len(sample) > 0 and isinstance(sample.iloc[0], (bytes, bytearray)):
+        return KIND_BINARY, None
+    return KIND_UTF8, None
+
+
+def encode_var_values(values: Sequence[Any], kind: str) -> Tuple[np.ndarray, bytes, np.ndarray]:
+    """将变长列的值编码为 (lengths, data, valid)"""
+    valid = np.fromiter((v is not None and not (isinstance(v, float) and np.isnan(v)) for v in values),
+                        dtype=np.uint8, count=len(values))
+    if kind == KIND_BINARY:
+        encoded = [bytes(v) if ok and isinstance(v, (bytes, bytearray)) else (str(v).encode('utf-8') if ok else b'')
+                   for v, ok in zip(values, valid)]
+    else:
+        encoded = [str(v).encode('utf-8') if ok else b'' for v, ok in zip(values, valid)]
+    lengths = np.fromiter((len(b) for b in encoded), dtype=np.int64, count=len(encoded))
+    return lengths, b''.join(encoded), valid
+
+
+def decode_var_values(offsets: np.ndarray, data: Union[bytes, memoryview, np.ndarray],
+                      valid: np.ndarray, kind: str) -> np.ndarray:
+    """将 offsets/data/valid 解码为 object 数组
+
+    offsets 的长度为行数 + 1，偏移量相对于 data 的起点。
+    """
+    count = len(offsets) - 1
+    result = np.empty(count, dtype=object)
+    if count == 0:
+        return result
+    raw = data.tobytes() if isinstance(data, np.ndarray) else bytes(data)
+    starts = offsets[:-1].tolist()
+    ends = offsets[1:].tolist()
+    flags = valid.tolist()
+    if kind == KIND_BINARY:
+        values = [raw[a:b] if ok else None for a, b, ok in zip(starts, ends, flags)]
+    else:
+        values = [raw[a:b].decode('utf-8') if ok else None for a, b, ok in zip(starts, ends, flags)]
+    result[:] = values
+    return result
+
+
+def _map_file(path: Path, dtype: Union[str, np.dtype], length: int) -> np.ndarray:
+    """只读映射文件的前 length 个元素（length 为 0 时返回空数组）"""
+    if length <= 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r', shape=(length,))
+
+
+class ColumnStoreWriter:
+    """列式存储写入方
+
+    负责追加数据并发布新版本。重新打开已有目录时，会截断上次未发布的残留数据，
+    从最后一次发布的行数继续追加。
+    """
+
+    def __init__(self, path: Union[str, Path], columns_config: Optional[List[Any]] = None):
+        """
+        Args:
+            path: 存储目录，不存在时自动创建
+            columns_config: 列配置（ColumnConfig 列表），随 schema 一起保存，供读取方使用
+        """
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._columns: List[Dict[str, Any]] = []
+        self._columns_config = [
+            c.model_dump() if hasattr(c, 'model_dump') else dict(c) for c in (columns_config or [])
+        ]
+        self._row_count = 0
+        self._seq = 0
+        self._schema_version = 0
+        self._schema_dirty = False
+        # 被替换、等待删除的旧数据文件: [{'file': 文件名, 'retired_at': 时间戳}]
+        self._retired: List[Dict[str, Any]] = []
+
+        header_path = self.path / _HEADER_FILE
+        if not header_path.exists():
+            header_path.write_bytes(b'\x00' * _HEADER_SIZE)
+        self._header_file = open(header_path, 'r+b')
+        self._header = mmap.mmap(self._header_file.fileno(), _HEADER_SIZE)
+
+        schema_path = self.path / _SCHEMA_FILE
+        if schema_path.exists():
+            self._resume(schema_path)
+        else:
+            self._write_schema()
+            self._publish()
+
+    @property
+    def row_count(self) -> int:
+        return self._row_count
+
+    @property
+    def version(self) -> int:
+        return self._seq // 2
+
+    @property
+    def columns(self) -> List[str]:
+        return [c['name'] for c in self._columns]
+
+    def set_columns_config(self, columns_config: List[Any]):
+        """更新随 schema 保存的列配置，在下一次 append 时一起发布"""
+        self._columns_config = [
+            c.model_dump() if hasattr(c, 'model_dump') else dict(c) for c in columns_config
+        ]
+        self._schema_dirty = True
+
+    def _resume(self, schema_path: Path):
+        """从已有目录恢复写入状态，并截断未发布的数据"""
+        with open(schema_path, 'r', encoding='utf-8') as f:
+            schema = json.load(f)
+        self._columns = schema['columns']
+        if not self._columns_config:
+            self._columns_config = schema.get('columns_config') or []
+        self._retired = schema.get('retired') or []
+        seq, row_count, schema_version, _ = struct.unpack(_HEADER_FORMAT, self._header[:_HEADER_SIZE])
+        self._seq = seq + (seq % 2)
+        self._row_count = row_count
+        self._schema_version = schema_version
+        for col in self._columns:
+            self._truncate_column(col, row_count)
+
+    def _truncate_column(self, col: Dict[str, Any], row_count: int):
+        stem = self.path / col['file']
+        if col['kind'] == KIND_FIXED:
+            itemsize = np.dtype(col['dtype']).itemsize
+            os.truncate(f'{stem}.data', row_count * itemsize)
+            return
+        offsets = _map_file(Path(f'{stem}.offsets'), np.int64, row_count + 1)
+        data_length = int(offsets[row_count]) if len(offsets) else 0
+        del offsets
+        os.truncate(f'{stem}.offsets', (row_count + 1) * 8)
+        os.truncate(f'{stem}.data', data_length)
+        os.truncate(f'{stem}.valid', row_count)
+
+    def _write_schema(self):
+        """原子地写入 schema.json"""
+        schema = {
+            'schema_version': self._schema_version,
+            'columns': self._columns,
+            'columns_config': self._columns_config,
+            'retired': self._retired,
+        }
+        tmp_path = self.path / (_SCHEMA_FILE + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(schema, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path / _SCHEMA_FILE)
+
+    def _publish(self):
+        """以 seqlock 方式发布行数和 schema 版本：奇数 seq 表示正在写入"""
+        self._seq += 1
+        self._header[:8] = struct.pack('<Q', self._seq)
+        self._header[8:_HEADER_SIZE] = struct.pack('<QQQ', self._row_count, self._schema_version, 0)
+        self._seq += 1
+        self._header[:8] = struct.pack('<Q', self._seq)
+        self._header.flush()
+
+    def _add_column(self, name: str, series: pd.Series):
+        """新增一列，并为已有行回填空值"""
+        kind, dtype = infer_column_kind(series)
+        if kind == KIND_FIXED and self._row_count > 0 and np.dtype(dtype).kind in 'biu':
+            # 已有行需要回填空值，整数列只能以浮点形式保存 NaN
+            dtype = np.dtype(np.float64).str
+        col = {'name': name, 'kind': kind, 'dtype': dtype, 'file': f'c{len(self._columns)}'}
+        stem = self.path / col['file']
+        if kind == KIND_FIXED:
+            fill = np.full(self._row_count, np.nan if np.dtype(dtype).kind == 'f' else 0, dtype=dtype)
+            with open(f'{stem}.data', 'wb') as f:
+                f.write(fill.tobytes())
+        else:
+            with open(f'{stem}.offsets', 'wb') as f:
+                f.write(np.zeros(self._row_count + 1, dtype=np.int64).tobytes())
+            open(f'{stem}.data', 'wb').close()
+            with open(f'{stem}.valid', 'wb') as f:
+                f.write(np.zeros(self._row_count, dtype=np.uint8).tobytes())
+        self._columns.append(col)
+
+    def _append_column(self, col: Dict[str, Any], series: Optional[pd.Series], count: int):
+        stem = self.path / col['file']
+        if col['kind'] == KIND_FIXED:
+            dtype = np.dtype(col['dtype'])
+            if series is None:
+                values = np.full(count, np.nan if dtype.kind == 'f' else 0, dtype=dtype)
+            else:
+                if dtype.kind in 'biuf' and series.dtype == object:
+                    series = pd.to_numeric(series, errors='coerce')
+                values = series.to_numpy(dtype=dtype, na_value=np.nan) if dtype.kind == 'f' else series.to_numpy(dtype=dtype)
+            with open(f'{stem}.data', 'ab') as f:
+                f.write(np.ascontiguousarray(values).tobytes())
+            return
+
+        values = [None] * count if series is None else series.tolist()
+        lengths, data, valid = encode_var_values(values, col['kind'])
+        offsets_path = Path(f'{stem}.offsets')
+        last = _map_file(offsets_path, np.int64, self._row_count + 1)
+        base = int(last[self._row_count]) if len(last) else 0
+        del last
+        offsets = base + np.cumsum(lengths)
+        with open(f'{stem}.data', 'ab') as f:
+            f.write(data)
+        with open(offsets_path, 'ab') as f:
+            f.write(offsets.astype(np.int64).tobytes())
+        with open(f'{stem}.valid', 'ab') as f:
+            f.write(valid.tobytes())
+
+    def _promote_to_float(self, col: Dict[str, Any]):
+        """整数列遇到空值时提升为 float64
+
+        提升后写入带 schema 版本后缀的新数据文件并变更 schema，正在读取旧文件的进程在下次同步时切换到新文件。
+        旧文件不立即删除：其他进程可能已读取旧的 schema、尚未映射旧文件，保留 RETIRED_FILE_GRACE 秒后再删除。
+        """
+        old_file = f"{col['file']}.data"
+        values = _map_file(self.path / old_file, col['dtype'], self._row_count).astype(np.float64)
+        col['file'] = f"{col['file'].split('_v')[0]}_v{self._schema_version + 1}"
+        col['dtype'] = np.dtype(np.float64).str
+        with open(self.path / f"{col['file']}.data", 'wb') as f:
+            f.write(values.tobytes())
+        self._retired.append({'file': old_file, 'retired_at': time.time()})
+
+    def _remove_retired(self) -> bool:
+        """删除保留时间已过的旧数据文件，返回是否有文件被删除"""
+        now = time.time()
+        kept = []
+        for item in self._retired:
+            if now - item['retired_at'] < RETIRED_FILE_GRACE:
+                kept.append(item)
+                continue
+            try:
+                os.remove(self.path / item['file'])
+            except FileNotFoundError:
+                pass
+            except OSError:
+                # Windows 下旧文件可能仍被读取方映射，下次再删除
+                kept.append(item)
+        removed = len(kept) < len(self._retired)
+        self._retired = kept
+        return removed
+
+    def append(self, data: Union[pd.DataFrame, List[Dict[str, Any]], Dict[str, Any]]) -> int:
+        """追加一批数据并发布新版本
+
+        Args:
+            data: DataFrame、字典列表或单个字典
+
+        Returns:
+            发布后的版本号
+        """
+        if isinstance(data, dict):
+            data = [data]
+        df = data if isinstance(data, pd.DataFrame) else pd.DataFrame(data)
+        count = len(df)
+        if count == 0:
+            return self.version
+
+        known = {c['name'] for c in self._columns}
+        schema_changed = self._schema_dirty
+        for name in df.columns:
+            if name not in known:
+                self._add_column(name, df[name])
+                schema_changed = True
+
+        for col in self._columns:
+            name = col['name']
+            if (col['kind'] == KIND_FIXED and np.dtype(col['dtype']).kind in 'biu'
+                    and (name not in df.columns or df[name].isna().any())):
+                self._promote_to_float(col)
+                schema_changed = True
+
+        for col in self._columns:
+            self._append_column(col, df[col['name']] if col['name'] in df.columns else None, count)
+
+        if schema_changed:
+            self._schema_version += 1
+            self._remove_retired()
+            self._write_schema()
+            self._schema_dirty = False
+        elif self._retired and self._remove_retired():
+            # 只更新待删除的旧文件列表，列定义没有变化，不变更 schema 版本
+            self._write_schema()
+        self._row_count += count
+        self._publish()
+        return self.version
+
+    def close(self):
+        self._header.close()
+        self._header_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ColumnStoreReader:
+    """列式存储读取方
+
+    通过 mmap 读取写入方发布的数据。定长列返回零拷贝的只读数组视图，
+    变长列按需解码指定的行范围或行位置。
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        if not (self.path / _SCHEMA_FILE).exists():
+            raise FileNotFoundError(f'列存储目录不存在或未初始化: {self.path}')
+        self._header_file = open(self.path / _HEADER_FILE, 'rb')
+        self._header = mmap.mmap(self._header_file.fileno(), _HEADER_SIZE, access=mmap.ACCESS_READ)
+        self._columns: Dict[str, Dict[str, Any]] = {}
+        self._column_order: List[str] = []
+        self._columns_config: List[Dict[str, Any]] = []
+        self._schema_version = -1
+        self._maps: Dict[Tuple[str, str], np.ndarray] = {}
+        self.version, self.row_count = 0, 0
+        self.refresh()
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self._column_order)
+
+    @property
+    def columns_config(self) -> List[Dict[str, Any]]:
+        return list(self._columns_config)
+
+    def column_kind(self, name: str) -> str:
+        return self._columns[name]['kind']
+
+    @property
+    def mapped_bytes(self) -> int:
+        """当前已映射的文件字节数（由操作系统按页加载，不计入常驻内存）"""
+        return sum(int(m.nbytes) for m in self._maps.values())
+
+    def read_header(self) -> Tuple[int, int, int]:
+        """读取一次稳定的发布头，返回 (version, row_count, schema_version)"""
+        while True:
+            seq1 = struct.unpack('<Q', self._header[:8])[0]
+            row_count, schema_version, _ = struct.unpack('<QQQ', self._header[8:_HEADER_SIZE])
+            seq2 = struct.unpack('<Q', self._header[:8])[0]
+            if seq1 == seq2 and seq1 % 2 == 0:
+                return seq1 // 2, row_count, schema_version
+            time.sleep(0)
+
+    def refresh(self) -> bool:
+        """同步到写入方最新发布的版本，返回版本是否发生变化"""
+        version, row_count, schema_version = self.read_header()
+        if schema_version != self._schema_version:
+            self._load_schema(schema_version)
+        changed = version != self.version
+        self.version, self.row_count = version, row_count
+        return changed
+
+    def _load_schema(self, schema_version: int):
+        with open(self.path / _SCHEMA_FILE, 'r', encoding='utf-8') as f:
+            schema = json.load(f)
+        self._columns = {c['name']: c for c in schema['columns']}
+        self._column_order = [c['name'] for c in schema['columns']]
+        self._columns_config = schema.get('columns_config') or []
+        self._schema_version = schema_version
+        self._maps.clear()
+
+    def _mapped(self, name: str, part: str, dtype: Union[str, np.dtype], length: int) -> np.ndarray:
+        """返回至少包含 length 个元素的映射，长度不足时重新映射"""
+        key = (name, part)
+        current = self._maps.get(key)
+        if current is None or len(current) < length:
+            current = _map_file(self.path / f"{self._columns[name]['file']}.{part}", dtype, length)
+            self._maps[key] = current
+        return current[:length]
+
+    def fixed_array(self, name: str, start: int = 0, stop: Optional[int] = None) -> np.ndarray:
+        """返回定长列的零拷贝只读视图"""
+        col = self._columns[name]
+        if col['kind'] != KIND_FIXED:
+            raise TypeError(f'列 {name} 不是定长列')
+        stop = self.row_count if stop is None else min(stop, self.row_count)
+        return self._mapped(name, 'data', col['dtype'], self.row_count)[start:stop]
+
+    def read_column(self, name: str, start: int = 0, stop: Optional[int] = None) -> np.ndarray:
+        """读取一列在 [start, stop) 范围内的值"""
+        col = self._columns[name]
+        stop = self.row_count if stop is None else min(stop, self.row_count)
+        start = max(0, min(start, stop))
+        if col['kind'] == KIND_FIXED:
+            return self.fixed_array(name, start, stop)
+        offsets = self._mapped(name, 'offsets', np.int64, self.row_count + 1)[start:stop + 1]
+        valid = self._mapped(name, 'valid', np.uint8, self.row_count)[start:stop]
+        data_end = int(offsets[-1]) if len(offsets) else 0
+        data = self._mapped(name, 'data', np.uint8, data_end)
+        base = int(offsets[0]) if len(offsets) else 0
+        return decode_var_values(offsets - base, data[base:data_end], valid, col['kind'])
+
+    def take(self, name: str, positions: Sequence[int]) -> np.ndarray:
+        """按行位置读取一列（用于分页只取当前页的数据）"""
+        positions = np.asarray(positions, dtype=np.int64)
+        col = self._columns[name]
+        if col['kind'] == KIND_FIXED:
+            return np.asarray(self.fixed_array(name)[positions])
+        offsets = self._mapped(name, 'offsets', np.int64, self.row_count + 1)
+        valid = self._mapped(name, 'valid', np.uint8, self.row_count)
+        data = self._mapped(name, 'data', np.uint8, int(offsets[-1]) if len(offsets) else 0)
+        result = np.empty(len(positions), dtype=object)
+        for i, pos in enumerate(positions.tolist()):
+            if not valid[pos]:
+                result[i] = None
+                continue
+            raw = data[offsets[pos]:offsets[pos + 1]].tobytes()
+            result[i] = raw if col['kind'] == KIND_BINARY else raw.decode('utf-8')
+        return result
+
+    def read_frame(self, columns: Optional[List[str]] = None, start: int = 0,
+                   stop: Optional[int] = None) -> pd.DataFrame:
+        """读取 [start, stop) 范围的 DataFrame，定长列不复制"""
+        names = columns if columns is not None else self._column_order
+        stop = self.row_count if stop is None else min(stop, self.row_count)
+        data = {name: self.read_column(name, start, stop) for name in names}
+        return pd.DataFrame(data, columns=names, copy=False)
+
+    def close(self):
+        self._maps.clear()
+        self._header.close()
+        self._header_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
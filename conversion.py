@@ -0,0 +1,139 @@
+"""写入数据的转换进程池
+
+add_data 的大部分耗时在把新数据转换为可追加的列：构建 DataFrame、16 进制字符串转 bytes、
+ts 字符串解析、类型推断和新字段的列配置推断。这些只依赖新数据和列配置，DataTable 在获取写锁之前
+完成转换（data_table.prepare_batch），写锁只用于分配 id、拼接和发布。
+
+转换仍然占用写入线程所在进程的 GIL，大批量导入时同一进程中的查询会变慢。启用进程池后，
+不少于 threshold_rows 行的批次在子进程中转换，写入线程只等待结果：
+
+    CONVERSION_POOL.configure(max_workers=2, threshold_rows=20_000)
+
+也可通过环境变量 NICE_TABLE_CONVERSION_WORKERS、NICE_TABLE_CONVERSION_THRESHOLD 设置，默认关闭。
+
+子进程按 pickle 协议 5 序列化结果，数值列等连续缓冲区以带外（out-of-band）方式写入一块共享内存，
+父进程只复制一次（不经过进程间管道的多次拷贝）；字符串等 Python 对象仍在 pickle 数据中传递。
+"""
+
+import logging
+import multiprocessing
+import os
+import pickle
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+from typing import Any, Callable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_THRESHOLD_ROWS = 20_000
+
+# (pickle 数据, 共享内存名称（没有带外缓冲区时为 None）, 各缓冲区的字节数)
+_Packed = Tuple[bytes, Optional[str], List[int]]
+
+
+class ConversionPool:
+    """在子进程中执行转换函数，结果经共享内存返回"""
+
+    def __init__(self, max_workers: int = 0, threshold_rows: int = DEFAULT_THRESHOLD_ROWS):
+        """
+        Args:
+            max_workers: 子进程数，0 表示关闭（在调用线程中转换）
+            threshold_rows: 不少于该行数的批次才交给子进程（小批量的进程间传输开销大于转换本身）
+        """
+        self.max_workers = max_workers
+        self.threshold_rows = threshold_rows
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_workers > 0
+
+    def configure(self, max_workers: int, threshold_rows: Optional[int] = None):
+        """修改子进程数和行数阈值（已启动的子进程会被关闭，下次使用时按新设置启动）"""
+        self.shutdown()
+        self.max_workers = max_workers
+        if threshold_rows is not None:
+            self.threshold_rows = threshold_rows
+
+    def should_offload(self, rows: int) -> bool:
+        """该行数的批次是否交给子进程转换"""
+        return self.enabled and rows >= self.threshold_rows
+
+    def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """在子进程中执行 fn(*args) 并返回结果；fn 必须是可按名称导入的模块级函数
+
+        子进程异常退出（如被 OOM 杀死）时重建进程池，本次改为在调用线程中执行。
+        """
+        executor = self._get_executor()
+        try:
+            packed = executor.submit(_run_packed, fn, args).result()
+        except BrokenProcessPool as e:
+            logger.warning(f'转换进程池不可用，改为在当前进程中转换: {e}')
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = None
+            return fn(*args)
+        return _unpack(packed)
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # 使用 spawn：写入进程中有其他线程（事件循环、写入队列）持有锁时 fork 可能死锁
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers, mp_context=multiprocessing.get_context('spawn')
+                )
+            return self._executor
+
+
+def _run_packed(fn: Callable[..., Any], args: Tuple[Any, ...]) -> _Packed:
+    """在子进程中执行：结果的带外缓冲区依次写入一块共享内存"""
+    buffers: List[pickle.PickleBuffer] = []
+    data = pickle.dumps(fn(*args), protocol=5, buffer_callback=buffers.append)
+    views = [buffer.raw() for buffer in buffers]
+    sizes = [view.nbytes for view in views]
+    if not sum(sizes):
+        return data, None, sizes
+    shm = shared_memory.SharedMemory(create=True, size=sum(sizes))
+    try:
+        offset = 0
+        for view in views:
+            shm.buf[offset:offset + view.nbytes] = view
+            offset += view.nbytes
+    finally:
+        shm.close()
+    return data, shm.name, sizes
+
+
+def _unpack(packed: _Packed) -> Any:
+    """复制共享内存中的缓冲区（之后立即释放共享内存），重建结果"""
+    data, name, sizes = packed
+    if name is None:
+        return pickle.loads(data, buffers=[b''] * len(sizes))
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        copied = bytearray(shm.buf[:sum(sizes)])
+    finally:
+        shm.close()
+        shm.unlink()
+    view = memoryview(copied)
+    buffers = []
+    offset = 0
+    for size in sizes:
+        buffers.append(view[offset:offset + size])
+        offset += size
+    return pickle.loads(data, buffers=buffers)
+
+
+CONVERSION_POOL = ConversionPool(
+    max_workers=int(os.environ.get('NICE_TABLE_CONVERSION_WORKERS') or 0),
+    threshold_rows=int(os.environ.get('NICE_TABLE_CONVERSION_THRESHOLD') or DEFAULT_THRESHOLD_ROWS),
+)
@@ -4,6 +4,7 @@ import random
 from datetime import datetime, timedelta
 from typing import List, Dict, Optional
 import numpy as np
+import pandas as pd
 
 
 def generate_single_record(start_id: Optional[int] = None) -> dict:
@@ -72,12 +73,83 @@ def generate_single_record(start_id: Optional[int] = None) -> dict:
     }
 
 
-def generate_batch_records(start_id: int, count: int) -> List[Dict]:
+# 批量生成使用的字段取值
+ORDER_STATUSES = ['待付款', '已付款', '已发货', '已完成', '已取消', '退款中']
+PAYMENT_METHODS = ['支付宝', '微信支付', '银行卡', '现金', 'PayPal']
+CITIES = ['北京', '上海', '广州', '深圳', '杭州', '成都', '武汉', '西安', '南京', '重庆']
+MERCHANTS = ['商家A', '商家B', '商家C', '商家D', '商家E', '商家F', '商家G']
+PAYLOAD_SIZE = 16
+
+
+def _object_array(values: List) -> np.ndarray:
+    """转换为 object 数组（按下标取值时多行共享同一个字符串对象）"""
+    result = np.empty(len(values), dtype=object)
+    result[:] = values
+    return result
+
+
+def _order_numbers(ids: np.ndarray) -> np.ndarray:
+    """向量化生成订单号 ORD + 补零到 10 位的 ID
+
+    直接按 UCS4 编码写入每个字符，再整体视为定长字符串数组，避免逐行格式化。
+    """
+    width = max(10, len(str(int(ids.max())))) if len(ids) > 0 else 10
+    chars = np.empty((len(ids), 3 + width), dtype=np.uint32)
+    chars[:, :3] = [ord(c) for c in 'ORD']
+    remaining = ids.astype(np.uint64)
+    for pos in range(3 + width - 1, 2, -1):
+        quotient = remaining // 10
+        chars[:, pos] = remaining - quotient * 10 + ord('0')
+        remaining = quotient
+    return chars.view(f'U{3 + width}').ravel().astype(object)
+
+
+def _generate_columns(start_id: int, count: int, rng: np.random.Generator,
+                      extra_columns: int = 0, cardinality: int = 10) -> Dict[str, np.ndarray]:
+    """按列生成随机数据（全部向量化），返回 列名 -> 数组"""
+    ids = np.arange(start_id, start_id + count, dtype=np.int64)
+    now = datetime.now()
+
+    # 日期只有 731 种取值，先格式化再按下标取值
+    date_strings = _object_array([(now - timedelta(days=d)).strftime('%Y-%m-%d') for d in range(731)])
+    # payload: 每行 16 字节，按定长 void 类型整体转换为 bytes 对象
+    payload_bytes = rng.integers(0, 256, (count, PAYLOAD_SIZE), dtype=np.uint8)
+
+    columns = {
+        'id': ids,
+        'order_number': _order_numbers(ids),
+        'order_status': _object_array(ORDER_STATUSES)[rng.integers(0, len(ORDER_STATUSES), count)],
+        'payment_method': _object_array(PAYMENT_METHODS)[rng.integers(0, len(PAYMENT_METHODS), count)],
+        'order_amount': np.round(rng.uniform(10, 10000, count), 2),
+        'item_count': rng.integers(1, 101, count),
+        'shipping_cost': np.round(rng.uniform(0, 50, count), 1),
+        'city': _object_array(CITIES)[rng.integers(0, len(CITIES), count)],
+        'merchant': _object_array(MERCHANTS)[rng.integers(0, len(MERCHANTS), count)],
+        'user_id': rng.integers(1000, 100000, count),
+        'discount': np.round(rng.uniform(0, 0.5, count), 2),
+        'order_date': date_strings[rng.integers(0, 731, count)],
+        'payload': _object_array(payload_bytes.view(f'V{PAYLOAD_SIZE}').ravel().tolist()),
+        'ts': now.timestamp() - rng.uniform(0, 2 * 365 * 24 * 3600, count),
+    }
+
+    # 额外的列：偶数列为数值，奇数列为有 cardinality 种取值的字符串
+    for i in range(extra_columns):
+        name = f'extra_{i}'
+        if i % 2 == 0:
+            columns[name] = np.round(rng.uniform(0, 1000, count), 2)
+        else:
+            values = _object_array([f'{name}_{k}' for k in range(cardinality)])
+            columns[name] = values[rng.integers(0, cardinality, count)]
+    return columns
+
+
+def generate_batch_records(start_id: int, count: int, seed: Optional[int] = None) -> List[Dict]:
     """批量生成随机数据记录
     
     Args:
         start_id: 起始ID
         count: 生成数量
+        seed: 随机种子，相同的种子生成相同的数据（日期和时间戳相对于当前时间）
     
     Returns:
         数据记录列表
@@ -85,63 +157,30 @@ def generate_batch_records(start_id: int, count: int) -> List[Dict]:
     if count <= 0:
         return []
 
-    # 字段定义
-    order_statuses = ['待付款', '已付款', '已发货', '已完成', '已取消', '退款中']
-    payment_methods = ['支付宝', '微信支付', '银行卡', '现金', 'PayPal']
-    cities = ['北京', '上海', '广州', '深圳', '杭州', '成都', '武汉', '西安', '南京', '重庆']
-    merchants = ['商家A', '商家B', '商家C', '商家D', '商家E', '商家F', '商家G']
-    
-    # 预生成基础数据
-    ids = np.arange(start_id, start_id + count)
-    
-    # 生成订单号
-    order_numbers = [f"ORD{str(rid).zfill(10)}" for rid in ids]
-    
-    # 随机选择分类字段
-    batch_statuses = np.random.choice(order_statuses, count)
-    batch_payments = np.random.choice(payment_methods, count)
-    batch_cities = np.random.choice(cities, count)
-    batch_merchants = np.random.choice(merchants, count)
-    
-    # 生成数值字段
-    batch_amounts = np.round(np.random.uniform(10, 10000, count), 2)
-    batch_item_counts = np.random.randint(1, 101, count)
-    batch_shipping_costs = np.round(np.random.uniform(0, 50, count), 1)
-    batch_user_ids = np.random.randint(1000, 100000, count)
-    batch_discounts = np.round(np.random.uniform(0, 0.5, count), 2)
-    
-    # 生成日期
-    base_date = datetime.now()
-    days_offsets = np.random.randint(0, 731, count)
-    batch_dates = [(base_date - timedelta(days=int(d))).strftime('%Y-%m-%d') for d in days_offsets]
+    columns = _generate_columns(start_id, count, np.random.default_rng(seed))
+    names = list(columns)
+    # tolist() 将 numpy 标量转换为 Python 的 int/float
+    return [dict(zip(names, row)) for row in zip(*(columns[name].tolist() for name in names))]
+
+
+def generate_batch_dataframe(start_id: int,
+                             count: int,
+                             seed: Optional[int] = None,
+                             extra_columns: int = 0,
+                             cardinality: int = 10) -> pd.DataFrame:
+    """按列批量生成随机数据，直接返回 DataFrame（高速模式，每秒可生成百万行以上）
     
-    # 生成时间戳
-    base_timestamp = base_date.timestamp()
-    seconds_offsets = np.random.uniform(0, 2 * 365 * 24 * 3600, count)
-    batch_ts = base_timestamp - seconds_offsets
+    列与 generate_batch_records 相同，不经过逐行的字典。
     
-    # 生成Payload (bytes)
-    batch_payloads = [bytes(np.random.randint(0, 256, 16, dtype=np.uint8)) for _ in range(count)]
+    Args:
+        start_id: 起始ID
+        count: 生成数量
+        seed: 随机种子，相同的种子生成相同的数据（日期和时间戳相对于当前时间）
+        extra_columns: 额外增加的列数（extra_0, extra_1, ...），用于测试更宽的表
+        cardinality: 额外字符串列的不同取值数量
     
-    # 组装数据
-    records = []
-    for i in range(count):
-        records.append({
-            'id': int(ids[i]),
-            'order_number': order_numbers[i],
-            'order_status': str(batch_statuses[i]),
-            'payment_method': str(batch_payments[i]),
-            'order_amount': float(batch_amounts[i]),
-            'item_count': int(batch_item_counts[i]),
-            'shipping_cost': float(batch_shipping_costs[i]),
-            'city': str(batch_cities[i]),
-            'merchant': str(batch_merchants[i]),
-            'user_id': int(batch_user_ids[i]),
-            'discount': float(batch_discounts[i]),
-            'order_date': batch_dates[i],
-            'payload': batch_payloads[i],
-            'ts': float(batch_ts[i])
-        })
-        
-    return records
-
+    Returns:
+        DataFrame
+    """
+    columns = _generate_columns(start_id, max(count, 0), np.random.default_rng(seed), extra_columns, cardinality)
+    return pd.DataFrame(columns, copy=False)
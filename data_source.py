@@ -0,0 +1,191 @@
+"""DataSource - 多个 NiceTable 视图共享的数据源
+
+同一份数据在多个页面（或多个用户）中展示时，每个视图只引用同一个 DataSource：
+- 数据、id 索引、缓存和写入只有一份，内存随数据量而不是 数据量 × 视图数 增长
+- 筛选、排序、分页和列显示是每个视图各自的前端状态，通过请求参数传给共享的 DataTable
+- 通过 DataSource 写入或替换数据后，所有关联的视图都会收到刷新通知
+
+    source = DataSource(df, name='orders')
+
+    @ui.page('/')
+    def page():
+        NiceTable(source=source)
+
+    source.add_data(records)  # 所有打开的页面都会刷新
+
+大量生产者各自写入小批量时，可启用写入队列（见 ingest.py），多次提交合并为一次 add_data：
+
+    source.start_ingest_queue(max_batch_rows=10_000, max_delay=0.05)
+    result = await asyncio.wrap_future(source.submit(records))
+"""
+
+import asyncio
+import logging
+import uuid
+import weakref
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Union
+
+import pandas as pd
+
+from data_table import ColumnConfig, DataTable, generate_columns_config_from_dataframe
+from ingest import IngestQueue
+
+logger = logging.getLogger(__name__)
+
+
+class DataSource:
+    """共享的表格数据源，持有唯一的 DataTable 并通知关联的视图"""
+
+    def __init__(self,
+                 dataframe: Optional[pd.DataFrame] = None,
+                 columns_config: Optional[List[ColumnConfig]] = None,
+                 data_table: Optional[DataTable] = None,
+                 name: Optional[str] = None):
+        """
+        Args:
+            dataframe: 表格数据（会复制一次）
+            columns_config: 列配置，默认根据 dataframe 自动生成
+            data_table: 直接使用已有的 DataTable（如 MappedDataTable、SharedDataTable），此时忽略 dataframe
+            name: 数据源名称，用作指标中的 table 标签，默认随机生成
+        """
+        if data_table is None:
+            if dataframe is None:
+                raise ValueError('dataframe 不能为空')
+            if columns_config is None:
+                if dataframe.empty:
+                    raise ValueError('空 DataFrame 需要同时提供 columns_config')
+                columns_config = generate_columns_config_from_dataframe(dataframe)
+            data_table = DataTable(dataframe, columns_config)
+        self.name = name or uuid.uuid4().hex
+        self.table = data_table
+        self.table.table_id = self.name
+        # 关联的视图（弱引用，视图被删除后自动移除）
+        self._views: 'weakref.WeakSet' = weakref.WeakSet()
+        # 写入队列（默认关闭），以及提交写入的事件循环（写线程写完后在该循环中通知视图）
+        self.ingest_queue: Optional[IngestQueue] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def views(self) -> list:
+        return list(self._views)
+
+    def attach(self, view):
+        """关联视图（NiceTable 创建时自动调用）"""
+        self._views.add(view)
+
+    def detach(self, view):
+        self._views.discard(view)
+
+    def add_data(self, records: Union[List[Dict[str, Any]], pd.DataFrame], refresh: bool = True) -> Dict[str, Any]:
+        """写入数据，refresh 为 True 时通知所有视图刷新
+
+        启用写入队列时经队列合并写入（每批写入后都会通知视图，忽略 refresh）：
+        - 在其他线程中调用时等待队列空位和写入完成，返回写入结果
+        - 在事件循环中调用（如 NiceTable 的事件处理函数）时不阻塞事件循环：队列已满时抛出 IngestQueueFull，
+          否则提交后立即返回 {'success': True, 'queued': True, 'added_count': n}（n 为提交的行数），
+          写入失败时记录错误日志；需要实际的写入结果时使用 submit 并等待返回的 Future
+        """
+        if self.ingest_queue is not None:
+            if self._remember_loop():
+                future = self.ingest_queue.submit(records)
+                future.add_done_callback(self._log_failure)
+                return {'success': True, 'queued': True, 'added_count': len(records)}
+            return self.ingest_queue.submit(records, block=True).result()
+        return self._after_write(self.table.add_data(records), refresh)
+
+    def submit(self, records: Union[List[Dict[str, Any]], pd.DataFrame]) -> Future:
+        """提交写入，返回带写入结果的 Future
+
+        启用写入队列时与其他提交合并写入，队列已满时抛出 IngestQueueFull；否则立即写入。
+        """
+        if self.ingest_queue is None:
+            future: Future = Future()
+            try:
+                future.set_result(self.add_data(records))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+        self._remember_loop()
+        return self.ingest_queue.submit(records)
+
+    def start_ingest_queue(self, **options: Any) -> IngestQueue:
+        """启用写入队列，options 见 IngestQueue（max_batch_rows、max_delay、max_pending_rows）"""
+        if self.ingest_queue is None:
+            self.ingest_queue = IngestQueue(
+                lambda records: self.table.add_data(records), name=self.name, on_batch=self._batch_written, **options
+            )
+        return self.ingest_queue
+
+    def stop_ingest_queue(self, timeout: Optional[float] = None):
+        """写完队列中剩余的记录后关闭写入队列"""
+        queue, self.ingest_queue = self.ingest_queue, None
+        if queue is not None:
+            queue.close(timeout)
+
+    def _remember_loop(self) -> bool:
+        """记录当前线程中运行的事件循环，返回是否在事件循环中调用"""
+        try:
+            self._loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return False
+        return True
+
+    def _log_failure(self, future: Future):
+        # 事件循环中调用 add_data 时不等待写入结果，失败只能记录在日志中
+        error = future.exception()
+        if error is not None:
+            logger.error(f'数据源 {self.name} 经写入队列写入失败: {error}')
+
+    def _batch_written(self, result: Dict[str, Any]):
+        # 写线程中调用：视图的刷新需要在事件循环中执行
+        loop = self._loop
+        if loop is not None and loop.is_running():
+            loop.call_soon_threadsafe(self._after_write, result, True)
+        else:
+            self._after_write(result, True)
+
+    def upsert(self, records: List[Dict[str, Any]], refresh: bool = True) -> Dict[str, Any]:
+        """按 id 写入（已存在则更新，否则追加），见 DataTable.upsert"""
+        return self._after_write(self.table.upsert(records), refresh)
+
+    def update_rows(self, updates: Dict[Any, Dict[str, Any]], refresh: bool = True) -> Dict[str, Any]:
+        """按 id 更新已有行的字段，见 DataTable.update_rows"""
+        return self._after_write(self.table.update_rows(updates), refresh)
+
+    def delete_rows(self, ids: List[Any], refresh: bool = True) -> Dict[str, Any]:
+        """按 id 删除行，见 DataTable.delete_rows"""
+        return self._after_write(self.table.delete_rows(ids), refresh)
+
+    def update_dataframe(self, dataframe: pd.DataFrame, append_only: Optional[bool] = None) -> Dict[str, Any]:
+        """用外部管理的 DataFrame 更新数据，并通知所有视图刷新（append_only 见 DataTable.update_dataframe）"""
+        result = self.table.update_dataframe(dataframe, append_only)
+        if result.get('columns_updated'):
+            self._notify('refresh_columns')
+        self._notify('refresh_data')
+        return result
+
+    def replace(self, dataframe: pd.DataFrame, columns_config: Optional[List[ColumnConfig]] = None):
+        """替换为新的数据（重建 DataTable），所有视图随之切换"""
+        if columns_config is None:
+            columns_config = self.table.columns_config
+        table = DataTable(dataframe, columns_config)
+        table.table_id = self.name
+        self.table = table
+        self._notify('refresh_columns')
+        self._notify('refresh_data')
+
+    def refresh_views(self, columns: bool = False):
+        """通知所有视图刷新数据，columns 为 True 时同时刷新列配置（如批量写入多块后统一刷新）"""
+        if columns:
+            self._notify('refresh_columns')
+        self._notify('refresh_data')
+
+    def _after_write(self, result: Dict[str, Any], refresh: bool) -> Dict[str, Any]:
+        if refresh:
+            self.refresh_views(bool(result.get('columns_updated')))
+        return result
+
+    def _notify(self, method: str):
+        for view in self.views:
+            getattr(view, method)()
@@ -6,11 +6,49 @@
 
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any, Union, Tuple
+from pathlib import Path
+import numpy as np
 import pandas as pd
+import json
 import re
+import shutil
 import logging
+import time
+from contextlib import contextmanager
 from datetime import datetime
 
+from column_store import ColumnStoreReader, ColumnStoreWriter
+from conversion import CONVERSION_POOL
+from memory import BUDGET, array_bytes, empty_usage, finish_usage, frame_bytes
+from metrics import ROWS_INGESTED, STAGE_SECONDS, current_request_timings
+from sketch import HyperLogLog
+
+try:
+    import pyarrow as _pa
+except ImportError:
+    _pa = None
+
+# update_dataframe 自动检测追加写入时，抽样比较的前缀行数
+_APPEND_CHECK_ROWS = 16
+# 字符串列声明的存储类型：安装了 pyarrow 时使用 Arrow 字符串，否则保持 object（不约束）
+_STRING_DTYPE = 'string[pyarrow]' if _pa is not None else None
+# 推断字符串列的存储类型时检查的行数
+_SCHEMA_SAMPLE_ROWS = 1000
+# 不同值不超过该数量的字符串列使用下拉筛选
+_MULTI_SELECT_MAX_OPTIONS = 100
+# 生成列配置时估计不同值数量的抽样行数（按等间隔抽样）
+_INFER_SAMPLE_ROWS = 20_000
+# 估计值超过上限的该倍数才直接判定为高基数（约为 HyperLogLog 标准误差的 6 倍），其余列精确统计
+_SKETCH_MARGIN = 1.1
+# 逐块加入 HyperLogLog 的行数；精确统计不同值时第一块的行数（之后每块增大为 4 倍，至多 _DISTINCT_CHUNK_MAX_ROWS）
+_SKETCH_CHUNK_ROWS = 4096
+_DISTINCT_CHUNK_ROWS = 4096
+_DISTINCT_CHUNK_MAX_ROWS = 1 << 20
+
+
+class SchemaError(ValueError):
+    """写入的值无法按列配置声明的类型保存（如整数列中的小数、数字列中的文本）"""
+
 
 class ColumnConfig(BaseModel):
     """列配置模型"""
@@ -24,6 +62,8 @@ class ColumnConfig(BaseModel):
     width: Optional[int] = None  # 固定宽度
     fixed: Optional[bool | str] = False  # 是否固定: 'left', 'right', False
     options: Optional[List[str]] = None  # 下拉选项（用于select类型）
+    dtype: Optional[str] = None  # 声明的存储类型（pandas 可空类型，如 'Int64'、'Float64'、'boolean'），写入时按此转换
+    inferred: Optional[bool] = False  # 列配置是否根据数据推断：推断的 dtype 遇到不符合的值时放宽（如 Int64 → Float64），声明的则报错
 
 
 # 数据模型（从 api.py 移过来，避免循环导入）
@@ -65,14 +105,22 @@ class DataTable:
     封装表格的数据处理功能，包括筛选、分页、排序等操作。
     初始化时传入DataFrame格式的数据和列配置。
     """
+
+    # 指标中的 table 标签（NiceTable 会设置为实例 uid）
+    table_id = 'default'
+    # 慢查询阈值（秒）：get_list 超过该耗时时记录执行计划，None 表示不记录
+    slow_query_seconds: Optional[float] = 0.5
+    # 同一查询两次记录执行计划的最小间隔（秒），避免慢查询反复执行 explain 加重负载
+    slow_query_log_interval = 60.0
     
-    def __init__(self, dataframe: pd.DataFrame, columns_config: List[ColumnConfig]):
+    def __init__(self, dataframe: pd.DataFrame, columns_config: List[ColumnConfig], copy: bool = True):
         """
         初始化表格类
         
         Args:
             dataframe: pandas DataFrame格式的数据（可以为空，但必须有正确的列结构）
             columns_config: 列配置列表，定义每列的属性（字段名、类型、筛选方式等）
+            copy: 是否复制传入的 DataFrame；为 False 时直接引用（调用方需保证不再修改它）
         """
         import threading
         self._lock = threading.RLock()
@@ -89,16 +137,50 @@ class DataTable:
             # 创建具有正确列结构的空 DataFrame
             self.dataframe = pd.DataFrame(columns=expected_columns)
         else:
-            self.dataframe = dataframe.copy()
+            self.dataframe = dataframe.copy() if copy else dataframe
+        # 按列配置声明的类型转换（只转换类型不一致的列，不修改传入的 DataFrame）
+        self.dataframe = _cast_to_schema(self.dataframe, columns_config)
         
         self.columns_config = columns_config
+        # 上次 update_dataframe 传入的数据源的列类型（转换前），用于识别按相同类型增长的数据源
+        self._source_dtypes: Optional[pd.Series] = None
+        # id 列排序索引: (构建时的 DataFrame, 排序后的 id, 对应的行位置)，DataFrame 替换后自动重建
+        self._id_index: Optional[Tuple[pd.DataFrame, np.ndarray, np.ndarray]] = None
         # 验证列配置中的字段是否存在于DataFrame中
         self._validate_columns()
+        BUDGET.track(self)
     
     @property
     def total_count(self) -> int:
         """获取总数据量"""
         return len(self.dataframe)
+
+    def memory_usage(self, exact: bool = False) -> Dict[str, Any]:
+        """内存占用（字节），类别说明见 memory.py
+
+        不加锁，只读取当前引用的数据（内存预算检查时会统计其他表格）。
+
+        Args:
+            exact: 为 True 时逐个统计 object 列中的对象，否则按抽样估算
+
+        Returns:
+            columns、indexes、caches、segments、mapped、resident（常驻总和）和 by_column（每列）
+        """
+        usage = empty_usage()
+        by_column, usage['mapped'] = frame_bytes(self.dataframe, exact)
+        usage['by_column'] = by_column
+        usage['columns'] = sum(by_column.values())
+        id_index = self._id_index
+        if id_index is not None:
+            for array in id_index[1:]:
+                resident, mapped = array_bytes(array)
+                usage['indexes'] += resident
+                usage['mapped'] += mapped
+        return finish_usage(usage)
+
+    def shed_caches(self) -> int:
+        """丢弃可重建的缓存，返回释放的字节数（DataTable 没有缓存，子类按需覆盖）"""
+        return 0
     
     def _validate_columns(self):
         """验证列配置中的字段是否存在于DataFrame中"""
@@ -113,6 +195,35 @@ class DataTable:
     def _logger(self):
         """获取日志记录器"""
         return logging.getLogger(__name__)
+
+    def _observe(self, operation: str, stage: str, seconds: float):
+        """记录阶段耗时指标（在 API 请求中时同时计入该请求的 Server-Timing）"""
+        STAGE_SECONDS.observe(seconds, table=self.table_id, operation=operation, stage=stage)
+        timings = current_request_timings()
+        if timings is not None:
+            timings.add(stage, seconds)
+
+    @contextmanager
+    def _write_lock(self, operation: str):
+        """获取写锁，并记录等待锁和持有锁的时间"""
+        start = time.perf_counter()
+        with self._lock:
+            acquired = time.perf_counter()
+            self._observe(operation, 'lock_wait', acquired - start)
+            try:
+                yield
+            finally:
+                self._observe(operation, 'lock_hold', time.perf_counter() - acquired)
+
+    def _refresh_column_options(self, operation: str, rows: Optional[pd.DataFrame] = None) -> bool:
+        """更新筛选选项并记录耗时；传入 rows（新增或修改的行）时只把这些行的取值合并到已有选项"""
+        start = time.perf_counter()
+        if rows is not None:
+            updated = self._merge_column_options(rows)
+        else:
+            updated = self._update_column_options()
+        self._observe(operation, 'options', time.perf_counter() - start)
+        return updated
     
     def _parse_number_value(self, value: Any) -> Union[int, float, None]:
         """解析数字值，支持16进制字符串（如0x123）"""
@@ -150,26 +261,30 @@ class DataTable:
             dt = datetime.fromtimestamp(float(ts))
             microseconds = int((float(ts) % 1) * 1000000)
             return dt.strftime('%Y-%m-%d %H:%M:%S') + f'.{microseconds:06d}'
-        except (ValueError, OSError):
+        except (ValueError, OSError, TypeError):
             return str(ts)
     
     def _apply_number_operator(self, df_series: pd.Series, operator: str, value: Union[int, float]) -> pd.Series:
-        """应用数字操作符到pandas Series"""
+        """应用数字操作符到pandas Series（可空类型列中缺失值的比较结果为 NA，按不满足处理）"""
         if operator == '=':
-            return df_series == value
+            result = df_series == value
         elif operator == '>':
-            return df_series > value
+            result = df_series > value
         elif operator == '<':
-            return df_series < value
+            result = df_series < value
         elif operator == '>=':
-            return df_series >= value
+            result = df_series >= value
         elif operator == '<=':
-            return df_series <= value
+            result = df_series <= value
         else:
             return pd.Series([True] * len(df_series), index=df_series.index)
+        return result.fillna(False).astype(bool) if result.dtype == 'boolean' else result
     
-    def _process_number_filter(self, filter_value: Any, field_name: str, target_df: pd.DataFrame) -> Optional[pd.Series]:
-        """处理数字筛选条件，返回筛选掩码或None"""
+    def _number_conditions(self, filter_value: Any) -> Tuple[List[Tuple[str, Union[int, float]]], bool]:
+        """把数字筛选条件（FilterGroup、NumberFilter 或字典）规范化为 ([(运算符, 数值)], 是否为 OR 组合)
+
+        缺少运算符或数值无法解析的条件被忽略；供各存储后端翻译为各自的表达式。
+        """
         # 统一处理 FilterGroup、NumberFilter 和字典格式
         filter_group = None
         if isinstance(filter_value, FilterGroup):
@@ -184,21 +299,27 @@ class DataTable:
                 filter_group = FilterGroup(filters=[NumberFilter(**filter_value)], logic='AND')
         
         if not filter_group:
-            return None
+            return [], False
         
-        filters_mask = []
+        conditions = []
         for num_filter in filter_group.filters:
             if num_filter.operator and num_filter.value is not None:
                 val = self._parse_number_value(num_filter.value)
                 if val is not None:
-                    filters_mask.append(self._apply_number_operator(target_df[field_name], num_filter.operator, val))
+                    conditions.append((num_filter.operator, val))
+        return conditions, (filter_group.logic or 'AND').upper() == 'OR'
+
+    def _process_number_filter(self, filter_value: Any, field_name: str, target_df: pd.DataFrame) -> Optional[pd.Series]:
+        """处理数字筛选条件，返回筛选掩码或None"""
+        conditions, is_or = self._number_conditions(filter_value)
+        filters_mask = [self._apply_number_operator(target_df[field_name], operator, val)
+                        for operator, val in conditions]
         
         if not filters_mask:
             return None
         
         # 组合多个条件
-        logic = filter_group.logic or 'AND'
-        if logic.upper() == 'OR':
+        if is_or:
             field_mask = filters_mask[0]
             for m in filters_mask[1:]:
                 field_mask |= m
@@ -228,15 +349,16 @@ class DataTable:
                     if col_config.prop not in self.dataframe.columns:
                         continue
                     
-                    unique_count = self.dataframe[col_config.prop].nunique()
+                    # 按块统计，超过上限时提前结束
+                    unique_values = _distinct_values(self.dataframe[col_config.prop], _MULTI_SELECT_MAX_OPTIONS,
+                                                     dropna=True)
                     
-                    if unique_count > 100:
+                    if unique_values is None:
                         if col_config.filterType != 'text':
                             col_config.options = None
                             col_config.filterType = 'text'
                             columns_updated = True
                     else:
-                        unique_values = self.dataframe[col_config.prop].dropna().unique().tolist()
                         options = sorted([str(v) for v in unique_values])
                         
                         if col_config.options != options:
@@ -246,6 +368,104 @@ class DataTable:
                     pass
         return columns_updated
     
+    def distinct_values(self, column: str) -> List[Any]:
+        """列中不重复的非空值（列配置中没有缓存筛选选项时使用），列不存在时返回空列表"""
+        current_df = self.dataframe
+        if column not in current_df.columns:
+            return []
+        return current_df[column].dropna().unique().tolist()
+
+    def _merge_column_options(self, rows: pd.DataFrame) -> bool:
+        """把 rows（新增或修改的行）的取值合并到已有的筛选选项，返回是否有更新
+
+        只增不减：被修改或删除的行原来的取值仍保留在选项中，需要时可调用 _update_column_options 全量统计。
+        """
+        if rows.empty:
+            return False
+        select_columns = [c for c in self.columns_config
+                          if c.filterType in ['multi-select', 'select'] and c.prop in rows.columns]
+        if any(c.options is None for c in select_columns):
+            # 还没有统计过选项，只能全量统计
+            return self._update_column_options()
+        columns_updated = False
+        for col_config in select_columns:
+            try:
+                values = {str(v) for v in rows[col_config.prop].dropna().unique()}
+            except Exception:
+                continue
+            if values.issubset(col_config.options):
+                continue
+            options = set(col_config.options) | values
+            if len(options) > _MULTI_SELECT_MAX_OPTIONS:
+                col_config.options = None
+                col_config.filterType = 'text'
+            else:
+                col_config.options = sorted(options)
+            columns_updated = True
+        return columns_updated
+
+    def _appended_rows(self, old_df: pd.DataFrame, new_df: pd.DataFrame,
+                       append_only: Optional[bool] = None) -> Optional[int]:
+        """new_df 是否只是在 old_df 之后追加了行：是则返回追加的起始位置，否则返回 None
+
+        要求列名、列顺序相同且行数不减少，并抽样比较前缀中的若干行（含索引）。dtype 与 old_df 不同时，只接受与上次传入的
+        数据源类型（self._source_dtypes）相同的 new_df：数据源按列配置转换后才写入（如有缺失值的 float64 列保存为 Int64），
+        此时声明了类型的列比较转换后的抽样。append_only 为 None 时还要求前缀的整个 id 列与 old_df 相同
+        （否则 id 索引中的行位置会失效）；为 True 时信任调用方，只做抽样检查。
+        """
+        if append_only is False or new_df is old_df or len(old_df) == 0 or len(new_df) < len(old_df):
+            return None
+        if list(new_df.columns) != list(old_df.columns):
+            return None
+        if not new_df.dtypes.equals(old_df.dtypes) and (self._source_dtypes is None
+                                                         or not new_df.dtypes.equals(self._source_dtypes)):
+            return None
+        start = len(old_df)
+        positions = np.unique(np.linspace(0, start - 1, min(start, _APPEND_CHECK_ROWS)).astype(np.int64))
+        declared = {c.prop for c in self.columns_config if c.dtype}
+        try:
+            old_sample = old_df.iloc[positions]
+            sample = _cast_to_schema(new_df.iloc[positions], self.columns_config)
+            if not old_sample.index.equals(sample.index):
+                return None
+            for col in old_df.columns:
+                left, right = old_sample[col], sample[col]
+                if left.dtype == right.dtype:
+                    if not left.equals(right):
+                        return None
+                elif col not in declared or _dtype_family(left.dtype) != _dtype_family(right.dtype):
+                    return None
+                elif not left.astype(object).equals(right.astype(object)):
+                    return None
+            if append_only is None and 'id' in old_df.columns:
+                prefix = new_df[['id']].iloc[:start]
+                if prefix['id'].dtype != old_df['id'].dtype:
+                    prefix = _cast_to_schema(prefix, self.columns_config)
+                if not _same_values(old_df['id'].to_numpy(), prefix['id'].to_numpy()):
+                    return None
+        except Exception:
+            return None
+        return start
+
+    def _extend_id_index(self, old_df: pd.DataFrame, new_df: pd.DataFrame, start: int):
+        """把 new_df 从 start 起新增行的 id 合并到 old_df 已有的 id 索引中，避免下次查找时整体重新排序"""
+        id_index = self._id_index
+        if id_index is None or id_index[0] is not old_df or 'id' not in new_df.columns:
+            return
+        _, sorted_ids, positions = id_index
+        delta = _index_values(new_df['id'])[start:]
+        if delta.dtype != sorted_ids.dtype:
+            return  # 类型变化时下次查找重建
+        try:
+            order = np.argsort(delta, kind='stable')
+            delta_sorted = delta[order]
+            # 相同 id 时新增的行排在已有行之后，与稳定排序的结果一致
+            insert_at = np.searchsorted(sorted_ids, delta_sorted, side='right')
+        except TypeError:
+            return
+        self._id_index = (new_df, np.insert(sorted_ids, insert_at, delta_sorted),
+                          np.insert(positions, insert_at, order + start))
+
     def _build_pandas_filter(self, filters: Optional[FilterParams] = None, df: Optional[pd.DataFrame] = None) -> pd.Series:
         """将筛选条件转换为pandas布尔索引（动态处理任意字段）"""
         # 使用传入的df或self.dataframe
@@ -267,79 +487,101 @@ class DataTable:
         
         # 遍历所有筛选字段（包括动态字段和旧字段）
         for field_name, filter_value in filter_dict.items():
-            
-            # 检查字段是否存在于DataFrame中
-            if field_name not in target_df.columns:
-                continue
-            
-            # 查找对应的列配置
-            col_config = next((c for c in self.columns_config if c.prop == field_name), None)
-            if not col_config or not col_config.filterable:
+            col_config = self._filter_column(field_name, target_df)
+            if col_config is None:
                 continue
+            field_mask, _ = self._field_mask(field_name, filter_value, col_config, target_df)
+            if field_mask is not None:
+                mask &= field_mask
+        
+        return mask
+
+    def _filter_column(self, field_name: str, target_df: pd.DataFrame) -> Optional[ColumnConfig]:
+        """返回可筛选字段的列配置；字段不在数据中或不可筛选时返回 None"""
+        # 检查字段是否存在于DataFrame中
+        if field_name not in target_df.columns:
+            return None
+        
+        # 查找对应的列配置
+        col_config = next((c for c in self.columns_config if c.prop == field_name), None)
+        if not col_config or not col_config.filterable:
+            return None
+        return col_config
+
+    def _field_mask(self, field_name: str, filter_value: Any, col_config: ColumnConfig,
+                    target_df: pd.DataFrame) -> Tuple[Optional[pd.Series], str]:
+        """单个字段的筛选掩码和使用的方法（用于执行计划）；条件为空时掩码为 None"""
+        # 根据筛选类型处理
+        if col_config.filterType == 'number':
+            # 数字类型筛选
+            return self._process_number_filter(filter_value, field_name, target_df), 'compare'
+        
+        elif col_config.filterType == 'text':
+            # 文本筛选
+            if not (isinstance(filter_value, str) and filter_value):
+                return None, 'contains'
+            # 对于bytes类型字段，需要先转换为16进制字符串再筛选
+            if col_config.type == 'bytes':
+                try:
+                    if target_df[field_name].dtype == 'object':
+                        sample = target_df[field_name].dropna()
+                        if len(sample) > 0 and isinstance(sample.iloc[0], bytes):
+                            hex_series = target_df[field_name].apply(
+                                lambda val: self._bytes_to_hex(val) if isinstance(val, bytes) else str(val)
+                            )
+                            return hex_series.str.contains(filter_value, case=False, na=False), 'hex+contains'
+                except Exception:
+                    pass
+            return target_df[field_name].astype(str).str.contains(filter_value, case=False, na=False), 'contains'
+        
+        elif col_config.filterType == 'date':
+            # 日期筛选
+            if not (isinstance(filter_value, str) and filter_value):
+                return None, 'date'
+            if field_name == 'ts':
+                try:
+                    ts_str_series = target_df[field_name].apply(self._timestamp_to_str)
+                    return ts_str_series.str.contains(filter_value, case=False, na=False), 'format+contains'
+                except Exception:
+                    return target_df[field_name].astype(str).str.contains(filter_value, case=False, na=False), 'contains'
+            return target_df[field_name].astype(str) == filter_value, 'equals'
+        
+        elif col_config.filterType in ['multi-select', 'select']:
+            # 多选或单选筛选
+            # 统一处理：如果是单个值，转换为列表
+            if isinstance(filter_value, list):
+                filter_list = filter_value
+            elif filter_value is not None and filter_value != '':
+                filter_list = [filter_value]
+            else:
+                return None, 'isin'
             
-            # 根据筛选类型处理
-            if col_config.filterType == 'number':
-                # 数字类型筛选
-                field_mask = self._process_number_filter(filter_value, field_name, target_df)
-                if field_mask is not None:
-                    mask &= field_mask
-            
-            elif col_config.filterType == 'text':
-                # 文本筛选
-                if isinstance(filter_value, str) and filter_value:
-                    # 对于bytes类型字段，需要先转换为16进制字符串再筛选
-                    if col_config.type == 'bytes':
-                        try:
-                            if target_df[field_name].dtype == 'object':
-                                sample = target_df[field_name].dropna()
-                                if len(sample) > 0 and isinstance(sample.iloc[0], bytes):
-                                    hex_series = target_df[field_name].apply(
-                                        lambda val: self._bytes_to_hex(val) if isinstance(val, bytes) else str(val)
-                                    )
-                                    mask &= hex_series.str.contains(filter_value, case=False, na=False)
-                                else:
-                                    mask &= target_df[field_name].astype(str).str.contains(filter_value, case=False, na=False)
-                            else:
-                                mask &= target_df[field_name].astype(str).str.contains(filter_value, case=False, na=False)
-                        except Exception:
-                            mask &= target_df[field_name].astype(str).str.contains(filter_value, case=False, na=False)
-                    else:
-                        mask &= target_df[field_name].astype(str).str.contains(filter_value, case=False, na=False)
-            
-            elif col_config.filterType == 'date':
-                # 日期筛选
-                if isinstance(filter_value, str) and filter_value:
-                    if field_name == 'ts':
-                        try:
-                            ts_str_series = target_df[field_name].apply(self._timestamp_to_str)
-                            mask &= ts_str_series.str.contains(filter_value, case=False, na=False)
-                        except Exception:
-                            mask &= target_df[field_name].astype(str).str.contains(filter_value, case=False, na=False)
-                    else:
-                        mask &= (target_df[field_name].astype(str) == filter_value)
-            
-            elif col_config.filterType in ['multi-select', 'select']:
-                # 多选或单选筛选
-                # 统一处理：如果是单个值，转换为列表
-                if isinstance(filter_value, list):
-                    filter_list = filter_value
-                elif filter_value is not None and filter_value != '':
-                    filter_list = [filter_value]
-                else:
-                    continue
-                
-                if len(filter_list) > 0:
-                    # 确保 DataFrame 列的数据类型匹配
+            if len(filter_list) > 0:
+                # 确保 DataFrame 列的数据类型匹配
+                try:
+                    return target_df[field_name].isin(filter_list), 'isin'
+                except Exception:
+                    # 尝试转换为字符串后再筛选
                     try:
-                        mask &= target_df[field_name].isin(filter_list)
-                    except Exception as e:
-                        # 尝试转换为字符串后再筛选
-                        try:
-                            mask &= target_df[field_name].astype(str).isin([str(v) for v in filter_list])
-                        except Exception as e2:
-                            pass
+                        return target_df[field_name].astype(str).isin([str(v) for v in filter_list]), 'str+isin'
+                    except Exception:
+                        pass
+            return None, 'isin'
         
-        return mask
+        return None, col_config.filterType or ''
+    
+    def _serialize_records(self, df: pd.DataFrame) -> List[Dict[str, Any]]:
+        """将DataFrame转换为字典列表，并处理特殊类型字段（bytes、ts）的转换，缺失值（NaN）转换为 None"""
+        data_list = df.to_dict('records')
+        for record in data_list:
+            for key, value in record.items():
+                if isinstance(value, bytes):
+                    record[key] = self._bytes_to_hex(value)
+                elif isinstance(value, float) and value != value:
+                    record[key] = None
+                elif key == 'ts' and isinstance(value, (int, float)):
+                    record[key] = self._timestamp_to_str(value)
+        return data_list
     
     def get_list(self, 
                  filters: Optional['FilterParams'] = None,
@@ -406,9 +648,8 @@ class DataTable:
             self._last_known_length = dataframe_length
         
         try:
-            # 记录开始时间（用于性能监控）
-            import time as time_module
-            start_time = time_module.time()
+            # 各阶段耗时记录到指标（见 metrics.py）
+            query_start = stage_start = time.perf_counter()
             
             # 构建筛选条件 - 传入 current_df
             mask = self._build_pandas_filter(filters, df=current_df)
@@ -433,16 +674,6 @@ class DataTable:
                 )
                 mask = pd.Series([True] * len(current_df), index=current_df.index)
             
-            # 检查筛选后的数据量（用于调试）
-            filtered_count = int(mask.sum()) if hasattr(mask, 'sum') else len(mask[mask])
-            filter_info = self._get_filter_dict(filters) if filters else {}
-            
-            if filtered_count == 0 and len(current_df) > 0:
-                self._logger.warning(
-                    f"⚠️ 筛选后数据为空！原始数据量: {len(current_df)}, "
-                    f"筛选条件: {filter_info}. 这可能导致表格显示为空！"
-                )
-            
             # 使用视图而不是copy，提高性能（在筛选时）
             filtered_df = current_df[mask]
             
@@ -451,12 +682,18 @@ class DataTable:
             
             # 计算总数（在排序前，避免不必要的计算）
             total_count = len(filtered_df)
+            stage_end = time.perf_counter()
+            self._observe('get_list', 'filter', stage_end - stage_start)
+            stage_start = stage_end
             
             # 排序（如果需要）
             if needs_sort:
                 ascending = sort_order == 'ascending' if sort_order else True
                 # 排序时需要copy，因为会修改数据
                 filtered_df = filtered_df.sort_values(by=sort_by, ascending=ascending, na_position='last').copy()
+                stage_end = time.perf_counter()
+                self._observe('get_list', 'sort', stage_end - stage_start)
+                stage_start = stage_end
             
             # 分页
             start_index = (page - 1) * page_size
@@ -474,14 +711,7 @@ class DataTable:
                     paginated_df = filtered_df.iloc[start_index:end_index]
                 else:
                     paginated_df = filtered_df.iloc[start_index:end_index].copy()
-            
-            # 记录性能信息（仅在大数据量时）
-            elapsed_time = time_module.time() - start_time
-            if elapsed_time > 0.5 or len(current_df) > 5000:
-                self._logger.debug(
-                    f"get_list 性能: 数据量={len(current_df)}, 筛选后={total_count}, "
-                    f"分页={page}/{page_size}, 耗时={elapsed_time:.3f}秒"
-                )
+            self._observe('get_list', 'slice', time.perf_counter() - stage_start)
         except Exception as e:
             # 如果处理失败，记录错误并返回空结果
             dataframe_length = len(current_df) if current_df is not None else 'N/A'
@@ -508,15 +738,11 @@ class DataTable:
                 total_count = 0
         
         # 将DataFrame转换为字典列表
-        data_list = paginated_df.to_dict('records')
-        
-        # 处理特殊类型字段的转换
-        for record in data_list:
-            for key, value in record.items():
-                if isinstance(value, bytes):
-                    record[key] = self._bytes_to_hex(value)
-                elif key == 'ts' and isinstance(value, (int, float)):
-                    record[key] = self._timestamp_to_str(value)
+        stage_start = time.perf_counter()
+        data_list = self._serialize_records(paginated_df)
+        stage_end = time.perf_counter()
+        self._observe('get_list', 'serialize', stage_end - stage_start)
+        self._check_slow_query(stage_end - query_start, filters, page, page_size, sort_by, sort_order)
         
         return {
             "list": data_list,
@@ -525,6 +751,122 @@ class DataTable:
             "pageSize": page_size
         }
     
+    def _canonical_filters(self, filters: Optional['FilterParams']) -> Dict[str, Any]:
+        """规范化的筛选条件（按字段名排序，去掉空条件），用于日志和执行计划"""
+        filter_dict = self._get_filter_dict(filters)
+        return {k: filter_dict[k] for k in sorted(filter_dict) if filter_dict[k] not in (None, '', [])}
+
+    def _plan_frame(self, columns: List[str], filter_dict: Dict[str, Any]) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+        """执行计划使用的数据（只包含 columns 中存在的列）和数据访问方式说明"""
+        current_df = self.dataframe
+        return current_df[[c for c in columns if c in current_df.columns]], {'storage': 'memory'}
+
+    def explain(self,
+                filters: Optional['FilterParams'] = None,
+                page: int = 1,
+                page_size: int = 100,
+                sort_by: Optional[str] = None,
+                sort_order: Optional[str] = None) -> Dict[str, Any]:
+        """返回 get_list 的执行计划（执行筛选和排序，但不返回数据行）
+        
+        Returns:
+            包含每个筛选条件的方法、匹配行数、累计剩余行数和耗时，排序和分页信息，
+            以及数据访问方式（是否使用缓存、跳过了哪些数据段等）的字典
+        """
+        total_start = time.perf_counter()
+        # 按执行顺序（与 _build_pandas_filter 相同）依次应用筛选条件
+        filter_dict = {k: v for k, v in self._get_filter_dict(filters).items() if v not in (None, '', [])}
+        columns = list(filter_dict) + ([sort_by] if sort_by and sort_by not in filter_dict else [])
+        current_df, source = self._plan_frame(columns, filter_dict)
+        load_seconds = time.perf_counter() - total_start
+        
+        mask = np.ones(len(current_df), dtype=bool)
+        predicates = []
+        filter_seconds = 0.0
+        for field_name, filter_value in filter_dict.items():
+            entry: Dict[str, Any] = {'column': field_name, 'condition': filter_value}
+            predicates.append(entry)
+            col_config = self._filter_column(field_name, current_df)
+            if col_config is None:
+                entry['skipped'] = '列不存在或不可筛选'
+                continue
+            start = time.perf_counter()
+            field_mask, method = self._field_mask(field_name, filter_value, col_config, current_df)
+            seconds = time.perf_counter() - start
+            filter_seconds += seconds
+            entry.update({'filterType': col_config.filterType, 'method': method, 'index': None})
+            if field_mask is None:
+                entry['skipped'] = '条件无效'
+                continue
+            field_mask = field_mask.to_numpy(dtype=bool)
+            mask &= field_mask
+            entry.update({
+                'rows_matched': int(field_mask.sum()),
+                'rows_after': int(mask.sum()),
+                'ms': round(seconds * 1000, 3),
+            })
+        filtered_count = int(mask.sum())
+        
+        sort_plan = None
+        sort_seconds = 0.0
+        if sort_by:
+            sort_plan = {'column': sort_by, 'order': sort_order or 'ascending'}
+            if sort_by in current_df.columns:
+                start = time.perf_counter()
+                current_df[sort_by][mask].sort_values(ascending=sort_order != 'descending', na_position='last')
+                sort_seconds = time.perf_counter() - start
+                sort_plan.update({'method': 'sort_values', 'dtype': str(current_df[sort_by].dtype),
+                                  'rows': filtered_count, 'ms': round(sort_seconds * 1000, 3)})
+            else:
+                sort_plan['skipped'] = '列不存在'
+        
+        start_index = (page - 1) * page_size
+        return {
+            'rows': len(current_df),
+            'source': source,
+            'filters': self._canonical_filters(filters),
+            'predicates': predicates,
+            'filtered_rows': filtered_count,
+            'sort': sort_plan,
+            'page': {
+                'page': page,
+                'pageSize': page_size,
+                'offset': start_index,
+                'rows': max(0, min(page_size, filtered_count - start_index)),
+            },
+            'ms': {
+                'load': round(load_seconds * 1000, 3),
+                'filter': round(filter_seconds * 1000, 3),
+                'sort': round(sort_seconds * 1000, 3),
+                'total': round((time.perf_counter() - total_start) * 1000, 3),
+            },
+        }
+
+    def _check_slow_query(self, elapsed: float, filters: Optional['FilterParams'], page: int, page_size: int,
+                          sort_by: Optional[str], sort_order: Optional[str]):
+        """查询耗时超过 slow_query_seconds 时记录慢查询日志（附执行计划）"""
+        if self.slow_query_seconds is None or elapsed < self.slow_query_seconds:
+            return
+        filter_dict = self._canonical_filters(filters)
+        query = {'filters': filter_dict, 'page': page, 'pageSize': page_size, 'sortBy': sort_by, 'sortOrder': sort_order}
+        key = json.dumps(query, sort_keys=True, ensure_ascii=False, default=str)
+        now = time.monotonic()
+        if not hasattr(self, '_slow_query_explained'):
+            self._slow_query_explained: Dict[str, float] = {}
+        explained = self._slow_query_explained
+        if now - explained.get(key, float('-inf')) < self.slow_query_log_interval:
+            self._logger.warning(f"慢查询 [{self.table_id}] {elapsed * 1000:.1f}ms: {key}")
+            return
+        if len(explained) >= 1000:
+            for old_key in [k for k, t in explained.items() if now - t >= self.slow_query_log_interval]:
+                del explained[old_key]
+        explained[key] = now
+        plan = self.explain(filters, page, page_size, sort_by, sort_order)
+        self._logger.warning(
+            f"慢查询 [{self.table_id}] {elapsed * 1000:.1f}ms: {key}\n"
+            f"执行计划: {json.dumps(plan, ensure_ascii=False, default=str)}"
+        )
+
     def get_columns_config(self) -> Dict[str, Any]:
         """获取列配置信息
         
@@ -554,6 +896,46 @@ class DataTable:
             "columns": columns_list
         }
     
+    def _get_id_index(self, df: pd.DataFrame) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """获取 df 的 id 排序索引 (sorted_ids, positions)，无法排序（如混合类型）时返回 None"""
+        id_index = self._id_index
+        if id_index is not None and id_index[0] is df:
+            return id_index[1], id_index[2]
+        if 'id' not in df.columns:
+            return None
+        ids = _index_values(df['id'])
+        try:
+            positions = np.argsort(ids, kind='stable')
+        except TypeError:
+            return None
+        sorted_ids = ids[positions]
+        self._id_index = (df, sorted_ids, positions)
+        return sorted_ids, positions
+    
+    def _find_id_positions(self, df: pd.DataFrame, row_id: Any) -> np.ndarray:
+        """查找 id 等于 row_id 的所有行位置（升序），优先使用 id 索引"""
+        if 'id' not in df.columns:
+            return np.empty(0, dtype=np.int64)
+        id_index = self._get_id_index(df)
+        # 数字与非数字之间不使用索引（numpy 会隐式转换，与 pandas 的 == 语义不同）
+        is_numeric = np.asarray(row_id).dtype.kind in 'iufb'
+        if id_index is not None and is_numeric == (id_index[0].dtype.kind in 'iufb'):
+            sorted_ids, positions = id_index
+            try:
+                left = np.searchsorted(sorted_ids, row_id, side='left')
+                right = np.searchsorted(sorted_ids, row_id, side='right')
+            except TypeError:
+                pass
+            else:
+                found = np.sort(positions[left:right])
+                if _ids_match(df['id'], found, row_id):
+                    return found
+                # 索引中的行位置与 id 列不一致（数据在索引之外被修改）：丢弃索引，下次查找时重建
+                self._logger.warning(f"id 索引与数据不一致，重建索引（id={row_id!r}）")
+                if self._id_index is not None and self._id_index[0] is df:
+                    self._id_index = None
+        return np.flatnonzero((df['id'] == row_id).to_numpy())
+    
     def get_row_position(self, row_id: Any, filters: Optional['FilterParams'] = None) -> Dict[str, Any]:
         """获取行在筛选结果中的位置
         
@@ -570,19 +952,17 @@ class DataTable:
             if current_df is None:
                 return {"found": False, "position": -1}
         
-        mask = self._build_pandas_filter(filters, df=current_df)
-        filtered_df = current_df[mask].copy()
-        
-        # 查找选中行的位置
-        matching_rows = filtered_df[filtered_df['id'] == row_id]
-        if not matching_rows.empty:
-            filtered_df_reset = filtered_df.reset_index(drop=True)
-            matching_rows_reset = filtered_df_reset[filtered_df_reset['id'] == row_id]
-            if not matching_rows_reset.empty:
-                position = matching_rows_reset.index[0]
+        # 通过 id 索引找到候选行，再检查其是否满足筛选条件
+        candidates = self._find_id_positions(current_df, row_id)
+        if len(candidates) > 0:
+            mask = self._build_pandas_filter(filters, df=current_df).to_numpy()
+            matched = candidates[mask[candidates]] if len(mask) == len(current_df) else []
+            if len(matched) > 0:
+                # 位置 = 该行之前满足筛选条件的行数
+                position = int(np.count_nonzero(mask[:matched[0]]))
                 return {
                     "found": True,
-                    "position": int(position)
+                    "position": position
                 }
         
         return {
@@ -599,18 +979,26 @@ class DataTable:
         Returns:
             行详情列表，每个元素包含label、value、detail、type等字段
         """
+        start = time.perf_counter()
         # 使用锁保护读取
         with self._lock:
             current_df = self.dataframe
             if current_df is None:
                 raise ValueError("DataFrame 未初始化")
         
-        # 在DataFrame中通过ID列查找该行
-        matching_rows = current_df[current_df['id'] == row_id]
-        if len(matching_rows) == 0:
+        # 在DataFrame中通过ID索引查找该行
+        positions = self._find_id_positions(current_df, row_id)
+        if len(positions) == 0:
             raise ValueError(f"未找到ID为 {row_id} 的记录")
+        row_df = current_df.iloc[[int(positions[0])]]
+        self._observe('get_row_detail', 'lookup', time.perf_counter() - start)
         
-        row_record = matching_rows.iloc[0].to_dict()
+        return self._row_detail(row_df)
+    
+    def _row_detail(self, row_df: pd.DataFrame) -> List[Dict[str, Any]]:
+        """根据单行 DataFrame 生成行详情（数字列的 format 取决于该列的 dtype）"""
+        start = time.perf_counter()
+        row_record = row_df.iloc[0].to_dict()
         
         # 根据列配置生成详情
         detail = []
@@ -619,7 +1007,9 @@ class DataTable:
             if prop in row_record:
                 value = row_record[prop]
                 # 处理特殊类型字段的转换
-                if isinstance(value, bytes):
+                if value is pd.NA or (isinstance(value, float) and value != value):
+                    value = None
+                elif isinstance(value, bytes):
                     value = self._bytes_to_hex(value)
                 elif prop == 'ts' and isinstance(value, (int, float)):
                     value = self._timestamp_to_str(value)
@@ -631,70 +1021,251 @@ class DataTable:
                     "type": col_config.type
                 }
                 if col_config.type == 'number':
-                    detail_item['format'] = 'int' if 'int' in str(current_df[prop].dtype) else 'float'
+                    detail_item['format'] = 'int' if pd.api.types.is_integer_dtype(row_df[prop].dtype) else 'float'
                 detail.append(detail_item)
         
+        self._observe('get_row_detail', 'serialize', time.perf_counter() - start)
         return detail
     
-    def update_dataframe(self, new_dataframe: pd.DataFrame) -> Dict[str, Any]:
+    def save_snapshot(self, path: Union[str, Path]) -> Dict[str, Any]:
+        """保存快照：列数据、列配置（含筛选选项）和已构建的索引
+        
+        列数据以列存储格式（见 column_store.py）写入，恢复时可直接内存映射。
+        先写入临时目录再替换，保存过程中失败不会破坏已有快照。
+        
+        Args:
+            path: 快照目录
+        
+        Returns:
+            包含行数和索引列表的字典
+        """
+        with self._lock:
+            current_df = self.dataframe
+            columns_config = [c.model_copy(deep=True) for c in self.columns_config]
+        id_index = self._get_id_index(current_df)
+        
+        target = Path(path)
+        tmp_path = target.with_name(target.name + '.tmp')
+        if tmp_path.exists():
+            shutil.rmtree(tmp_path)
+        
+        with ColumnStoreWriter(tmp_path, columns_config) as writer:
+            writer.append(current_df)
+        
+        indexes = []
+        if id_index is not None and id_index[0].dtype == object:
+            # object 类型的 id（如补齐 None 后的整数列）与恢复后的列一样转换为数值类型
+            try:
+                id_index = (pd.to_numeric(pd.Series(id_index[0])).to_numpy(), id_index[1])
+            except (ValueError, TypeError):
+                id_index = None
+        if id_index is not None and id_index[0].dtype != object:
+            np.save(tmp_path / 'index_id_values.npy', id_index[0], allow_pickle=False)
+            np.save(tmp_path / 'index_id_positions.npy', id_index[1], allow_pickle=False)
+            indexes.append('id')
+        
+        meta = {
+            "format_version": 1,
+            "row_count": len(current_df),
+            "created_at": time.time(),
+            "indexes": indexes,
+        }
+        with open(tmp_path / 'snapshot.json', 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        
+        # 原子替换旧快照
+        old_path = target.with_name(target.name + '.old')
+        if target.exists():
+            if old_path.exists():
+                shutil.rmtree(old_path)
+            target.rename(old_path)
+        tmp_path.rename(target)
+        if old_path.exists():
+            shutil.rmtree(old_path, ignore_errors=True)
+        
+        self._logger.info(f"快照已保存: {target}, 行数={len(current_df)}, 索引={indexes}")
+        return {"success": True, "row_count": len(current_df), "indexes": indexes}
+    
+    @staticmethod
+    def load_snapshot(path: Union[str, Path], lazy: bool = False) -> 'DataTable':
+        """从快照恢复表格
+        
+        数值列直接内存映射（不复制），字符串和 bytes 列解码为对象；列配置和筛选选项
+        直接读取，不再重新推断；id 索引以内存映射方式加载，恢复后立即可用。
+        
+        Args:
+            path: save_snapshot 写入的目录
+            lazy: 为 True 时返回只读的 MappedDataTable，所有列都按需加载
+        
+        Returns:
+            恢复后的 DataTable
+        """
+        path = Path(path)
+        with open(path / 'snapshot.json', 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        
+        if lazy:
+            from mapped_table import MappedDataTable
+            return MappedDataTable(path, read_only=True, options_current=True)
+        
+        with ColumnStoreReader(path) as reader:
+            columns_config = [ColumnConfig(**c) for c in reader.columns_config]
+            if reader.row_count > 0:
+                dataframe = reader.read_frame()
+            else:
+                dataframe = pd.DataFrame(columns=[c.prop for c in columns_config])
+        
+        table = DataTable(dataframe, columns_config, copy=False)
+        if 'id' in meta.get('indexes', []):
+            sorted_ids = np.load(path / 'index_id_values.npy', mmap_mode='r')
+            positions = np.load(path / 'index_id_positions.npy', mmap_mode='r')
+            table._id_index = (table.dataframe, sorted_ids, positions)
+        return table
+    
+    def _fill_missing_ids(self, new_df: pd.DataFrame, max_id: Any) -> Any:
+        """为没有ID或ID为None的新数据自动生成ID，返回生成后的最大ID"""
+        if 'id' not in new_df.columns:
+            new_df['id'] = None
+        missing = new_df['id'].isna().to_numpy()
+        count = int(missing.sum())
+        if count == 0:
+            return max_id
+        new_df.loc[missing, 'id'] = max_id + np.arange(1, count + 1)
+        if new_df['id'].dtype == object:
+            new_df['id'] = new_df['id'].infer_objects()
+        elif not isinstance(new_df['id'].dtype, np.dtype) and new_df['id'].dtype.kind in 'iuf':
+            # 可空类型的 id 补齐后没有缺失值，恢复为 numpy 类型
+            new_df['id'] = new_df['id'].astype(new_df['id'].dtype.numpy_dtype)
+        return max_id + count
+    
+    def _convert_special_columns(self, new_df: pd.DataFrame):
+        """根据列配置转换新数据中的特殊类型字段（16进制字符串 -> bytes，ts 字符串 -> 时间戳）"""
+        _convert_special_columns(new_df, self.columns_config)
+
+    def _prepare_batch(self, new_data: Union[Dict[str, Any], List[Dict[str, Any]], pd.DataFrame, 'PreparedBatch'],
+                       existing_columns: List[str]) -> 'PreparedBatch':
+        """在写锁之外转换新数据（见 prepare_batch），大批量且启用了转换进程池时在子进程中执行"""
+        if isinstance(new_data, PreparedBatch):
+            return new_data
+        if isinstance(new_data, dict):
+            new_data = [new_data]
+        if len(new_data) == 0:
+            raise ValueError("新数据不能为空")
+        start = time.perf_counter()
+        args = (new_data, list(self.columns_config), list(existing_columns))
+        if CONVERSION_POOL.should_offload(len(new_data)):
+            batch = CONVERSION_POOL.run(prepare_batch, *args)
+        else:
+            batch = prepare_batch(*args)
+        self._observe('add_data', 'convert', time.perf_counter() - start)
+        return batch
+    
+    def _reconcile_columns_config(self, new_dataframe: pd.DataFrame) -> bool:
+        """整体替换数据后调整列配置：为新字段生成配置、移除已删除字段的配置，并按新数据的列顺序排列
+
+        Returns:
+            列配置是否有变化
+        """
+        # 检查是否有新字段
+        # 注意：这里假设 columns_config 已经包含了之前的所有字段
+        existing_columns = set(c.prop for c in self.columns_config)
+        new_columns = set(new_dataframe.columns)
+        added_columns = new_columns - existing_columns
+        removed_columns = existing_columns - new_columns
+
+        columns_updated = False
+        if added_columns:
+            # 为新字段生成列配置
+            temp_df = new_dataframe[list(added_columns)]
+            new_columns_config = generate_columns_config_from_dataframe(temp_df)
+            self.columns_config.extend(new_columns_config)
+            columns_updated = True
+
+        # 移除已删除的列的配置
+        if removed_columns:
+            self.columns_config = [c for c in self.columns_config if c.prop not in removed_columns]
+            columns_updated = True
+
+        # 推断的存储类型按新数据重新推断（声明的类型不变，按声明的类型转换）
+        for i, config in enumerate(self.columns_config):
+            if config.inferred and config.type != 'bytes' and config.prop in new_columns:
+                dtype = _schema_dtype(new_dataframe[config.prop])
+                if dtype != config.dtype:
+                    self.columns_config[i] = config.model_copy(update={'dtype': dtype})
+
+        # 按照 new_dataframe.columns 的顺序重新排列列配置
+        # 创建一个字典，方便快速查找列配置
+        config_dict = {c.prop: c for c in self.columns_config}
+        # 按照 new_dataframe.columns 的顺序重新构建列配置列表
+        reordered_config = []
+        for col_name in new_dataframe.columns:
+            if col_name in config_dict:
+                reordered_config.append(config_dict[col_name])
+            else:
+                # 如果列配置不存在（理论上不应该发生），生成一个新的
+                self._logger.warning(f"列 {col_name} 在列配置中不存在，自动生成配置")
+                temp_df = new_dataframe[[col_name]]
+                new_config = generate_columns_config_from_dataframe(temp_df)
+                if new_config:
+                    reordered_config.append(new_config[0])
+                    columns_updated = True
+
+        # 更新列配置列表
+        self.columns_config = reordered_config
+        return columns_updated
+
+    def update_dataframe(self, new_dataframe: pd.DataFrame, append_only: Optional[bool] = None) -> Dict[str, Any]:
         """直接更新DataFrame (由外部控制数据源时使用)
         
+        new_dataframe 只是在当前数据之后追加了行时（如不断增长的 df_source），只处理新增的行：
+        合并 id 索引和筛选选项，不重新比较列配置；其他情况按整体替换处理。
+        
         Args:
             new_dataframe: 新的DataFrame数据
+            append_only: None 表示自动检测是否只追加了行；True 表示调用方保证前面的行没有变化；
+                False 表示按整体替换处理
         
         Returns:
             包含更新结果的字典
         """
         # 使用锁保护写入
-        with self._lock:
+        with self._write_lock('update_dataframe'):
             if new_dataframe is None:
                 raise ValueError("DataFrame不能为None")
             
-            # 检查是否有新字段
-            # 注意：这里假设 columns_config 已经包含了之前的所有字段
-            existing_columns = set(c.prop for c in self.columns_config)
-            new_columns = set(new_dataframe.columns)
-            added_columns = new_columns - existing_columns
-            removed_columns = existing_columns - new_columns
-            
-            columns_updated = False
-            if added_columns:
-                # 为新字段生成列配置
-                temp_df = new_dataframe[list(added_columns)]
-                new_columns_config = generate_columns_config_from_dataframe(temp_df)
-                self.columns_config.extend(new_columns_config)
-                columns_updated = True
-            
-            # 移除已删除的列的配置
-            if removed_columns:
-                self.columns_config = [c for c in self.columns_config if c.prop not in removed_columns]
-                columns_updated = True
-            
-            # 更新 DataFrame 引用
-            self.dataframe = new_dataframe
-            
-            # 按照 new_dataframe.columns 的顺序重新排列列配置
-            # 创建一个字典，方便快速查找列配置
-            config_dict = {c.prop: c for c in self.columns_config}
-            # 按照 new_dataframe.columns 的顺序重新构建列配置列表
-            reordered_config = []
-            for col_name in new_dataframe.columns:
-                if col_name in config_dict:
-                    reordered_config.append(config_dict[col_name])
-                else:
-                    # 如果列配置不存在（理论上不应该发生），生成一个新的
-                    self._logger.warning(f"列 {col_name} 在列配置中不存在，自动生成配置")
-                    temp_df = new_dataframe[[col_name]]
-                    new_config = generate_columns_config_from_dataframe(temp_df)
-                    if new_config:
-                        reordered_config.append(new_config[0])
-                        columns_updated = True
+            old_dataframe = self.dataframe
+            start = self._appended_rows(old_dataframe, new_dataframe, append_only)
+            if start is not None:
+                # 只按列配置声明的类型转换新增的行（与 add_data 相同，无法转换时抛出 SchemaError，此时尚未修改任何状态）；
+                # 数据源与已有数据的类型相同且新增的行不需要转换时直接引用，不复制
+                tail = new_dataframe.iloc[start:]
+                delta = _cast_to_schema(tail, self.columns_config)
+                self._source_dtypes = new_dataframe.dtypes
+                if delta is not tail or not new_dataframe.dtypes.equals(old_dataframe.dtypes):
+                    new_dataframe = _append_rows(old_dataframe, delta)
+                self.dataframe = new_dataframe
+                self._extend_id_index(old_dataframe, new_dataframe, start)
+                return {
+                    "success": True,
+                    "columns_updated": self._refresh_column_options('update_dataframe', new_dataframe.iloc[start:]),
+                    "total_count": len(self.dataframe),
+                    "incremental": True,
+                    "appended_count": len(new_dataframe) - start
+                }
             
-            # 更新列配置列表
-            self.columns_config = reordered_config
+            # 整体替换：先按新数据调整列配置（新字段和推断的类型按新数据重新推断），再按声明的类型转换
+            columns = list(self.columns_config)
+            columns_updated = self._reconcile_columns_config(new_dataframe)
+            try:
+                cast = _cast_to_schema(new_dataframe, self.columns_config)
+            except SchemaError:
+                self.columns_config = columns
+                raise
+            self._source_dtypes = new_dataframe.dtypes
+            self.dataframe = cast
             
             # 更新列配置中的筛选选项
-            if self._update_column_options():
+            if self._refresh_column_options('update_dataframe'):
                 columns_updated = True
             
             # 验证列配置
@@ -703,37 +1274,36 @@ class DataTable:
             return {
                 "success": True,
                 "columns_updated": columns_updated,
-                "total_count": len(self.dataframe)
+                "total_count": len(self.dataframe),
+                "incremental": False
             }
 
-    def add_data(self, new_data: Union[Dict[str, Any], List[Dict[str, Any]]]) -> Dict[str, Any]:
+    def add_data(self, new_data: Union[Dict[str, Any], List[Dict[str, Any]], pd.DataFrame, 'PreparedBatch']) -> Dict[str, Any]:
         """动态添加新数据到DataFrame
         
         Args:
-            new_data: 新数据，可以是单个字典或字典列表
+            new_data: 新数据，可以是单个字典、字典列表、按列构建的 DataFrame（批量写入时无需逐行构建字典）
+                或已转换的 PreparedBatch
         
         Returns:
             包含添加结果和更新后的列配置的字典
         """
+        # 检查 dataframe 是否有效
+        if not hasattr(self, 'dataframe') or self.dataframe is None:
+            raise ValueError("DataFrame 未初始化，无法添加数据")
+        # 转换新数据不需要持有写锁：写锁只用于分配 id、拼接和发布
+        batch = self._prepare_batch(new_data, self.dataframe.columns)
+        
         # 使用锁保护写入
-        with self._lock:
-            # 检查 dataframe 是否有效
-            if not hasattr(self, 'dataframe') or self.dataframe is None:
-                raise ValueError("DataFrame 未初始化，无法添加数据")
-            
-            # 确保new_data是列表格式
-            if isinstance(new_data, dict):
-                new_data = [new_data]
-            
-            if not new_data:
-                raise ValueError("新数据不能为空")
-            
+        with self._write_lock('add_data'):
             # 保存原始数据量，用于验证
             original_length = len(self.dataframe)
             original_columns = set(self.dataframe.columns)
             
-            # 转换为DataFrame
-            new_df = pd.DataFrame(new_data)
+            new_df = batch.frame
+            # 超出内存预算时先丢弃缓存，仍然不足则拒绝写入（此时尚未修改任何状态）
+            if BUDGET.limit is not None:
+                BUDGET.reserve(self, sum(frame_bytes(new_df)[0].values()))
             
             # 检查是否有新字段（不在现有DataFrame中的字段）
             existing_columns = set(self.dataframe.columns)
@@ -743,27 +1313,27 @@ class DataTable:
             # 如果新数据中有新字段，需要更新列配置
             columns_updated = False
             if added_columns:
-                # 为新字段生成列配置（generate_columns_config_from_dataframe 定义在本文件末尾）
-                # 直接调用，无需导入
-                
-                # 创建一个临时DataFrame，只包含新字段，用于生成列配置
-                temp_df = new_df[list(added_columns)]
-                new_columns_config = generate_columns_config_from_dataframe(temp_df)
+                # 新字段的列配置在转换时已推断；转换期间数据被整体替换时，补充推断缺少配置的字段
+                new_columns_config = [c for c in batch.columns_config if c.prop in added_columns]
+                inferred = {c.prop for c in new_columns_config}
+                missing = [col for col in new_df.columns if col in added_columns and col not in inferred]
+                if missing:
+                    new_columns_config.extend(generate_columns_config_from_dataframe(new_df[missing]))
                 
                 # 将新列配置添加到现有配置中
                 self.columns_config.extend(new_columns_config)
                 columns_updated = True
             
             # 确保新数据的列与现有DataFrame的列对齐
-            # 对于新数据中不存在的列，填充None
+            # 对于新数据中不存在的列，填充与该列同类型的缺失值（整数、布尔列使用可空类型，不会退化为 object）
             for col in existing_columns:
                 if col not in new_df.columns:
-                    new_df[col] = None
+                    new_df[col] = _missing_column(self.dataframe[col], new_df.index)
             
-            # 对于现有DataFrame中不存在的列（新字段），在现有DataFrame中填充None
+            # 对于现有DataFrame中不存在的列（新字段），在现有DataFrame中填充缺失值
             for col in added_columns:
                 if col not in self.dataframe.columns:
-                    self.dataframe[col] = None
+                    self.dataframe[col] = _missing_column(new_df[col], self.dataframe.index)
             
             # 确保列顺序一致
             new_df = new_df[self.dataframe.columns]
@@ -771,58 +1341,7 @@ class DataTable:
             # 处理ID字段：如果新数据没有ID或ID为None，自动生成
             if 'id' in self.dataframe.columns:
                 max_id = self.dataframe['id'].max() if len(self.dataframe) > 0 else 0
-                for idx, row in new_df.iterrows():
-                    if pd.isna(row.get('id')) or row.get('id') is None:
-                        max_id += 1
-                        new_df.at[idx, 'id'] = max_id
-            
-            # 处理特殊类型字段
-            for col in new_df.columns:
-                col_config = next((c for c in self.columns_config if c.prop == col), None)
-                if col_config:
-                    if col_config.type == 'bytes':
-                        # 如果字段类型是bytes，但新数据是字符串，尝试转换
-                        for idx, val in new_df[col].items():
-                            if isinstance(val, str):
-                                # 尝试将16进制字符串转换为bytes
-                                try:
-                                    # 移除空格并转换为bytes
-                                    hex_str = val.replace(' ', '').replace('-', '')
-                                    new_df.at[idx, col] = bytes.fromhex(hex_str)
-                                except ValueError:
-                                    # 如果转换失败，保持原值
-                                    pass
-                    elif col == 'ts' and col_config.type == 'date':
-                        # 如果ts字段是字符串，尝试转换为时间戳
-                        for idx, val in new_df[col].items():
-                            if pd.isna(val) or val is None:
-                                continue
-                            if isinstance(val, str) and val.strip():
-                                try:
-                                    # 尝试解析日期时间字符串（支持多种格式）
-                                    val_stripped = val.strip()
-                                    # 尝试完整格式：YYYY-MM-DD HH:MM:SS.ffffff
-                                    try:
-                                        dt = datetime.strptime(val_stripped, '%Y-%m-%d %H:%M:%S.%f')
-                                        new_df.at[idx, col] = dt.timestamp()
-                                    except ValueError:
-                                        # 尝试格式：YYYY-MM-DD HH:MM:SS
-                                        try:
-                                            dt = datetime.strptime(val_stripped, '%Y-%m-%d %H:%M:%S')
-                                            new_df.at[idx, col] = dt.timestamp()
-                                        except ValueError:
-                                            # 尝试格式：YYYY-MM-DD
-                                            try:
-                                                dt = datetime.strptime(val_stripped, '%Y-%m-%d')
-                                                new_df.at[idx, col] = dt.timestamp()
-                                            except ValueError:
-                                                # 如果都失败，尝试作为数字（可能是时间戳字符串）
-                                                try:
-                                                    new_df.at[idx, col] = float(val_stripped)
-                                                except ValueError:
-                                                    pass
-                                except Exception:
-                                    pass
+                self._fill_missing_ids(new_df, max_id)
             
             # 将新数据追加到DataFrame
             # 使用 ignore_index=True 确保索引连续，避免索引问题
@@ -830,7 +1349,15 @@ class DataTable:
             try:
                 # 执行合并操作
                 combined_df = pd.concat([self.dataframe, new_df], ignore_index=True)
-                
+                # pandas 确定结果类型时忽略全部为缺失值的部分（如 float64 与全为 NA 的 Float64 得到 float64），
+                # 新数据为可空类型的列重新转换为可空类型
+                for col in new_df.columns:
+                    dtype = combined_df[col].dtype
+                    if isinstance(dtype, np.dtype) and not isinstance(new_df[col].dtype, np.dtype):
+                        nullable = _nullable_dtype(dtype)
+                        if nullable is not dtype:
+                            combined_df[col] = combined_df[col].astype(nullable)
+
                 # 验证合并后的数据量是否正确
                 expected_length = original_length + len(new_df)
                 if len(combined_df) != expected_length:
@@ -853,7 +1380,9 @@ class DataTable:
                     )
                 
                 # 所有验证通过后，才更新 self.dataframe
+                old_dataframe = self.dataframe
                 self.dataframe = combined_df
+                self._extend_id_index(old_dataframe, combined_df, original_length)
                 
                 # 记录添加数据的信息
                 self._logger.info(
@@ -877,12 +1406,14 @@ class DataTable:
                 raise
             
             # 更新列配置中的筛选选项
-            if self._update_column_options():
+            if self._refresh_column_options('add_data', self.dataframe.iloc[original_length:]):
                 columns_updated = True
             
             # 验证列配置
             self._validate_columns()
             
+            ROWS_INGESTED.inc(len(new_df), table=self.table_id)
+            
             return {
                 "success": True,
                 "added_count": len(new_df),
@@ -890,6 +1421,425 @@ class DataTable:
                 "added_columns": list(added_columns) if added_columns else []
             }
 
+    # ---------- 按 id 修改和删除 ----------
+
+    def _locate_rows(self, ids: List[Any]) -> Dict[Any, np.ndarray]:
+        """每个 id 在 self.dataframe 中的行位置（使用 id 索引），不存在的 id 不在结果中
+
+        不支持修改已有行的子类覆盖此方法并抛出异常。
+        """
+        df = self.dataframe
+        located = {}
+        for row_id in ids:
+            positions = self._find_id_positions(df, row_id)
+            if len(positions):
+                located[row_id] = positions
+        return located
+
+    def _apply_updates(self, operation: str, updates: Dict[Any, Dict[str, Any]],
+                       located: Dict[Any, np.ndarray]) -> Tuple[int, bool]:
+        """把 updates（id -> 字段）写入 located 中的行，返回 (更新的行数, 列配置是否有更新)
+
+        读取不加锁、直接使用 self.dataframe 的快照，因此不原地修改：只复制被修改的列，
+        其他列与 id 索引沿用原来的数据。
+        """
+        fields = [{k: v for k, v in values.items() if k != 'id'} for row_id, values in updates.items()]
+        if not any(fields):
+            return 0, False
+        row_positions = [located[row_id] for row_id in updates]
+        changes = pd.DataFrame(fields)
+        self._convert_special_columns(changes)
+        changes = _cast_to_schema(changes, self.columns_config)
+
+        old_df = self.dataframe
+        new_df = old_df.copy(deep=False)
+        columns_updated = False
+        added_columns = [c for c in changes.columns if c not in old_df.columns]
+        if added_columns:
+            added_config = generate_columns_config_from_dataframe(changes[added_columns])
+            changes = _cast_to_schema(changes, added_config)
+            self.columns_config.extend(added_config)
+            columns_updated = True
+        for col in changes.columns:
+            positions, values = [], []
+            for row_fields, row_position, value in zip(fields, row_positions, changes[col]):
+                if col in row_fields:
+                    positions.append(row_position)
+                    values.extend([value] * len(row_position))
+            if not positions:
+                continue
+            column = new_df[col] if col in new_df.columns else _missing_column(changes[col], new_df.index)
+            new_df[col] = _assign_values(column, np.concatenate(positions), values)
+
+        self.dataframe = new_df
+        id_index = self._id_index
+        if id_index is not None and id_index[0] is old_df:
+            # id 列没有变化，索引继续有效
+            self._id_index = (new_df, id_index[1], id_index[2])
+        if self._refresh_column_options(operation, changes):
+            columns_updated = True
+        self._validate_columns()
+        return sum(len(p) for p in row_positions), columns_updated
+
+    def _drop_positions(self, positions: np.ndarray):
+        """删除指定位置（升序、无重复）的行，并从 id 索引中移除这些行、平移其后的行位置"""
+        old_df = self.dataframe
+        keep = np.ones(len(old_df), dtype=bool)
+        keep[positions] = False
+        new_df = old_df[keep].reset_index(drop=True)
+        id_index = self._id_index
+        if id_index is not None and id_index[0] is old_df:
+            _, sorted_ids, index_positions = id_index
+            kept = keep[index_positions]
+            index_positions = index_positions[kept]
+            index_positions = index_positions - np.searchsorted(positions, index_positions)
+            self._id_index = (new_df, sorted_ids[kept], index_positions)
+        self.dataframe = new_df
+        # 删除导致的行数减少不是异常（见 get_list 中的数据量检查）
+        self._last_known_length = len(new_df)
+
+    def update_rows(self, updates: Dict[Any, Dict[str, Any]]) -> Dict[str, Any]:
+        """按 id 更新已有行的字段（同一 id 有多行时全部更新），不存在的 id 不会新增
+
+        Args:
+            updates: id -> 要更新的字段，如 {1001: {'order_status': '已发货'}}
+
+        Returns:
+            包含更新行数和不存在的 id 的字典
+        """
+        with self._write_lock('update_rows'):
+            located = self._locate_rows(list(updates))
+            updated_count, columns_updated = self._apply_updates(
+                'update_rows', {k: v for k, v in updates.items() if k in located}, located)
+            return {
+                "success": True,
+                "updated_count": updated_count,
+                "missing_ids": [k for k in updates if k not in located],
+                "columns_updated": columns_updated
+            }
+
+    def upsert(self, records: Union[Dict[str, Any], List[Dict[str, Any]]]) -> Dict[str, Any]:
+        """按 id 写入：id 已存在时更新该行，否则追加
+
+        同一批中重复的 id 按字段合并（后出现的值优先），重复投递同一批数据不会产生重复的行。
+        没有 id 的记录按 add_data 追加并自动生成 id。先更新后追加，追加失败时已完成的更新保留。
+
+        Returns:
+            包含更新行数和追加行数的字典
+        """
+        with self._write_lock('upsert'):
+            if isinstance(records, dict):
+                records = [records]
+            if not records:
+                raise ValueError("新数据不能为空")
+
+            by_id: Dict[Any, Dict[str, Any]] = {}
+            new_records = []
+            for record in records:
+                row_id = record.get('id')
+                if row_id is None or (np.ndim(row_id) == 0 and pd.isna(row_id)):
+                    new_records.append(record)
+                else:
+                    by_id[row_id] = {**by_id.get(row_id, {}), **record}
+            located = self._locate_rows(list(by_id))
+            updated_count, columns_updated = self._apply_updates(
+                'upsert', {k: v for k, v in by_id.items() if k in located}, located)
+            new_records.extend(v for k, v in by_id.items() if k not in located)
+
+            added_count = 0
+            if new_records:
+                result = self.add_data(new_records)
+                added_count = result['added_count']
+                columns_updated = columns_updated or result['columns_updated']
+            return {
+                "success": True,
+                "updated_count": updated_count,
+                "added_count": added_count,
+                "columns_updated": columns_updated
+            }
+
+    def delete_rows(self, ids: List[Any]) -> Dict[str, Any]:
+        """按 id 删除行（同一 id 有多行时全部删除），不存在的 id 忽略
+
+        Returns:
+            包含删除行数、不存在的 id 和剩余总行数的字典
+        """
+        with self._write_lock('delete_rows'):
+            ids = list(dict.fromkeys(ids))
+            located = self._locate_rows(ids)
+            deleted_count = 0
+            if located:
+                positions = np.unique(np.concatenate(list(located.values())))
+                self._drop_positions(positions)
+                deleted_count = len(positions)
+            return {
+                "success": True,
+                "deleted_count": deleted_count,
+                "missing_ids": [k for k in ids if k not in located],
+                "total_count": self.total_count
+            }
+
+
+def _assign_values(column: pd.Series, positions: np.ndarray, values: List[Any]) -> pd.Series:
+    """复制 column 并把 positions 处的值替换为 values；类型不兼容时（如数字列写入字符串）按 object 写入后重新推断
+
+    整数、布尔列写入缺失值时改用对应的可空类型，而不是变为 float 或 object。
+    """
+    incoming = pd.Series(values).to_numpy()
+    if isinstance(column.dtype, np.dtype) and np.can_cast(incoming.dtype, column.dtype, casting='same_kind'):
+        array = column.to_numpy(copy=True)
+        array[positions] = incoming
+        return pd.Series(array, index=column.index, name=column.name)
+    nullable = _nullable_dtype(column.dtype)
+    if isinstance(nullable, pd.api.extensions.ExtensionDtype):
+        # 可空类型的数组检查写入的值，类型不兼容时抛出异常
+        array = column.array.astype(nullable, copy=True)
+        try:
+            array[positions] = incoming
+            return pd.Series(array, index=column.index, name=column.name)
+        except (TypeError, ValueError):
+            pass
+    array = column.to_numpy(dtype=object, copy=True)
+    array[positions] = incoming.astype(object)
+    return pd.Series(array, index=column.index, name=column.name).infer_objects()
+
+
+class PreparedBatch:
+    """在写锁之外转换好的一批新数据（见 prepare_batch），可直接传给 add_data"""
+
+    def __init__(self, frame: pd.DataFrame, columns_config: List[ColumnConfig]):
+        self.frame = frame
+        # 转换时已有数据中没有的字段的列配置
+        self.columns_config = columns_config
+
+    def __len__(self) -> int:
+        return len(self.frame)
+
+
+def prepare_batch(new_data: Union[List[Dict[str, Any]], pd.DataFrame],
+                  columns_config: List[ColumnConfig],
+                  existing_columns: List[str]) -> PreparedBatch:
+    """把新数据转换为可直接追加的列：构建 DataFrame、推断新字段的列配置、转换特殊类型字段
+
+    只依赖参数，不访问表格状态，可以在写锁之外或子进程中执行（见 conversion.py）。
+    """
+    # 传入的 DataFrame 复制一份，后续会修改
+    new_df = new_data.copy() if isinstance(new_data, pd.DataFrame) else pd.DataFrame(new_data)
+    existing = set(existing_columns)
+    added = [col for col in new_df.columns if col not in existing]
+    added_config = generate_columns_config_from_dataframe(new_df[added]) if added else []
+    _convert_special_columns(new_df, list(columns_config) + added_config)
+    new_df = _cast_to_schema(new_df, list(columns_config) + added_config)
+    return PreparedBatch(new_df, added_config)
+
+
+def _convert_special_columns(new_df: pd.DataFrame, columns_config: List[ColumnConfig]):
+    """根据列配置转换新数据中的特殊类型字段（16进制字符串 -> bytes，ts 字符串 -> 时间戳）"""
+    types = {c.prop: c.type for c in columns_config}
+    for col in new_df.columns:
+        # 字符串只会出现在 object 列中
+        if new_df[col].dtype != object:
+            continue
+        if types.get(col) == 'bytes':
+            # 如果字段类型是bytes，但新数据是字符串，尝试转换
+            new_df[col] = new_df[col].map(_hex_to_bytes)
+        elif col == 'ts' and types.get(col) == 'date':
+            # 如果ts字段是字符串，尝试转换为时间戳
+            new_df[col] = new_df[col].map(_parse_timestamp).infer_objects()
+
+
+def _nullable_dtype(dtype: Any) -> Any:
+    """能保存缺失值（序列化为 None）的对应类型：numpy 数字、布尔类型转为可空的 Int64、Float64 等和 boolean，其他类型不变"""
+    if isinstance(dtype, np.dtype):
+        if dtype.kind in 'iuf':
+            prefix = {'i': 'Int', 'u': 'UInt', 'f': 'Float'}[dtype.kind]
+            return pd.api.types.pandas_dtype(prefix + str(dtype.itemsize * 8))
+        if dtype.kind == 'b':
+            return pd.BooleanDtype()
+    return dtype
+
+
+def _missing_column(like: pd.Series, index: pd.Index) -> pd.Series:
+    """与 like 同类型（数字、布尔列为可空类型）、全部为缺失值的列，用于对齐缺少某些字段的批次"""
+    if like.dtype == object:
+        return pd.Series(np.full(len(index), None, dtype=object), index=index)
+    return pd.Series(index=index, dtype=_nullable_dtype(like.dtype))
+
+
+def _schema_dtype(series: pd.Series) -> Optional[str]:
+    """推断列声明的存储类型（可空类型）；bytes、混合类型等无法向量化保存的列返回 None"""
+    dtype = series.dtype
+    if pd.api.types.is_bool_dtype(dtype):
+        return 'boolean'
+    if pd.api.types.is_integer_dtype(dtype) or pd.api.types.is_float_dtype(dtype):
+        return str(_nullable_dtype(dtype))
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return str(dtype)
+    # object 列（如只有部分记录带有的字段）按前若干行的值推断，再检查整列（写入时会按推断的类型检查每个值）
+    inferred = pd.api.types.infer_dtype(series.head(_SCHEMA_SAMPLE_ROWS), skipna=True)
+    if inferred not in ('boolean', 'string') or pd.api.types.infer_dtype(series, skipna=True) != inferred:
+        return None
+    return 'boolean' if inferred == 'boolean' else _STRING_DTYPE
+
+
+def _cast_to_schema(df: pd.DataFrame, columns_config: List[ColumnConfig]) -> pd.DataFrame:
+    """把 df 中与列配置声明的类型不一致的列转换为该类型，返回新的 DataFrame（没有需要转换的列时返回 df 本身）
+
+    数字、布尔列没有缺失值时使用对应的 numpy 类型（已经是同类 numpy 类型时不转换），有缺失值（或为空）时
+    使用声明的可空类型，缺失值不会变为 object 或 NaN。无法按声明的类型保存的值（如整数列中的 1.7、
+    数字列中的 'abc'）抛出 SchemaError，不截断、也不改变列的类型；根据数据推断的类型（inferred）则放宽：
+    整数列中的小数转为 Float64，其他无法转换的值保留原来的类型。
+    """
+    result = df
+    for config in columns_config:
+        if not config.dtype or config.prop not in df.columns:
+            continue
+        column = df[config.prop]
+        declared = pd.api.types.pandas_dtype(config.dtype)
+        if column.dtype == declared:
+            continue
+        converted = _cast_column(column, declared, widen=bool(config.inferred))
+        if converted is column:
+            continue
+        if result is df:
+            result = df.copy(deep=False)
+        result[config.prop] = converted
+    return result
+
+
+def _cast_column(column: pd.Series, declared: Any, widen: bool = False) -> pd.Series:
+    """把一列转换为声明的类型（见 _cast_to_schema），不需要转换时返回 column 本身
+
+    widen 为 True 时（推断的类型）无法按声明的类型保存的值不报错：整数列放宽为 Float64，其他情况返回 column 本身。
+    """
+    if declared.kind in 'iuf' and not pd.api.types.is_numeric_dtype(column.dtype):
+        # 文本等按数字解析，无法解析的值报错，而不是使整列变为 object
+        numeric = pd.to_numeric(column, errors='coerce')
+        invalid = numeric.isna().to_numpy() & column.notna().to_numpy()
+        if widen and invalid.any():
+            return column
+        _check_values(column, invalid, declared)
+        column = numeric
+    if declared.kind in 'iu' and column.dtype.kind == 'f':
+        # 整数列只接受整数值，不截断小数
+        values = column.to_numpy(dtype=np.float64, na_value=np.nan)
+        with np.errstate(invalid='ignore'):
+            invalid = ~np.isnan(values) & ~(np.isfinite(values) & (values == np.trunc(values)))
+        if widen and invalid.any():
+            declared = pd.Float64Dtype()
+        else:
+            _check_values(column, invalid, declared)
+    elif declared.kind == 'b' and column.dtype.kind in 'iuf':
+        # 布尔列只接受 0、1
+        values = column.to_numpy(dtype=np.float64, na_value=np.nan)
+        invalid = ~np.isnan(values) & (values != 0) & (values != 1)
+        if widen and invalid.any():
+            return column
+        _check_values(column, invalid, declared)
+    elif widen and declared.kind in 'OU' and pd.api.types.infer_dtype(column, skipna=True) not in ('string', 'empty'):
+        # 推断为文本的列中出现了其他类型的值：保留原值，不转换为字符串
+        return column
+
+    target = declared
+    if declared.kind in 'biuf' and len(column) and not column.hasnans:
+        if isinstance(column.dtype, np.dtype) and column.dtype.kind == declared.kind:
+            return column
+        target = declared.numpy_dtype
+    if column.dtype == target:
+        return column
+    try:
+        return column.astype(target)
+    except (TypeError, ValueError) as e:
+        if widen:
+            return column
+        raise SchemaError(f"列 {column.name} 声明为 {declared}，值无法转换为该类型: {e}") from e
+
+
+def _check_values(column: pd.Series, invalid: np.ndarray, declared: Any):
+    """invalid 标记的值无法按声明的类型保存时抛出 SchemaError（列出前几个值）"""
+    if invalid.any():
+        examples = column[invalid].head(3).tolist()
+        raise SchemaError(
+            f"列 {column.name} 声明为 {declared}，以下值无法按该类型保存: {examples}（共 {int(invalid.sum())} 个）"
+        )
+
+
+def _append_rows(old_df: pd.DataFrame, delta: pd.DataFrame) -> pd.DataFrame:
+    """把 delta 追加到 old_df 之后（保留 delta 的索引）；delta 中有缺失值的数字、布尔列，结果同样使用可空类型"""
+    if delta.empty:
+        return old_df
+    combined = pd.concat([old_df, delta])
+    for col in delta.columns:
+        dtype = delta[col].dtype
+        if (isinstance(dtype, pd.api.extensions.ExtensionDtype) and dtype.kind in 'biuf' and delta[col].hasnans
+                and combined[col].dtype != dtype and _dtype_family(combined[col].dtype) == _dtype_family(dtype)):
+            combined[col] = combined[col].astype(dtype)
+    return combined
+
+
+def _dtype_family(dtype: Any) -> str:
+    """类型的大类：numpy 类型与对应的可空类型（如 int64 与 Int64）相同，其他类型为类型名"""
+    dtype = pd.api.types.pandas_dtype(dtype)
+    if dtype.kind in 'biuf':
+        return 'i' if dtype.kind == 'u' else dtype.kind
+    return str(dtype)
+
+
+def _same_values(left: np.ndarray, right: np.ndarray) -> bool:
+    """两个数组的值是否相同（缺失值视为相同）"""
+    if len(left) != len(right) or left.dtype != right.dtype:
+        return False
+    if left.dtype.kind in 'iub':
+        return bool(np.array_equal(left, right))
+    if left.dtype.kind == 'f':
+        return bool(np.array_equal(left, right, equal_nan=True))
+    return pd.Series(left).equals(pd.Series(right))
+
+
+def _ids_match(ids: pd.Series, positions: np.ndarray, row_id: Any) -> bool:
+    """ids 在 positions 处的值是否都等于 row_id（检查 id 索引查找的结果）"""
+    if not len(positions):
+        return True
+    try:
+        values = ids.to_numpy() if isinstance(ids.dtype, np.dtype) else ids.array
+        return bool(np.all(np.asarray(values[positions]) == row_id))
+    except (TypeError, ValueError):
+        return False
+
+
+def _index_values(series: pd.Series) -> np.ndarray:
+    """建立索引用的 numpy 数组：没有缺失值的可空数字列转换为对应的 numpy 类型，避免按 Python 对象排序"""
+    dtype = series.dtype
+    if isinstance(dtype, pd.api.extensions.ExtensionDtype) and dtype.kind in 'biuf' and not series.hasnans:
+        return series.to_numpy(dtype=dtype.numpy_dtype)
+    return series.to_numpy()
+
+
+def _hex_to_bytes(value: Any) -> Any:
+    """16进制字符串（可含空格、-）转换为 bytes，无法转换时保持原值"""
+    if not isinstance(value, str):
+        return value
+    try:
+        return bytes.fromhex(value.replace(' ', '').replace('-', ''))
+    except ValueError:
+        return value
+
+
+def _parse_timestamp(value: Any) -> Any:
+    """日期时间字符串转换为时间戳（支持多种格式，也可以是时间戳字符串），无法转换时保持原值"""
+    if not isinstance(value, str) or not value.strip():
+        return value
+    value_stripped = value.strip()
+    for fmt in ('%Y-%m-%d %H:%M:%S.%f', '%Y-%m-%d %H:%M:%S', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(value_stripped, fmt).timestamp()
+        except ValueError:
+            pass
+    try:
+        return float(value_stripped)
+    except ValueError:
+        return value
+
 
 def _is_hex_string(sample_values: List[Any], col_name: str) -> bool:
     """检查样本值是否都是16进制字符串格式"""
@@ -909,32 +1859,91 @@ def _is_hex_string(sample_values: List[Any], col_name: str) -> bool:
     return is_hex or any(keyword in col_name.lower() for keyword in ['bytes', 'hex', 'binary', 'data', 'payload'])
 
 
-def _determine_string_column_type(df: pd.DataFrame, col: str, col_type: str) -> Tuple[str, str, int]:
-    """确定字符串类型列的配置（column_type, filter_type, min_width）"""
-    sample_values = df[col].dropna().head(10).tolist()
+def _first_values(series: pd.Series, count: int) -> List[Any]:
+    """前 count 个非缺失值（先在开头的若干行中查找，避免对整列 dropna）"""
+    values = series.head(_SCHEMA_SAMPLE_ROWS).dropna()
+    if len(values) < count and len(series) > _SCHEMA_SAMPLE_ROWS:
+        values = series.dropna()
+    return values.head(count).tolist()
+
+
+def _distinct_values(series: pd.Series, limit: int, dropna: bool = False) -> Optional[np.ndarray]:
+    """按块统计 series 的不同值（按首次出现的顺序，与 unique() 相同），超过 limit 个时提前结束并返回 None"""
+    seen = np.empty(0, dtype=object)
+    start, size = 0, _DISTINCT_CHUNK_ROWS
+    while start < len(series):
+        chunk = series.iloc[start:start + size]
+        start, size = start + size, min(size * 4, _DISTINCT_CHUNK_MAX_ROWS)
+        if dropna:
+            chunk = chunk.dropna()
+        values = np.asarray(chunk.unique(), dtype=object)
+        seen = pd.unique(np.concatenate([seen, values])) if len(seen) else values
+        if len(seen) > limit:
+            return None
+    return seen
+
+
+def _exceeds_distinct(series: pd.Series, limit: int, sample_rows: int) -> bool:
+    """按等间隔抽取至多 sample_rows 行，用 HyperLogLog 估计不同值数量是否明显超过 limit
+
+    逐块加入，估计值超过 limit * _SKETCH_MARGIN 时提前结束：高基数列只需对几千个值求哈希。
+    返回 False 不代表不超过 limit（抽样可能遗漏少见的值），需要再精确统计。
+    """
+    step = -(-len(series) // sample_rows) if sample_rows > 0 else 1
+    sample = series.iloc[::step] if step > 1 else series
+    sketch = HyperLogLog()
+    for start in range(0, len(sample), _SKETCH_CHUNK_ROWS):
+        sketch.add(sample.iloc[start:start + _SKETCH_CHUNK_ROWS])
+        if sketch.estimate() > limit * _SKETCH_MARGIN:
+            return True
+    return False
+
+
+def _column_options(series: pd.Series, sample_rows: Optional[int]) -> Optional[List[str]]:
+    """不同值不超过 _MULTI_SELECT_MAX_OPTIONS 个时返回下拉选项（按首次出现的顺序），否则返回 None
+
+    sample_rows 不为 None 时先用抽样估计排除高基数列（不对整列求哈希），只对可能符合的列精确统计。
+    """
+    if sample_rows is not None and _exceeds_distinct(series, _MULTI_SELECT_MAX_OPTIONS, sample_rows):
+        return None
+    values = _distinct_values(series, _MULTI_SELECT_MAX_OPTIONS)
+    return None if values is None else [str(v) for v in values]
+
+
+def _determine_string_column_type(df: pd.DataFrame, col: str, col_type: str,
+                                  sample_rows: Optional[int] = _INFER_SAMPLE_ROWS
+                                  ) -> Tuple[str, str, int, Optional[List[str]]]:
+    """确定字符串类型列的配置（column_type, filter_type, min_width, options）"""
+    sample_values = _first_values(df[col], 10)
     
     # 检查是否为16进制字符串（bytes类型）
     if _is_hex_string(sample_values, col):
-        return 'bytes', 'text', 200
+        return 'bytes', 'text', 200, None
     
     # 启发式规则：如果是 ID、编号、Code 等字段，通常是高基数的，直接使用文本筛选
     is_id_like = any(keyword in col.lower() for keyword in ['id', 'no', 'number', 'code', 'uuid', 'guid'])
     if is_id_like:
-        return 'string', 'text', 120
+        return 'string', 'text', 120, None
     
     # 检查唯一值数量
-    unique_values = df[col].unique().tolist()
-    if len(unique_values) <= 100:
-        return 'string', 'multi-select', 120
+    options = _column_options(df[col], sample_rows)
+    if options is not None:
+        return 'string', 'multi-select', 120, options
     else:
-        return 'string', 'text', 120
+        return 'string', 'text', 120, None
 
 
-def generate_columns_config_from_dataframe(df: pd.DataFrame) -> List[ColumnConfig]:
+def generate_columns_config_from_dataframe(df: pd.DataFrame,
+                                           sample_rows: Optional[int] = _INFER_SAMPLE_ROWS) -> List[ColumnConfig]:
     """根据DataFrame自动生成列配置
     
+    字符串列的不同值不超过 100 个时使用下拉筛选。先按等间隔抽取至多 sample_rows 行，用 HyperLogLog
+    估计不同值数量，明显超过上限的列直接使用文本筛选，不对整列求哈希；其余列按块精确统计选项，
+    超过上限时提前结束。结果与逐列 unique() 相同。
+    
     Args:
         df: pandas DataFrame
+        sample_rows: 估计不同值数量的抽样行数，None 表示不估计、直接精确统计
     
     Returns:
         列配置列表
@@ -955,7 +1964,7 @@ def generate_columns_config_from_dataframe(df: pd.DataFrame) -> List[ColumnConfi
         if col.lower() == 'ts':
             column_type = 'date'
             filter_type = 'date'
-        elif 'int' in col_type or 'float' in col_type:
+        elif pd.api.types.is_integer_dtype(df[col].dtype) or pd.api.types.is_float_dtype(df[col].dtype):
             column_type = 'number'
             filter_type = 'number'
         elif 'datetime' in col_type or 'date' in col.lower():
@@ -969,22 +1978,19 @@ def generate_columns_config_from_dataframe(df: pd.DataFrame) -> List[ColumnConfi
             filter_type = 'text'
             min_width = 200
         elif 'object' in col_type:
-            sample_value = df[col].dropna().iloc[0] if not df[col].dropna().empty else None
+            sample_value = next(iter(_first_values(df[col], 1)), None)
             if isinstance(sample_value, bytes):
                 column_type = 'bytes'
                 filter_type = 'text'
                 min_width = 200
             else:
-                column_type, filter_type, min_width = _determine_string_column_type(df, col, col_type)
-                if filter_type == 'multi-select':
-                    unique_values = df[col].unique().tolist()
-                    options = [str(v) for v in unique_values]
+                column_type, filter_type, min_width, options = _determine_string_column_type(
+                    df, col, col_type, sample_rows)
         elif 'string' in col_type:
-            column_type, filter_type, min_width = _determine_string_column_type(df, col, col_type)
-            if filter_type == 'multi-select':
-                unique_values = df[col].unique().tolist()
-                options = [str(v) for v in unique_values]
+            column_type, filter_type, min_width, options = _determine_string_column_type(
+                df, col, col_type, sample_rows)
         
+        dtype = _schema_dtype(df[col]) if column_type != 'bytes' else None
         columns_config.append(ColumnConfig(
             prop=col,
             label=col,
@@ -994,7 +2000,10 @@ def generate_columns_config_from_dataframe(df: pd.DataFrame) -> List[ColumnConfi
             filterType=filter_type,
             minWidth=min_width,
             fixed=fixed,
-            options=options
+            options=options,
+            # bytes 列保存 Python bytes 对象（十六进制字符串在写入时转换），不声明存储类型
+            dtype=dtype,
+            inferred=True
         ))
     
     return columns_config
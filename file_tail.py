@@ -0,0 +1,211 @@
+"""文件跟踪 - 把只追加的本地 CSV / NDJSON 文件中新增的行持续写入表格
+
+很多数据以只追加的日志文件落地。FileTail 记录已读取到的字节位置（offset），每次只读取之后追加的
+完整行（用 mmap 映射文件，不把整个文件读入内存），按 chunk_bytes 分块解析为 DataFrame 后走 add_data
+（bytes、ts 等字段按列配置转换），每块写入后把 offset 保存到检查点文件，重启后从检查点继续：
+
+    tail = FileTail(source, 'orders.ndjson')
+    app.on_startup(tail.start)     # 在事件循环中后台轮询，写入后刷新视图
+    app.on_shutdown(tail.stop)
+
+不再需要在页面中自行维护 DataFrame 并定时调用 update_dataframe（见 nicegui_empty_table.py）。
+
+- CSV 第一行为列名；NDJSON 每行一个 JSON 对象
+- 末尾不完整的行（写入方还没写完换行符）留到下次读取
+- 文件变短或被替换（inode 变化，如日志轮转）时从头读取新文件
+- 检查点在写入表格之后保存，进程在两者之间退出时重启后会重复写入该块（至少一次）
+"""
+
+import asyncio
+import io
+import json
+import logging
+import mmap
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+import pandas as pd
+
+from bulk_ingest import BulkFormatError, csv_dtypes, parse_ndjson
+from data_source import DataSource
+from data_table import DataTable
+from metrics import FILE_TAIL_LAG_BYTES
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_BYTES = 8 << 20
+
+_FORMATS = {'.csv': 'csv', '.ndjson': 'ndjson', '.jsonl': 'ndjson'}
+
+
+class FileTail:
+    """跟踪一个只追加的 CSV / NDJSON 文件，把新增的行写入 DataSource 或 DataTable"""
+
+    def __init__(self,
+                 target: Union[DataSource, DataTable],
+                 path: Union[str, Path],
+                 fmt: Optional[str] = None,
+                 checkpoint_path: Optional[Union[str, Path, bool]] = None,
+                 chunk_bytes: int = DEFAULT_CHUNK_BYTES,
+                 poll_interval: float = 0.5):
+        """
+        Args:
+            target: 写入目标；DataSource 在每轮写入后通知所有视图刷新
+            path: 跟踪的文件（可以尚不存在）
+            fmt: 'csv' 或 'ndjson'，默认按扩展名判断（.csv、.ndjson、.jsonl）
+            checkpoint_path: 检查点文件，默认为 path + '.offset'；False 表示不保存检查点（重启后从头读取）
+            chunk_bytes: 每次解析写入的最大字节数（按完整行切分）
+            poll_interval: 后台轮询间隔（秒）
+        """
+        self.target = target
+        self.path = Path(path)
+        self.fmt = fmt or _FORMATS.get(self.path.suffix.lower())
+        if self.fmt not in ('csv', 'ndjson'):
+            raise ValueError(f'无法确定文件格式，请指定 fmt=\'csv\' 或 \'ndjson\': {self.path}')
+        if checkpoint_path is None:
+            checkpoint_path = self.path.with_name(self.path.name + '.offset')
+        self.checkpoint_path = Path(checkpoint_path) if checkpoint_path is not False else None
+        self.chunk_bytes = chunk_bytes
+        self.poll_interval = poll_interval
+        # 已写入表格的字节位置、文件的 inode 和 CSV 列名
+        self.offset = 0
+        self.inode: Optional[int] = None
+        self.columns: Optional[List[str]] = None
+        self.rows_added = 0
+        self._task: Optional[asyncio.Task] = None
+        self._load_checkpoint()
+
+    @property
+    def table(self) -> DataTable:
+        """写入目标当前的 DataTable"""
+        return self.target.table if isinstance(self.target, DataSource) else self.target
+
+    # ---------- 读取 ----------
+
+    def poll(self) -> Dict[str, Any]:
+        """读取并写入自上次以来追加的所有完整行（阻塞调用，可在线程中执行）
+
+        Returns:
+            added_count（写入的行数）、chunks（写入次数）和 columns_updated
+        """
+        added = chunks = 0
+        columns_updated = False
+        while True:
+            block = self._read_block()
+            if block is None:
+                break
+            frame, end = block
+            if not frame.empty:
+                result = self._apply(frame)
+                added += result.get('added_count', 0)
+                chunks += 1
+                columns_updated = columns_updated or bool(result.get('columns_updated'))
+            self.offset = end
+            self._save_checkpoint()
+        self.rows_added += added
+        return {'added_count': added, 'chunks': chunks, 'columns_updated': columns_updated}
+
+    def _read_block(self) -> Optional[tuple]:
+        """从 offset 开始读取不超过 chunk_bytes 的完整行，返回 (DataFrame, 结束位置)，没有新的完整行时返回 None"""
+        try:
+            f = open(self.path, 'rb')
+        except FileNotFoundError:
+            return None
+        with f:
+            stat = os.fstat(f.fileno())
+            if stat.st_size < self.offset or (self.inode is not None and stat.st_ino != self.inode):
+                logger.warning(f'{self.path} 被截断或替换，从头读取')
+                self.offset = 0
+                self.columns = None
+            self.inode = stat.st_ino
+            size = stat.st_size
+            FILE_TAIL_LAG_BYTES.set(size - self.offset, table=self.table.table_id, path=str(self.path))
+            if size <= self.offset:
+                return None
+            with mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ) as mm:
+                start = self.offset
+                if self.fmt == 'csv' and self.columns is None:
+                    header_end = mm.find(b'\n', start)
+                    if header_end < 0:
+                        return None
+                    self.columns = list(pd.read_csv(io.BytesIO(mm[start:header_end + 1]), nrows=0).columns)
+                    start = header_end + 1
+                # 只取完整的行；单行超过 chunk_bytes 时读到该行结束
+                end = mm.rfind(b'\n', start, min(size, start + self.chunk_bytes))
+                if end < 0:
+                    end = mm.find(b'\n', start)
+                if end < 0:
+                    if start != self.offset:  # 只有列名
+                        return pd.DataFrame(), start
+                    return None
+                data = mm[start:end + 1]
+        return self._parse(data), end + 1
+
+    def _parse(self, data: bytes) -> pd.DataFrame:
+        if self.fmt == 'ndjson':
+            lines = [line for line in data.split(b'\n') if line.strip()]
+            return parse_ndjson(lines) if lines else pd.DataFrame()
+        if not data.strip():
+            return pd.DataFrame()
+        try:
+            return pd.read_csv(io.BytesIO(data), header=None, names=self.columns,
+                               dtype=csv_dtypes(self.table.columns_config))
+        except (pd.errors.ParserError, UnicodeDecodeError) as e:
+            raise BulkFormatError(f'CSV 解析失败: {e}')
+
+    def _apply(self, frame: pd.DataFrame) -> Dict[str, Any]:
+        if isinstance(self.target, DataSource):
+            return self.target.add_data(frame, refresh=False)
+        return self.target.add_data(frame)
+
+    # ---------- 检查点 ----------
+
+    def _load_checkpoint(self):
+        if self.checkpoint_path is None or not self.checkpoint_path.exists():
+            return
+        with open(self.checkpoint_path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        self.offset = state.get('offset', 0)
+        self.inode = state.get('inode')
+        self.columns = state.get('columns')
+
+    def _save_checkpoint(self):
+        """原子地写入检查点"""
+        if self.checkpoint_path is None:
+            return
+        state = {'path': str(self.path), 'offset': self.offset, 'inode': self.inode, 'columns': self.columns}
+        tmp_path = self.checkpoint_path.with_name(self.checkpoint_path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    # ---------- 后台轮询 ----------
+
+    def start(self) -> asyncio.Task:
+        """在当前事件循环中启动后台轮询（读取和写入在线程中执行）"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        return self._task
+
+    async def stop(self):
+        """停止后台轮询（线程中正在进行的读取会写完当前块并保存检查点）"""
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    async def _run(self):
+        while True:
+            try:
+                result = await asyncio.to_thread(self.poll)
+            except Exception:
+                # 解析或写入失败时停在出错的块之前，下一轮重试
+                logger.exception(f'跟踪文件 {self.path} 失败')
+            else:
+                if result['chunks'] and isinstance(self.target, DataSource):
+                    self.target.refresh_views(result['columns_updated'])
+            await asyncio.sleep(self.poll_interval)
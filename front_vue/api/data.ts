@@ -1,5 +1,5 @@
-import axios from 'axios'
-import { TableData, FilterParams, PaginationParams, ApiResponse, ListResponse, RowPositionResponse, RowDetail, ColumnsConfigResponse } from '../types'
+import axios, { AxiosInstance } from 'axios'
+import { TableData, FilterParams, PaginationParams, ApiResponse, ListResponse, RowPositionResponse, RowDetail, ColumnsConfigResponse, ServerTiming, RequestTiming, LoadTiming } from '../types'
 
 // 动态获取 API base URL
 // 如果是在 NiceGUI 中嵌入，使用相对路径
@@ -19,25 +19,128 @@ const api = axios.create({
   timeout: 30000,
 })
 
+// 解析 Server-Timing 响应头，如 "filter;dur=1.2, sort;dur=0.4, total;dur=2.0"
+export const parseServerTiming = (header?: string | null): ServerTiming => {
+  const timing: ServerTiming = {}
+  if (!header) return timing
+  header.split(',').forEach(entry => {
+    const [name, ...params] = entry.trim().split(';')
+    const dur = params.find(p => p.trim().startsWith('dur='))
+    if (name && dur) {
+      timing[name] = parseFloat(dur.trim().slice(4))
+    }
+  })
+  return timing
+}
+
+// POST 请求并分别计时：fetch（网络 + 服务端）和 parse（JSON 解析）
+// 以文本接收响应后手动解析，解析时间才不会计入 fetch
+export const timedPost = async (
+  client: AxiosInstance,
+  url: string,
+  body: any
+): Promise<{ data: any; timing: RequestTiming }> => {
+  const start = performance.now()
+  let response
+  try {
+    response = await client.post(url, body, { responseType: 'text', transformResponse: (r: any) => r })
+  } catch (error: any) {
+    // 错误响应同样是文本，解析后保持 error.response.data.detail 的用法
+    if (error.response && typeof error.response.data === 'string') {
+      try {
+        error.response.data = JSON.parse(error.response.data)
+      } catch {
+        // 非 JSON 错误响应，保留原文本
+      }
+    }
+    throw error
+  }
+  const fetched = performance.now()
+  const data = JSON.parse(response.data)
+  const parsed = performance.now()
+  return {
+    data,
+    timing: {
+      fetch: fetched - start,
+      parse: parsed - fetched,
+      server: parseServerTiming(response.headers['server-timing'])
+    }
+  }
+}
+
+// 批量上报 loadData 耗时：攒够 batchSize 条或每 interval 毫秒发送一次，
+// 页面隐藏时用 sendBeacon 发送剩余样本（sendBeacon 不能带请求头，表格 id 放在请求体中）
+export class TelemetryBatcher {
+  private samples: LoadTiming[] = []
+  private timer: ReturnType<typeof setInterval> | null = null
+
+  constructor(
+    private client: AxiosInstance,
+    private url: string,
+    private getTableId: () => string | null = () => null,
+    private batchSize = 20,
+    private interval = 10000
+  ) {}
+
+  start() {
+    if (this.timer) return
+    this.timer = setInterval(() => this.flush(), this.interval)
+    document.addEventListener('visibilitychange', this.onVisibilityChange)
+  }
+
+  stop() {
+    if (this.timer) {
+      clearInterval(this.timer)
+      this.timer = null
+    }
+    document.removeEventListener('visibilitychange', this.onVisibilityChange)
+    this.flush(true)
+  }
+
+  add(sample: LoadTiming) {
+    this.samples.push(sample)
+    if (this.samples.length >= this.batchSize) {
+      this.flush()
+    }
+  }
+
+  flush(useBeacon = false) {
+    if (this.samples.length === 0) return
+    const payload = { tableId: this.getTableId(), samples: this.samples }
+    this.samples = []
+    if (useBeacon && navigator.sendBeacon) {
+      const url = (this.client.defaults.baseURL || '') + this.url
+      navigator.sendBeacon(url, new Blob([JSON.stringify(payload)], { type: 'application/json' }))
+      return
+    }
+    // 上报失败不影响表格使用，直接丢弃
+    this.client.post(this.url, payload).catch(() => {})
+  }
+
+  private onVisibilityChange = () => {
+    if (document.visibilityState === 'hidden') {
+      this.flush(true)
+    }
+  }
+}
+
 export const dataApi = {
   // 获取数据列表
   getList: async (
     params: PaginationParams & { filters?: FilterParams }
   ): Promise<ListResponse> => {
     try {
-      const response = await api.post('/data/list', params)
+      const { data, timing } = await timedPost(api, '/data/list', params)
       
       // 检查响应格式
-      const data = response.data
-      
       // 如果直接返回了 ListResponse 格式（没有 success 字段）
       if (data.list && data.total !== undefined) {
-        return data as ListResponse
+        return { ...data, timing } as ListResponse
       }
       
       // 如果是 ApiResponse 格式
       if (data.success && data.data) {
-        return data.data as ListResponse
+        return { ...data.data, timing } as ListResponse
       }
       
       // 如果都不匹配，抛出错误
@@ -146,6 +249,50 @@ export const dataApi = {
     }
   },
 
+  // 按 id 写入数据（id 已存在时更新，否则追加）
+  upsertData: async (data: TableData | TableData[]): Promise<{ success: boolean; updated_count: number; added_count: number; columns_updated: boolean }> => {
+    try {
+      const response = await api.post<ApiResponse<{ success: boolean; updated_count: number; added_count: number; columns_updated: boolean }>>('/data/upsert', {
+        data: Array.isArray(data) ? data : [data]
+      })
+      if (response.data.success && response.data.data) {
+        return response.data.data
+      } else {
+        throw new Error('API返回数据格式错误')
+      }
+    } catch (error: any) {
+      if (error.response) {
+        throw new Error(error.response.data?.detail || error.response.data?.message || '服务器错误')
+      } else if (error.request) {
+        throw new Error('无法连接到服务器，请确保后端服务已启动')
+      } else {
+        throw error
+      }
+    }
+  },
+
+  // 按 id 删除数据
+  deleteRows: async (ids: Array<string | number>): Promise<{ success: boolean; deleted_count: number; missing_ids: Array<string | number>; total_count: number }> => {
+    try {
+      const response = await api.post<ApiResponse<{ success: boolean; deleted_count: number; missing_ids: Array<string | number>; total_count: number }>>('/data/delete', {
+        ids
+      })
+      if (response.data.success && response.data.data) {
+        return response.data.data
+      } else {
+        throw new Error('API返回数据格式错误')
+      }
+    } catch (error: any) {
+      if (error.response) {
+        throw new Error(error.response.data?.detail || error.response.data?.message || '服务器错误')
+      } else if (error.request) {
+        throw new Error('无法连接到服务器，请确保后端服务已启动')
+      } else {
+        throw error
+      }
+    }
+  },
+
   // 启动自动添加数据
   startAutoAdd: async (batchSize: number = 1, interval: number = 0.5): Promise<{ success: boolean; message: string }> => {
     try {
@@ -248,4 +395,7 @@ export const dataApi = {
       }
     }
   },
+
+  // 创建 loadData 耗时的批量上报器
+  createTelemetry: (): TelemetryBatcher => new TelemetryBatcher(api, '/data/telemetry')
 }
@@ -34,6 +34,26 @@ export interface ListResponse {
   total: number
   page: number
   pageSize: number
+  timing?: RequestTiming  // 前端测得的请求耗时（不是后端返回的字段）
+}
+
+// 服务端各阶段耗时（毫秒），来自 Server-Timing 响应头，如 { filter: 1.2, sort: 0.4, total: 2.0 }
+export type ServerTiming = Record<string, number>
+
+// 单个请求的前端耗时（毫秒）
+export interface RequestTiming {
+  fetch: number  // 发出请求到收到完整响应（网络 + 服务端）
+  parse: number  // JSON 解析
+  server: ServerTiming
+}
+
+// 一次 loadData 的耗时样本（毫秒），批量上报到 /telemetry
+export interface LoadTiming {
+  fetch: number
+  parse: number
+  render: number  // 数据赋值到表格渲染完成（下一帧）
+  server: number  // 服务端总耗时（Server-Timing 的 total）
+  rows: number
 }
 
 export interface RowPositionResponse {
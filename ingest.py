@@ -0,0 +1,217 @@
+"""写入队列 - 合并小批量写入，在独立的写线程中执行
+
+每次 add_data 都要获取写锁、转换类型、拼接 DataFrame、刷新筛选选项，大量生产者各自提交小批量时，
+这些固定开销占了大部分时间。IngestQueue 把提交的记录放入队列，写线程按行数（max_batch_rows）
+或等待时间（max_delay）把多次提交合并为一批，只调用一次 add_data。
+
+队列中尚未写入的行数超过 max_pending_rows 时 submit 抛出 IngestQueueFull（/add 返回 429），
+生产者稍后重试（或 block=True 等待空位），写线程跟不上时内存不会无限增长。
+
+    queue = IngestQueue(table.add_data, name='orders')
+    future = queue.submit(records)            # concurrent.futures.Future
+    result = await asyncio.wrap_future(future)
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple, Union
+
+import pandas as pd
+
+from metrics import INGEST_BATCH_ROWS, INGEST_QUEUE_FULL, INGEST_QUEUE_ROWS
+
+logger = logging.getLogger(__name__)
+
+
+class IngestQueueFull(Exception):
+    """写入队列已满，生产者应稍后重试"""
+
+
+class IngestQueue:
+    """合并写入的队列，写入在专用的写线程中执行"""
+
+    def __init__(self,
+                 apply: Callable[[Union[List[Dict[str, Any]], pd.DataFrame]], Dict[str, Any]],
+                 name: str = 'default',
+                 max_batch_rows: int = 10_000,
+                 max_delay: float = 0.05,
+                 max_pending_rows: int = 200_000,
+                 on_batch: Optional[Callable[[Dict[str, Any]], None]] = None):
+        """
+        Args:
+            apply: 写入一批记录（字典列表，含 DataFrame 提交时为 DataFrame）的函数，如 DataTable.add_data，在写线程中调用
+            name: 队列名称，用作指标中的 table 标签
+            max_batch_rows: 合并到这么多行时立即写入
+            max_delay: 最早的提交最多等待这么久（秒）就写入，不再等待更多提交
+            max_pending_rows: 尚未写入（排队中和正在写入）的行数上限，超出时拒绝提交
+            on_batch: 每批写入成功后在写线程中调用，参数为 apply 的返回值
+        """
+        self.name = name
+        self.max_batch_rows = max_batch_rows
+        self.max_delay = max_delay
+        self.max_pending_rows = max_pending_rows
+        self._apply = apply
+        self._on_batch = on_batch
+        # (记录, Future, 提交时间)
+        self._queue: Deque[Tuple[Any, Future, float]] = deque()
+        self._queued_rows = 0
+        self._inflight_rows = 0
+        self._cond = threading.Condition()
+        self._closed = False
+        self._batches = 0
+        self._rows_written = 0
+        self._rejected = 0
+        self._thread = threading.Thread(target=self._run, name=f'ingest-{name}', daemon=True)
+        self._thread.start()
+
+    @property
+    def pending_rows(self) -> int:
+        """尚未写入的行数（排队中和正在写入）"""
+        return self._queued_rows + self._inflight_rows
+
+    def stats(self) -> Dict[str, Any]:
+        """队列深度和累计写入情况"""
+        with self._cond:
+            return {
+                'queued_rows': self._queued_rows,
+                'queued_submissions': len(self._queue),
+                'inflight_rows': self._inflight_rows,
+                'batches': self._batches,
+                'rows_written': self._rows_written,
+                'rejected': self._rejected,
+            }
+
+    def submit(self, records: Union[Dict[str, Any], List[Dict[str, Any]], pd.DataFrame],
+               block: bool = False, timeout: Optional[float] = None) -> Future:
+        """提交记录，返回写入完成后带结果的 Future
+
+        队列已满时：block 为 False 立即抛出 IngestQueueFull，否则最多等待 timeout 秒。
+        单次提交的行数超过上限时，只要队列为空仍然接受，避免永远无法写入。
+        """
+        if isinstance(records, dict):
+            records = [records]
+        if len(records) == 0:
+            raise ValueError("新数据不能为空")
+        count = len(records)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError(f'写入队列 {self.name} 已关闭')
+                pending = self.pending_rows
+                if pending == 0 or pending + count <= self.max_pending_rows:
+                    break
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if not block or (remaining is not None and remaining <= 0):
+                    self._rejected += 1
+                    INGEST_QUEUE_FULL.inc(table=self.name)
+                    raise IngestQueueFull(
+                        f'写入队列已满: {pending} 行等待写入，上限 {self.max_pending_rows} 行'
+                    )
+                self._cond.wait(remaining)
+            future: Future = Future()
+            self._queue.append((records if isinstance(records, pd.DataFrame) else list(records),
+                                future, time.monotonic()))
+            self._queued_rows += count
+            INGEST_QUEUE_ROWS.set(self.pending_rows, table=self.name)
+            self._cond.notify_all()
+        return future
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """等待已提交的记录全部写入，返回是否在 timeout 内完成"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self.pending_rows:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def close(self, timeout: Optional[float] = None):
+        """停止接受提交，写完队列中剩余的记录后结束写线程"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+
+    def _next_batch(self) -> Optional[List[Tuple[Any, Future, float]]]:
+        """等待并取出下一批提交；队列关闭且为空时返回 None"""
+        with self._cond:
+            while not self._queue:
+                if self._closed:
+                    return None
+                self._cond.wait()
+            # 凑够 max_batch_rows 行，或最早的提交等待超过 max_delay 时写入
+            deadline = self._queue[0][2] + self.max_delay
+            while not self._closed and self._queued_rows < self.max_batch_rows:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch = []
+            rows = 0
+            while self._queue and (not batch or rows + len(self._queue[0][0]) <= self.max_batch_rows):
+                item = self._queue.popleft()
+                self._queued_rows -= len(item[0])
+                # 已取消的提交不再写入
+                if item[1].set_running_or_notify_cancel():
+                    batch.append(item)
+                    rows += len(item[0])
+            self._inflight_rows = rows
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            try:
+                self._write(batch)
+            finally:
+                with self._cond:
+                    self._inflight_rows = 0
+                    INGEST_QUEUE_ROWS.set(self.pending_rows, table=self.name)
+                    self._cond.notify_all()
+
+    def _write(self, batch: List[Tuple[Any, Future, float]]):
+        if not batch:
+            return
+        records = _combine([item[0] for item in batch])
+        try:
+            result = self._apply(records)
+        except Exception as e:
+            if len(batch) == 1:
+                batch[0][1].set_exception(e)
+                return
+            # 合并后的批次写入失败时逐个提交重试，只让出错的提交失败
+            logger.warning(f'写入队列 {self.name} 合并写入 {len(records)} 行失败，逐个提交重试: {e}')
+            for item in batch:
+                self._write([item])
+            return
+        INGEST_BATCH_ROWS.observe(len(records), table=self.name)
+        self._batches += 1
+        self._rows_written += len(records)
+        if self._on_batch is not None:
+            try:
+                self._on_batch(result)
+            except Exception:
+                logger.exception(f'写入队列 {self.name} 的 on_batch 回调失败')
+        for item_records, future, _ in batch:
+            future.set_result({
+                'success': True,
+                'added_count': len(item_records),
+                'batch_rows': len(records),
+                'columns_updated': bool(result.get('columns_updated')),
+            })
+
+
+def _combine(items: List[Any]) -> Union[List[Dict[str, Any]], pd.DataFrame]:
+    """合并多次提交：都是字典列表时拼接列表，含 DataFrame 时按列拼接"""
+    if not any(isinstance(item, pd.DataFrame) for item in items):
+        return [record for item in items for record in item]
+    frames = [item if isinstance(item, pd.DataFrame) else pd.DataFrame(item) for item in items]
+    return frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
@@ -0,0 +1,484 @@
+"""NiceTable API 并发压测工具
+
+在本地子进程中启动挂载了 NiceTable 路由的 FastAPI 应用（预加载生成的数据），
+用 httpx.AsyncClient 模拟多个并发的仪表盘：按权重调用 /list、/row-position、/row-detail、/filters，
+同时以固定速率向 /add 写入数据。每个并发级别统计：
+- 各接口的延迟分位数、延迟直方图和错误率
+- 实际写入速率
+- 服务端事件循环延迟（服务端定时采样，通过 /loadtest/lag 获取）以及压测端自身的事件循环延迟
+
+按并发级别从小到大运行，输出在写入持续进行时满足延迟目标（--slo-ms）的最大仪表盘数。
+全程只访问 127.0.0.1，无需外部网络。
+
+用法：
+    python loadtest.py --rows 100000 --dashboards 1 5 10 20 50 --ingest-rate 1000
+    python loadtest.py --filter-mix none=4,status=2,amount=2,text=1,sort=1 --output loadtest.json
+    python loadtest.py --url http://127.0.0.1:8080 --table-id <uid> --dashboards 5
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import platform
+import socket
+import sys
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime
+from multiprocessing import get_context
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+import numpy as np
+
+from benchmark import build_dataframe
+from data_generator import CITIES, ORDER_STATUSES, generate_batch_records
+from data_source import DataSource
+from nice_table import NiceTable
+
+DEFAULT_DASHBOARDS = [1, 5, 10, 20, 50]
+# 模拟仪表盘的默认表格 id
+TABLE_ID = 'loadtest'
+# 延迟直方图的桶上界（毫秒），最后一个桶为无穷大
+HISTOGRAM_BUCKETS_MS = [1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000]
+# 仪表盘中各接口的调用权重
+DEFAULT_OPERATIONS = {'list': 6, 'row-position': 1, 'row-detail': 2, 'filters': 1}
+DEFAULT_FILTER_MIX = {'none': 4, 'status': 2, 'amount': 2, 'text': 1, 'sort': 1, 'deep': 1}
+
+
+# ---------- 服务端 ----------
+
+class _HeadlessTable:
+    """无界面的表格实例：只提供 API 路由需要的 logic、page_size 和写入方法（压测不渲染前端）"""
+
+    # 与 NiceTable 相同的数据访问、写入路径（含工作负载录制）和回收逻辑
+    logic = NiceTable.logic
+    add_data = NiceTable.add_data
+    submit_data = NiceTable.submit_data
+    upsert = NiceTable.upsert
+    update_rows = NiceTable.update_rows
+    delete_rows = NiceTable.delete_rows
+    release = NiceTable.release
+    idle_timeout: Optional[float] = None
+
+    def __init__(self, logic, uid: str = TABLE_ID, page_size: int = 100):
+        self.uid = uid
+        # 传入 DataSource 时与其他视图共享，否则创建独占的数据源
+        self.source = logic if isinstance(logic, DataSource) else DataSource(data_table=logic, name=uid)
+        self.source.attach(self)
+        self.page_size = page_size
+        self._last_access = time.monotonic()
+
+    def refresh_data(self):
+        pass
+
+    def refresh_columns(self):
+        pass
+
+    def delete(self):
+        self.release()
+
+
+class LoopLagMonitor:
+    """事件循环延迟采样：每隔 interval 秒 sleep 一次，实际唤醒时间超出预期的部分即为延迟"""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.samples: List[float] = []
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(loop.time() - start - self.interval, 0.0))
+
+    def snapshot(self, reset: bool = False) -> Dict[str, float]:
+        samples, self.samples = self.samples, ([] if reset else self.samples)
+        return lag_stats(samples)
+
+
+def lag_stats(samples: List[float]) -> Dict[str, float]:
+    """事件循环延迟样本（秒）汇总为毫秒"""
+    if not samples:
+        return {'count': 0, 'p50_ms': 0.0, 'p99_ms': 0.0, 'max_ms': 0.0}
+    values = np.asarray(samples, dtype=float) * 1000
+    return {
+        'count': len(values),
+        'p50_ms': float(np.percentile(values, 50)),
+        'p99_ms': float(np.percentile(values, 99)),
+        'max_ms': float(values.max()),
+    }
+
+
+def create_app(table, table_id: str = TABLE_ID, page_size: int = 100):
+    """创建挂载 NiceTable 路由的 FastAPI 应用，并将 table（DataTable 或共享的 DataSource）注册为 table_id 对应的实例"""
+    from fastapi import FastAPI
+
+    monitor = LoopLagMonitor()
+
+    @asynccontextmanager
+    async def lifespan(_app):
+        task = asyncio.create_task(monitor.run())
+        yield
+        task.cancel()
+
+    app = FastAPI(lifespan=lifespan)
+    app.include_router(NiceTable.build_router())
+    # 注册表只保存弱引用，由 app 持有实例
+    app.state.table = _HeadlessTable(table, table_id, page_size)
+    NiceTable._instances[table_id] = app.state.table
+
+    @app.get('/loadtest/lag')
+    async def loop_lag(reset: bool = False):
+        return monitor.snapshot(reset)
+
+    return app
+
+
+def serve(port: int, rows: int, seed: int = 0, table_id: str = TABLE_ID):
+    """在当前进程中预加载 rows 行数据并启动服务（阻塞）"""
+    import uvicorn
+
+    from data_table import DataTable, generate_columns_config_from_dataframe
+
+    logging.getLogger('data_table').setLevel(logging.ERROR)
+    df = build_dataframe(rows, seed=seed)
+    table = DataTable(df, generate_columns_config_from_dataframe(df), copy=False)
+    config = uvicorn.Config(create_app(table, table_id), host='127.0.0.1', port=port,
+                            log_level='warning', access_log=False)
+    uvicorn.Server(config).run()
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(rows: int, seed: int = 0, timeout: float = 300.0):
+    """在子进程中启动服务，等待就绪后返回 (url, process)"""
+    port = _free_port()
+    process = get_context('spawn').Process(target=serve, args=(port, rows, seed), daemon=True)
+    process.start()
+    url = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if not process.is_alive():
+            raise RuntimeError(f'压测服务启动失败（退出码 {process.exitcode}）')
+        try:
+            if httpx.get(f'{url}/loadtest/lag', timeout=1.0).status_code == 200:
+                return url, process
+        except httpx.TransportError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise TimeoutError(f'压测服务在 {timeout} 秒内未就绪')
+
+
+# ---------- 压测端 ----------
+
+def parse_weights(text: str) -> Dict[str, float]:
+    """解析 'none=4,status=2' 形式的权重"""
+    weights = {}
+    for item in text.split(','):
+        name, _, weight = item.partition('=')
+        weights[name.strip()] = float(weight) if weight else 1.0
+    return weights
+
+
+def filter_profiles(total: int, page_size: int) -> Dict[str, Callable[[np.random.Generator], Dict[str, Any]]]:
+    """筛选场景：每个场景根据随机数生成 /list 请求体的一部分（filters、排序或页码）"""
+    last_page = max((total + page_size - 1) // page_size, 1)
+    return {
+        'none': lambda rng: {},
+        'status': lambda rng: {'filters': {'order_status': rng.choice(ORDER_STATUSES, 2, replace=False).tolist()}},
+        'city': lambda rng: {'filters': {'city': [str(rng.choice(CITIES))]}},
+        'amount': lambda rng: {'filters': {'order_amount': {
+            'filters': [{'operator': '>', 'value': round(float(rng.uniform(10, 10000)), 2)}], 'logic': 'AND'}}},
+        'text': lambda rng: {'filters': {'order_number': f'{int(rng.integers(0, 10000)):04d}'}},
+        'sort': lambda rng: {'sortBy': 'order_amount', 'sortOrder': str(rng.choice(['ascending', 'descending']))},
+        'deep': lambda rng: {'page': int(rng.integers(1, last_page + 1))},
+    }
+
+
+class LatencyRecorder:
+    """按接口记录请求耗时和错误"""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+
+    def record(self, name: str, seconds: float, ok: bool):
+        self.samples.setdefault(name, []).append(seconds)
+        self.errors.setdefault(name, 0)
+        if not ok:
+            self.errors[name] += 1
+
+    def summary(self, duration: float) -> Dict[str, Dict[str, Any]]:
+        return {name: dict(latency_stats(samples), errors=self.errors[name],
+                           error_rate=self.errors[name] / len(samples), rps=len(samples) / duration)
+                for name, samples in self.samples.items()}
+
+
+def latency_stats(samples: List[float]) -> Dict[str, Any]:
+    """请求耗时样本（秒）汇总为延迟分位数（毫秒）和直方图"""
+    values = np.asarray(samples, dtype=float) * 1000
+    counts = np.bincount(np.searchsorted(HISTOGRAM_BUCKETS_MS, values, side='left'),
+                         minlength=len(HISTOGRAM_BUCKETS_MS) + 1)
+    labels = [f'<={b}ms' for b in HISTOGRAM_BUCKETS_MS] + [f'>{HISTOGRAM_BUCKETS_MS[-1]}ms']
+    return {
+        'count': len(values),
+        'mean_ms': float(values.mean()),
+        'p50_ms': float(np.percentile(values, 50)),
+        'p95_ms': float(np.percentile(values, 95)),
+        'p99_ms': float(np.percentile(values, 99)),
+        'max_ms': float(values.max()),
+        'histogram': dict(zip(labels, counts.tolist())),
+    }
+
+
+async def _timed(client: httpx.AsyncClient, recorder: LatencyRecorder, name: str, method: str, path: str,
+                 **kwargs) -> Optional[Dict[str, Any]]:
+    start = time.perf_counter()
+    try:
+        response = await client.request(method, path, **kwargs)
+        ok = response.status_code < 400
+    except httpx.HTTPError:
+        response, ok = None, False
+    recorder.record(name, time.perf_counter() - start, ok)
+    return response.json() if ok else None
+
+
+async def _dashboard(client, recorder, rng, stop: asyncio.Event, operations: Dict[str, float],
+                     profiles: Dict[str, Callable], filter_mix: Dict[str, float], page_size: int,
+                     think_time: float, id_range: List[int]):
+    """单个仪表盘：按权重循环调用查询接口，每次请求后等待 think_time 秒"""
+    op_names = list(operations)
+    op_weights = np.array([operations[n] for n in op_names], dtype=float)
+    mix_names = list(filter_mix)
+    mix_weights = np.array([filter_mix[n] for n in mix_names], dtype=float)
+    while not stop.is_set():
+        op = op_names[rng.choice(len(op_names), p=op_weights / op_weights.sum())]
+        profile = profiles[mix_names[rng.choice(len(mix_names), p=mix_weights / mix_weights.sum())]](rng)
+        row_id = int(rng.integers(1, id_range[0] + 1))
+        if op == 'list':
+            payload = dict({'page': 1, 'pageSize': page_size}, **profile)
+            await _timed(client, recorder, f'list:{profile_name(profile)}', 'POST', '/list', json=payload)
+        elif op == 'row-position':
+            payload = {'rowId': row_id, 'filters': profile.get('filters')}
+            await _timed(client, recorder, 'row-position', 'POST', '/row-position', json=payload)
+        elif op == 'row-detail':
+            await _timed(client, recorder, 'row-detail', 'POST', '/row-detail', json={'row': {'id': row_id}})
+        else:
+            await _timed(client, recorder, 'filters', 'GET', '/filters')
+        if think_time > 0:
+            await asyncio.sleep(think_time * float(rng.uniform(0.5, 1.5)))
+        else:
+            await asyncio.sleep(0)
+
+
+def profile_name(profile: Dict[str, Any]) -> str:
+    if 'filters' in profile:
+        return 'filter'
+    if 'sortBy' in profile:
+        return 'sort'
+    return 'deep' if profile.get('page', 1) > 1 else 'unfiltered'
+
+
+async def _ingest(client, recorder, stop: asyncio.Event, rate: float, batch_size: int, seed: int,
+                  id_range: List[int]) -> Tuple[int, int]:
+    """按固定速率（行/秒）向 /add 写入，落后时立即补发；返回 (写入行数, 批次数)"""
+    interval = batch_size / rate
+    next_time = time.perf_counter()
+    rows = batches = 0
+    while not stop.is_set():
+        records = generate_batch_records(0, batch_size, seed=seed + batches)
+        for record in records:
+            del record['id']  # 由服务端分配 id
+            record['payload'] = record['payload'].hex()
+        result = await _timed(client, recorder, 'add', 'POST', '/add', json={'data': records})
+        if result is not None:
+            rows += batch_size
+            id_range[0] += batch_size
+        batches += 1
+        next_time += interval
+        delay = next_time - time.perf_counter()
+        if delay > 0:
+            try:
+                await asyncio.wait_for(stop.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+    return rows, batches
+
+
+async def run_level(url: str, dashboards: int, duration: float = 10.0, ingest_rate: float = 1000.0,
+                    ingest_batch: int = 100, think_time: float = 0.5, page_size: int = 100,
+                    operations: Optional[Dict[str, float]] = None, filter_mix: Optional[Dict[str, float]] = None,
+                    table_id: str = TABLE_ID, seed: int = 0, timeout: float = 30.0) -> Dict[str, Any]:
+    """以 dashboards 个并发仪表盘和 ingest_rate 行/秒的写入压测 duration 秒，返回统计结果"""
+    operations = operations or DEFAULT_OPERATIONS
+    filter_mix = filter_mix or DEFAULT_FILTER_MIX
+    limits = httpx.Limits(max_connections=dashboards + 2, max_keepalive_connections=dashboards + 2)
+    async with httpx.AsyncClient(base_url=url, headers={'x-table-id': table_id}, timeout=timeout,
+                                 limits=limits) as client:
+        first = (await client.post('/list', json={'page': 1, 'pageSize': 1})).json()
+        total = first['total']
+        profiles = filter_profiles(total, page_size)
+        unknown = set(filter_mix) - set(profiles)
+        if unknown:
+            raise ValueError(f'未知的筛选场景: {sorted(unknown)}，可选: {sorted(profiles)}')
+        server_lag = await _server_lag(client, reset=True)
+
+        recorder = LatencyRecorder()
+        stop = asyncio.Event()
+        id_range = [total]
+        client_lag = LoopLagMonitor()
+        lag_task = asyncio.create_task(client_lag.run())
+        tasks = [asyncio.create_task(_dashboard(client, recorder, np.random.default_rng(seed + i), stop, operations,
+                                                profiles, filter_mix, page_size, think_time, id_range))
+                 for i in range(dashboards)]
+        ingest_task = (asyncio.create_task(_ingest(client, recorder, stop, ingest_rate, ingest_batch, seed, id_range))
+                       if ingest_rate > 0 else None)
+        start = time.perf_counter()
+        await asyncio.sleep(duration)
+        stop.set()
+        await asyncio.gather(*tasks)
+        ingested, batches = (await ingest_task) if ingest_task else (0, 0)
+        # 查询按实际耗时（含停止时等待中的请求）计算速率，写入按计划时长计算（第一批在开始时立即发送）
+        elapsed = time.perf_counter() - start
+        lag_task.cancel()
+        if server_lag is not None:
+            server_lag = await _server_lag(client, reset=True)
+
+    endpoints = recorder.summary(elapsed)
+    queries = [s for name, samples in recorder.samples.items() if name != 'add' for s in samples]
+    query_errors = sum(n for name, n in recorder.errors.items() if name != 'add')
+    return {
+        'dashboards': dashboards,
+        'duration_s': elapsed,
+        'initial_rows': total,
+        'queries': dict(latency_stats(queries), errors=query_errors,
+                        error_rate=query_errors / len(queries), rps=len(queries) / elapsed) if queries else None,
+        'endpoints': endpoints,
+        'ingest': {
+            'target_rows_per_sec': ingest_rate,
+            'rows_per_sec': ingested / duration,
+            'rows': ingested,
+            'batches': batches,
+        },
+        'server_loop_lag': server_lag,
+        'client_loop_lag': client_lag.snapshot(),
+    }
+
+
+async def _server_lag(client: httpx.AsyncClient, reset: bool) -> Optional[Dict[str, float]]:
+    """获取服务端事件循环延迟；目标服务未提供 /loadtest/lag 时返回 None"""
+    try:
+        response = await client.get('/loadtest/lag', params={'reset': reset})
+    except httpx.HTTPError:
+        return None
+    return response.json() if response.status_code == 200 else None
+
+
+def is_sustained(level: Dict[str, Any], slo_ms: float, max_error_rate: float, min_ingest_ratio: float = 0.9) -> bool:
+    """该并发级别是否可持续：查询 p95 不超过 slo_ms、错误率不超过上限、写入速率达到目标"""
+    queries = level['queries']
+    if not queries:
+        return False
+    ingest = level['ingest']
+    ingest_ok = ingest['rows_per_sec'] >= ingest['target_rows_per_sec'] * min_ingest_ratio
+    add_errors = level['endpoints'].get('add', {}).get('errors', 0)
+    return queries['p95_ms'] <= slo_ms and queries['error_rate'] <= max_error_rate and ingest_ok and not add_errors
+
+
+def run_load_test(dashboard_levels: List[int], rows: int = 100_000, url: Optional[str] = None,
+                  slo_ms: float = 200.0, max_error_rate: float = 0.01, seed: int = 0,
+                  stop_on_failure: bool = True, **level_kwargs) -> Dict[str, Any]:
+    """逐个并发级别压测；未指定 url 时在子进程中启动预加载 rows 行的服务"""
+    process = None
+    if url is None:
+        print(f"启动压测服务: {rows} 行 ...", file=sys.stderr)
+        url, process = start_server(rows, seed)
+    levels = []
+    try:
+        for dashboards in sorted(dashboard_levels):
+            print(f"压测: {dashboards} 个仪表盘 ...", file=sys.stderr)
+            level = asyncio.run(run_level(url, dashboards, seed=seed, **level_kwargs))
+            level['sustained'] = is_sustained(level, slo_ms, max_error_rate)
+            levels.append(level)
+            if not level['sustained'] and stop_on_failure:
+                break
+    finally:
+        if process is not None:
+            process.terminate()
+            process.join()
+
+    sustained = [level['dashboards'] for level in levels if level['sustained']]
+    return {
+        'meta': {
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'rows': rows if process is not None else None,
+            'url': url,
+            'slo_p95_ms': slo_ms,
+            'max_error_rate': max_error_rate,
+            'seed': seed,
+            **level_kwargs,
+        },
+        'levels': levels,
+        'max_sustained_dashboards': max(sustained) if sustained else 0,
+    }
+
+
+def print_report(report: Dict[str, Any]):
+    print(f"{'仪表盘':>6} {'查询/秒':>9} {'p50':>8} {'p95':>8} {'p99':>8} {'错误率':>7} "
+          f"{'写入行/秒':>10} {'服务端延迟p99':>13}  结果")
+    for level in report['levels']:
+        q = level['queries'] or {'rps': 0, 'p50_ms': 0, 'p95_ms': 0, 'p99_ms': 0, 'error_rate': 1}
+        lag = level['server_loop_lag']
+        lag_text = f"{lag['p99_ms']:.1f}ms" if lag else '-'
+        print(f"{level['dashboards']:>6} {q['rps']:>9.1f} {q['p50_ms']:>7.1f}ms {q['p95_ms']:>7.1f}ms "
+              f"{q['p99_ms']:>7.1f}ms {q['error_rate']:>7.2%} {level['ingest']['rows_per_sec']:>10.0f} "
+              f"{lag_text:>13}  {'✓' if level['sustained'] else '✗'}")
+    print(f"\n写入持续进行时可支撑的最大仪表盘数: {report['max_sustained_dashboards']}"
+          f"（p95 <= {report['meta']['slo_p95_ms']:.0f}ms）")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='NiceTable API 并发压测')
+    parser.add_argument('--rows', type=int, default=100_000, help='预加载的行数')
+    parser.add_argument('--dashboards', type=int, nargs='+', default=DEFAULT_DASHBOARDS, help='并发仪表盘数（可多个）')
+    parser.add_argument('--duration', type=float, default=10.0, help='每个并发级别的持续时间（秒）')
+    parser.add_argument('--ingest-rate', type=float, default=1000.0, help='写入速率（行/秒），0 表示不写入')
+    parser.add_argument('--ingest-batch', type=int, default=100, help='每次 /add 的行数')
+    parser.add_argument('--think-time', type=float, default=0.5, help='仪表盘两次请求之间的平均间隔（秒）')
+    parser.add_argument('--page-size', type=int, default=100, help='/list 每页行数')
+    parser.add_argument('--operations', type=parse_weights, help='接口权重，如 list=6,row-detail=2,filters=1')
+    parser.add_argument('--filter-mix', type=parse_weights, help='筛选场景权重，如 none=4,status=2,amount=2')
+    parser.add_argument('--slo-ms', type=float, default=200.0, help='查询 p95 延迟目标（毫秒）')
+    parser.add_argument('--max-error-rate', type=float, default=0.01, help='允许的最大错误率')
+    parser.add_argument('--url', help='压测已运行的服务（不启动本地服务）')
+    parser.add_argument('--table-id', default=TABLE_ID, help='x-table-id 请求头')
+    parser.add_argument('--seed', type=int, default=0, help='随机种子')
+    parser.add_argument('--no-stop', action='store_true', help='某个级别不达标后继续压测更高级别')
+    parser.add_argument('--output', help='将结果保存为 JSON 文件')
+    args = parser.parse_args(argv)
+
+    report = run_load_test(
+        args.dashboards, rows=args.rows, url=args.url, slo_ms=args.slo_ms, max_error_rate=args.max_error_rate,
+        seed=args.seed, stop_on_failure=not args.no_stop, duration=args.duration, ingest_rate=args.ingest_rate,
+        ingest_batch=args.ingest_batch, think_time=args.think_time, page_size=args.page_size,
+        operations=args.operations, filter_mix=args.filter_mix, table_id=args.table_id,
+    )
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    print_report(report)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
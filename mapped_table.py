@@ -0,0 +1,344 @@
+"""MappedDataTable - 基于内存映射列存储的 DataTable
+
+数据持久化在列存储目录中（格式见 column_store.py），不常驻内存：
+- 定长列直接映射文件，筛选/排序时由操作系统按页加载
+- 变长列（字符串、bytes）只有被筛选或排序用到时才解码，并按 LRU 缓存有限的列数
+- 分页时只读取当前页的行，因此常驻内存取决于访问的列和页，而不是表的大小
+
+适用于超出内存的大表（如多天的订单历史）。接口与 DataTable 相同。
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from column_store import KIND_FIXED, ColumnStoreReader, ColumnStoreWriter
+from data_table import (ColumnConfig, DataTable, FilterParams, PreparedBatch, _cast_to_schema,
+                        generate_columns_config_from_dataframe)
+from memory import BUDGET, array_bytes, empty_usage, finish_usage, object_bytes
+from metrics import ROWS_INGESTED
+
+
+class MappedDataTable(DataTable):
+    """以内存映射列存储为后端的表格数据管理类"""
+
+    def __init__(self,
+                 path: Union[str, Path],
+                 dataframe: Optional[pd.DataFrame] = None,
+                 columns_config: Optional[List[ColumnConfig]] = None,
+                 read_only: bool = False,
+                 max_cached_columns: int = 4,
+                 options_current: bool = False):
+        """
+        Args:
+            path: 列存储目录，不存在时创建
+            dataframe: 初始数据，会追加到列存储中（已有目录时为追加）
+            columns_config: 列配置，默认使用列存储中保存的配置或根据数据自动生成
+            read_only: 只读模式（不打开写入端，可用于其他进程共享同一目录）
+            max_cached_columns: 最多缓存多少个已解码的变长列
+            options_current: 列存储中保存的筛选选项与数据一致（如快照），打开时无需重新统计
+        """
+        self._lock = threading.RLock()
+        self.path = Path(path)
+        self._writer: Optional[ColumnStoreWriter] = None
+        if not read_only:
+            self._writer = ColumnStoreWriter(path, columns_config)
+            if dataframe is not None and not dataframe.empty:
+                self._writer.append(dataframe)
+        self._reader = ColumnStoreReader(path)
+        self._max_cached_columns = max_cached_columns
+        # 已解码的变长列: 列名 -> object 数组（LRU）
+        self._decoded: 'OrderedDict[str, np.ndarray]' = OrderedDict()
+        # select 类型列的选项集合，以及已统计到的行数
+        self._option_sets: Dict[str, Set[str]] = {}
+        self._option_rows: Dict[str, int] = {}
+        self._max_id: Optional[Any] = None
+        self._id_index = None
+
+        if columns_config is None:
+            columns_config = [ColumnConfig(**c) for c in self._reader.columns_config]
+        if not columns_config:
+            if not self._reader.columns:
+                raise ValueError('列存储为空时需要提供 columns_config')
+            columns_config = generate_columns_config_from_dataframe(self._read_frame(stop=1000))
+        self.columns_config = columns_config
+        self._validate_columns()
+        if options_current:
+            for col_config in self.columns_config:
+                if col_config.options is not None:
+                    self._option_sets[col_config.prop] = set(col_config.options)
+                    self._option_rows[col_config.prop] = self._reader.row_count
+        self._update_column_options()
+        BUDGET.track(self)
+
+    # ---------- 存储访问 ----------
+
+    @property
+    def total_count(self) -> int:
+        return self._reader.row_count
+
+    @property
+    def dataframe(self) -> pd.DataFrame:
+        """完整的 DataFrame（会解码所有列，仅用于兼容，大表上应避免使用）"""
+        self._refresh()
+        return self._read_frame()
+
+    def memory_usage(self, exact: bool = False) -> Dict[str, Any]:
+        """内存占用：列数据是内存映射的，常驻内存只有已解码的变长列缓存"""
+        usage = empty_usage()
+        for name, values in list(self._decoded.items()):
+            size = array_bytes(values)[0] + object_bytes(values, exact)
+            usage['by_column'][name] = size
+            usage['caches'] += size
+        usage['mapped'] = self._reader.mapped_bytes
+        return finish_usage(usage)
+
+    def shed_caches(self) -> int:
+        freed = self.memory_usage()['caches']
+        self._decoded.clear()
+        return freed
+
+    def _refresh(self):
+        """同步写入端（可能在其他进程）发布的新版本"""
+        if self._reader.refresh():
+            self._max_id = None
+
+    def _read_frame(self, columns: Optional[List[str]] = None, start: int = 0,
+                    stop: Optional[int] = None) -> pd.DataFrame:
+        return self._reader.read_frame(columns, start, stop)
+
+    def _column(self, name: str) -> pd.Series:
+        """获取整列数据：定长列为零拷贝映射，变长列解码后缓存"""
+        if self._reader.column_kind(name) == KIND_FIXED:
+            return pd.Series(self._reader.fixed_array(name), name=name, copy=False)
+        row_count = self._reader.row_count
+        cached = self._decoded.pop(name, None)
+        start = 0 if cached is None else len(cached)
+        if start < row_count:
+            delta = self._reader.read_column(name, start, row_count)
+            cached = delta if cached is None else np.concatenate([cached, delta])
+        self._decoded[name] = cached
+        while len(self._decoded) > self._max_cached_columns:
+            self._decoded.popitem(last=False)
+        return pd.Series(cached, name=name, copy=False)
+
+    def _take_rows(self, positions: np.ndarray) -> pd.DataFrame:
+        """只读取指定行位置的所有列"""
+        data = {name: self._reader.take(name, positions) for name in self._reader.columns}
+        return pd.DataFrame(data, columns=self._reader.columns)
+
+    def _validate_columns(self):
+        missing = {col.prop for col in self.columns_config} - set(self._reader.columns)
+        if missing and self._reader.row_count > 0:
+            raise ValueError(f"列配置中定义的字段在列存储中不存在: {missing}")
+
+    def _filter_positions(self, filters: Optional[FilterParams]) -> np.ndarray:
+        """计算满足筛选条件的行位置，只加载筛选涉及的列"""
+        row_count = self._reader.row_count
+        filter_dict = self._get_filter_dict(filters)
+        columns = [name for name in filter_dict if name in self._reader.columns]
+        if not columns:
+            return np.arange(row_count)
+        subset = pd.DataFrame({name: self._column(name) for name in columns}, copy=False)
+        mask = self._build_pandas_filter(filters, df=subset)
+        return np.flatnonzero(mask.to_numpy())
+
+    def _plan_frame(self, columns: List[str], filter_dict: Dict[str, Any]) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+        with self._lock:
+            self._refresh()
+            columns = [name for name in columns if name in self._reader.columns]
+            mapped = [name for name in columns if self._reader.column_kind(name) == KIND_FIXED]
+            cached = [name for name in columns if name not in mapped and name in self._decoded]
+            frame = pd.DataFrame({name: self._column(name) for name in columns},
+                                 index=pd.RangeIndex(self._reader.row_count), copy=False)
+        return frame, {
+            'storage': 'mmap',
+            'mapped_columns': mapped,
+            'cached_columns': cached,
+            'decoded_columns': [name for name in columns if name not in mapped and name not in cached],
+        }
+
+    def _update_column_options(self) -> bool:
+        """增量更新 select 类型列的选项，只统计上次之后新增的行"""
+        columns_updated = False
+        row_count = self._reader.row_count
+        for col_config in self.columns_config:
+            if col_config.filterType not in ['multi-select', 'select'] or col_config.prop not in self._reader.columns:
+                continue
+            seen = self._option_rows.get(col_config.prop, 0)
+            if seen >= row_count:
+                continue
+            values = self._reader.read_column(col_config.prop, seen, row_count)
+            option_set = self._option_sets.setdefault(col_config.prop, set())
+            option_set.update(str(v) for v in pd.unique(pd.Series(values).dropna()))
+            self._option_rows[col_config.prop] = row_count
+            if len(option_set) > 100:
+                col_config.options = None
+                col_config.filterType = 'text'
+                columns_updated = True
+                continue
+            options = sorted(option_set)
+            if col_config.options != options:
+                col_config.options = options
+                columns_updated = True
+        return columns_updated
+
+    def distinct_values(self, column: str) -> List[Any]:
+        with self._lock:
+            self._refresh()
+            if column not in self._reader.columns:
+                return []
+            return self._column(column).dropna().unique().tolist()
+
+    # ---------- 查询 ----------
+
+    def get_list(self,
+                 filters: Optional[FilterParams] = None,
+                 page: int = 1,
+                 page_size: int = 100,
+                 sort_by: Optional[str] = None,
+                 sort_order: Optional[str] = None) -> Dict[str, Any]:
+        query_start = time.perf_counter()
+        with self._lock:
+            self._refresh()
+            positions = self._filter_positions(filters)
+            total_count = len(positions)
+
+            if sort_by and sort_by in self._reader.columns and total_count > 0:
+                ascending = sort_order == 'ascending' if sort_order else True
+                sort_values = self._column(sort_by)
+                if total_count < len(sort_values):
+                    sort_values = sort_values.iloc[positions]
+                positions = sort_values.sort_values(ascending=ascending, na_position='last').index.to_numpy()
+
+            start_index = (page - 1) * page_size
+            page_positions = positions[start_index:start_index + page_size]
+            page_df = self._take_rows(page_positions)
+
+        data_list = self._serialize_records(page_df)
+        self._check_slow_query(time.perf_counter() - query_start, filters, page, page_size, sort_by, sort_order)
+        return {
+            "list": data_list,
+            "total": total_count,
+            "page": page,
+            "pageSize": page_size
+        }
+
+    def get_row_position(self, row_id: Any, filters: Optional[FilterParams] = None) -> Dict[str, Any]:
+        with self._lock:
+            self._refresh()
+            if 'id' not in self._reader.columns:
+                return {"found": False, "position": -1}
+            positions = self._filter_positions(filters)
+            ids = self._column('id').to_numpy()[positions]
+            matches = np.flatnonzero(ids == row_id)
+        if len(matches) == 0:
+            return {"found": False, "position": -1}
+        return {"found": True, "position": int(matches[0])}
+
+    def get_row_detail(self, row_id: Any) -> List[Dict[str, Any]]:
+        start = time.perf_counter()
+        with self._lock:
+            self._refresh()
+            matches = np.flatnonzero(self._column('id').to_numpy() == row_id)
+            if len(matches) == 0:
+                raise ValueError(f"未找到ID为 {row_id} 的记录")
+            row_df = self._take_rows(matches[:1])
+        self._observe('get_row_detail', 'lookup', time.perf_counter() - start)
+
+        return self._row_detail(row_df)
+
+    # ---------- 写入 ----------
+
+    def _require_writer(self) -> ColumnStoreWriter:
+        if self._writer is None:
+            raise RuntimeError('MappedDataTable 以只读模式打开，不能写入')
+        return self._writer
+
+    def _locate_rows(self, ids: List[Any]) -> Dict[Any, np.ndarray]:
+        raise RuntimeError('MappedDataTable 的列存储只支持追加写入，不能按 id 修改或删除行')
+
+    def add_data(self, new_data: Union[Dict[str, Any], List[Dict[str, Any]], pd.DataFrame, PreparedBatch]) -> Dict[str, Any]:
+        self._require_writer()
+        batch = self._prepare_batch(new_data, self._reader.columns)
+        with self._write_lock('add_data'):
+            writer = self._require_writer()
+            new_df = batch.frame
+            added_columns = set(new_df.columns) - set(self._reader.columns)
+            columns_updated = False
+            if added_columns:
+                new_columns_config = [c for c in batch.columns_config if c.prop in added_columns]
+                missing = added_columns - {c.prop for c in new_columns_config}
+                if missing:
+                    new_columns_config.extend(generate_columns_config_from_dataframe(new_df[sorted(missing)]))
+                self.columns_config.extend(new_columns_config)
+                writer.set_columns_config(self.columns_config)
+                columns_updated = True
+
+            if 'id' in self._reader.columns or 'id' in new_df.columns:
+                if 'id' not in new_df.columns:
+                    new_df['id'] = None
+                if self._max_id is None:
+                    self._max_id = self._column('id').max() if self._reader.row_count > 0 and 'id' in self._reader.columns else 0
+                    if pd.isna(self._max_id):
+                        self._max_id = 0
+                self._fill_missing_ids(new_df, self._max_id)
+                self._max_id = max(self._max_id, pd.to_numeric(new_df['id'], errors='coerce').max())
+
+            writer.append(new_df)
+            self._reader.refresh()
+            if self._refresh_column_options('add_data'):
+                columns_updated = True
+            ROWS_INGESTED.inc(len(new_df), table=self.table_id)
+
+            return {
+                "success": True,
+                "added_count": len(new_df),
+                "columns_updated": columns_updated,
+                "added_columns": list(added_columns) if added_columns else []
+            }
+
+    def update_dataframe(self, new_dataframe: pd.DataFrame, append_only: Optional[bool] = None) -> Dict[str, Any]:
+        """追加 new_dataframe 中超出已存储行数的部分
+
+        列存储只支持追加：已存储的行不会被修改，新增列在已存储的行上为空值。
+        append_only 只为与 DataTable 保持接口一致，始终按追加处理。
+        """
+        with self._lock:
+            writer = self._require_writer()
+            if new_dataframe is None:
+                raise ValueError("DataFrame不能为None")
+            if len(new_dataframe) < writer.row_count:
+                raise ValueError(
+                    f'列存储只支持追加写入: 已存储 {writer.row_count} 行，新数据只有 {len(new_dataframe)} 行'
+                )
+            # 只转换新增的行（已存储的行不会再写入）
+            delta = _cast_to_schema(new_dataframe.iloc[writer.row_count:], self.columns_config)
+            added_columns = set(new_dataframe.columns) - set(self._reader.columns)
+            columns_updated = False
+            if added_columns:
+                self.columns_config.extend(
+                    generate_columns_config_from_dataframe(new_dataframe[list(added_columns)])
+                )
+                writer.set_columns_config(self.columns_config)
+                columns_updated = True
+            writer.append(delta)
+            self._reader.refresh()
+            if self._update_column_options():
+                columns_updated = True
+            return {
+                "success": True,
+                "columns_updated": columns_updated,
+                "total_count": self._reader.row_count
+            }
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+        self._reader.close()
+        self._decoded.clear()
@@ -0,0 +1,185 @@
+"""内存统计与进程级内存预算
+
+DataTable.memory_usage() 按类别统计一个表格占用的内存（字节）：
+- columns：列数据，object 列包含其中 Python 对象（字符串、bytes）的大小
+- indexes：id 排序索引
+- caches：可随时丢弃、需要时重建的缓存（已解码的列存储列、数据段的列缓存和字典）
+- segments：分层表已封存的数据段缓冲区
+- mapped：内存映射的数据（快照、列存储、磁盘数据段），由操作系统按页加载和换出，不计入常驻内存
+
+MemoryBudget 限制进程内所有表格常驻内存的总和：写入前检查预算，超出时先丢弃各表的缓存，
+仍然超出则拒绝写入（MemoryBudgetExceeded），避免单个表格无限增长导致整个进程被 OOM 杀死。
+预算默认关闭，可通过环境变量 NICE_TABLE_MEMORY_BUDGET（如 2G、512M）或 BUDGET.set_limit() 设置。
+"""
+
+import mmap
+import os
+import re
+import sys
+import threading
+import weakref
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from metrics import CACHE_SHED_BYTES, INGEST_REJECTED, MEMORY_BUDGET_BYTES
+
+# 估算 object 列时最多抽样的值数量（exact=False）
+_SAMPLE_SIZE = 1000
+_SIZE_UNITS = {'': 1, 'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30, 'T': 1 << 40}
+MEMORY_KINDS = ('columns', 'indexes', 'caches', 'segments', 'mapped')
+
+
+def parse_size(value: Optional[str]) -> Optional[int]:
+    """解析字节数，如 '512M'、'2G'、'1.5GB'、'1048576'；空值返回 None"""
+    if value is None or str(value).strip() == '':
+        return None
+    match = re.fullmatch(r'\s*([\d.]+)\s*([KMGT]?)i?B?\s*', str(value).upper())
+    if not match:
+        raise ValueError(f'无法解析的大小: {value}')
+    return int(float(match.group(1)) * _SIZE_UNITS[match.group(2)])
+
+
+def format_bytes(size: float) -> str:
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if abs(size) < 1024 or unit == 'GB':
+            return f'{size:.0f} {unit}' if unit == 'B' else f'{size:.1f} {unit}'
+        size /= 1024
+    return f'{size:.1f} GB'
+
+
+def is_mapped(array: Any) -> bool:
+    """数组是否（间接）引用内存映射的文件"""
+    while array is not None:
+        if isinstance(array, (np.memmap, mmap.mmap)):
+            return True
+        array = getattr(array, 'base', None)
+    return False
+
+
+def array_bytes(array: Any) -> Tuple[int, int]:
+    """numpy 数组的 (常驻字节, 内存映射字节)，不含 object 数组中对象本身的大小"""
+    if array is None:
+        return 0, 0
+    if isinstance(array, bytes):
+        return len(array), 0
+    if is_mapped(array):
+        return 0, int(array.nbytes)
+    return int(array.nbytes), 0
+
+
+def object_bytes(values: np.ndarray, exact: bool = False) -> int:
+    """object 数组中 Python 对象的总大小；exact=False 时按均匀抽样估算"""
+    count = len(values)
+    if count == 0:
+        return 0
+    if exact or count <= _SAMPLE_SIZE:
+        return sum(sys.getsizeof(v) for v in values)
+    sample = values[np.linspace(0, count - 1, _SAMPLE_SIZE).astype(np.int64)]
+    return int(sum(sys.getsizeof(v) for v in sample) * count / _SAMPLE_SIZE)
+
+
+def series_bytes(series: pd.Series, exact: bool = False) -> Tuple[int, int]:
+    """一列数据的 (常驻字节, 内存映射字节)"""
+    if not isinstance(series.dtype, np.dtype):
+        # 扩展类型（category、可空整数等）由 pandas 统计
+        return int(series.memory_usage(index=False, deep=True)), 0
+    values = series.to_numpy()
+    resident, mapped = array_bytes(values)
+    if values.dtype == object:
+        resident += object_bytes(values, exact)
+    return resident, mapped
+
+
+def frame_bytes(df: pd.DataFrame, exact: bool = False) -> Tuple[Dict[str, int], int]:
+    """DataFrame 每列的常驻字节（索引计入 '(index)'），以及内存映射的总字节数"""
+    columns = {}
+    mapped = 0
+    for name in df.columns:
+        resident, column_mapped = series_bytes(df[name], exact)
+        columns[str(name)] = resident
+        mapped += column_mapped
+    columns['(index)'] = int(df.index.memory_usage())
+    return columns, mapped
+
+
+def empty_usage() -> Dict[str, Any]:
+    """memory_usage() 的结果结构：各类别字节数和每列字节数"""
+    usage: Dict[str, Any] = {kind: 0 for kind in MEMORY_KINDS}
+    usage['by_column'] = {}
+    return usage
+
+
+def finish_usage(usage: Dict[str, Any]) -> Dict[str, Any]:
+    usage['resident'] = sum(usage[kind] for kind in MEMORY_KINDS if kind != 'mapped')
+    return usage
+
+
+class MemoryBudgetExceeded(MemoryError):
+    """写入会超出进程级内存预算"""
+
+
+class MemoryBudget:
+    """进程级内存预算（所有已创建的表格共享）"""
+
+    def __init__(self, limit: Optional[int] = None):
+        self._tables: 'weakref.WeakSet' = weakref.WeakSet()
+        self._lock = threading.Lock()
+        self.limit: Optional[int] = None
+        self.set_limit(limit)
+
+    def set_limit(self, limit: Optional[int]):
+        """设置预算（字节），None 表示不限制"""
+        self.limit = limit
+        MEMORY_BUDGET_BYTES.set(limit or 0)
+
+    def track(self, table):
+        """登记表格（弱引用，表格被回收后自动移除）"""
+        with self._lock:
+            self._tables.add(table)
+
+    def tables(self) -> list:
+        with self._lock:
+            return list(self._tables)
+
+    def usage(self) -> int:
+        """所有表格的常驻内存总和"""
+        return sum(table.memory_usage()['resident'] for table in self.tables())
+
+    def shed(self, target: Optional[int] = None) -> int:
+        """丢弃缓存（先丢缓存最大的表），直到总用量不超过 target；返回释放的字节数"""
+        usages = [(table, table.memory_usage()) for table in self.tables()]
+        used = sum(u['resident'] for _, u in usages)
+        freed = 0
+        for table, usage in sorted(usages, key=lambda item: item[1]['caches'], reverse=True):
+            if target is not None and used - freed <= target:
+                break
+            if usage['caches'] == 0:
+                continue
+            released = table.shed_caches()
+            CACHE_SHED_BYTES.inc(released, table=table.table_id)
+            freed += released
+        return freed
+
+    def reserve(self, table, incoming: int):
+        """写入 incoming 字节前检查预算：超出时先丢弃缓存，仍然超出则抛出 MemoryBudgetExceeded"""
+        if self.limit is None:
+            return
+        available = self.limit - incoming
+        used = self.usage()
+        if used <= available:
+            return
+        freed = self.shed(available)
+        if used - freed <= available:
+            table._logger.warning(
+                f"内存预算 {format_bytes(self.limit)} 不足，已丢弃缓存 {format_bytes(freed)}")
+            return
+        INGEST_REJECTED.inc(table=table.table_id)
+        raise MemoryBudgetExceeded(
+            f"内存预算不足，拒绝写入表格 {table.table_id}: 已用 {format_bytes(used - freed)}，"
+            f"写入约需 {format_bytes(incoming)}，预算 {format_bytes(self.limit)}"
+        )
+
+
+BUDGET = MemoryBudget(parse_size(os.environ.get('NICE_TABLE_MEMORY_BUDGET')))
@@ -0,0 +1,256 @@
+"""进程内指标（计数器、直方图），以 Prometheus 文本格式导出
+
+DataTable 记录各阶段耗时（筛选、排序、分页、序列化、写锁等待/持有、筛选选项刷新）和写入行数，
+NiceTable 路由记录每个请求的耗时和状态码，/metrics 返回 REGISTRY.render() 的结果。
+同一请求内记录的阶段耗时还会通过 Server-Timing 响应头返回给前端（见 RequestTimings）。
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# 默认直方图桶上界（秒）
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str]):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._series: Dict[Tuple[str, ...], object] = {}
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def remove(self, **labels: str):
+        """删除匹配给定标签的所有序列（如表格实例销毁时）"""
+        with self._lock:
+            for key in list(self._series):
+                if all(key[self.labelnames.index(k)] == str(v) for k, v in labels.items() if k in self.labelnames):
+                    del self._series[key]
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}']
+        with self._lock:
+            series = sorted((key, self._copy(value)) for key, value in self._series.items())
+        for key, value in series:
+            lines.extend(self._render_series(key, value))
+        return lines
+
+    def _copy(self, value):
+        return value
+
+    def _render_series(self, key, value) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """单调递增计数器"""
+
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._series.get(self._key(labels), 0)
+
+    def _render_series(self, key, value) -> List[str]:
+        return [f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}']
+
+
+class Gauge(_Metric):
+    """可增可减的当前值（如内存占用）"""
+
+    kind = 'gauge'
+
+    def set(self, value: float, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = value
+
+    def value(self, **labels: str) -> float:
+        return self._series.get(self._key(labels), 0)
+
+    def _render_series(self, key, value) -> List[str]:
+        return [f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}']
+
+
+class Histogram(_Metric):
+    """固定桶直方图（累计计数、总和、次数）"""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str], buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels: str):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # [各桶计数（最后一个为 +Inf）, 总和, 次数]
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, **labels: str) -> int:
+        series = self._series.get(self._key(labels))
+        return series[2] if series else 0
+
+    def _copy(self, value):
+        return [list(value[0]), value[1], value[2]]
+
+    def _render_series(self, key, value) -> List[str]:
+        counts, total, count = value
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(list(self.buckets) + ['+Inf'], counts):
+            cumulative += bucket_count
+            le = bound if bound == '+Inf' else _format_value(bound)
+            bucket_labels = _format_labels(self.labelnames, key, 'le="%s"' % le)
+            lines.append(f'{self.name}_bucket{bucket_labels} {cumulative}')
+        labels = _format_labels(self.labelnames, key)
+        lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+        lines.append(f'{self.name}_count{labels} {count}')
+        return lines
+
+
+class MetricsRegistry:
+    """指标注册表"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help_text, labelnames))
+
+    def gauge(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, help_text, labelnames))
+
+    def histogram(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help_text, labelnames, buckets))
+
+    def _register(self, metric: _Metric):
+        if metric.name in self._metrics:
+            raise ValueError(f'指标 {metric.name} 已注册')
+        self._metrics[metric.name] = metric
+        return metric
+
+    def remove(self, **labels: str):
+        """从所有指标中删除匹配给定标签的序列"""
+        for metric in self._metrics.values():
+            if set(labels) & set(metric.labelnames):
+                metric.remove(**labels)
+
+    def render(self) -> str:
+        """Prometheus 文本格式（0.0.4）"""
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    'nice_table_stage_seconds', 'DataTable 各阶段耗时（秒）', ('table', 'operation', 'stage'))
+ROWS_INGESTED = REGISTRY.counter(
+    'nice_table_rows_ingested_total', '通过 add_data 写入的行数', ('table',))
+REQUEST_SECONDS = REGISTRY.histogram(
+    'nice_table_request_seconds', 'API 请求耗时（秒）', ('table', 'endpoint'))
+REQUESTS = REGISTRY.counter(
+    'nice_table_requests_total', 'API 请求次数', ('table', 'endpoint', 'status'))
+CLIENT_SECONDS = REGISTRY.histogram(
+    'nice_table_client_seconds', '前端上报的 loadData 各阶段耗时（秒）', ('table', 'phase'))
+MEMORY_BYTES = REGISTRY.gauge(
+    'nice_table_memory_bytes', '表格内存占用（字节），kind 为 columns/indexes/caches/segments/mapped', ('table', 'kind'))
+MEMORY_BUDGET_BYTES = REGISTRY.gauge(
+    'nice_table_memory_budget_bytes', '进程级内存预算（字节），0 表示不限制')
+CACHE_SHED_BYTES = REGISTRY.counter(
+    'nice_table_cache_shed_bytes_total', '超出内存预算时丢弃的缓存（字节）', ('table',))
+INGEST_REJECTED = REGISTRY.counter(
+    'nice_table_ingest_rejected_total', '超出内存预算而被拒绝的写入批次', ('table',))
+INGEST_QUEUE_ROWS = REGISTRY.gauge(
+    'nice_table_ingest_queue_rows', '写入队列中等待写入的行数', ('table',))
+INGEST_QUEUE_FULL = REGISTRY.counter(
+    'nice_table_ingest_queue_full_total', '写入队列已满（背压）而被拒绝的提交', ('table',))
+INGEST_BATCH_ROWS = REGISTRY.histogram(
+    'nice_table_ingest_batch_rows', '写入队列每次合并写入的行数', ('table',),
+    buckets=(1, 10, 100, 1000, 10_000, 100_000))
+FILE_TAIL_LAG_BYTES = REGISTRY.gauge(
+    'nice_table_file_tail_lag_bytes', '跟踪的文件中尚未写入表格的字节数', ('table', 'path'))
+
+
+class RequestTimings:
+    """单个请求的阶段耗时，用于生成 Server-Timing 响应头
+
+    queue 为请求进入路由到第一个阶段开始的时间（解析请求体、查找实例、等待读锁），
+    encode 为最后一个阶段结束到响应生成的时间（FastAPI 的 JSON 编码）。
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+        self._last_end: Optional[float] = None
+
+    def add(self, stage: str, seconds: float):
+        now = time.perf_counter()
+        if self._last_end is None:
+            self.stages['queue'] = max(0.0, now - seconds - self.start)
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+        self._last_end = now
+
+    def header(self) -> str:
+        now = time.perf_counter()
+        stages = dict(self.stages)
+        if self._last_end is not None:
+            stages['encode'] = now - self._last_end
+        stages['total'] = now - self.start
+        return ', '.join(f'{name};dur={seconds * 1000:.3f}' for name, seconds in stages.items())
+
+
+_request_timings: ContextVar[Optional[RequestTimings]] = ContextVar('nice_table_request_timings', default=None)
+
+
+@contextmanager
+def request_timings():
+    """在 with 块内记录当前请求的阶段耗时（DataTable 记录的阶段会计入该请求）"""
+    timings = RequestTimings()
+    token = _request_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _request_timings.reset(token)
+
+
+def current_request_timings() -> Optional[RequestTimings]:
+    return _request_timings.get()
@@ -1,20 +1,74 @@
 import asyncio
 import logging
+import os
+import time
 import uuid
+import weakref
 from pathlib import Path
 from typing import Any, Dict, List, Optional
 
 import pandas as pd
 from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import PlainTextResponse
+from fastapi.routing import APIRoute
 from fastapi.staticfiles import StaticFiles
 from nicegui import app, ui
 
+from bulk_ingest import DEFAULT_CHUNK_ROWS, FORMATS, BulkFormatError, BulkWriter, body_format, csv_dtypes
 from data_table import FilterParams
-from data_table import ColumnConfig, DataTable, generate_columns_config_from_dataframe
+from data_source import DataSource
+from data_table import ColumnConfig, DataTable
+from ingest import IngestQueueFull
+from memory import BUDGET, MEMORY_KINDS, MemoryBudgetExceeded, format_bytes
+from metrics import CLIENT_SECONDS, MEMORY_BYTES, REGISTRY, REQUEST_SECONDS, REQUESTS, request_timings
+from workload import WorkloadRecorder, batch_shape
 
 logger = logging.getLogger(__name__)
 
 
+# /telemetry 接受的前端耗时阶段，以及每批最多处理的样本数
+_CLIENT_PHASES = ('fetch', 'parse', 'render', 'server')
+_TELEMETRY_MAX_SAMPLES = 100
+
+
+def _request_table_id(request: Request) -> Optional[str]:
+    """请求指定的表格 id：x-table-id 请求头，或 table_id 查询参数（用于无法设置请求头的场景）"""
+    return request.headers.get('x-table-id') or request.query_params.get('table_id')
+
+
+def _metric_table_label(table_id: Optional[str]) -> str:
+    # 只使用已注册的实例 id 作为标签，避免任意请求头造成标签无限增长
+    return table_id if table_id in NiceTable._instances else '-'
+
+
+class _MetricsRoute(APIRoute):
+    """记录每个请求的耗时和状态码（按表格 id 和 endpoint 标记），并返回 Server-Timing 响应头"""
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+        endpoint = self.path.lstrip('/')
+
+        async def timed_handler(request: Request):
+            start = time.perf_counter()
+            status = 500
+            try:
+                with request_timings() as timings:
+                    response = await handler(request)
+                    response.headers['Server-Timing'] = timings.header()
+                status = response.status_code
+                return response
+            except HTTPException as e:
+                status = e.status_code
+                raise
+            finally:
+                # 优先使用 get_target_instance 确定的实例（包括未指定 id 时唯一的实例）
+                table = _metric_table_label(getattr(request.state, 'table_id', None) or _request_table_id(request))
+                REQUEST_SECONDS.observe(time.perf_counter() - start, table=table, endpoint=endpoint)
+                REQUESTS.inc(table=table, endpoint=endpoint, status=str(status))
+
+        return timed_handler
+
+
 class NiceTable(ui.element):
     """封装后的 NiceGUI 数据表格控件"""
 
@@ -25,10 +79,17 @@ class NiceTable(ui.element):
     _js_asset: Optional[str] = None
     _assets_ready = False
     _router_registered = False
-    # 使用字典存储所有活跃实例，key 为 uid
-    _instances: Dict[str, 'NiceTable'] = {}
+    # 所有活跃实例，key 为 uid。只保存弱引用：实例由 NiceGUI 客户端的元素树持有，
+    # 客户端被删除（断开连接且超过重连时间）时元素被删除并从这里移除，不会因注册表而常驻内存
+    _instances: 'weakref.WeakValueDictionary[str, NiceTable]' = weakref.WeakValueDictionary()
     # 存储所有连接的客户端，用于后台任务中发送消息
-    _connected_clients: set = set()
+    _connected_clients: 'weakref.WeakSet' = weakref.WeakSet()
+    # 空闲超时（秒）：超过该时间没有 API 请求的实例会被回收，None 表示不回收
+    idle_timeout: Optional[float] = None
+    # 检查空闲实例的间隔（秒）
+    reap_interval = 60.0
+    # 工作负载录制器（默认关闭，见 start_recording）
+    _recorder: Optional[WorkloadRecorder] = None
     
     @classmethod
     def _parse_assets_from_html(cls) -> tuple:
@@ -66,26 +127,34 @@ class NiceTable(ui.element):
 
     def __init__(
         self,
-        dataframe: pd.DataFrame,
+        dataframe: Optional[pd.DataFrame] = None,
         columns_config: Optional[List[ColumnConfig]] = None,
         page_size: int = 100,
+        data_table: Optional[DataTable] = None,
+        idle_timeout: Optional[float] = None,
+        source: Optional[DataSource] = None,
     ):
+        """
+        Args:
+            dataframe: 表格数据
+            columns_config: 列配置，默认根据 dataframe 自动生成
+            page_size: 默认每页大小
+            data_table: 直接使用已有的 DataTable（如 SharedDataTable），此时忽略 dataframe 和 columns_config
+            idle_timeout: 空闲超时（秒），默认使用类属性 NiceTable.idle_timeout
+            source: 共享的数据源（见 data_source.py），多个视图共用同一份数据和写入，此时忽略其他数据参数。
+                回收某个视图不影响其他视图
+        """
         super().__init__('div')
-        if dataframe is None:
-            raise ValueError('dataframe 不能为空')
-
-        if columns_config is None:
-            if dataframe.empty:
-                raise ValueError('空 DataFrame 需要同时提供 columns_config')
-            columns_config = generate_columns_config_from_dataframe(dataframe)
-             
-        base_df = dataframe.copy()
-        if base_df.empty:
-            base_df = pd.DataFrame(columns=[col.prop for col in columns_config])
-
-        self.logic = DataTable(base_df, columns_config)
-        self.page_size = page_size
         self.uid = uuid.uuid4().hex
+        if source is None:
+            # 独占的数据源（DataTable 会复制 dataframe，这里不再重复复制）
+            source = DataSource(dataframe, columns_config, data_table=data_table, name=self.uid)
+        self.source = source
+        self.source.attach(self)
+        self.page_size = page_size
+        if idle_timeout is not None:
+            self.idle_timeout = idle_timeout
+        self._last_access = time.monotonic()
         self.container_id = f'nice-table-{self.uid}'
 
         # 注册实例
@@ -114,29 +183,98 @@ class NiceTable(ui.element):
         with self:
             self._render_frontend()
     
-    def delete(self):
-        """销毁实例时从注册表中移除"""
-        if self.uid in NiceTable._instances:
+    def release(self):
+        """从注册表和数据源中移除实例并清理它的指标（元素被删除时自动调用）"""
+        if NiceTable._instances.get(self.uid) is self:
             del NiceTable._instances[self.uid]
-        super().delete()
+        self.source.detach(self)
+        REGISTRY.remove(table=self.uid)
+
+    @property
+    def logic(self) -> DataTable:
+        """数据源当前的 DataTable（替换数据后随之更新）"""
+        return self.source.table
+
+    def _handle_delete(self):
+        # delete() 和客户端删除（页面关闭或刷新后旧客户端超时）都会调用
+        self.release()
+        super()._handle_delete()
+
+    @classmethod
+    def reap_idle_instances(cls) -> List[str]:
+        """回收超过空闲超时没有 API 请求的实例，返回被回收的 uid"""
+        now = time.monotonic()
+        reaped = []
+        for uid, inst in list(cls._instances.items()):
+            timeout = getattr(inst, 'idle_timeout', None)
+            if timeout is None or now - getattr(inst, '_last_access', now) < timeout:
+                continue
+            logger.info(f'回收空闲的表格实例 {uid}（{now - inst._last_access:.0f} 秒没有请求）')
+            try:
+                inst.delete()
+            except Exception:
+                # 元素已脱离客户端（如客户端正在删除），只从注册表中移除
+                inst.release()
+            reaped.append(uid)
+        return reaped
 
     # ---------- Public API ----------
     def add_data(self, records: List[Dict[str, Any]], refresh: bool = False) -> Dict[str, Any]:
-        """向表格添加数据"""
+        """向表格添加数据（写入共享的数据源，refresh 为 True 时刷新数据源的所有视图）
+
+        数据源启用写入队列时，在事件处理函数中调用不等待写入完成，见 DataSource.add_data。
+        """
+        if not records:
+            return {'success': False, 'added_count': 0}
+
+        start = time.time()
+        result = self.source.add_data(records, refresh=refresh)
+        if NiceTable._recorder is not None:
+            NiceTable._recorder.record('add', self.uid, start, **batch_shape(records))
+        return result
+
+    async def submit_data(self, records: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """异步写入并刷新所有视图
+
+        数据源启用写入队列（source.start_ingest_queue()）时与其他提交合并写入，
+        队列已满时抛出 IngestQueueFull；否则与 add_data(records, refresh=True) 相同。
+        """
         if not records:
             return {'success': False, 'added_count': 0}
 
-        result = self.logic.add_data(records)
-        if refresh:
-            self.refresh_data()
+        start = time.time()
+        result = await asyncio.wrap_future(self.source.submit(records))
+        if NiceTable._recorder is not None:
+            NiceTable._recorder.record('add', self.uid, start, **batch_shape(records))
         return result
 
-    def update_source(self, dataframe: pd.DataFrame):
-        """更新数据源 (使用外部管理的 DataFrame)"""
-        result = self.logic.update_dataframe(dataframe)
-        if result.get('columns_updated'):
-            self.refresh_columns()
-        self.refresh_data()
+    def upsert(self, records: List[Dict[str, Any]], refresh: bool = False) -> Dict[str, Any]:
+        """按 id 写入数据：id 已存在时更新该行，否则追加（重复投递不会产生重复行）"""
+        if not records:
+            return {'success': False, 'updated_count': 0, 'added_count': 0}
+
+        start = time.time()
+        result = self.source.upsert(records, refresh=refresh)
+        if NiceTable._recorder is not None:
+            NiceTable._recorder.record('upsert', self.uid, start, updated=result['updated_count'],
+                                       added=result['added_count'], **batch_shape(records))
+        return result
+
+    def update_rows(self, updates: Dict[Any, Dict[str, Any]], refresh: bool = False) -> Dict[str, Any]:
+        """按 id 更新已有行的字段，如 {1001: {'order_status': '已发货'}}"""
+        return self.source.update_rows(updates, refresh=refresh)
+
+    def delete_rows(self, ids: List[Any], refresh: bool = False) -> Dict[str, Any]:
+        """按 id 删除行"""
+        start = time.time()
+        result = self.source.delete_rows(ids, refresh=refresh)
+        if NiceTable._recorder is not None:
+            NiceTable._recorder.record('delete', self.uid, start, rows=len(ids), deleted=result['deleted_count'])
+        return result
+
+    def update_source(self, dataframe: pd.DataFrame, append_only: Optional[bool] = None):
+        """更新数据源 (使用外部管理的 DataFrame，只追加了行时增量处理)"""
+        self.source.update_dataframe(dataframe, append_only)
 
     def refresh_data(self):
         """通知前端刷新数据列表"""
@@ -155,9 +293,9 @@ class NiceTable(ui.element):
             }}
         """
         
-        # 尝试使用 UI context（如果在 UI 上下文中）
+        # 发送到该实例所属的客户端（共享数据源的其他视图可能属于其他客户端）
         try:
-            ui.run_javascript(js_code)
+            self.client.run_javascript(js_code)
         except RuntimeError:
             # 如果不在 UI 上下文中（如后台任务），使用 WebSocket 直接发送
             for client in NiceTable._connected_clients.copy():
@@ -170,24 +308,37 @@ class NiceTable(ui.element):
 
     def refresh_columns(self):
         """通知前端刷新列设置"""
-        ui.run_javascript(
-            f"""
-            const inst = window.__nice_table_registry && window.__nice_table_registry['{self.uid}'];
-            if (inst && inst.refreshColumns) {{
-                inst.refreshColumns();
-            }}
-            """
-        )
+        try:
+            self.client.run_javascript(
+                f"""
+                const inst = window.__nice_table_registry && window.__nice_table_registry['{self.uid}'];
+                if (inst && inst.refreshColumns) {{
+                    inst.refreshColumns();
+                }}
+                """
+            )
+        except RuntimeError as e:
+            logger.debug(f'通知 {self.uid} 刷新列设置失败: {e}')
 
     def replace_dataframe(self, dataframe: pd.DataFrame, columns_config: Optional[List[ColumnConfig]] = None):
-        """重新加载数据源"""
-        if columns_config is None:
-            columns_config = self.logic.columns_config
-        self.logic = DataTable(dataframe.copy(), columns_config)
-        self.refresh_columns()
-        self.refresh_data()
+        """重新加载数据源（共享数据源的所有视图都会切换到新数据）"""
+        self.source.replace(dataframe, columns_config)
 
 
+    @classmethod
+    def start_recording(cls, path: str) -> WorkloadRecorder:
+        """开始录制 API 请求和 add_data 批次（NDJSON，.gz 结尾时压缩），可用 workload.py 回放"""
+        cls.stop_recording()
+        cls._recorder = WorkloadRecorder(path)
+        return cls._recorder
+
+    @classmethod
+    def stop_recording(cls):
+        """停止录制并关闭文件"""
+        if cls._recorder is not None:
+            cls._recorder.close()
+            cls._recorder = None
+
     @property
     def is_auto_add_running(self) -> bool:
         """检查自动添加任务是否正在运行"""
@@ -374,56 +525,98 @@ class NiceTable(ui.element):
     def _ensure_routes(cls):
         if cls._router_registered:
             return
+        app.include_router(cls.build_router())
+        app.timer(cls.reap_interval, cls.reap_idle_instances, immediate=False)
+        cls._router_registered = True
 
-        router = APIRouter()
+    @classmethod
+    def build_router(cls) -> APIRouter:
+        """创建表格 API 路由，也可挂载到独立的 FastAPI 应用（如压测工具）"""
+        router = APIRouter(route_class=_MetricsRoute)
 
         def get_target_instance(request: Request) -> 'NiceTable':
-            # 从 Header 中获取 table-id
-            table_id = request.headers.get('x-table-id')
+            table_id = _request_table_id(request)
             if not table_id:
-                # 兼容旧逻辑：如果只有一个实例，就返回那个
-                # 如果有多个实例（如刷新页面后旧实例未销毁），返回最新创建的那个（字典的最后一个）
-                if cls._instances:
-                    return list(cls._instances.values())[-1]
-                
-                raise HTTPException(status_code=400, detail='缺少 x-table-id 请求头，且无可用实例')
-            
-            inst = cls._get_instance(table_id)
-            if not inst:
-                raise HTTPException(status_code=404, detail=f'Table instance {table_id} not found')
+                # 只有一个实例时才能确定目标，多个实例时必须指定，避免请求落到其他用户的表格上
+                instances = list(cls._instances.values())
+                if len(instances) == 1:
+                    inst = instances[0]
+                elif instances:
+                    raise HTTPException(status_code=400, detail='存在多个表格实例，请求必须提供 x-table-id 请求头')
+                else:
+                    raise HTTPException(status_code=400, detail='缺少 x-table-id 请求头，且无可用实例')
+            else:
+                inst = cls._get_instance(table_id)
+                if not inst:
+                    raise HTTPException(status_code=404, detail=f'Table instance {table_id} not found')
+            inst._last_access = time.monotonic()
+            request.state.table_id = inst.uid
             return inst
 
+        def record(request: Request, endpoint: str, start: float, **fields: Any):
+            # 录制请求（未开启录制时无开销）；记录 get_target_instance 确定的实例，回放时按实例区分
+            if cls._recorder is not None:
+                table_id = getattr(request.state, 'table_id', None) or _request_table_id(request)
+                cls._recorder.record(endpoint, table_id, start, **fields)
+
         @router.post('/list')
         async def list_endpoint(request: Request, payload: Dict[str, Any]):
+            start = time.time()
+            inst = get_target_instance(request)
+            filters = payload.get('filters')
+            filter_params = FilterParams(**filters) if filters else None
+            page = payload.get('page', 1)
+            page_size = payload.get('pageSize', inst.page_size)
+            result = inst.logic.get_list(
+                filters=filter_params,
+                page=page,
+                page_size=page_size,
+                sort_by=payload.get('sortBy'),
+                sort_order=payload.get('sortOrder'),
+            )
+            record(request, 'list', start, filters=filters, page=page, pageSize=page_size,
+                   sortBy=payload.get('sortBy'), sortOrder=payload.get('sortOrder'), total=result.get('total'))
+            return result
+
+        @router.post('/explain')
+        async def explain(request: Request, payload: Dict[str, Any]):
+            """返回 /list 请求的执行计划（不返回数据行）"""
             inst = get_target_instance(request)
             filters = payload.get('filters')
             filter_params = FilterParams(**filters) if filters else None
-            return inst.logic.get_list(
+            plan = inst.logic.explain(
                 filters=filter_params,
                 page=payload.get('page', 1),
                 page_size=payload.get('pageSize', inst.page_size),
                 sort_by=payload.get('sortBy'),
                 sort_order=payload.get('sortOrder'),
             )
+            return {'success': True, 'data': plan}
 
         @router.post('/row-position')
         async def row_position(request: Request, payload: Dict[str, Any]):
+            start = time.time()
             inst = get_target_instance(request)
             row_id = payload.get('row_id') or payload.get('rowId')
             if row_id is None:
                 raise HTTPException(status_code=400, detail='缺少 rowId')
             filters = payload.get('filters')
             filter_params = FilterParams(**filters) if filters else None
-            return {'success': True, 'data': inst.logic.get_row_position(row_id, filter_params)}
+            data = inst.logic.get_row_position(row_id, filter_params)
+            record(request, 'row-position', start, rowId=row_id, filters=filters)
+            return {'success': True, 'data': data}
 
         @router.post('/row-detail')
         async def row_detail(request: Request, payload: Dict[str, Any]):
+            start = time.time()
             inst = get_target_instance(request)
             row = payload.get('row') or {}
             row_id = row.get('id')
             if row_id is None:
                 raise HTTPException(status_code=400, detail='缺少 row.id')
-            return {'success': True, 'data': inst.logic.get_row_detail(row_id)}
+            data = inst.logic.get_row_detail(row_id)
+            record(request, 'row-detail', start, rowId=row_id)
+            return {'success': True, 'data': data}
 
         @router.get('/columns')
         async def columns(request: Request):
@@ -442,6 +635,7 @@ class NiceTable(ui.element):
 
         @router.get('/filters')
         async def filter_options(request: Request):
+            start = time.time()
             inst = get_target_instance(request)
             options: Dict[str, List[str]] = {}
             for col in inst.logic.columns_config:
@@ -453,10 +647,11 @@ class NiceTable(ui.element):
                          options[col.prop] = col.options
                     else:
                          # 如果没有缓存的 options，尝试实时计算（兼容旧逻辑）
-                         unique_values = inst.logic.dataframe[col.prop].dropna().unique()
+                         unique_values = inst.logic.distinct_values(col.prop)
                          options[col.prop] = sorted([str(v) for v in unique_values])
                 except Exception:
                     options[col.prop] = []
+            record(request, 'filters', start)
             return {'success': True, 'data': options}
 
         @router.post('/add')
@@ -465,7 +660,73 @@ class NiceTable(ui.element):
             data = payload.get('data')
             if not data:
                 raise HTTPException(status_code=400, detail='缺少 data')
-            result = inst.add_data(data, refresh=True)
+            try:
+                result = await inst.submit_data(data)
+            except IngestQueueFull as e:
+                # 写入跟不上时的背压：生产者稍后重试
+                raise HTTPException(status_code=429, detail=str(e), headers={'Retry-After': '1'})
+            except MemoryBudgetExceeded as e:
+                raise HTTPException(status_code=507, detail=str(e))
+            except ValueError as e:
+                # 如值无法按列声明的类型保存（SchemaError）
+                raise HTTPException(status_code=400, detail=str(e))
+            return {'success': True, 'data': result}
+
+        @router.post('/bulk')
+        async def bulk_add(request: Request, chunk_rows: int = DEFAULT_CHUNK_ROWS):
+            """批量写入：按 Content-Type 把请求体（按列 JSON、NDJSON、CSV、Arrow）直接解析为列，见 bulk_ingest.py"""
+            start = time.time()
+            inst = get_target_instance(request)
+            fmt = body_format(request.headers.get('content-type'))
+            if fmt is None:
+                raise HTTPException(status_code=415, detail=f'不支持的 Content-Type，可用: {", ".join(FORMATS)}')
+            if chunk_rows <= 0:
+                raise HTTPException(status_code=400, detail='chunk_rows 必须大于 0')
+            writer = BulkWriter(inst.source)
+            try:
+                result = await writer.ingest(fmt, request.stream(), chunk_rows=chunk_rows,
+                                             dtype=csv_dtypes(inst.logic.columns_config))
+            except ImportError as e:
+                raise HTTPException(status_code=415, detail=str(e))
+            except BulkFormatError as e:
+                raise HTTPException(status_code=400, detail=f'{e}（已写入 {writer.added_count} 行）')
+            except IngestQueueFull as e:
+                raise HTTPException(status_code=429, detail=str(e), headers={'Retry-After': '1'})
+            except MemoryBudgetExceeded as e:
+                raise HTTPException(status_code=507, detail=f'{e}（已写入 {writer.added_count} 行）')
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=f'{e}（已写入 {writer.added_count} 行）')
+            content_length = request.headers.get('content-length')
+            record(request, 'bulk', start, rows=result['added_count'], format=fmt,
+                   bytes=int(content_length) if content_length and content_length.isdigit() else None)
+            return {'success': True, 'data': result}
+
+        @router.post('/upsert')
+        async def upsert(request: Request, payload: Dict[str, Any]):
+            """按 id 写入：{data: [...]}，id 已存在的行更新，其余追加"""
+            inst = get_target_instance(request)
+            data = payload.get('data')
+            if not data:
+                raise HTTPException(status_code=400, detail='缺少 data')
+            try:
+                result = inst.upsert(data, refresh=True)
+            except MemoryBudgetExceeded as e:
+                raise HTTPException(status_code=507, detail=str(e))
+            except (RuntimeError, ValueError) as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            return {'success': True, 'data': result}
+
+        @router.post('/delete')
+        async def delete_rows(request: Request, payload: Dict[str, Any]):
+            """按 id 删除行：{ids: [...]}"""
+            inst = get_target_instance(request)
+            ids = payload.get('ids')
+            if not isinstance(ids, list) or not ids:
+                raise HTTPException(status_code=400, detail='缺少 ids')
+            try:
+                result = inst.delete_rows(ids, refresh=True)
+            except (RuntimeError, ValueError) as e:
+                raise HTTPException(status_code=400, detail=str(e))
             return {'success': True, 'data': result}
 
         @router.get('/statistics')
@@ -474,7 +735,7 @@ class NiceTable(ui.element):
             inst = get_target_instance(request)
             
             # 获取基础统计信息
-            total_rows = len(inst.logic.dataframe)
+            total_rows = inst.logic.total_count
             total_columns = len(inst.logic.columns_config)
             
             # 获取列名列表
@@ -485,6 +746,10 @@ class NiceTable(ui.element):
             
             # 获取可排序列数量
             sortable_columns = sum(1 for col in inst.logic.columns_config if col.sortable)
+
+            # 内存占用
+            memory = inst.logic.memory_usage()
+            budget = f"，进程预算 {format_bytes(BUDGET.limit)}" if BUDGET.limit is not None else ""
             
             # 构建统计数据（行列可扩展格式）
             statistics_data = {
@@ -495,14 +760,66 @@ class NiceTable(ui.element):
                     {"统计项": "可筛选列数", "值": str(filterable_columns), "描述": "支持筛选功能的列数"},
                     {"统计项": "可排序列数", "值": str(sortable_columns), "描述": "支持排序功能的列数"},
                     {"统计项": "列名列表", "值": ", ".join(column_names[:5]) + ("..." if len(column_names) > 5 else ""), "描述": "所有列的名称"},
+                    {"统计项": "内存占用", "值": format_bytes(memory['resident']),
+                     "描述": f"列 {format_bytes(memory['columns'])}，索引 {format_bytes(memory['indexes'])}，"
+                             f"缓存 {format_bytes(memory['caches'])}，数据段 {format_bytes(memory['segments'])}{budget}"},
+                    {"统计项": "内存映射", "值": format_bytes(memory['mapped']), "描述": "快照、列存储等映射的文件，由操作系统按需换入换出"},
                 ]
             }
             
             return {'success': True, 'data': statistics_data}
 
-        app.include_router(router)
-        cls._router_registered = True
+        @router.post('/telemetry')
+        async def telemetry(request: Request, payload: Dict[str, Any]):
+            """接收前端批量上报的 loadData 耗时（毫秒）：fetch、parse、render、server
+
+            sendBeacon 无法设置请求头，因此表格 id 也可以放在请求体的 tableId 中。
+            network 由 fetch 减去 server 得到。
+            """
+            samples = payload.get('samples')
+            if not isinstance(samples, list):
+                raise HTTPException(status_code=400, detail='缺少 samples')
+            table = _metric_table_label(_request_table_id(request) or payload.get('tableId'))
+            accepted = 0
+            for sample in samples[:_TELEMETRY_MAX_SAMPLES]:
+                if not isinstance(sample, dict):
+                    continue
+                phases = {}
+                for phase in _CLIENT_PHASES:
+                    value = sample.get(phase)
+                    if isinstance(value, (int, float)) and 0 <= value < 3_600_000:
+                        phases[phase] = value / 1000
+                if 'fetch' in phases and 'server' in phases:
+                    phases['network'] = max(0.0, phases['fetch'] - phases['server'])
+                for phase, seconds in phases.items():
+                    CLIENT_SECONDS.observe(seconds, table=table, phase=phase)
+                accepted += bool(phases)
+            return {'success': True, 'data': {'accepted': accepted}}
+
+        @router.get('/metrics', response_class=PlainTextResponse)
+        async def metrics():
+            """Prometheus 文本格式的指标"""
+            # 共用数据源的多个视图只统计一次，标签与阶段指标一致（DataTable.table_id），
+            # 每次重新生成以去掉已回收表格的序列
+            tables = {id(inst.logic): inst.logic for inst in list(cls._instances.values())}
+            totals: Dict[str, Dict[str, int]] = {}
+            for table in tables.values():
+                memory = table.memory_usage()
+                total = totals.setdefault(table.table_id, dict.fromkeys(MEMORY_KINDS, 0))
+                for kind in MEMORY_KINDS:
+                    total[kind] += memory[kind]
+            MEMORY_BYTES.remove()
+            for table_id, memory in totals.items():
+                for kind in MEMORY_KINDS:
+                    MEMORY_BYTES.set(memory[kind], table=table_id, kind=kind)
+            return PlainTextResponse(REGISTRY.render(), media_type='text/plain; version=0.0.4; charset=utf-8')
+
+        return router
 
 
 # 在应用启动前注册路由，确保 API 可用
-NiceTable._ensure_routes()
\ No newline at end of file
+NiceTable._ensure_routes()
+
+# 通过环境变量开启工作负载录制
+if os.environ.get('NICE_TABLE_RECORD'):
+    NiceTable.start_recording(os.environ['NICE_TABLE_RECORD'])
\ No newline at end of file
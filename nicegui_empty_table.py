@@ -114,7 +114,7 @@ def main_page():
                         # 3. 只在需要刷新时，通知表格控件更新数据源
                         # 将最新的 DataFrame 传递给表格控件
                         # 使用 asyncio.to_thread 避免 update_dataframe 中的计算阻塞主线程
-                        # 注意：update_dataframe 中包含了耗时的 unique() 计算
+                        # df_source 只追加了行，update_dataframe 只统计新增行的筛选选项
                         result = await asyncio.to_thread(table.logic.update_dataframe, data_state['df_source'])
                         if result.get('columns_updated'):
                             table.refresh_columns()
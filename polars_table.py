@@ -0,0 +1,536 @@
+"""PolarsDataTable - 以 Polars 惰性查询为引擎的 DataTable
+
+DataTable 的筛选由 pandas 逐个条件生成布尔掩码，排序对全部匹配行做完整排序，都在单线程中执行。
+PolarsDataTable 把数据保存为 Polars DataFrame，筛选条件编译为一个惰性表达式（LazyFrame），
+由 Polars 的查询优化器和多线程执行引擎完成：
+
+- 筛选条件的语义与 DataTable._field_mask 相同：文本为不区分大小写的正则包含，数字运算符支持十六进制值和
+  FilterGroup 的 AND/OR，多选为 is_in，bytes 列按 "AB CD" 形式的十六进制文本、ts 列按时间字符串匹配
+- 所有条件合并为一个 filter，只读取用到的列（谓词下推和投影下推）
+- 总数和当前页在同一次 collect_all 中计算，共享筛选结果
+- 排序的前几页使用 top_k 只保留 offset + page_size 行，不对全部匹配行排序
+
+需要安装 polars（pip install 'polars>=1.0'），未安装时创建 PolarsDataTable 会抛出 ImportError：
+
+    table = PolarsDataTable(df, generate_columns_config_from_dataframe(df))
+    NiceTable(data_table=table)
+"""
+
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from data_table import (_APPEND_CHECK_ROWS, ColumnConfig, DataTable, FilterParams, PreparedBatch, SchemaError,
+                        _cast_to_schema, generate_columns_config_from_dataframe)
+from memory import BUDGET, empty_usage, finish_usage, frame_bytes
+from metrics import ROWS_INGESTED
+
+try:
+    import polars as _pl
+except ImportError:
+    _pl = None
+
+# 需要保留的行数（offset + page_size）不超过表行数的该比例时使用 top_k，否则完整排序
+_TOP_K_RATIO = 0.25
+
+
+def _require_polars():
+    if _pl is None:
+        raise ImportError("PolarsDataTable 需要安装 polars: pip install 'polars>=1.0'")
+
+
+def _to_polars(df: pd.DataFrame) -> '_pl.DataFrame':
+    """按列把 pandas DataFrame 转换为 Polars DataFrame（不依赖 pyarrow），缺失值转为 null"""
+    columns = []
+    for name in df.columns:
+        series = df[name]
+        if series.dtype.kind in 'biufM':
+            if isinstance(series.dtype, np.dtype):
+                columns.append(_pl.Series(str(name), series.to_numpy(), nan_to_null=True))
+                continue
+            # 可空类型（Int64 等）：缺失值通过掩码转为 null
+            values = series.to_numpy(dtype=object)
+            values[series.isna().to_numpy()] = None
+            columns.append(_pl.Series(str(name), values.tolist()))
+            continue
+        values = [None if v is None or (isinstance(v, float) and v != v) else v for v in series.tolist()]
+        try:
+            columns.append(_pl.Series(str(name), values))
+        except (TypeError, ValueError, OverflowError, _pl.exceptions.PolarsError):
+            # 混合类型的列按字符串保存
+            columns.append(_pl.Series(str(name), [None if v is None else str(v) for v in values], dtype=_pl.Utf8))
+    return _pl.DataFrame(columns)
+
+
+def _to_pandas(frame: '_pl.DataFrame') -> pd.DataFrame:
+    """转换为 pandas DataFrame（数值列经 numpy，其他列经 Python 对象，不依赖 pyarrow）"""
+    data = {}
+    for series in frame.get_columns():
+        if series.dtype.is_numeric() and series.null_count() == 0:
+            data[series.name] = series.to_numpy()
+        else:
+            data[series.name] = pd.Series(series.to_list(), dtype=object).infer_objects()
+    return pd.DataFrame(data, columns=frame.columns)
+
+
+class PolarsDataTable(DataTable):
+    """以 Polars 为后端的表格数据管理类，接口与 DataTable 相同"""
+
+    def __init__(self, dataframe: pd.DataFrame, columns_config: List[ColumnConfig], copy: bool = True):
+        """
+        Args:
+            dataframe: 初始数据（pandas DataFrame，转换为 Polars 保存；copy 只为与 DataTable 保持接口一致）
+            columns_config: 列配置列表
+        """
+        _require_polars()
+        import threading
+        self._lock = threading.RLock()
+        if dataframe is None:
+            raise ValueError("DataFrame不能为None")
+        if not columns_config:
+            raise ValueError("列配置不能为空")
+        if dataframe.empty:
+            dataframe = pd.DataFrame(columns=[col.prop for col in columns_config])
+        self._frame = _to_polars(dataframe)
+        self.columns_config = columns_config
+        self._id_index = None
+        self._validate_columns()
+        BUDGET.track(self)
+
+    # ---------- 存储访问 ----------
+
+    @property
+    def dataframe(self) -> pd.DataFrame:
+        """完整的 pandas DataFrame（会转换所有列，仅用于兼容，大表上应避免使用）"""
+        return _to_pandas(self._frame)
+
+    @dataframe.setter
+    def dataframe(self, value: pd.DataFrame):
+        self._frame = _to_polars(value)
+
+    @property
+    def total_count(self) -> int:
+        return self._frame.height
+
+    def memory_usage(self, exact: bool = False) -> Dict[str, Any]:
+        """内存占用：Polars 的列数据（Arrow 缓冲区）按 estimated_size 统计"""
+        usage = empty_usage()
+        frame = self._frame
+        for series in frame.get_columns():
+            usage['by_column'][series.name] = series.estimated_size()
+        usage['columns'] = sum(usage['by_column'].values())
+        return finish_usage(usage)
+
+    def _validate_columns(self):
+        missing = {col.prop for col in self.columns_config} - set(self._frame.columns)
+        if missing:
+            raise ValueError(f"列配置中定义的字段在DataFrame中不存在: {missing}")
+
+    def distinct_values(self, column: str) -> List[Any]:
+        frame = self._frame
+        if column not in frame.columns:
+            return []
+        return frame[column].drop_nulls().unique(maintain_order=True).to_list()
+
+    def _update_column_options(self) -> bool:
+        """用 n_unique 和 unique 统计 select 类型列的选项（多线程，不转换为 Python 对象）"""
+        columns_updated = False
+        frame = self._frame
+        for col_config in self.columns_config:
+            if col_config.filterType not in ['multi-select', 'select'] or col_config.prop not in frame.columns:
+                continue
+            column = frame[col_config.prop].drop_nulls()
+            if column.n_unique() > 100:
+                if col_config.filterType != 'text':
+                    col_config.options = None
+                    col_config.filterType = 'text'
+                    columns_updated = True
+                continue
+            options = sorted(str(v) for v in column.unique().to_list())
+            if col_config.options != options:
+                col_config.options = options
+                columns_updated = True
+        return columns_updated
+
+    # ---------- 筛选条件编译 ----------
+
+    def _filter_expr(self, filters: Optional[FilterParams], frame: '_pl.DataFrame') -> Optional['_pl.Expr']:
+        """把筛选条件编译为一个 Polars 表达式（字段之间为 AND），没有有效条件时返回 None"""
+        exprs = []
+        for field_name, filter_value in self._get_filter_dict(filters).items():
+            if field_name not in frame.columns:
+                continue
+            col_config = next((c for c in self.columns_config if c.prop == field_name), None)
+            if not col_config or not col_config.filterable:
+                continue
+            expr = self._field_expr(field_name, filter_value, col_config, frame)
+            if expr is not None:
+                exprs.append(expr)
+        if not exprs:
+            return None
+        return _pl.all_horizontal(exprs) if len(exprs) > 1 else exprs[0]
+
+    def _field_expr(self, field_name: str, filter_value: Any, col_config: ColumnConfig,
+                    frame: '_pl.DataFrame') -> Optional['_pl.Expr']:
+        """单个字段的表达式，语义与 DataTable._field_mask 相同；null 值视为不匹配"""
+        column = _pl.col(field_name)
+        dtype = frame.schema[field_name]
+        if col_config.filterType == 'number':
+            return self._number_expr(column, filter_value)
+
+        if col_config.filterType in ('text', 'date'):
+            if not (isinstance(filter_value, str) and filter_value):
+                return None
+            if col_config.filterType == 'date' and field_name != 'ts':
+                return (column.cast(_pl.Utf8) == filter_value).fill_null(False)
+            if col_config.filterType == 'date':
+                text = self._ts_text_expr(column, frame[field_name])
+            elif col_config.type == 'bytes' and dtype == _pl.Binary:
+                # "AB CD EF" 形式，与 _bytes_to_hex 相同
+                text = (column.bin.encode('hex').str.replace_all('(..)', '${1} ')
+                        .str.strip_chars_end(' ').str.to_uppercase())
+            else:
+                text = column.cast(_pl.Utf8)
+            # 与 str.contains(case=False) 相同：按正则匹配，不区分大小写
+            return text.str.contains(f'(?i){filter_value}').fill_null(False)
+
+        if col_config.filterType in ('multi-select', 'select'):
+            if isinstance(filter_value, list):
+                values = filter_value
+            elif filter_value is not None and filter_value != '':
+                values = [filter_value]
+            else:
+                return None
+            if not values:
+                return None
+            is_text = dtype in (_pl.Utf8, _pl.Categorical)
+            if all(isinstance(v, str) for v in values) == is_text or (dtype.is_numeric() and all(
+                    isinstance(v, (int, float)) for v in values)):
+                return column.is_in(values).fill_null(False)
+            # 类型不一致时按字符串比较（与 DataTable 的 str+isin 回退相同）
+            return column.cast(_pl.Utf8).is_in([str(v) for v in values]).fill_null(False)
+        return None
+
+    def _number_expr(self, column: '_pl.Expr', filter_value: Any) -> Optional['_pl.Expr']:
+        conditions, is_or = self._number_conditions(filter_value)
+        exprs = []
+        for operator, value in conditions:
+            if operator == '=':
+                expr = column == value
+            elif operator == '>':
+                expr = column > value
+            elif operator == '<':
+                expr = column < value
+            elif operator == '>=':
+                expr = column >= value
+            elif operator == '<=':
+                expr = column <= value
+            else:
+                expr = _pl.lit(True)
+            exprs.append(expr.fill_null(False))
+        if not exprs:
+            return None
+        if len(exprs) == 1:
+            return exprs[0]
+        return _pl.any_horizontal(exprs) if is_or else _pl.all_horizontal(exprs)
+
+    def _ts_text_expr(self, column: '_pl.Expr', values: '_pl.Series') -> '_pl.Expr':
+        """ts（Unix 时间戳）的本地时间字符串，格式与 _timestamp_to_str 相同
+
+        数据范围内本地时区的 UTC 偏移不变（没有跨越夏令时切换）时按固定偏移向量化计算，否则逐行调用 _timestamp_to_str。
+        """
+        bounds = values.drop_nulls()
+        offsets = set()
+        for ts in (bounds.min(), bounds.max()) if len(bounds) else ():
+            try:
+                offsets.add(datetime.fromtimestamp(ts).astimezone().utcoffset())
+            except (TypeError, ValueError, OverflowError, OSError):
+                offsets.add(None)
+        if len(offsets) > 1 or None in offsets or not values.dtype.is_numeric():
+            return column.map_elements(self._timestamp_to_str, return_dtype=_pl.Utf8)
+        offset_us = int(next(iter(offsets)).total_seconds() * 1_000_000) if offsets else 0
+        micros = (column.cast(_pl.Float64) * 1_000_000).cast(_pl.Int64) + offset_us
+        return _pl.from_epoch(micros, time_unit='us').dt.strftime('%Y-%m-%d %H:%M:%S%.6f')
+
+    def _query_plan(self, frame: '_pl.DataFrame', filters: Optional[FilterParams], page: int, page_size: int,
+                    sort_by: Optional[str], sort_order: Optional[str]) -> Tuple['_pl.LazyFrame', '_pl.LazyFrame', str]:
+        """(总数查询, 当前页查询, 排序方式)"""
+        lf = frame.lazy()
+        expr = self._filter_expr(filters, frame)
+        if expr is not None:
+            lf = lf.filter(expr)
+        count_lf = lf.select(_pl.len())
+        offset = (page - 1) * page_size
+        method = 'none'
+        if sort_by and sort_by in frame.columns:
+            descending = not (sort_order == 'ascending' if sort_order else True)
+            k = offset + page_size
+            if k <= frame.height * _TOP_K_RATIO:
+                # top_k 优先保留非空值，之后按相同顺序排序（null 在最后）
+                lf = lf.top_k(k, by=sort_by, reverse=not descending)
+                method = 'top_k'
+            else:
+                method = 'sort'
+            lf = lf.sort(sort_by, descending=descending, nulls_last=True, maintain_order=True)
+        return count_lf, lf.slice(offset, page_size), method
+
+    # ---------- 查询 ----------
+
+    def get_list(self,
+                 filters: Optional[FilterParams] = None,
+                 page: int = 1,
+                 page_size: int = 100,
+                 sort_by: Optional[str] = None,
+                 sort_order: Optional[str] = None) -> Dict[str, Any]:
+        frame = self._frame
+        query_start = time.perf_counter()
+        try:
+            count_lf, page_lf, _ = self._query_plan(frame, filters, page, page_size, sort_by, sort_order)
+            counts, page_frame = _pl.collect_all([count_lf, page_lf])
+            total_count = counts.item()
+            page_df = pd.DataFrame.from_records(page_frame.rows(), columns=page_frame.columns)
+        except _pl.exceptions.PolarsError as e:
+            self._logger.error(f"get_list 处理失败: {e}, 筛选条件={self._get_filter_dict(filters)}", exc_info=True)
+            total_count, page_df = frame.height, pd.DataFrame(columns=frame.columns)
+        stage_end = time.perf_counter()
+        self._observe('get_list', 'filter', stage_end - query_start)
+
+        data_list = self._serialize_records(page_df)
+        end = time.perf_counter()
+        self._observe('get_list', 'serialize', end - stage_end)
+        self._check_slow_query(end - query_start, filters, page, page_size, sort_by, sort_order)
+        return {
+            "list": data_list,
+            "total": total_count,
+            "page": page,
+            "pageSize": page_size
+        }
+
+    def explain(self,
+                filters: Optional[FilterParams] = None,
+                page: int = 1,
+                page_size: int = 100,
+                sort_by: Optional[str] = None,
+                sort_order: Optional[str] = None) -> Dict[str, Any]:
+        """get_list 的执行计划：Polars 优化后的查询计划和各步骤的耗时"""
+        total_start = time.perf_counter()
+        frame = self._frame
+        count_lf, page_lf, method = self._query_plan(frame, filters, page, page_size, sort_by, sort_order)
+        start = time.perf_counter()
+        filtered_count = count_lf.collect().item()
+        filter_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        page_lf.collect()
+        page_seconds = time.perf_counter() - start
+        sort_plan = None
+        if sort_by:
+            sort_plan = {'column': sort_by, 'order': sort_order or 'ascending', 'method': method}
+            if sort_by not in frame.columns:
+                sort_plan['skipped'] = '列不存在'
+        start_index = (page - 1) * page_size
+        return {
+            'rows': frame.height,
+            'source': {'storage': 'polars', 'plan': page_lf.explain()},
+            'filters': self._canonical_filters(filters),
+            'predicates': [{'column': k, 'condition': v} for k, v in self._canonical_filters(filters).items()],
+            'filtered_rows': filtered_count,
+            'sort': sort_plan,
+            'page': {
+                'page': page,
+                'pageSize': page_size,
+                'offset': start_index,
+                'rows': max(0, min(page_size, filtered_count - start_index)),
+            },
+            'ms': {
+                'filter': round(filter_seconds * 1000, 3),
+                'sort': round(page_seconds * 1000, 3),
+                'total': round((time.perf_counter() - total_start) * 1000, 3),
+            },
+        }
+
+    def get_row_position(self, row_id: Any, filters: Optional[FilterParams] = None) -> Dict[str, Any]:
+        frame = self._frame
+        if 'id' not in frame.columns:
+            return {"found": False, "position": -1}
+        lf = frame.lazy()
+        expr = self._filter_expr(filters, frame)
+        if expr is not None:
+            lf = lf.filter(expr)
+        # 位置 = 该行之前满足筛选条件的行数
+        matched = lf.with_row_index('_position').filter(_pl.col('id') == row_id).select('_position').head(1).collect()
+        if matched.height == 0:
+            return {"found": False, "position": -1}
+        return {"found": True, "position": int(matched.item())}
+
+    def get_row_detail(self, row_id: Any) -> List[Dict[str, Any]]:
+        start = time.perf_counter()
+        frame = self._frame
+        row = frame.filter(_pl.col('id') == row_id).head(1) if 'id' in frame.columns else frame.clear()
+        if row.height == 0:
+            raise ValueError(f"未找到ID为 {row_id} 的记录")
+        self._observe('get_row_detail', 'lookup', time.perf_counter() - start)
+        return self._row_detail(_to_pandas(row))
+
+    # ---------- 写入 ----------
+
+    def add_data(self, new_data: Union[Dict[str, Any], List[Dict[str, Any]], pd.DataFrame, PreparedBatch]) -> Dict[str, Any]:
+        batch = self._prepare_batch(new_data, self._frame.columns)
+        with self._write_lock('add_data'):
+            new_df = batch.frame
+            if BUDGET.limit is not None:
+                BUDGET.reserve(self, sum(frame_bytes(new_df)[0].values()))
+            frame = self._frame
+            added_columns = [c for c in new_df.columns if c not in frame.columns]
+            columns_updated = False
+            if added_columns:
+                new_columns_config = [c for c in batch.columns_config if c.prop in added_columns]
+                inferred = {c.prop for c in new_columns_config}
+                missing = [c for c in added_columns if c not in inferred]
+                if missing:
+                    new_columns_config.extend(generate_columns_config_from_dataframe(new_df[missing]))
+                self.columns_config.extend(new_columns_config)
+                columns_updated = True
+
+            if 'id' in frame.columns or 'id' in new_df.columns:
+                max_id = frame['id'].max() if 'id' in frame.columns and frame.height > 0 else None
+                self._fill_missing_ids(new_df, 0 if max_id is None else max_id)
+
+            # 列的并集；类型不同时放宽为共同的超类型
+            self._frame = _pl.concat([frame, _to_polars(new_df)], how='diagonal_relaxed')
+            if self._refresh_column_options('add_data', new_df):
+                columns_updated = True
+            ROWS_INGESTED.inc(len(new_df), table=self.table_id)
+            return {
+                "success": True,
+                "added_count": len(new_df),
+                "columns_updated": columns_updated,
+                "added_columns": added_columns
+            }
+
+    def update_dataframe(self, new_dataframe: pd.DataFrame, append_only: Optional[bool] = None) -> Dict[str, Any]:
+        """用 new_dataframe 更新数据：只是在当前数据之后追加了行时只转换新增的行，否则整体转换替换
+
+        追加检测与 DataTable 相同（列和类型相同、抽样比较前缀中的若干行，append_only 为 None 时还比较整个 id 列）。
+        """
+        with self._write_lock('update_dataframe'):
+            if new_dataframe is None:
+                raise ValueError("DataFrame不能为None")
+            frame = self._frame
+            start = None
+            if (append_only is not False and frame.height > 0 and len(new_dataframe) >= frame.height
+                    and list(new_dataframe.columns) == frame.columns):
+                start = frame.height
+                # 与 DataTable 相同：抽样比较前缀中的若干行（按声明的类型转换后），自动检测时还要求前缀的整个 id 列相同
+                positions = np.unique(np.linspace(0, start - 1, min(start, _APPEND_CHECK_ROWS)).astype(np.int64))
+                try:
+                    sample = _to_polars(_cast_to_schema(new_dataframe.iloc[positions], self.columns_config))
+                    if sample.schema != frame.schema or not frame[positions.tolist()].equals(sample):
+                        start = None
+                    elif append_only is None and 'id' in frame.columns:
+                        prefix = _cast_to_schema(new_dataframe[['id']].iloc[:start], self.columns_config)
+                        if not frame['id'].equals(_to_polars(prefix)['id']):
+                            start = None
+                except Exception:
+                    start = None
+            if start is not None:
+                # 只转换新增的行（无法按声明的类型保存时抛出 SchemaError，此时尚未修改任何状态）
+                tail = _cast_to_schema(new_dataframe.iloc[start:], self.columns_config)
+                self._frame = _pl.concat([frame, _to_polars(tail)], how='diagonal_relaxed')
+                return {
+                    "success": True,
+                    "columns_updated": self._refresh_column_options('update_dataframe', tail),
+                    "total_count": self._frame.height,
+                    "incremental": True,
+                    "appended_count": len(tail)
+                }
+
+            # 整体替换：先按新数据调整列配置（推断的类型重新推断），再按声明的类型转换
+            columns = list(self.columns_config)
+            columns_updated = self._reconcile_columns_config(new_dataframe)
+            try:
+                new_dataframe = _cast_to_schema(new_dataframe, self.columns_config)
+            except SchemaError:
+                self.columns_config = columns
+                raise
+            self._frame = _to_polars(new_dataframe)
+            if self._refresh_column_options('update_dataframe'):
+                columns_updated = True
+            self._validate_columns()
+            return {
+                "success": True,
+                "columns_updated": columns_updated,
+                "total_count": self._frame.height,
+                "incremental": False
+            }
+
+    def _locate_rows(self, ids: List[Any]) -> Dict[Any, np.ndarray]:
+        frame = self._frame
+        if 'id' not in frame.columns or not ids:
+            return {}
+        matched = (frame.lazy().with_row_index('_position').filter(_pl.col('id').is_in(list(ids)))
+                   .select('id', '_position').collect())
+        found: Dict[Any, List[int]] = {}
+        for row_id, position in matched.iter_rows():
+            found.setdefault(row_id, []).append(position)
+        return {row_id: np.array(found[row_id], dtype=np.int64) for row_id in ids if row_id in found}
+
+    def _apply_updates(self, operation: str, updates: Dict[Any, Dict[str, Any]],
+                       located: Dict[Any, np.ndarray]) -> Tuple[int, bool]:
+        """把 updates 写入 located 中的行：每个被修改的列整列替换（scatter），不修改读取中的快照"""
+        fields = [{k: v for k, v in values.items() if k != 'id'} for row_id, values in updates.items()]
+        if not any(fields):
+            return 0, False
+        row_positions = [located[row_id] for row_id in updates]
+        changes = pd.DataFrame(fields)
+        self._convert_special_columns(changes)
+        # 与 DataTable 相同：按声明的类型检查和转换，无法保存的值抛出 SchemaError
+        changes = _cast_to_schema(changes, self.columns_config)
+
+        frame = self._frame
+        columns_updated = False
+        added_columns = [c for c in changes.columns if c not in frame.columns]
+        if added_columns:
+            self.columns_config.extend(generate_columns_config_from_dataframe(changes[added_columns]))
+            columns_updated = True
+        new_columns = []
+        for col in changes.columns:
+            positions, values = [], []
+            for row_fields, row_position, value in zip(fields, row_positions, changes[col]):
+                if col in row_fields:
+                    positions.extend(row_position.tolist())
+                    values.extend([None if pd.isna(value) else value] * len(row_position))
+            if not positions:
+                continue
+            if col in frame.columns:
+                column = frame[col].clone()
+                try:
+                    # scatter 会把无法转换的值静默写为 null：先检查写入的值能否无损转换为该列的类型
+                    incoming = _to_polars(pd.DataFrame({col: pd.Series(values, dtype=object)}))[col]
+                    converted = incoming.cast(column.dtype, strict=True)
+                    if not converted.cast(incoming.dtype).equals(incoming):
+                        raise ValueError(f'列 {col} 的值无法无损转换为 {column.dtype}')
+                    column.scatter(positions, converted)
+                except (TypeError, ValueError, OverflowError, _pl.exceptions.PolarsError):
+                    # 类型不兼容（如没有声明类型的数字列写入字符串）时按 Python 对象重建该列
+                    items = column.to_list()
+                    for position, value in zip(positions, values):
+                        items[position] = value
+                    column = _to_polars(pd.DataFrame({col: pd.Series(items, dtype=object)}))[col]
+            else:
+                items = [None] * frame.height
+                for position, value in zip(positions, values):
+                    items[position] = value
+                column = _to_polars(pd.DataFrame({col: pd.Series(items, dtype=object)}))[col]
+            new_columns.append(column)
+        self._frame = frame.with_columns(new_columns)
+        if self._refresh_column_options(operation, changes):
+            columns_updated = True
+        return sum(len(p) for p in row_positions), columns_updated
+
+    def _drop_positions(self, positions: np.ndarray):
+        keep = np.ones(self._frame.height, dtype=bool)
+        keep[positions] = False
+        self._frame = self._frame.filter(_pl.Series(keep))
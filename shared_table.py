@@ -0,0 +1,183 @@
+"""共享表格 - 多个进程共享同一份列数据
+
+用于多 worker 部署（如 uvicorn --workers N）：
+- 写入进程使用 SharedTableWriter，它是一个普通的 DataTable，
+  每次追加数据后把新增的行写入列存储目录并发布新的版本号
+- 每个读取进程创建一个 SharedDataTable，映射同一个列存储目录，
+  在处理查询前检查版本号，只同步新发布的行
+
+数值列直接映射列存储文件（多个进程共享同一份物理内存）；字符串和 bytes 列
+在每个读取进程中按增量解码。列存储格式见 column_store.py。
+"""
+
+import logging
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from column_store import KIND_FIXED, ColumnStoreReader, ColumnStoreWriter
+from data_table import ColumnConfig, DataTable, FilterParams, PreparedBatch, generate_columns_config_from_dataframe
+
+logger = logging.getLogger(__name__)
+
+
+class SharedTableWriter(DataTable):
+    """共享表格的写入端
+
+    行为与 DataTable 相同，额外把新增的行追加到列存储并发布版本号。
+    列存储只支持追加，因此 update_dataframe 传入的新数据必须是已发布的行之后追加了行。
+    """
+
+    def __init__(self, path: Union[str, Path], dataframe: pd.DataFrame, columns_config: List[ColumnConfig]):
+        """
+        Args:
+            path: 列存储目录（Linux 上可使用 /dev/shm 下的目录）
+            dataframe: 初始数据
+            columns_config: 列配置，会随 schema 一起发布给读取进程
+        """
+        super().__init__(dataframe, columns_config)
+        self._store = ColumnStoreWriter(path, columns_config)
+        if self._store.row_count > len(self.dataframe):
+            raise ValueError(
+                f'列存储中已有 {self._store.row_count} 行，多于初始数据的 {len(self.dataframe)} 行'
+            )
+        self._publish_tail()
+
+    @property
+    def version(self) -> int:
+        """已发布的版本号"""
+        return self._store.version
+
+    def _publish_tail(self):
+        """将尚未发布的行追加到列存储"""
+        published = self._store.row_count
+        if len(self.dataframe) > published:
+            self._store.append(self.dataframe.iloc[published:])
+
+    def add_data(self, new_data: Union[Dict[str, Any], List[Dict[str, Any]], pd.DataFrame, PreparedBatch]) -> Dict[str, Any]:
+        batch = self._prepare_batch(new_data, self.dataframe.columns)
+        with self._lock:
+            result = super().add_data(batch)
+            self._publish_tail()
+            result['version'] = self._store.version
+            return result
+
+    def update_dataframe(self, new_dataframe: pd.DataFrame, append_only: Optional[bool] = None) -> Dict[str, Any]:
+        with self._lock:
+            if new_dataframe is None:
+                raise ValueError("DataFrame不能为None")
+            old_dataframe = self.dataframe
+            if self._store.row_count and new_dataframe is not old_dataframe:
+                # 已发布的行不能修改：新数据必须是已发布的行（列和前面的行都不变）之后追加的行，
+                # 否则写入端更新了数据而读取进程仍然读到旧值
+                if self._appended_rows(old_dataframe, new_dataframe, append_only) is None:
+                    raise ValueError(
+                        f'共享表只支持追加写入: 新数据必须在已发布的 {self._store.row_count} 行之后追加，'
+                        f'不能修改、删除或重新排列已发布的行和列'
+                    )
+                append_only = True
+            result = super().update_dataframe(new_dataframe, append_only)
+            self._publish_tail()
+            result['version'] = self._store.version
+            return result
+
+    def _locate_rows(self, ids: List[Any]) -> Dict[Any, np.ndarray]:
+        raise RuntimeError('共享表只支持追加写入，不能按 id 修改或删除行')
+
+    def close(self):
+        self._store.close()
+
+
+class SharedDataTable(DataTable):
+    """共享表格的读取端
+
+    从列存储目录映射数据，只读。每次查询前检查写入端发布的版本号，
+    版本变化时只解码新增的行，数值列始终直接引用映射的文件内容，不复制。
+    """
+
+    def __init__(self, path: Union[str, Path], columns_config: Optional[List[ColumnConfig]] = None):
+        """
+        Args:
+            path: 写入端使用的列存储目录
+            columns_config: 列配置，默认使用写入端发布的配置
+        """
+        self._reader = ColumnStoreReader(path)
+        # 变长列已解码的值：列名 -> (缓冲区, 已解码的行数)。缓冲区按倍数扩容，同步时只解码并写入新增的行，
+        # 各版本的 DataFrame 引用同一缓冲区的前缀，不复制已解码的行
+        self._decoded: Dict[str, Tuple[np.ndarray, int]] = {}
+        dataframe = self._build_dataframe()
+        if columns_config is None:
+            columns_config = [ColumnConfig(**c) for c in self._reader.columns_config]
+        if not columns_config:
+            columns_config = generate_columns_config_from_dataframe(dataframe)
+        # 列的类型由列存储决定（写入端已按声明的类型检查），读取端不再转换，否则每次同步都要转换整列
+        columns_config = [c.model_copy(update={'dtype': None}) for c in columns_config]
+        super().__init__(dataframe, columns_config, copy=False)
+        self._update_column_options()
+
+    @property
+    def version(self) -> int:
+        """当前已同步的版本号"""
+        return self._reader.version
+
+    def _build_dataframe(self) -> pd.DataFrame:
+        """根据当前映射构建 DataFrame：定长列零拷贝，变长列只解码新增的行"""
+        row_count = self._reader.row_count
+        data = {}
+        for name in self._reader.columns:
+            if self._reader.column_kind(name) == KIND_FIXED:
+                data[name] = self._reader.fixed_array(name)
+                continue
+            buffer, decoded = self._decoded.get(name, (None, 0))
+            if buffer is None or decoded < row_count:
+                if buffer is None or len(buffer) < row_count:
+                    # 按倍数扩容：复制已解码的引用的总开销与行数成正比，而不是每次同步复制整列
+                    grown = np.empty(max(row_count, 2 * decoded), dtype=object)
+                    grown[:decoded] = buffer[:decoded] if buffer is not None else []
+                    buffer = grown
+                buffer[decoded:row_count] = self._reader.read_column(name, decoded, row_count)
+                self._decoded[name] = (buffer, row_count)
+            data[name] = buffer[:row_count]
+        return pd.DataFrame(data, columns=self._reader.columns, copy=False)
+
+    def sync(self) -> bool:
+        """同步到写入端最新发布的版本，返回是否有更新"""
+        with self._lock:
+            if not self._reader.refresh():
+                return False
+            dataframe = self._build_dataframe()
+            # 列存储只追加，已解码的前缀不变
+            DataTable.update_dataframe(self, dataframe, append_only=True)
+            logger.debug(f'共享表已同步到版本 {self._reader.version}，共 {len(dataframe)} 行')
+            return True
+
+    def get_list(self, filters: Optional[FilterParams] = None, page: int = 1, page_size: int = 100,
+                 sort_by: Optional[str] = None, sort_order: Optional[str] = None) -> Dict[str, Any]:
+        self.sync()
+        return super().get_list(filters, page, page_size, sort_by, sort_order)
+
+    def get_row_position(self, row_id: Any, filters: Optional[FilterParams] = None) -> Dict[str, Any]:
+        self.sync()
+        return super().get_row_position(row_id, filters)
+
+    def get_row_detail(self, row_id: Any) -> List[Dict[str, Any]]:
+        self.sync()
+        return super().get_row_detail(row_id)
+
+    def get_columns_config(self) -> Dict[str, Any]:
+        self.sync()
+        return super().get_columns_config()
+
+    def add_data(self, new_data: Union[Dict[str, Any], List[Dict[str, Any]], pd.DataFrame, PreparedBatch]) -> Dict[str, Any]:
+        raise RuntimeError('SharedDataTable 是只读的，请通过写入进程的 SharedTableWriter 添加数据')
+
+    def update_dataframe(self, new_dataframe: pd.DataFrame, append_only: Optional[bool] = None) -> Dict[str, Any]:
+        raise RuntimeError('SharedDataTable 是只读的，请通过写入进程的 SharedTableWriter 更新数据')
+
+    def _locate_rows(self, ids: List[Any]) -> Dict[Any, np.ndarray]:
+        raise RuntimeError('SharedDataTable 是只读的，不能修改或删除行')
+
+    def close(self):
+        self._reader.close()
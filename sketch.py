@@ -0,0 +1,66 @@
+"""不同值数量的近似统计（HyperLogLog）
+
+生成列配置时需要判断字符串列的不同值是否超过下拉选项的上限（100 个）。对整列调用 unique()
+需要对每个值求哈希并保存全部不同值，千万行的高基数列耗时数秒、占用大量内存。
+
+HyperLogLog 只保存 2^precision 个寄存器（默认 4096 字节），按块向量化地加入数据：
+每个值的 64 位哈希（pandas.util.hash_array）的高 precision 位选择寄存器，其余位中
+最高位 1 的位置作为该寄存器的候选值，寄存器取最大值。标准误差约为 1.04 / sqrt(2^precision)
+（默认约 1.6%），不同值较少时使用线性计数修正，结果接近精确值。
+"""
+
+from typing import Union
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_PRECISION = 12
+
+
+class HyperLogLog:
+    """可按块加入数据的不同值数量估计"""
+
+    def __init__(self, precision: int = DEFAULT_PRECISION):
+        if not 4 <= precision <= 16:
+            raise ValueError("precision 应在 4 到 16 之间")
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+        # 已加入的值的数量
+        self.rows = 0
+
+    def add(self, values: Union[pd.Series, np.ndarray]):
+        """加入一批值（缺失值也计为一个不同值，与 unique() 一致）"""
+        if isinstance(values, pd.Series):
+            values = values.to_numpy()
+        if len(values) == 0:
+            return
+        if values.dtype == object:
+            hashes = pd.util.hash_array(values, categorize=False)
+        else:
+            hashes = pd.util.hash_array(values)
+        p = self.precision
+        index = (hashes >> np.uint64(64 - p)).astype(np.intp)
+        rest = hashes & np.uint64((1 << (64 - p)) - 1)
+        # 剩余 64 - p 位中最高位 1 的位置（从 1 开始），全为 0 时为 64 - p + 1
+        _, exponent = np.frexp(rest.astype(np.float64))
+        rank = (64 - p + 1 - exponent).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+        self.rows += len(values)
+
+    def estimate(self) -> float:
+        """估计的不同值数量"""
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and zeros:
+            # 小基数时线性计数更准确
+            return float(m * np.log(m / zeros))
+        return float(raw)
+
+    def merge(self, other: 'HyperLogLog'):
+        """合并另一个相同精度的估计（如各数据段分别统计后合并）"""
+        if other.precision != self.precision:
+            raise ValueError("只能合并相同精度的 HyperLogLog")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        self.rows += other.rows
@@ -0,0 +1,744 @@
+"""SqliteDataTable - 以 SQLite 为存储和查询引擎的 DataTable
+
+DataTable 的每次查询都对整个 DataFrame 做筛选、排序和切片。SqliteDataTable 把数据存放在 SQLite
+（内存数据库或文件）中，查询翻译为参数化的 SQL，由 SQLite 的索引完成查找、筛选和排序：
+
+- 数字条件（含 FilterGroup 的 AND/OR）翻译为比较，多选为 IN，日期为 =，文本为 LIKE（不区分大小写的子串匹配，
+  条件中含正则元字符时改用 REGEXP，与 DataTable 的 str.contains 一致）；bytes 列按十六进制文本、ts 列按时间字符串匹配
+- id 列和数字、日期、下拉筛选列建立索引（index_columns 可指定），按 id 查找行和定位不再扫描整表
+- 分页使用 LIMIT/OFFSET；顺序翻页时记住每页最后一行的排序值和行号，下一页改用 keyset 条件直接从该位置开始
+- 文件数据库使用 WAL 模式，各线程使用自己的连接读取，查询不等待写入；内存数据库只有一个连接，读写串行
+
+接口与 DataTable 相同（增删改、行定位、行详情、执行计划等），可直接传给 NiceTable：
+
+    table = SqliteDataTable('orders.db', df)        # 或 ':memory:'
+    NiceTable(data_table=table)
+
+文件数据库中同时保存列配置，之后可直接打开：SqliteDataTable('orders.db')。
+"""
+
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from data_table import (ColumnConfig, DataTable, FilterParams, PreparedBatch, _cast_to_schema,
+                        generate_columns_config_from_dataframe)
+from memory import BUDGET, empty_usage, finish_usage, frame_bytes
+from metrics import ROWS_INGESTED
+
+# 行号列（INTEGER PRIMARY KEY，即 rowid 的别名）：保持插入顺序，VACUUM 后也不变
+_ROW = '_row'
+_META_TABLE = '_nice_table_meta'
+# 默认建立索引的筛选类型
+_INDEXED_FILTER_TYPES = ('number', 'date', 'select', 'multi-select')
+_REGEX_CHARS = set('.^$*+?{}[]\\|()')
+# 每条语句绑定的参数个数上限（SQLite 默认限制为 32766）
+_MAX_PARAMS = 900
+# 记住多少个分页位置（keyset）
+_KEYSET_CACHE_SIZE = 256
+_NUMBER_OPERATORS = ('=', '>', '<', '>=', '<=')
+
+
+def _quote(name: Any) -> str:
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def _sql_value(value: Any) -> Any:
+    """转换为 sqlite3 可绑定的值：numpy 标量转为 Python 类型，缺失值转为 None"""
+    if value is None:
+        return None
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and value != value:
+        return None
+    if isinstance(value, (pd.Timestamp, np.datetime64)):
+        return str(value)
+    if value is pd.NaT or value is pd.NA:
+        return None
+    return value
+
+
+def _column_values(series: pd.Series) -> List[Any]:
+    """按列转换为可绑定的值（整列转换，避免逐个判断类型）"""
+    if series.dtype.kind == 'M':
+        series = series.astype(str).where(series.notna(), None)
+    values = series.to_numpy(dtype=object)
+    missing = pd.isna(series).to_numpy()
+    if missing.any():
+        values = values.copy()
+        values[missing] = None
+    return values.tolist()
+
+
+def _column_type(dtype: Any, col_config: Optional[ColumnConfig]) -> str:
+    """列的声明类型（决定 SQLite 的类型亲和性）"""
+    if col_config is not None and col_config.type == 'bytes':
+        return 'BLOB'
+    kind = getattr(dtype, 'kind', None)
+    if kind in ('b', 'i', 'u'):
+        return 'INTEGER'
+    if kind == 'f':
+        return 'REAL'
+    if kind is None and col_config is not None and col_config.type == 'number':
+        return 'NUMERIC'
+    # 不声明类型：字符串、数字混合的列按原值保存
+    return ''
+
+
+def _like_pattern(value: str) -> str:
+    escaped = value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f'%{escaped}%'
+
+
+def _regexp(pattern: str, value: Any) -> bool:
+    if value is None:
+        return False
+    return re.search(pattern, str(value), re.IGNORECASE) is not None
+
+
+class SqliteDataTable(DataTable):
+    """以 SQLite 为后端的表格数据管理类"""
+
+    def __init__(self,
+                 path: Union[str, Path] = ':memory:',
+                 dataframe: Optional[pd.DataFrame] = None,
+                 columns_config: Optional[List[ColumnConfig]] = None,
+                 table_name: str = 'data',
+                 index_columns: Optional[List[str]] = None):
+        """
+        Args:
+            path: 数据库文件，':memory:' 表示内存数据库
+            dataframe: 初始数据，追加到表中（文件中已有该表时为追加）
+            columns_config: 列配置，默认使用数据库中保存的配置或根据数据自动生成
+            table_name: 数据表名（同一个文件中可以保存多个表格）
+            index_columns: 建立索引的列，默认为 id 和数字、日期、下拉筛选列
+        """
+        self._lock = threading.RLock()
+        self.path = str(path)
+        self.table_name = table_name
+        self._memory = self.path == ':memory:' or 'mode=memory' in self.path
+        self._index_columns = list(index_columns) if index_columns is not None else None
+        self._id_index = None
+        # 读取用的连接：文件数据库每个线程一个（WAL 模式下读取不等待写入）
+        self._local = threading.local()
+        self._read_conns: List[sqlite3.Connection] = []
+        # 写入版本：每次写入后递增，分页位置和计数缓存随之失效
+        self._version = 0
+        self._page_keys: 'OrderedDict[tuple, Tuple[Any, int]]' = OrderedDict()
+        self._counts: Dict[tuple, int] = {}
+
+        self._conn = self._connect()
+        if not self._memory:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(f'CREATE TABLE IF NOT EXISTS {_META_TABLE} (key TEXT PRIMARY KEY, value TEXT)')
+        self._columns = self._table_columns()
+
+        if columns_config is None:
+            columns_config = self._load_config()
+        if not columns_config:
+            if dataframe is None or dataframe.empty:
+                raise ValueError('数据库中没有该表时需要提供 dataframe 或 columns_config')
+            columns_config = generate_columns_config_from_dataframe(dataframe)
+        self.columns_config = columns_config
+
+        with self._conn:
+            if not self._columns:
+                self._create_table(dataframe)
+            if dataframe is not None and not dataframe.empty:
+                self._ensure_columns(dataframe)
+                self._insert(dataframe)
+        self._ensure_indexes()
+        self._save_config()
+        self._validate_columns()
+        self._update_column_options()
+        BUDGET.track(self)
+
+    # ---------- 连接与表结构 ----------
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False, uri=self.path.startswith('file:'))
+        # 与 DataTable 相同的文本转换，供筛选条件使用
+        conn.create_function('nt_hex', 1, self._hex_text, deterministic=True)
+        conn.create_function('nt_ts', 1, self._ts_text, deterministic=True)
+        conn.create_function('regexp', 2, _regexp, deterministic=True)
+        return conn
+
+    def _hex_text(self, value: Any) -> Optional[str]:
+        if value is None:
+            return None
+        return self._bytes_to_hex(value) if isinstance(value, bytes) else str(value)
+
+    def _ts_text(self, value: Any) -> Optional[str]:
+        if value is None:
+            return None
+        try:
+            return self._timestamp_to_str(value)
+        except (TypeError, ValueError, OverflowError, OSError):
+            return str(value)
+
+    @property
+    def _table(self) -> str:
+        return _quote(self.table_name)
+
+    def _table_columns(self) -> List[str]:
+        rows = self._conn.execute(f'PRAGMA table_info({self._table})').fetchall()
+        return [row[1] for row in rows if row[1] != _ROW]
+
+    def _config(self, name: str) -> Optional[ColumnConfig]:
+        return next((c for c in self.columns_config if c.prop == name), None)
+
+    def _create_table(self, dataframe: Optional[pd.DataFrame]):
+        columns = list(dataframe.columns) if dataframe is not None else [c.prop for c in self.columns_config]
+        definitions = [f'{_quote(_ROW)} INTEGER PRIMARY KEY']
+        for name in columns:
+            dtype = dataframe[name].dtype if dataframe is not None else None
+            definitions.append(f'{_quote(name)} {_column_type(dtype, self._config(name))}'.rstrip())
+        self._conn.execute(f'CREATE TABLE {self._table} ({", ".join(definitions)})')
+        self._columns = columns
+
+    def _ensure_columns(self, frame: pd.DataFrame):
+        """为 frame 中表里还没有的列执行 ALTER TABLE（已有的行上为 NULL）"""
+        for name in frame.columns:
+            if name not in self._columns:
+                column_type = _column_type(frame[name].dtype, self._config(name))
+                self._conn.execute(f'ALTER TABLE {self._table} ADD COLUMN {_quote(name)} {column_type}'.rstrip())
+                self._columns.append(name)
+
+    def _ensure_indexes(self):
+        if self._index_columns is not None:
+            names = self._index_columns
+        else:
+            names = ['id'] + [c.prop for c in self.columns_config
+                              if c.filterable and c.filterType in _INDEXED_FILTER_TYPES]
+        for name in dict.fromkeys(names):
+            if name in self._columns:
+                index_name = _quote(f'{self.table_name}__{name}')
+                self._conn.execute(f'CREATE INDEX IF NOT EXISTS {index_name} ON {self._table} ({_quote(name)})')
+
+    def _insert(self, frame: pd.DataFrame):
+        columns = list(frame.columns)
+        placeholders = ', '.join('?' * len(columns))
+        self._conn.executemany(
+            f'INSERT INTO {self._table} ({", ".join(_quote(c) for c in columns)}) VALUES ({placeholders})',
+            zip(*[_column_values(frame[c]) for c in columns]),
+        )
+
+    def _load_config(self) -> List[ColumnConfig]:
+        row = self._conn.execute(f'SELECT value FROM {_META_TABLE} WHERE key = ?',
+                                 (f'{self.table_name}:columns_config',)).fetchone()
+        return [ColumnConfig(**c) for c in json.loads(row[0])] if row else []
+
+    def _save_config(self):
+        value = json.dumps([c.model_dump() for c in self.columns_config], ensure_ascii=False)
+        with self._conn:
+            self._conn.execute(f'INSERT OR REPLACE INTO {_META_TABLE} (key, value) VALUES (?, ?)',
+                               (f'{self.table_name}:columns_config', value))
+
+    def _validate_columns(self):
+        missing = {col.prop for col in self.columns_config} - set(self._columns)
+        if missing:
+            raise ValueError(f"列配置中定义的字段在数据表中不存在: {missing}")
+
+    # ---------- 存储访问 ----------
+
+    def _read(self, sql: str, params: Any = ()) -> Tuple[List[tuple], List[str]]:
+        """执行查询，返回 (行, 列名)"""
+        if self._memory:
+            with self._lock:
+                cursor = self._conn.execute(sql, params)
+                return cursor.fetchall(), [d[0] for d in cursor.description or ()]
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+            with self._lock:
+                self._read_conns.append(conn)
+        cursor = conn.execute(sql, params)
+        return cursor.fetchall(), [d[0] for d in cursor.description or ()]
+
+    def _read_frame(self, sql: str, params: Any = ()) -> pd.DataFrame:
+        rows, names = self._read(sql, params)
+        return pd.DataFrame.from_records(rows, columns=names)
+
+    def _select_columns(self) -> str:
+        return ', '.join(_quote(c) for c in self._columns)
+
+    def _changed(self):
+        """写入后使分页位置和计数缓存失效"""
+        self._version += 1
+        self._page_keys.clear()
+        self._counts.clear()
+
+    def _count(self, where: str, params: List[Any]) -> int:
+        key = (where, tuple(params), self._version)
+        count = self._counts.get(key)
+        if count is None:
+            sql = f'SELECT COUNT(*) FROM {self._table}' + (f' WHERE {where}' if where else '')
+            count = self._read(sql, params)[0][0][0]
+            if len(self._counts) >= _KEYSET_CACHE_SIZE:
+                self._counts.clear()
+            self._counts[key] = count
+        return count
+
+    @property
+    def total_count(self) -> int:
+        return self._count('', [])
+
+    @property
+    def dataframe(self) -> pd.DataFrame:
+        """完整的 DataFrame（会读取所有行，仅用于兼容，大表上应避免使用）"""
+        return self._read_frame(f'SELECT {self._select_columns()} FROM {self._table} ORDER BY {_ROW}')
+
+    def _plan_frame(self, columns: List[str], filter_dict: Dict[str, Any]) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+        columns = [c for c in columns if c in self._columns]
+        frame = self._read_frame(
+            f'SELECT {", ".join(_quote(c) for c in columns) or "1"} FROM {self._table} ORDER BY {_ROW}')
+        return frame[columns], {'storage': 'sqlite'}
+
+    def memory_usage(self, exact: bool = False) -> Dict[str, Any]:
+        """内存占用：内存数据库的页面计入列数据（含索引），文件数据库计入 mapped（由操作系统缓存）
+
+        与 DataTable 一样不加锁（内存预算检查时会统计其他表格），sqlite3 的连接本身可跨线程使用。
+        """
+        usage = empty_usage()
+        size = self._conn.execute('SELECT page_count * page_size FROM pragma_page_count(), pragma_page_size()').fetchone()[0]
+        if self._memory:
+            usage['columns'] = size
+        else:
+            usage['mapped'] = size
+        return finish_usage(usage)
+
+    def shed_caches(self) -> int:
+        self._page_keys.clear()
+        self._counts.clear()
+        return 0
+
+    def distinct_values(self, column: str) -> List[Any]:
+        if column not in self._columns:
+            return []
+        rows, _ = self._read(
+            f'SELECT DISTINCT {_quote(column)} FROM {self._table} WHERE {_quote(column)} IS NOT NULL')
+        return [row[0] for row in rows]
+
+    def _update_column_options(self) -> bool:
+        """用 COUNT(DISTINCT) 和 DISTINCT 统计 select 类型列的选项（有索引时只读取索引）"""
+        columns_updated = False
+        for col_config in self.columns_config:
+            if col_config.filterType not in ['multi-select', 'select'] or col_config.prop not in self._columns:
+                continue
+            column = _quote(col_config.prop)
+            unique_count = self._read(f'SELECT COUNT(DISTINCT {column}) FROM {self._table}')[0][0][0]
+            if unique_count > 100:
+                col_config.options = None
+                col_config.filterType = 'text'
+                columns_updated = True
+                continue
+            options = sorted(str(v) for v in self.distinct_values(col_config.prop))
+            if col_config.options != options:
+                col_config.options = options
+                columns_updated = True
+        return columns_updated
+
+    # ---------- 筛选条件翻译 ----------
+
+    def _where(self, filters: Optional[FilterParams]) -> Tuple[str, List[Any]]:
+        """把筛选条件翻译为 WHERE 子句和参数（字段之间为 AND），没有有效条件时子句为空"""
+        clauses: List[str] = []
+        params: List[Any] = []
+        for field_name, filter_value in self._get_filter_dict(filters).items():
+            if field_name not in self._columns:
+                continue
+            col_config = self._config(field_name)
+            if not col_config or not col_config.filterable:
+                continue
+            clause = self._field_clause(field_name, filter_value, col_config, params)
+            if clause:
+                clauses.append(clause)
+        return ' AND '.join(clauses), params
+
+    def _field_clause(self, field_name: str, filter_value: Any, col_config: ColumnConfig,
+                      params: List[Any]) -> Optional[str]:
+        """单个字段的条件（参数追加到 params），条件为空时返回 None；语义与 DataTable._field_mask 相同"""
+        column = _quote(field_name)
+        if col_config.filterType == 'number':
+            return self._number_clause(column, filter_value, params)
+
+        if col_config.filterType in ('text', 'date'):
+            if not (isinstance(filter_value, str) and filter_value):
+                return None
+            if col_config.filterType == 'date' and field_name != 'ts':
+                params.append(filter_value)
+                return f'CAST({column} AS TEXT) = ?'
+            if col_config.filterType == 'date':
+                column = f'nt_ts({column})'
+            elif col_config.type == 'bytes':
+                column = f'nt_hex({column})'
+            if _REGEX_CHARS.intersection(filter_value):
+                params.append(filter_value)
+                return f'{column} REGEXP ?'
+            params.append(_like_pattern(filter_value))
+            return f"{column} LIKE ? ESCAPE '\\'"
+
+        if col_config.filterType in ('multi-select', 'select'):
+            if isinstance(filter_value, list):
+                values = filter_value
+            elif filter_value is not None and filter_value != '':
+                values = [filter_value]
+            else:
+                return None
+            if not values:
+                return None
+            params.extend(_sql_value(v) for v in values)
+            return f'{column} IN ({", ".join("?" * len(values))})'
+        return None
+
+    def _number_clause(self, column: str, filter_value: Any, params: List[Any]) -> Optional[str]:
+        conditions, is_or = self._number_conditions(filter_value)
+        terms, term_params = [], []
+        for operator, value in conditions:
+            if operator not in _NUMBER_OPERATORS:
+                if is_or:
+                    # 无法识别的运算符在 DataTable 中匹配所有行，OR 组合整体不筛选
+                    return None
+                continue
+            terms.append(f'{column} {operator} ?')
+            term_params.append(value)
+        if not terms:
+            return None
+        params.extend(term_params)
+        return '(' + (' OR ' if is_or else ' AND ').join(terms) + ')'
+
+    def _order_by(self, sort_by: Optional[str], ascending: bool) -> str:
+        if sort_by is None:
+            return f'ORDER BY {_ROW}'
+        direction = 'ASC' if ascending else 'DESC'
+        return f'ORDER BY {_quote(sort_by)} {direction} NULLS LAST, {_ROW}'
+
+    def _keyset_clause(self, sort_by: Optional[str], ascending: bool,
+                       boundary: Tuple[Any, int]) -> Tuple[str, List[Any]]:
+        """从上一页最后一行 (排序值, 行号) 之后开始的条件（与 _order_by 的顺序一致）"""
+        value, row = boundary
+        if sort_by is None:
+            return f'{_ROW} > ?', [row]
+        column = _quote(sort_by)
+        if value is None:
+            return f'({column} IS NULL AND {_ROW} > ?)', [row]
+        operator = '>' if ascending else '<'
+        return (f'({column} {operator} ? OR ({column} = ? AND {_ROW} > ?) OR {column} IS NULL)',
+                [value, value, row])
+
+    # ---------- 查询 ----------
+
+    def get_list(self,
+                 filters: Optional[FilterParams] = None,
+                 page: int = 1,
+                 page_size: int = 100,
+                 sort_by: Optional[str] = None,
+                 sort_order: Optional[str] = None) -> Dict[str, Any]:
+        query_start = stage_start = time.perf_counter()
+        where, params = self._where(filters)
+        total_count = self._count(where, params)
+        stage_end = time.perf_counter()
+        self._observe('get_list', 'filter', stage_end - stage_start)
+        stage_start = stage_end
+
+        page_df = pd.DataFrame(columns=self._columns)
+        start_index = (page - 1) * page_size
+        if start_index < total_count:
+            sort_column = sort_by if sort_by in self._columns else None
+            ascending = sort_order == 'ascending' if sort_order else True
+            page_df = self._read_page(where, params, sort_column, ascending, page, page_size)
+        self._observe('get_list', 'slice', time.perf_counter() - stage_start)
+
+        stage_start = time.perf_counter()
+        data_list = self._serialize_records(page_df)
+        stage_end = time.perf_counter()
+        self._observe('get_list', 'serialize', stage_end - stage_start)
+        self._check_slow_query(stage_end - query_start, filters, page, page_size, sort_by, sort_order)
+        return {
+            "list": data_list,
+            "total": total_count,
+            "page": page,
+            "pageSize": page_size
+        }
+
+    def _page_sql(self, where: str, params: List[Any], sort_by: Optional[str], ascending: bool,
+                  page: int, page_size: int) -> Tuple[str, List[Any], str]:
+        """分页查询的 SQL、参数和方式（上一页的位置已知时为 keyset，否则为 offset）"""
+        version = self._version
+        key = (where, tuple(params), sort_by, ascending, page_size, page - 1, version)
+        boundary = self._page_keys.get(key) if page > 1 else None
+        conditions = [f'({where})'] if where else []
+        params = list(params)
+        if boundary is not None:
+            clause, clause_params = self._keyset_clause(sort_by, ascending, boundary)
+            conditions.append(clause)
+            params.extend(clause_params)
+            tail, method = 'LIMIT ?', 'keyset'
+            params.append(page_size)
+        else:
+            tail, method = 'LIMIT ? OFFSET ?', 'offset'
+            params.extend([page_size, (page - 1) * page_size])
+        sql = (f'SELECT {_ROW}, {self._select_columns()} FROM {self._table}'
+               + (f' WHERE {" AND ".join(conditions)}' if conditions else '')
+               + f' {self._order_by(sort_by, ascending)} {tail}')
+        return sql, params, method
+
+    def _read_page(self, where: str, params: List[Any], sort_by: Optional[str], ascending: bool,
+                   page: int, page_size: int) -> pd.DataFrame:
+        version = self._version
+        sql, sql_params, _ = self._page_sql(where, params, sort_by, ascending, page, page_size)
+        rows, names = self._read(sql, sql_params)
+        if rows:
+            last = rows[-1]
+            value = last[names.index(sort_by)] if sort_by is not None else None
+            self._page_keys[(where, tuple(params), sort_by, ascending, page_size, page, version)] = (value, last[0])
+            while len(self._page_keys) > _KEYSET_CACHE_SIZE:
+                try:
+                    self._page_keys.popitem(last=False)
+                except KeyError:  # 同时被写入清空
+                    break
+        return pd.DataFrame.from_records([row[1:] for row in rows], columns=names[1:])
+
+    def explain(self,
+                filters: Optional[FilterParams] = None,
+                page: int = 1,
+                page_size: int = 100,
+                sort_by: Optional[str] = None,
+                sort_order: Optional[str] = None) -> Dict[str, Any]:
+        """get_list 的执行计划：生成的 SQL、参数和 SQLite 的 EXPLAIN QUERY PLAN"""
+        total_start = time.perf_counter()
+        where, params = self._where(filters)
+        start = time.perf_counter()
+        filtered_count = self._count(where, params)
+        count_seconds = time.perf_counter() - start
+        sort_column = sort_by if sort_by in self._columns else None
+        ascending = sort_order == 'ascending' if sort_order else True
+        sql, sql_params, method = self._page_sql(where, params, sort_column, ascending, page, page_size)
+        plan, _ = self._read(f'EXPLAIN QUERY PLAN {sql}', sql_params)
+        start_index = (page - 1) * page_size
+        sort_plan = None
+        if sort_by:
+            sort_plan = {'column': sort_by, 'order': sort_order or 'ascending'}
+            if sort_column is None:
+                sort_plan['skipped'] = '列不存在'
+        return {
+            'rows': self.total_count,
+            'source': {'storage': 'sqlite', 'sql': sql, 'params': sql_params,
+                       'paging': method, 'plan': [row[-1] for row in plan]},
+            'filters': self._canonical_filters(filters),
+            'predicates': [{'column': k, 'condition': v} for k, v in self._canonical_filters(filters).items()],
+            'filtered_rows': filtered_count,
+            'sort': sort_plan,
+            'page': {
+                'page': page,
+                'pageSize': page_size,
+                'offset': start_index,
+                'rows': max(0, min(page_size, filtered_count - start_index)),
+            },
+            'ms': {
+                'filter': round(count_seconds * 1000, 3),
+                'total': round((time.perf_counter() - total_start) * 1000, 3),
+            },
+        }
+
+    def get_row_position(self, row_id: Any, filters: Optional[FilterParams] = None) -> Dict[str, Any]:
+        if 'id' not in self._columns:
+            return {"found": False, "position": -1}
+        where, params = self._where(filters)
+        condition = f' AND ({where})' if where else ''
+        rows, _ = self._read(
+            f'SELECT {_ROW} FROM {self._table} WHERE "id" = ?{condition} ORDER BY {_ROW} LIMIT 1',
+            [_sql_value(row_id)] + params)
+        if not rows:
+            return {"found": False, "position": -1}
+        # 位置 = 该行之前满足筛选条件的行数（自然顺序）
+        position = self._read(f'SELECT COUNT(*) FROM {self._table} WHERE {_ROW} < ?{condition}',
+                              [rows[0][0]] + params)[0][0][0]
+        return {"found": True, "position": position}
+
+    def get_row_detail(self, row_id: Any) -> List[Dict[str, Any]]:
+        start = time.perf_counter()
+        row_df = pd.DataFrame()
+        if 'id' in self._columns:
+            row_df = self._read_frame(
+                f'SELECT {self._select_columns()} FROM {self._table} WHERE "id" = ? ORDER BY {_ROW} LIMIT 1',
+                [_sql_value(row_id)])
+        if row_df.empty:
+            raise ValueError(f"未找到ID为 {row_id} 的记录")
+        self._observe('get_row_detail', 'lookup', time.perf_counter() - start)
+
+        return self._row_detail(row_df)
+
+    # ---------- 写入 ----------
+
+    def _add_columns_config(self, frame: pd.DataFrame, batch_config: List[ColumnConfig]) -> List[str]:
+        """为 frame 中表里还没有的列添加列配置（优先使用转换时推断的配置），返回新增的列"""
+        added_columns = [c for c in frame.columns if c not in self._columns]
+        if added_columns:
+            new_columns_config = [c for c in batch_config if c.prop in added_columns]
+            inferred = {c.prop for c in new_columns_config}
+            missing = [c for c in added_columns if c not in inferred and self._config(c) is None]
+            if missing:
+                new_columns_config.extend(generate_columns_config_from_dataframe(frame[missing]))
+            self.columns_config.extend(new_columns_config)
+        return added_columns
+
+    def _after_schema_change(self):
+        self._ensure_indexes()
+        self._save_config()
+
+    def add_data(self, new_data: Union[Dict[str, Any], List[Dict[str, Any]], pd.DataFrame, PreparedBatch]) -> Dict[str, Any]:
+        batch = self._prepare_batch(new_data, self._columns)
+        with self._write_lock('add_data'):
+            new_df = batch.frame
+            if BUDGET.limit is not None and self._memory:
+                BUDGET.reserve(self, sum(frame_bytes(new_df)[0].values()))
+            added_columns = self._add_columns_config(new_df, batch.columns_config)
+            columns_updated = bool(added_columns)
+
+            if 'id' in self._columns or 'id' in new_df.columns:
+                max_id = None
+                if 'id' in self._columns:
+                    max_id = self._read(f'SELECT MAX("id") FROM {self._table}')[0][0][0]
+                self._fill_missing_ids(new_df, 0 if max_id is None else max_id)
+
+            with self._conn:
+                self._ensure_columns(new_df)
+                self._insert(new_df)
+            if added_columns:
+                self._after_schema_change()
+            self._changed()
+            if self._refresh_column_options('add_data', new_df):
+                columns_updated = True
+            ROWS_INGESTED.inc(len(new_df), table=self.table_id)
+
+            return {
+                "success": True,
+                "added_count": len(new_df),
+                "columns_updated": columns_updated,
+                "added_columns": added_columns
+            }
+
+    def update_dataframe(self, new_dataframe: pd.DataFrame, append_only: Optional[bool] = None) -> Dict[str, Any]:
+        """用 new_dataframe 更新数据表
+
+        new_dataframe 只是在当前数据之后追加了行时（append_only=True，或自动检测到已存储的 id 是其前缀）
+        只插入新增的行；否则清空数据表后重新写入。
+        """
+        with self._write_lock('update_dataframe'):
+            if new_dataframe is None:
+                raise ValueError("DataFrame不能为None")
+            stored_count = self.total_count
+            start = None
+            if append_only is not False and len(new_dataframe) >= stored_count:
+                if append_only:
+                    start = stored_count
+                elif 'id' in new_dataframe.columns and 'id' in self._columns:
+                    rows, _ = self._read(f'SELECT "id" FROM {self._table} ORDER BY {_ROW}')
+                    stored_ids = np.array([row[0] for row in rows], dtype=object)
+                    prefix = new_dataframe['id'].iloc[:stored_count].to_numpy(dtype=object)
+                    if np.array_equal(stored_ids, prefix):
+                        start = stored_count
+
+            # 只转换要写入的行（追加时为新增的行），无法按声明的类型保存时抛出 SchemaError，此时尚未修改任何状态
+            inserted = _cast_to_schema(new_dataframe.iloc[start or 0:], self.columns_config)
+            added_columns = self._add_columns_config(new_dataframe, [])
+            with self._conn:
+                if start is None:
+                    self._conn.execute(f'DELETE FROM {self._table}')
+                self._ensure_columns(inserted)
+                self._insert(inserted)
+            if added_columns:
+                self._after_schema_change()
+            self._changed()
+            rows = new_dataframe.iloc[start:] if start is not None else None
+            columns_updated = self._refresh_column_options('update_dataframe', rows) or bool(added_columns)
+            result = {
+                "success": True,
+                "columns_updated": columns_updated,
+                "total_count": self.total_count,
+                "incremental": start is not None
+            }
+            if start is not None:
+                result["appended_count"] = len(new_dataframe) - start
+            return result
+
+    def _locate_rows(self, ids: List[Any]) -> Dict[Any, np.ndarray]:
+        """每个 id 对应的行号（使用 id 索引），不存在的 id 不在结果中"""
+        if 'id' not in self._columns:
+            return {}
+        wanted = {}
+        for row_id in ids:
+            wanted.setdefault(_sql_value(row_id), []).append(row_id)
+        found: Dict[Any, List[int]] = {}
+        keys = list(wanted)
+        for i in range(0, len(keys), _MAX_PARAMS):
+            chunk = keys[i:i + _MAX_PARAMS]
+            rows, _ = self._read(
+                f'SELECT "id", {_ROW} FROM {self._table} WHERE "id" IN ({", ".join("?" * len(chunk))}) ORDER BY {_ROW}',
+                chunk)
+            for row_id, row in rows:
+                found.setdefault(row_id, []).append(row)
+        located = {}
+        for key, rows in found.items():
+            for row_id in wanted.get(key, []):
+                located[row_id] = np.array(rows, dtype=np.int64)
+        return located
+
+    def _apply_updates(self, operation: str, updates: Dict[Any, Dict[str, Any]],
+                       located: Dict[Any, np.ndarray]) -> Tuple[int, bool]:
+        """按行号执行 UPDATE，返回 (更新的行数, 列配置是否有更新)"""
+        fields = [{k: v for k, v in values.items() if k != 'id'} for row_id, values in updates.items()]
+        if not any(fields):
+            return 0, False
+        changes = pd.DataFrame(fields)
+        self._convert_special_columns(changes)
+        added_columns = self._add_columns_config(changes, [])
+
+        updated_count = 0
+        with self._conn:
+            self._ensure_columns(changes[added_columns])
+            for i, (row_id, row_fields) in enumerate(zip(updates, fields)):
+                if not row_fields:
+                    continue
+                columns = list(row_fields)
+                values = [_sql_value(changes[c].iloc[i]) for c in columns]
+                assignments = ', '.join(f'{_quote(c)} = ?' for c in columns)
+                rows = located[row_id].tolist()
+                for j in range(0, len(rows), _MAX_PARAMS):
+                    chunk = rows[j:j + _MAX_PARAMS]
+                    self._conn.execute(
+                        f'UPDATE {self._table} SET {assignments} WHERE {_ROW} IN ({", ".join("?" * len(chunk))})',
+                        values + chunk)
+                updated_count += len(rows)
+        if added_columns:
+            self._after_schema_change()
+        self._changed()
+        columns_updated = bool(added_columns)
+        if self._refresh_column_options(operation, changes):
+            columns_updated = True
+        return updated_count, columns_updated
+
+    def _drop_positions(self, positions: np.ndarray):
+        rows = positions.tolist()
+        with self._conn:
+            for i in range(0, len(rows), _MAX_PARAMS):
+                chunk = rows[i:i + _MAX_PARAMS]
+                self._conn.execute(f'DELETE FROM {self._table} WHERE {_ROW} IN ({", ".join("?" * len(chunk))})', chunk)
+        self._changed()
+
+    def close(self):
+        with self._lock:
+            for conn in self._read_conns:
+                conn.close()
+            self._read_conns.clear()
+            self._conn.close()
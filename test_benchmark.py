@@ -0,0 +1,73 @@
+"""测试性能基准脚本
+
+用很小的数据量运行一遍全部基准，验证结果结构和基线比较
+"""
+
+import copy
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+import polars_table
+from benchmark import compare, run_benchmarks
+
+
+def test_benchmark_smoke_and_compare():
+    """测试基准运行与回退检测"""
+    print("=" * 60)
+    print("测试 1: 基准运行与比较")
+    print("=" * 60)
+
+    result = run_benchmarks([2000], repeat=2, batch_size=50, isolate=False)
+    operations = result['results']['2000']['operations']
+    print(f"操作: {sorted(operations)}")
+    for name in ['get_list:unfiltered', 'get_list:deep_page', 'get_list:filter:number:id',
+                 'get_list:filter:multi-select:order_status', 'get_list:filter:ts:ts',
+                 'get_list:filter:bytes:payload', 'get_row_position', 'get_row_detail',
+                 '_update_column_options', 'add_data', 'update_dataframe']:
+        assert name in operations, name
+    assert operations['add_data']['rows_per_sec'] > 0
+    assert result['results']['2000']['peak_rss_mb'] > 0
+
+    # 基线比当前快一倍时，应检测为回退
+    baseline = copy.deepcopy(result)
+    for stats in baseline['results']['2000']['operations'].values():
+        stats['p50_ms'] /= 2
+    rows = compare(result, baseline, threshold=0.2)
+    assert all(r['regression'] for r in rows if r['unit'] == 'p50_ms')
+    assert not any(r['regression'] for r in compare(result, result))
+    print("✓ 测试通过\n")
+
+
+def test_engines():
+    """测试其他存储引擎运行同一套基准，结果可与 pandas 的基线比较"""
+    print("=" * 60)
+    print("测试 2: 存储引擎")
+    print("=" * 60)
+
+    baseline = run_benchmarks([2000], repeat=1, batch_size=50, isolate=False)
+    engines = ['sqlite'] + (['polars'] if polars_table._pl is not None else [])
+    for engine in engines:
+        result = run_benchmarks([2000], repeat=1, batch_size=50, isolate=False, engine=engine)
+        assert result['meta']['engine'] == engine
+        rows = compare(result, baseline)
+        print(f"{engine}: {len(rows)} 项可比较")
+        assert {r['operation'] for r in rows} >= {'get_list:unfiltered', 'get_list:sorted:order_amount', 'add_data'}
+    print("✓ 测试通过\n")
+
+
+if __name__ == '__main__':
+    print("\n开始测试性能基准...\n")
+
+    try:
+        test_benchmark_smoke_and_compare()
+        test_engines()
+
+        print("=" * 60)
+        print("所有测试通过！✓")
+        print("=" * 60)
+
+    except AssertionError as e:
+        print(f"\n❌ 测试失败: {e}")
+        sys.exit(1)
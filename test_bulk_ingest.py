@@ -0,0 +1,144 @@
+"""测试批量写入：/bulk 的按列 JSON、NDJSON、CSV 请求体，以及 add_data 的 DataFrame 路径"""
+
+import asyncio
+import json
+import os
+import sys
+
+import pandas as pd
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+import bulk_ingest
+from data_generator import generate_batch_records
+from data_source import DataSource
+from data_table import DataTable, generate_columns_config_from_dataframe
+from loadtest import create_app
+
+
+_BASE = pd.DataFrame(generate_batch_records(1, 100))
+
+
+def _table():
+    return DataTable(_BASE.copy(), generate_columns_config_from_dataframe(_BASE))
+
+
+def _wire_records(start, count):
+    """请求体中的记录：bytes 为十六进制字符串，ts 为时间字符串，没有 id"""
+    records = generate_batch_records(start, count)
+    for record in records:
+        del record['id']
+        for key, value in record.items():
+            if isinstance(value, bytes):
+                record[key] = value.hex()
+        record['ts'] = pd.Timestamp(record['ts'], unit='s').strftime('%Y-%m-%d %H:%M:%S')
+    return records
+
+
+def test_dataframe_path():
+    """测试 add_data 传入 DataFrame 与字典列表的结果一致"""
+    print("=" * 60)
+    print("测试 1: add_data 的 DataFrame 路径")
+    print("=" * 60)
+
+    records = _wire_records(1000, 500)
+    by_dict, by_frame = _table(), _table()
+    by_dict.add_data(records)
+    result = by_frame.add_data(pd.DataFrame(records))
+    print(f"DataFrame 写入: {result}")
+    assert result['added_count'] == 500
+    pd.testing.assert_frame_equal(by_dict.dataframe, by_frame.dataframe)
+    tail = by_frame.dataframe.iloc[100:]
+    assert list(tail['id']) == list(range(101, 601))
+    assert isinstance(tail['payload'].iloc[0], bytes)
+    assert tail['ts'].dtype.kind in 'if'
+
+    # 部分行带 id 时只为缺少的行生成
+    frame = pd.DataFrame({'id': [None, 5000, None], 'order_status': ['a', 'b', 'c']})
+    by_frame.add_data(frame)
+    assert list(by_frame.dataframe['id'].iloc[-3:]) == [601, 5000, 602]
+    print("✓ 测试通过\n")
+
+
+def test_bulk_formats():
+    """测试 /bulk 的三种文本格式写入结果与 /add 一致"""
+    print("=" * 60)
+    print("测试 2: /bulk 请求格式")
+    print("=" * 60)
+
+    records = _wire_records(1000, 250)
+    columns = {key: [r[key] for r in records] for key in records[0]}
+    ndjson = '\n'.join(json.dumps(r, ensure_ascii=False) for r in records) + '\n'
+    csv = pd.DataFrame(records).to_csv(index=False)
+
+    expected = _table()
+    expected.add_data(records)
+    for content_type, body in [('application/json', json.dumps(columns)),
+                               ('application/x-ndjson', ndjson),
+                               ('text/csv; charset=utf-8', csv)]:
+        table = _table()
+        client = TestClient(create_app(table, 'bulk-test'))
+        response = client.post('/bulk?chunk_rows=100', content=body.encode('utf-8'),
+                               headers={'x-table-id': 'bulk-test', 'content-type': content_type})
+        data = response.json()['data']
+        print(f"{content_type}: {data}")
+        assert response.status_code == 200 and data['added_count'] == 250
+        assert data['chunks'] == (1 if content_type == 'application/json' else 3)
+        pd.testing.assert_frame_equal(table.dataframe, expected.dataframe, check_dtype=False)
+
+    client = TestClient(create_app(_table(), 'bulk-test'))
+    headers = {'x-table-id': 'bulk-test'}
+    assert client.post('/bulk', content=b'x', headers={**headers, 'content-type': 'text/plain'}).status_code == 415
+    bad = client.post('/bulk', content=b'{"a": [1, 2], "b": [1]}', headers={**headers, 'content-type': 'application/json'})
+    print(f"各列长度不一致: {bad.json()['detail']}")
+    assert bad.status_code == 400
+    if bulk_ingest._pa is None:
+        response = client.post('/bulk', content=b'', headers={**headers, 'content-type': 'application/vnd.apache.arrow.stream'})
+        assert response.status_code == 415 and 'pyarrow' in response.json()['detail']
+    print("✓ 测试通过\n")
+
+
+def test_ndjson_stream_chunks():
+    """测试 NDJSON 跨网络分块的行被正确拼接，解析出错时保留已写入的块"""
+    print("=" * 60)
+    print("测试 3: NDJSON 流式分块")
+    print("=" * 60)
+
+    async def stream(parts):
+        for part in parts:
+            yield part
+
+    async def collect(parts, chunk_rows):
+        return [lines async for lines in bulk_ingest.iter_ndjson(stream(parts), chunk_rows)]
+
+    chunks = asyncio.run(collect([b'{"a": 1}\n{"a"', b': 2}\n\n{"a": 3}', b'\n{"a": 4}'], 3))
+    assert chunks == [[b'{"a": 1}', b'{"a": 2}', b'{"a": 3}'], [b'{"a": 4}']]
+
+    source = DataSource(data_table=_table(), name='bulk-stream')
+    writer = bulk_ingest.BulkWriter(source)
+    body = [json.dumps(r).encode() + b'\n' for r in _wire_records(1, 20)] + [b'not json\n']
+    try:
+        asyncio.run(writer.ingest('ndjson', stream(body), chunk_rows=10))
+        raise AssertionError('错误的行应当报错')
+    except bulk_ingest.BulkFormatError as e:
+        print(f"解析失败: {e}, 已写入 {writer.added_count} 行")
+    assert writer.added_count == 20 and writer.chunks == 2 and source.table.total_count == 120
+    print("✓ 测试通过\n")
+
+
+if __name__ == '__main__':
+    print("\n开始测试批量写入...\n")
+
+    try:
+        test_dataframe_path()
+        test_bulk_formats()
+        test_ndjson_stream_chunks()
+
+        print("=" * 60)
+        print("所有测试通过！✓")
+        print("=" * 60)
+
+    except AssertionError as e:
+        print(f"\n❌ 测试失败: {e}")
+        sys.exit(1)
@@ -10,9 +10,21 @@ import os
 # 添加 backend 目录到路径
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'backend'))
 
+import pytest
+
+import polars_table
 from data_table import DataTable, ColumnConfig
+from polars_table import PolarsDataTable
+
+# 同样的测试在各个后端上运行（未安装 polars 时跳过 PolarsDataTable）
+_BACKENDS = [
+    pytest.param(DataTable, id='pandas'),
+    pytest.param(PolarsDataTable, id='polars',
+                 marks=pytest.mark.skipif(polars_table._pl is None, reason='未安装 polars')),
+]
 
-def test_column_order_preservation():
+@pytest.mark.parametrize('table_class', _BACKENDS)
+def test_column_order_preservation(table_class):
     """测试列顺序保持功能"""
     print("=" * 60)
     print("测试 1: 基本列顺序保持")
@@ -33,7 +45,7 @@ def test_column_order_preservation():
     ]
     
     # 创建 DataTable 实例
-    table = DataTable(initial_data, initial_columns)
+    table = table_class(initial_data, initial_columns)
     
     # 获取初始列顺序
     initial_config = table.get_columns_config()
@@ -62,7 +74,8 @@ def test_column_order_preservation():
     print("✓ 测试通过：列顺序与传入的 DataFrame 列顺序一致\n")
 
 
-def test_add_new_columns():
+@pytest.mark.parametrize('table_class', _BACKENDS)
+def test_add_new_columns(table_class):
     """测试添加新列时的顺序"""
     print("=" * 60)
     print("测试 2: 添加新列时的顺序保持")
@@ -79,7 +92,7 @@ def test_add_new_columns():
         ColumnConfig(prop='name', label='Name', type='string')
     ]
     
-    table = DataTable(initial_data, initial_columns)
+    table = table_class(initial_data, initial_columns)
     
     # 添加新列，顺序为: email, id, name, age
     new_data = pd.DataFrame({
@@ -104,7 +117,8 @@ def test_add_new_columns():
     print("✓ 测试通过：新列按传入顺序正确添加\n")
 
 
-def test_remove_columns():
+@pytest.mark.parametrize('table_class', _BACKENDS)
+def test_remove_columns(table_class):
     """测试删除列时的处理"""
     print("=" * 60)
     print("测试 3: 删除列时的处理")
@@ -125,7 +139,7 @@ def test_remove_columns():
         ColumnConfig(prop='email', label='Email', type='string')
     ]
     
-    table = DataTable(initial_data, initial_columns)
+    table = table_class(initial_data, initial_columns)
     
     # 删除 age 列，保留其他列，顺序为: email, id, name
     new_data = pd.DataFrame({
@@ -151,7 +165,8 @@ def test_remove_columns():
     print("✓ 测试通过：删除列后顺序正确，已删除的列已移除\n")
 
 
-def test_complex_scenario():
+@pytest.mark.parametrize('table_class', _BACKENDS)
+def test_complex_scenario(table_class):
     """测试复杂场景：添加、删除、重排序同时进行"""
     print("=" * 60)
     print("测试 4: 复杂场景（添加、删除、重排序）")
@@ -170,7 +185,7 @@ def test_complex_scenario():
         ColumnConfig(prop='age', label='Age', type='number')
     ]
     
-    table = DataTable(initial_data, initial_columns)
+    table = table_class(initial_data, initial_columns)
     
     # 复杂更新：删除 age，添加 email 和 phone，重排序为: phone, email, id, name
     new_data = pd.DataFrame({
@@ -202,7 +217,8 @@ def test_complex_scenario():
     print("✓ 测试通过：复杂场景处理正确\n")
 
 
-def test_get_columns_config_order():
+@pytest.mark.parametrize('table_class', _BACKENDS)
+def test_get_columns_config_order(table_class):
     """测试 get_columns_config 返回的顺序"""
     print("=" * 60)
     print("测试 5: get_columns_config 返回顺序验证")
@@ -221,7 +237,7 @@ def test_get_columns_config_order():
         ColumnConfig(prop='m_col', label='M', type='number')
     ]
     
-    table = DataTable(data, columns)
+    table = table_class(data, columns)
     
     # 获取列配置
     config = table.get_columns_config()
@@ -238,11 +254,13 @@ if __name__ == '__main__':
     print("\n开始测试列顺序修复功能...\n")
     
     try:
-        test_column_order_preservation()
-        test_add_new_columns()
-        test_remove_columns()
-        test_complex_scenario()
-        test_get_columns_config_order()
+        for table_class in [DataTable] + ([PolarsDataTable] if polars_table._pl is not None else []):
+            print(f"后端: {table_class.__name__}")
+            test_column_order_preservation(table_class)
+            test_add_new_columns(table_class)
+            test_remove_columns(table_class)
+            test_complex_scenario(table_class)
+            test_get_columns_config_order(table_class)
         
         print("=" * 60)
         print("所有测试通过！✓")
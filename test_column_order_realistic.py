@@ -10,9 +10,21 @@ import os
 # 添加 backend 目录到路径
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'backend'))
 
+import pytest
+
+import polars_table
 from data_table import DataTable, ColumnConfig
+from polars_table import PolarsDataTable
+
+# 同样的测试在各个后端上运行（未安装 polars 时跳过 PolarsDataTable）
+_BACKENDS = [
+    pytest.param(DataTable, id='pandas'),
+    pytest.param(PolarsDataTable, id='polars',
+                 marks=pytest.mark.skipif(polars_table._pl is None, reason='未安装 polars')),
+]
 
-def test_realistic_scenario():
+@pytest.mark.parametrize('table_class', _BACKENDS)
+def test_realistic_scenario(table_class):
     """测试实际场景：从不同数据源更新，列顺序不同"""
     print("=" * 60)
     print("实际场景测试：不同数据源的列顺序")
@@ -34,7 +46,7 @@ def test_realistic_scenario():
         ColumnConfig(prop='value', label='Value', type='number')
     ]
     
-    table = DataTable(initial_data, initial_columns)
+    table = table_class(initial_data, initial_columns)
     initial_config = table.get_columns_config()
     initial_order = [col['prop'] for col in initial_config['columns']]
     print(f"  初始列顺序: {initial_order}")
@@ -106,7 +118,8 @@ def test_realistic_scenario():
     print("=" * 60)
 
 
-def test_edge_cases():
+@pytest.mark.parametrize('table_class', _BACKENDS)
+def test_edge_cases(table_class):
     """测试边界情况"""
     print("\n" + "=" * 60)
     print("边界情况测试")
@@ -116,7 +129,7 @@ def test_edge_cases():
     print("\n测试 1: 单列数据")
     single_col_data = pd.DataFrame({'id': [1, 2, 3]})
     single_col_config = [ColumnConfig(prop='id', label='ID', type='number')]
-    table = DataTable(single_col_data, single_col_config)
+    table = table_class(single_col_data, single_col_config)
     config = table.get_columns_config()
     assert [col['prop'] for col in config['columns']] == ['id'], "单列顺序错误"
     print("  ✓ 单列数据测试通过")
@@ -128,7 +141,7 @@ def test_edge_cases():
         ColumnConfig(prop='id', label='ID', type='number'),
         ColumnConfig(prop='name', label='Name', type='string')
     ]
-    table = DataTable(empty_data, empty_config)
+    table = table_class(empty_data, empty_config)
     config = table.get_columns_config()
     assert [col['prop'] for col in config['columns']] == ['id', 'name'], "空 DataFrame 列顺序错误"
     print("  ✓ 空 DataFrame 测试通过")
@@ -140,7 +153,7 @@ def test_edge_cases():
         ColumnConfig(prop='old_col1', label='Old1', type='number'),
         ColumnConfig(prop='old_col2', label='Old2', type='string')
     ]
-    table = DataTable(old_data, old_config)
+    table = table_class(old_data, old_config)
     
     new_data = pd.DataFrame({'new_col1': [3, 4], 'new_col2': ['c', 'd']})
     result = table.update_dataframe(new_data)
@@ -159,8 +172,10 @@ if __name__ == '__main__':
     print("\n开始实际场景测试...\n")
     
     try:
-        test_realistic_scenario()
-        test_edge_cases()
+        for table_class in [DataTable] + ([PolarsDataTable] if polars_table._pl is not None else []):
+            print(f"后端: {table_class.__name__}")
+            test_realistic_scenario(table_class)
+            test_edge_cases(table_class)
         
         print("\n" + "=" * 60)
         print("所有实际场景测试通过！✓")
@@ -0,0 +1,137 @@
+"""测试写入数据的转换：在写锁之外转换，以及大批量在转换进程池中转换（结果经共享内存返回）"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+import data_table
+from conversion import ConversionPool, _run_packed, _unpack
+from data_generator import generate_batch_records
+from data_table import DataTable, PreparedBatch, generate_columns_config_from_dataframe
+from tiered_table import TieredDataTable
+
+_BASE = pd.DataFrame(generate_batch_records(1, 200))
+
+
+def _table():
+    return DataTable(_BASE.copy(), generate_columns_config_from_dataframe(_BASE))
+
+
+def _wire_records(start, count):
+    records = generate_batch_records(start, count)
+    for record in records:
+        del record['id']
+        record['payload'] = record['payload'].hex()
+        record['note_hex'] = 'ab' * 16
+    return records
+
+
+def _make_frame(rows):
+    return pd.DataFrame({'a': np.arange(rows), 'b': np.linspace(0, 1, rows), 's': ['x'] * rows})
+
+
+def test_pack_roundtrip():
+    """测试带外缓冲区经共享内存传回，结果与原数据一致且共享内存已释放"""
+    print("=" * 60)
+    print("测试 1: 共享内存传输")
+    print("=" * 60)
+
+    data, name, sizes = _run_packed(_make_frame, (1000,))
+    print(f"pickle 数据 {len(data)} 字节，带外缓冲区 {sizes}")
+    assert name is not None and sum(sizes) >= 1000 * 16
+    frame = _unpack((data, name, sizes))
+    pd.testing.assert_frame_equal(frame, _make_frame(1000))
+    frame.loc[0, 'a'] = -1  # 复制后的缓冲区可写
+    try:
+        from multiprocessing import shared_memory
+        shared_memory.SharedMemory(name=name)
+        raise AssertionError('共享内存应当已释放')
+    except FileNotFoundError:
+        pass
+    assert _unpack(_run_packed(dict, ())) == {}
+    print("✓ 测试通过\n")
+
+
+def test_convert_outside_lock():
+    """测试转换在写锁之外执行，新字段的列配置和特殊类型转换与之前一致"""
+    print("=" * 60)
+    print("测试 2: 写锁之外转换")
+    print("=" * 60)
+
+    table = _table()
+    owned = []
+    original = data_table.prepare_batch
+
+    def prepare(*args):
+        owned.append(table._lock._is_owned())
+        return original(*args)
+
+    data_table.prepare_batch = prepare
+    try:
+        result = table.add_data(_wire_records(1000, 50))
+    finally:
+        data_table.prepare_batch = original
+    print(f"add_data: {result}")
+    assert owned == [False]
+    assert result['added_columns'] == ['note_hex'] and result['columns_updated']
+    tail = table.dataframe.iloc[200:]
+    assert isinstance(tail['payload'].iloc[0], bytes) and tail['note_hex'].iloc[0] == b'\xab' * 16
+    assert next(c for c in table.columns_config if c.prop == 'note_hex').type == 'bytes'
+
+    # 已转换的批次直接写入；分层表在获取锁之前转换
+    batch = table._prepare_batch(_wire_records(2000, 10), table.dataframe.columns)
+    assert isinstance(batch, PreparedBatch) and len(batch) == 10
+    assert table.add_data(batch)['added_count'] == 10 and table.total_count == 260
+    tiered = TieredDataTable(_BASE.copy(), generate_columns_config_from_dataframe(_BASE), hot_rows=100, segment_rows=100)
+    assert tiered.add_data(_wire_records(1000, 150))['sealed_count'] > 0
+    print("✓ 测试通过\n")
+
+
+def test_process_pool():
+    """测试大批量在子进程中转换，结果与在当前进程中转换一致"""
+    print("=" * 60)
+    print("测试 3: 转换进程池")
+    print("=" * 60)
+
+    records = _wire_records(1000, 3000)
+    inline, pooled = _table(), _table()
+    inline.add_data(records)
+
+    pool = ConversionPool(max_workers=1, threshold_rows=1000)
+    assert not pool.should_offload(999) and pool.should_offload(1000)
+    original = data_table.CONVERSION_POOL
+    data_table.CONVERSION_POOL = pool
+    try:
+        result = pooled.add_data(records)
+        assert pool._executor is not None  # 经过了进程池
+        pooled.add_data(records[:10])       # 小批量在当前进程中转换
+    finally:
+        data_table.CONVERSION_POOL = original
+        pool.shutdown()
+    print(f"进程池转换: {result}")
+    assert result['added_count'] == 3000
+    pd.testing.assert_frame_equal(pooled.dataframe.iloc[:3200], inline.dataframe)
+    assert pooled.total_count == 3210
+    assert [c.prop for c in pooled.columns_config] == [c.prop for c in inline.columns_config]
+    print("✓ 测试通过\n")
+
+
+if __name__ == '__main__':
+    print("\n开始测试写入数据转换...\n")
+
+    try:
+        test_pack_roundtrip()
+        test_convert_outside_lock()
+        test_process_pool()
+
+        print("=" * 60)
+        print("所有测试通过！✓")
+        print("=" * 60)
+
+    except AssertionError as e:
+        print(f"\n❌ 测试失败: {e}")
+        sys.exit(1)
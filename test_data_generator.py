@@ -0,0 +1,62 @@
+"""测试数据生成器
+
+验证按列生成的 DataFrame 与逐条记录的格式一致，并且随机种子、额外列和取值数量可配置
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from data_generator import generate_batch_dataframe, generate_batch_records
+
+
+def test_batch_dataframe_format():
+    """测试列格式与记录格式一致"""
+    print("=" * 60)
+    print("测试 1: DataFrame 与记录格式")
+    print("=" * 60)
+
+    df = generate_batch_dataframe(99, 1000, seed=1)
+    records = generate_batch_records(99, 1000, seed=1)
+    assert list(df.columns) == list(records[0].keys())
+    assert df['id'].tolist() == [r['id'] for r in records] == list(range(99, 1099))
+    assert df['order_number'].iloc[0] == 'ORD0000000099'
+    assert all(isinstance(v, bytes) and len(v) == 16 for v in df['payload'])
+    assert df['order_date'].str.match(r'^\d{4}-\d{2}-\d{2}$').all()
+    # 相同种子生成相同的数据（ts 相对于当前时间，不比较）
+    for name in ['order_status', 'order_amount', 'payload', 'order_date']:
+        assert df[name].tolist() == [r[name] for r in records], name
+    assert generate_batch_dataframe(99, 1000, seed=2)['order_amount'].tolist() != df['order_amount'].tolist()
+    assert generate_batch_dataframe(10 ** 11, 2)['order_number'].iloc[0] == 'ORD100000000000'
+    print("✓ 测试通过\n")
+
+
+def test_batch_dataframe_extra_columns():
+    """测试额外列与取值数量"""
+    print("=" * 60)
+    print("测试 2: 额外列")
+    print("=" * 60)
+
+    df = generate_batch_dataframe(1, 5000, seed=3, extra_columns=4, cardinality=7)
+    assert len(df.columns) == 18
+    assert df['extra_1'].nunique() == 7 and df['extra_3'].nunique() == 7
+    assert df['extra_0'].dtype == 'float64'
+    assert generate_batch_dataframe(1, 0).empty
+    print("✓ 测试通过\n")
+
+
+if __name__ == '__main__':
+    print("\n开始测试数据生成器...\n")
+
+    try:
+        test_batch_dataframe_format()
+        test_batch_dataframe_extra_columns()
+
+        print("=" * 60)
+        print("所有测试通过！✓")
+        print("=" * 60)
+
+    except AssertionError as e:
+        print(f"\n❌ 测试失败: {e}")
+        sys.exit(1)
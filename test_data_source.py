@@ -0,0 +1,102 @@
+"""测试多个视图共享同一个数据源"""
+
+import gc
+import os
+import sys
+
+import pandas as pd
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from data_generator import generate_batch_records
+from data_source import DataSource
+from data_table import generate_columns_config_from_dataframe
+from loadtest import create_app
+from memory import BUDGET
+
+
+class _View:
+    """记录刷新通知的视图"""
+
+    def __init__(self):
+        self.refreshed = 0
+        self.columns_refreshed = 0
+
+    def refresh_data(self):
+        self.refreshed += 1
+
+    def refresh_columns(self):
+        self.columns_refreshed += 1
+
+
+def test_shared_source():
+    """测试多个视图共享数据、写入和替换"""
+    print("=" * 60)
+    print("测试 1: 共享数据源")
+    print("=" * 60)
+
+    df = pd.DataFrame(generate_batch_records(1, 1000))
+    gc.collect()
+    tables_before = len(BUDGET.tables())
+    source = DataSource(df, name='shared-orders')
+    assert source.table.table_id == 'shared-orders'
+    assert source.table.dataframe is not df  # 只复制一次
+
+    # 两个视图共享同一个 DataTable，不再各自创建
+    app_a = create_app(source, 'view-a')
+    app_b = create_app(source, 'view-b')
+    assert app_a.state.table.logic is app_b.state.table.logic is source.table
+    assert len(BUDGET.tables()) == tables_before + 1
+    views = [_View(), _View()]
+    for view in views:
+        source.attach(view)
+    assert len(source.views) == 4
+
+    # 通过一个视图写入，其他视图立即可见，并且都收到刷新通知
+    client_a, client_b = TestClient(app_a), TestClient(app_b)
+    records = generate_batch_records(0, 10)
+    for record in records:
+        del record['id']
+        record['payload'] = record['payload'].hex()
+        record['channel'] = 'app'
+    response = client_a.post('/add', json={'data': records}, headers={'x-table-id': 'view-a'})
+    assert response.json()['data']['added_count'] == 10
+    assert client_b.post('/list', json={}, headers={'x-table-id': 'view-b'}).json()['total'] == 1010
+    assert [(v.refreshed, v.columns_refreshed) for v in views] == [(1, 1), (1, 1)]
+
+    # 每个视图的筛选、排序和分页互不影响
+    page_a = client_a.post('/list', json={'page': 2, 'pageSize': 5, 'sortBy': 'order_amount', 'sortOrder': 'descending'},
+                           headers={'x-table-id': 'view-a'}).json()
+    page_b = client_b.post('/list', json={'filters': {'channel': 'app'}}, headers={'x-table-id': 'view-b'}).json()
+    assert page_a['page'] == 2 and len(page_a['list']) == 5
+    assert page_b['total'] == 10
+
+    # 替换数据后所有视图切换到新的 DataTable
+    source.replace(df.iloc[:100], generate_columns_config_from_dataframe(df))
+    assert app_a.state.table.logic is source.table and source.table.table_id == 'shared-orders'
+    assert client_b.post('/list', json={}, headers={'x-table-id': 'view-b'}).json()['total'] == 100
+    assert [v.refreshed for v in views] == [2, 2]
+
+    # 视图被回收后从数据源中移除，数据源不受影响
+    app_b.state.table.release()
+    del views[1], view
+    gc.collect()
+    assert len(source.views) == 2
+    assert client_a.post('/list', json={}, headers={'x-table-id': 'view-a'}).json()['total'] == 100
+    print("✓ 测试通过\n")
+
+
+if __name__ == '__main__':
+    print("\n开始测试共享数据源...\n")
+
+    try:
+        test_shared_source()
+
+        print("=" * 60)
+        print("所有测试通过！✓")
+        print("=" * 60)
+
+    except AssertionError as e:
+        print(f"\n❌ 测试失败: {e}")
+        sys.exit(1)
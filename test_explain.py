@@ -0,0 +1,132 @@
+"""测试执行计划（explain）、慢查询日志和 /explain 接口"""
+
+import logging
+import os
+import sys
+import tempfile
+
+import pandas as pd
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from data_generator import generate_batch_records
+from data_table import DataTable, FilterGroup, FilterParams, NumberFilter, generate_columns_config_from_dataframe
+from loadtest import create_app
+from mapped_table import MappedDataTable
+from tiered_table import TieredDataTable
+
+
+class _ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+def _filters():
+    return FilterParams(
+        order_amount=FilterGroup(filters=[NumberFilter(operator='>', value=5000)]),
+        order_status=['已付款', '已发货'],
+        not_a_column='x',
+    )
+
+
+def test_explain_plan():
+    """测试执行计划中每个筛选条件的行数与实际结果一致"""
+    print("=" * 60)
+    print("测试 1: 执行计划")
+    print("=" * 60)
+
+    df = pd.DataFrame(generate_batch_records(1, 3000))
+    table = DataTable(df, generate_columns_config_from_dataframe(df))
+    plan = table.explain(_filters(), 2, 50, 'order_amount', 'descending')
+    print(f"筛选条件: {[(p['column'], p.get('method'), p.get('rows_after')) for p in plan['predicates']]}")
+
+    amount = df['order_amount'] > 5000
+    status = df['order_status'].isin(['已付款', '已发货'])
+    predicates = {p['column']: p for p in plan['predicates']}
+    assert plan['rows'] == 3000
+    assert list(plan['filters']) == sorted(plan['filters'])
+    assert predicates['order_amount']['method'] == 'compare'
+    assert predicates['order_amount']['rows_matched'] == int(amount.sum())
+    assert predicates['order_status']['method'] == 'isin'
+    assert predicates['order_status']['rows_matched'] == int(status.sum())
+    assert predicates['order_status']['rows_after'] == int((amount & status).sum())
+    assert 'skipped' in predicates['not_a_column']
+    assert plan['filtered_rows'] == table.get_list(_filters(), 1, 10)['total']
+    assert plan['sort']['method'] == 'sort_values' and plan['sort']['rows'] == plan['filtered_rows']
+    assert plan['page'] == {'page': 2, 'pageSize': 50, 'offset': 50,
+                            'rows': min(50, plan['filtered_rows'] - 50)}
+
+    # 列存储和冷热分层表的执行计划与查询结果一致
+    filters = FilterParams(id=FilterGroup(filters=[NumberFilter(operator='<=', value=800)]), city=['北京', '上海'])
+    with tempfile.TemporaryDirectory() as tmp:
+        mapped = MappedDataTable(tmp, df)
+        mapped_plan = mapped.explain(filters)
+        assert mapped_plan['source']['storage'] == 'mmap'
+        assert mapped_plan['filtered_rows'] == mapped.get_list(filters)['total']
+    tiered = TieredDataTable(df, generate_columns_config_from_dataframe(df), hot_rows=500, segment_rows=1000)
+    tiered_plan = tiered.explain(filters)
+    print(f"分层表数据访问: {tiered_plan['source']}")
+    assert tiered_plan['source']['segments_pruned'] == 1
+    assert tiered_plan['rows'] == 2000
+    assert tiered_plan['filtered_rows'] == tiered.get_list(filters)['total']
+    print("✓ 测试通过\n")
+
+
+def test_slow_query_log_and_endpoint():
+    """测试慢查询日志和 /explain 接口"""
+    print("=" * 60)
+    print("测试 2: 慢查询日志与 /explain")
+    print("=" * 60)
+
+    df = pd.DataFrame(generate_batch_records(1, 1000))
+    table = DataTable(df, generate_columns_config_from_dataframe(df))
+    handler = _ListHandler()
+    logger = logging.getLogger('data_table')
+    level = logger.level
+    logger.setLevel(logging.WARNING)  # 其他测试（如基准测试）可能调高了级别
+    logger.addHandler(handler)
+    try:
+        table.get_list(FilterParams(order_status=['不存在']))
+        assert handler.messages == []  # 未超过阈值，且筛选为空不再告警
+
+        table.slow_query_seconds = 0
+        table.get_list(_filters(), 1, 20)
+        table.get_list(_filters(), 1, 20)
+    finally:
+        logger.removeHandler(handler)
+        logger.setLevel(level)
+    print(handler.messages[0][:200])
+    assert len(handler.messages) == 2
+    assert handler.messages[0].startswith('慢查询 [default]') and '执行计划' in handler.messages[0]
+    assert '"order_status": ["已付款", "已发货"]' in handler.messages[0]
+    # 同一查询在间隔内只记录一次执行计划
+    assert '执行计划' not in handler.messages[1]
+
+    client = TestClient(create_app(table, 'explain-test'))
+    response = client.post('/explain', headers={'x-table-id': 'explain-test'},
+                           json={'filters': {'order_status': ['已付款']}, 'page': 1, 'pageSize': 10})
+    data = response.json()['data']
+    assert 'list' not in data
+    assert data['filtered_rows'] == int((df['order_status'] == '已付款').sum())
+    print("✓ 测试通过\n")
+
+
+if __name__ == '__main__':
+    print("\n开始测试执行计划...\n")
+
+    try:
+        test_explain_plan()
+        test_slow_query_log_and_endpoint()
+
+        print("=" * 60)
+        print("所有测试通过！✓")
+        print("=" * 60)
+
+    except AssertionError as e:
+        print(f"\n❌ 测试失败: {e}")
+        sys.exit(1)
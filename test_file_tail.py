@@ -0,0 +1,157 @@
+"""测试文件跟踪：只读取新增的完整行、分块写入、检查点续读和文件轮转"""
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from data_generator import generate_batch_records
+from data_source import DataSource
+from data_table import DataTable, generate_columns_config_from_dataframe
+from file_tail import FileTail
+from metrics import FILE_TAIL_LAG_BYTES
+
+_BASE = pd.DataFrame(generate_batch_records(1, 10))
+
+
+def _table():
+    return DataTable(_BASE.copy(), generate_columns_config_from_dataframe(_BASE))
+
+
+def _wire_records(start, count):
+    records = generate_batch_records(start, count)
+    for record in records:
+        del record['id']
+        record['payload'] = record['payload'].hex()
+    return records
+
+
+def _append(path, text):
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(text)
+
+
+def _ndjson(records):
+    return ''.join(json.dumps(r, ensure_ascii=False) + '\n' for r in records)
+
+
+def test_ndjson_tail():
+    """测试 NDJSON 只读取新增的完整行，分块写入并从检查点续读"""
+    print("=" * 60)
+    print("测试 1: NDJSON 跟踪与检查点")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'orders.ndjson')
+        table = _table()
+        tail = FileTail(table, path, chunk_bytes=4096)
+        assert tail.poll()['added_count'] == 0  # 文件尚不存在
+
+        records = _wire_records(100, 60)
+        text = _ndjson(records)
+        partial = _ndjson(records[:1])
+        _append(path, text + partial[:30])  # 末尾是写了一半的行
+        result = tail.poll()
+        print(f"第一次读取: {result}")
+        assert result['added_count'] == 60 and result['chunks'] > 1
+        assert tail.offset == len(text.encode('utf-8')) and table.total_count == 70
+        assert isinstance(table.dataframe['payload'].iloc[-1], bytes)
+        assert FILE_TAIL_LAG_BYTES.value(table=table.table_id, path=path) == len(partial[:30].encode('utf-8'))
+
+        _append(path, partial[30:])
+        assert tail.poll()['added_count'] == 1 and tail.poll()['added_count'] == 0
+
+        # 重启后从检查点继续，不重复写入
+        resumed = FileTail(table, path)
+        assert resumed.offset == tail.offset
+        _append(path, _ndjson(_wire_records(200, 5)))
+        assert resumed.poll()['added_count'] == 5 and table.total_count == 76
+    print("✓ 测试通过\n")
+
+
+def test_csv_tail_and_rotation():
+    """测试 CSV 按列名解析（十六进制字符串按文本读取），文件被替换后从头读取"""
+    print("=" * 60)
+    print("测试 2: CSV 跟踪与文件轮转")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'orders.csv')
+        frame = pd.DataFrame(_wire_records(100, 40))
+        frame.loc[0, 'payload'] = '1234'  # 全是数字的十六进制字符串
+        frame.to_csv(path, index=False)
+        table = _table()
+        tail = FileTail(table, path, chunk_bytes=1024)
+        result = tail.poll()
+        print(f"CSV: {result}")
+        assert result['added_count'] == 40 and tail.columns == list(frame.columns)
+        assert table.dataframe['payload'].iloc[10] == b'\x12\x34'
+
+        frame.iloc[:5].to_csv(path, index=False, header=False, mode='a')
+        assert tail.poll()['added_count'] == 5
+
+        # 日志轮转：新文件从头读取（包括列名）
+        os.rename(path, path + '.1')
+        frame.iloc[:3].to_csv(path, index=False)
+        assert tail.poll()['added_count'] == 3 and table.total_count == 58
+    print("✓ 测试通过\n")
+
+
+def test_background_task():
+    """测试后台轮询写入 DataSource 并刷新视图"""
+    print("=" * 60)
+    print("测试 3: 后台轮询")
+    print("=" * 60)
+
+    class View:
+        refreshed = 0
+
+        def refresh_data(self):
+            View.refreshed += 1
+
+        def refresh_columns(self):
+            pass
+
+    async def run(path, source):
+        tail = FileTail(source, path, checkpoint_path=False, poll_interval=0.01)
+        tail.start()
+        _append(path, _ndjson(_wire_records(1, 20)))
+        for _ in range(200):
+            await asyncio.sleep(0.01)
+            if View.refreshed:
+                break
+        await tail.stop()
+        return tail
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'feed.jsonl')
+        source = DataSource(data_table=_table(), name='file-tail')
+        view = View()
+        source.attach(view)
+        tail = asyncio.run(run(path, source))
+        print(f"后台写入 {tail.rows_added} 行，刷新 {View.refreshed} 次")
+        assert tail.rows_added == 20 and source.table.total_count == 30 and View.refreshed >= 1
+        assert not os.path.exists(path + '.offset')
+    print("✓ 测试通过\n")
+
+
+if __name__ == '__main__':
+    print("\n开始测试文件跟踪...\n")
+
+    try:
+        test_ndjson_tail()
+        test_csv_tail_and_rotation()
+        test_background_task()
+
+        print("=" * 60)
+        print("所有测试通过！✓")
+        print("=" * 60)
+
+    except AssertionError as e:
+        print(f"\n❌ 测试失败: {e}")
+        sys.exit(1)
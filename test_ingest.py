@@ -0,0 +1,232 @@
+"""测试写入队列：合并小批量写入、背压（IngestQueueFull / 429）和出错提交的隔离"""
+
+import asyncio
+import json
+import logging
+import os
+import sys
+import threading
+
+import pandas as pd
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from data_generator import generate_batch_records
+from data_source import DataSource
+from data_table import DataTable, generate_columns_config_from_dataframe
+from ingest import IngestQueue, IngestQueueFull
+from loadtest import create_app
+from metrics import INGEST_BATCH_ROWS, INGEST_QUEUE_FULL, INGEST_QUEUE_ROWS
+
+
+def _records(start, count):
+    records = generate_batch_records(start, count)
+    for record in records:
+        del record['id']
+    return records
+
+
+def _table(count=500):
+    df = pd.DataFrame(generate_batch_records(1, count))
+    return DataTable(df, generate_columns_config_from_dataframe(df))
+
+
+def test_coalescing():
+    """测试多个生产者的小批量提交被合并写入"""
+    print("=" * 60)
+    print("测试 1: 合并写入")
+    print("=" * 60)
+
+    table = _table()
+    calls = []
+
+    def apply(records):
+        calls.append(len(records))
+        return table.add_data(records)
+
+    queue = IngestQueue(apply, name='ingest-coalesce', max_batch_rows=500, max_delay=0.05)
+    futures = []
+    lock = threading.Lock()
+
+    def produce(offset):
+        for i in range(25):
+            future = queue.submit(_records(offset + i * 10, 10))
+            with lock:
+                futures.append(future)
+
+    producers = [threading.Thread(target=produce, args=(n * 1000,)) for n in range(4)]
+    for producer in producers:
+        producer.start()
+    for producer in producers:
+        producer.join()
+    assert queue.flush(timeout=10)
+    results = [f.result() for f in futures]
+    stats = queue.stats()
+    print(f"100 次提交写入 {len(calls)} 批: {calls}, {stats}")
+    assert table.total_count == 500 + 1000
+    assert all(r['success'] and r['added_count'] == 10 for r in results)
+    assert len(calls) < 20 and max(calls) <= 500
+    assert stats['rows_written'] == 1000 and stats['queued_rows'] == 0
+    assert INGEST_BATCH_ROWS.count(table='ingest-coalesce') == len(calls)
+    queue.close()
+    try:
+        queue.submit(_records(0, 1))
+        raise AssertionError('关闭后应拒绝提交')
+    except RuntimeError:
+        pass
+    print("✓ 测试通过\n")
+
+
+def test_backpressure_and_failures():
+    """测试写入跟不上时拒绝提交，以及合并批次出错时只有出错的提交失败"""
+    print("=" * 60)
+    print("测试 2: 背压与出错隔离")
+    print("=" * 60)
+
+    release = threading.Event()
+    written = []
+
+    def apply(records):
+        release.wait()
+        if any(r.get('bad') for r in records):
+            raise ValueError('bad record')
+        written.extend(records)
+        return {'success': True}
+
+    queue = IngestQueue(apply, name='ingest-full', max_batch_rows=1000, max_delay=0.01, max_pending_rows=50)
+    first = queue.submit([{'n': i} for i in range(30)])
+    try:
+        queue.submit([{'n': i} for i in range(30)])
+        raise AssertionError('应当拒绝提交')
+    except IngestQueueFull as e:
+        print(f"队列已满: {e}")
+    try:
+        queue.submit([{'n': 0}] * 30, block=True, timeout=0.05)
+        raise AssertionError('等待超时后应当拒绝提交')
+    except IngestQueueFull:
+        pass
+    assert INGEST_QUEUE_FULL.value(table='ingest-full') == 2
+    assert INGEST_QUEUE_ROWS.value(table='ingest-full') == 30
+
+    good = queue.submit([{'n': 100}])
+    bad = queue.submit([{'bad': True}])
+    release.set()
+    assert first.result(timeout=5)['added_count'] == 30
+    assert good.result(timeout=5)['success']
+    try:
+        bad.result(timeout=5)
+        raise AssertionError('出错的提交应当失败')
+    except ValueError:
+        pass
+    assert len(written) == 31
+    queue.close()
+    print("✓ 测试通过\n")
+
+
+def test_add_endpoint():
+    """测试 /add 经写入队列写入，队列已满时返回 429"""
+    print("=" * 60)
+    print("测试 3: /add 与写入队列")
+    print("=" * 60)
+
+    table = _table()
+    source = DataSource(data_table=table, name='ingest-add')
+    queue = source.start_ingest_queue(max_delay=0.01, max_pending_rows=100)
+    client = TestClient(create_app(source, 'ingest-add'))
+    headers = {'x-table-id': 'ingest-add'}
+    payload = {'data': [{k: v.hex() if isinstance(v, bytes) else v for k, v in r.items()}
+                        for r in _records(0, 60)]}
+
+    with table._lock:  # 写线程等待写锁，提交堆积在队列中
+        pending = source.submit(_records(0, 80))
+        response = client.post('/add', json=payload, headers=headers)
+        print(f"队列已满: {response.status_code} {response.json()['detail']}")
+        assert response.status_code == 429 and response.headers['retry-after'] == '1'
+    assert pending.result(timeout=5)['added_count'] == 80
+
+    response = client.post('/add', json=payload, headers=headers)
+    data = response.json()['data']
+    assert response.status_code == 200 and data['added_count'] == 60 and table.total_count == 640
+    assert source.add_data(_records(0, 5))['added_count'] == 5
+    source.stop_ingest_queue()
+    assert source.ingest_queue is None and not queue._thread.is_alive()
+    assert source.add_data(_records(0, 5))['added_count'] == 5 and table.total_count == 650
+    print("✓ 测试通过\n")
+
+
+def test_event_loop_callers():
+    """测试在事件循环中调用 add_data 和 /bulk 不等待队列空位，队列已满时立即拒绝"""
+    print("=" * 60)
+    print("测试 4: 事件循环中的写入")
+    print("=" * 60)
+
+    table = _table()
+    source = DataSource(data_table=table, name='ingest-loop')
+    source.start_ingest_queue(max_delay=0.01, max_pending_rows=100)
+
+    async def handler():
+        # 如 NiceTable 的事件处理函数：写线程等待写锁时提交也不阻塞事件循环
+        queued = source.add_data(_records(0, 80))
+        try:
+            source.add_data(_records(0, 30))
+            raise AssertionError('队列已满时应当拒绝提交')
+        except IngestQueueFull as e:
+            print(f"队列已满: {e}")
+        return queued
+
+    with table._lock:
+        queued = asyncio.run(handler())
+    assert queued == {'success': True, 'queued': True, 'added_count': 80}
+    assert source.ingest_queue.flush(timeout=5) and table.total_count == 580
+
+    # 不等待结果的提交写入失败时记录错误日志
+    errors = []
+    handler_ = logging.Handler()
+    handler_.emit = errors.append
+    logging.getLogger('data_source').addHandler(handler_)
+    next(c for c in table.columns_config if c.prop == 'item_count').inferred = False
+    try:
+        async def bad_handler():
+            return source.add_data([{'item_count': 'many'}])
+
+        assert asyncio.run(bad_handler())['queued']
+        assert source.ingest_queue.flush(timeout=5) and table.total_count == 580
+    finally:
+        logging.getLogger('data_source').removeHandler(handler_)
+    print(f"写入失败的日志: {[r.getMessage() for r in errors]}")
+    assert len(errors) == 1 and 'item_count' in errors[0].getMessage()
+
+    client = TestClient(create_app(source, 'ingest-loop'))
+    records = [{k: v.hex() if isinstance(v, bytes) else v for k, v in r.items()} for r in _records(0, 60)]
+    body = json.dumps({key: [r[key] for r in records] for key in records[0]})
+    headers = {'x-table-id': 'ingest-loop', 'content-type': 'application/json'}
+    with table._lock:
+        pending = source.submit(_records(0, 80))
+        response = client.post('/bulk', content=body, headers=headers)
+        print(f"/bulk 队列已满: {response.status_code}")
+        assert response.status_code == 429 and response.headers['retry-after'] == '1'
+    assert pending.result(timeout=5)['added_count'] == 80
+    response = client.post('/bulk', content=body, headers=headers)
+    assert response.status_code == 200 and response.json()['data']['added_count'] == 60
+    assert table.total_count == 720
+    source.stop_ingest_queue()
+    print("✓ 测试通过\n")
+
+
+if __name__ == '__main__':
+    print("\n开始测试写入队列...\n")
+
+    try:
+        test_coalescing()
+        test_backpressure_and_failures()
+        test_add_endpoint()
+        test_event_loop_callers()
+
+        print("=" * 60)
+        print("所有测试通过！✓")
+        print("=" * 60)
+
+    except AssertionError as e:
+        print(f"\n❌ 测试失败: {e}")
+        sys.exit(1)
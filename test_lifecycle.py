@@ -0,0 +1,99 @@
+"""测试表格实例的生命周期：弱引用注册表、确定性路由和空闲回收"""
+
+import gc
+import os
+import sys
+import time
+
+import pandas as pd
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from data_generator import generate_batch_records
+from data_table import DataTable, generate_columns_config_from_dataframe
+from loadtest import create_app
+from metrics import REQUESTS
+from nice_table import NiceTable
+
+
+def _table():
+    df = pd.DataFrame(generate_batch_records(1, 200))
+    return DataTable(df, generate_columns_config_from_dataframe(df))
+
+
+def test_registry_and_routing():
+    """测试注册表不持有实例，以及没有 x-table-id 时的路由"""
+    print("=" * 60)
+    print("测试 1: 弱引用注册表与路由")
+    print("=" * 60)
+
+    gc.collect()
+    shared = _table()
+    app_a = create_app(shared, 'life-a')
+    app_b = create_app(shared, 'life-b')  # 两个视图共享同一个 DataTable
+    client_a, client_b = TestClient(app_a), TestClient(app_b)
+    assert {'life-a', 'life-b'} <= set(NiceTable._instances)
+
+    # 多个实例时必须指定表格 id
+    response = client_a.post('/list', json={})
+    print(f"多实例、无请求头: {response.status_code} {response.json()['detail']}")
+    assert response.status_code == 400
+    assert client_a.post('/list', json={}, headers={'x-table-id': 'life-b'}).json()['total'] == 200
+    assert client_a.post('/list?table_id=life-a', json={}).status_code == 200
+
+    # 实例只被 app 持有，app 释放后自动从注册表中移除
+    del app_b, client_b
+    gc.collect()
+    print(f"释放后的实例: {list(NiceTable._instances)}")
+    assert 'life-b' not in NiceTable._instances
+    if list(NiceTable._instances) == ['life-a']:
+        assert client_a.post('/list', json={}).status_code == 200
+    assert client_a.get('/filters', headers={'x-table-id': 'life-b'}).status_code == 404
+    print("✓ 测试通过\n")
+
+
+def test_idle_reaping():
+    """测试空闲超时回收实例并清理指标"""
+    print("=" * 60)
+    print("测试 2: 空闲回收")
+    print("=" * 60)
+
+    app_idle = create_app(_table(), 'life-idle')
+    app_busy = create_app(_table(), 'life-busy')
+    client = TestClient(app_idle)
+    app_idle.state.table.idle_timeout = 0.1
+    app_busy.state.table.idle_timeout = 0.1
+    client.post('/list', json={}, headers={'x-table-id': 'life-idle'})
+    assert REQUESTS.value(table='life-idle', endpoint='list', status='200') == 1
+
+    time.sleep(0.15)
+    client.post('/list', json={}, headers={'x-table-id': 'life-busy'})  # 刚访问过的实例不回收
+    reaped = NiceTable.reap_idle_instances()
+    print(f"回收: {reaped}")
+    assert 'life-idle' in reaped and 'life-busy' not in reaped
+    assert 'life-idle' not in NiceTable._instances and 'life-busy' in NiceTable._instances
+    assert REQUESTS.value(table='life-idle', endpoint='list', status='200') == 0
+    assert client.get('/filters', headers={'x-table-id': 'life-idle'}).status_code == 404
+
+    # 默认不回收
+    app_busy.state.table.idle_timeout = None
+    time.sleep(0.15)
+    assert 'life-busy' not in NiceTable.reap_idle_instances()
+    print("✓ 测试通过\n")
+
+
+if __name__ == '__main__':
+    print("\n开始测试实例生命周期...\n")
+
+    try:
+        test_registry_and_routing()
+        test_idle_reaping()
+
+        print("=" * 60)
+        print("所有测试通过！✓")
+        print("=" * 60)
+
+    except AssertionError as e:
+        print(f"\n❌ 测试失败: {e}")
+        sys.exit(1)
@@ -0,0 +1,64 @@
+"""测试 NiceTable API 压测工具（小数据量冒烟测试）"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from loadtest import HISTOGRAM_BUCKETS_MS, latency_stats, run_load_test
+
+
+def test_latency_histogram():
+    """测试延迟直方图分桶"""
+    print("=" * 60)
+    print("测试 1: 延迟直方图")
+    print("=" * 60)
+
+    stats = latency_stats([0.0005, 0.001, 0.003, 0.2, 10.0])
+    print(f"直方图: {stats['histogram']}")
+    assert len(stats['histogram']) == len(HISTOGRAM_BUCKETS_MS) + 1
+    assert sum(stats['histogram'].values()) == 5
+    assert stats['histogram']['<=1ms'] == 2
+    assert stats['histogram']['<=5ms'] == 1
+    assert stats['histogram']['<=250ms'] == 1
+    assert stats['histogram']['>5000ms'] == 1
+    print("✓ 测试通过\n")
+
+
+def test_load_test_smoke():
+    """测试本地启动服务并在写入的同时压测查询接口"""
+    print("=" * 60)
+    print("测试 2: 压测冒烟")
+    print("=" * 60)
+
+    report = run_load_test([1, 3], rows=2000, slo_ms=5000, duration=1.0, ingest_rate=200,
+                           ingest_batch=50, think_time=0.05)
+    for level in report['levels']:
+        print(f"{level['dashboards']} 个仪表盘: {level['queries']['count']} 次查询, "
+              f"p95 {level['queries']['p95_ms']:.1f}ms, 写入 {level['ingest']['rows']} 行")
+        assert level['queries']['errors'] == 0
+        assert level['endpoints']['add']['errors'] == 0
+        assert level['ingest']['rows'] > 0
+        assert level['server_loop_lag']['count'] > 0
+        assert sum(level['queries']['histogram'].values()) == level['queries']['count']
+    assert [level['dashboards'] for level in report['levels']] == [1, 3]
+    # 第二个级别开始时包含第一个级别写入的数据
+    assert report['levels'][1]['initial_rows'] == 2000 + report['levels'][0]['ingest']['rows']
+    assert report['max_sustained_dashboards'] == 3
+    print("✓ 测试通过\n")
+
+
+if __name__ == '__main__':
+    print("\n开始测试压测工具...\n")
+
+    try:
+        test_latency_histogram()
+        test_load_test_smoke()
+
+        print("=" * 60)
+        print("所有测试通过！✓")
+        print("=" * 60)
+
+    except AssertionError as e:
+        print(f"\n❌ 测试失败: {e}")
+        sys.exit(1)
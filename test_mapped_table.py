@@ -0,0 +1,104 @@
+"""测试 MappedDataTable
+
+验证内存映射列存储后端的查询结果与 DataTable 一致，并能从磁盘重新打开
+"""
+
+import copy
+import os
+import sys
+import tempfile
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from data_generator import generate_batch_records
+from data_table import DataTable, FilterParams, generate_columns_config_from_dataframe
+from mapped_table import MappedDataTable
+
+
+def _make_tables(path: str, count: int = 1000):
+    df = pd.DataFrame(generate_batch_records(1, count))
+    columns_config = generate_columns_config_from_dataframe(df)
+    mapped = MappedDataTable(path, df, copy.deepcopy(columns_config))
+    baseline = DataTable(df, copy.deepcopy(columns_config))
+    return mapped, baseline
+
+
+def test_query_matches_datatable():
+    """测试筛选、排序、分页结果与 DataTable 一致"""
+    print("=" * 60)
+    print("测试 1: 查询结果与 DataTable 一致")
+    print("=" * 60)
+
+    filters_list = [
+        None,
+        FilterParams(order_status=['已付款', '待付款']),
+        FilterParams(order_amount={'filters': [{'operator': '>', 'value': 500},
+                                               {'operator': '<', 'value': '0x1388'}], 'logic': 'AND'}),
+        FilterParams(order_number='ORD00000001'),
+        FilterParams(payload='A'),
+    ]
+    with tempfile.TemporaryDirectory() as path:
+        mapped, baseline = _make_tables(path)
+        for filters in filters_list:
+            for sort_by, sort_order in [(None, None), ('order_amount', 'descending'), ('id', 'ascending')]:
+                actual = mapped.get_list(filters, 2, 50, sort_by, sort_order)
+                expected = baseline.get_list(filters, 2, 50, sort_by, sort_order)
+                assert actual['total'] == expected['total'], f"总数不一致: {filters}"
+                assert actual['list'] == expected['list'], f"分页数据不一致: {filters}, {sort_by}"
+
+        filters = FilterParams(city=['北京', '上海'])
+        row_id = baseline.get_list(filters, 1, 10)['list'][5]['id']
+        assert mapped.get_row_position(row_id, filters) == baseline.get_row_position(row_id, filters)
+        assert mapped.get_row_detail(row_id) == baseline.get_row_detail(row_id)
+        mapped.close()
+    print("✓ 测试通过：查询结果一致\n")
+
+
+def test_add_data_and_reopen():
+    """测试追加数据后重新打开"""
+    print("=" * 60)
+    print("测试 2: 追加数据并重新打开")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as path:
+        mapped, _ = _make_tables(path, 100)
+        result = mapped.add_data([{'order_status': '新状态', 'extra': 'x'}])
+        assert result['added_count'] == 1
+        assert result['added_columns'] == ['extra']
+        assert mapped.total_count == 101
+
+        # 未提供 id 时自动生成
+        last = mapped.get_list(page_size=1, sort_by='id', sort_order='descending')['list'][0]
+        assert last['id'] == 101
+        assert '新状态' in next(c for c in mapped.columns_config if c.prop == 'order_status').options
+        mapped.close()
+
+        reopened = MappedDataTable(path, read_only=True)
+        print(f"重新打开后行数: {reopened.total_count}")
+        assert reopened.total_count == 101
+        assert reopened.get_list(FilterParams(extra='x'))['total'] == 1
+        try:
+            reopened.add_data({'id': 200})
+            assert False, "只读模式应该拒绝写入"
+        except RuntimeError:
+            pass
+        reopened.close()
+    print("✓ 测试通过：数据已持久化\n")
+
+
+if __name__ == '__main__':
+    print("\n开始测试 MappedDataTable...\n")
+
+    try:
+        test_query_matches_datatable()
+        test_add_data_and_reopen()
+
+        print("=" * 60)
+        print("所有测试通过！✓")
+        print("=" * 60)
+
+    except AssertionError as e:
+        print(f"\n❌ 测试失败: {e}")
+        sys.exit(1)
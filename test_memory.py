@@ -0,0 +1,155 @@
+"""测试内存统计和进程级内存预算"""
+
+import gc
+import os
+import sys
+import tempfile
+
+import pandas as pd
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from data_generator import generate_batch_records
+from data_table import DataTable, FilterParams, generate_columns_config_from_dataframe
+from loadtest import create_app
+from mapped_table import MappedDataTable
+from memory import BUDGET, MemoryBudgetExceeded, parse_size
+from metrics import CACHE_SHED_BYTES, INGEST_REJECTED, MEMORY_BYTES
+from tiered_table import TieredDataTable
+
+
+def _records(start, count):
+    records = generate_batch_records(start, count)
+    for record in records:
+        del record['id']
+    return records
+
+
+def test_memory_usage():
+    """测试各类表格的内存统计"""
+    print("=" * 60)
+    print("测试 1: 内存统计")
+    print("=" * 60)
+
+    df = pd.DataFrame(generate_batch_records(1, 5000))
+    table = DataTable(df, generate_columns_config_from_dataframe(df))
+    usage = table.memory_usage()
+    exact = table.memory_usage(exact=True)
+    expected = int(df.memory_usage(index=True, deep=True).sum())
+    print(f"DataTable: 估算 {usage['columns']}，精确 {exact['columns']}，pandas {expected}")
+    assert abs(exact['columns'] - expected) / expected < 0.01
+    assert abs(usage['columns'] - expected) / expected < 0.05
+    assert usage['mapped'] == 0 and usage['indexes'] == 0 and usage['caches'] == 0
+    assert set(usage['by_column']) == set(df.columns) | {'(index)'}
+    assert usage['by_column']['payload'] > usage['by_column']['order_amount']
+
+    # id 索引在首次查找时构建
+    table.get_row_detail(10)
+    assert table.memory_usage()['indexes'] == 2 * 5000 * 8
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # 快照中的数值列和 id 索引是内存映射的
+        table.save_snapshot(os.path.join(tmp, 'snapshot'))
+        restored = DataTable.load_snapshot(os.path.join(tmp, 'snapshot'))
+        restored_usage = restored.memory_usage()
+        print(f"快照恢复: 常驻 {restored_usage['resident']}，映射 {restored_usage['mapped']}")
+        assert restored_usage['indexes'] == 0
+        assert restored_usage['by_column']['order_amount'] == 0
+        assert restored_usage['mapped'] >= 5000 * 8 * 7 + 2 * 5000 * 8
+        assert restored_usage['resident'] < usage['resident']
+
+        # 列存储表只有已解码的变长列常驻内存
+        mapped = MappedDataTable(os.path.join(tmp, 'mapped'), df)
+        assert mapped.memory_usage()['caches'] == 0
+        mapped.get_list(FilterParams(city=['北京']), 1, 10, 'merchant', 'ascending')
+        mapped_usage = mapped.memory_usage()
+        assert set(mapped_usage['by_column']) == {'city', 'merchant'}
+        assert mapped_usage['caches'] == mapped_usage['resident'] > 0 and mapped_usage['mapped'] > 0
+        mapped.close()
+
+    tiered = TieredDataTable(df, generate_columns_config_from_dataframe(df), hot_rows=1000, segment_rows=2000)
+    tiered.get_list(None, 1, 10, 'city', 'ascending')
+    tiered_usage = tiered.memory_usage()
+    print(f"分层表: {({k: v for k, v in tiered_usage.items() if k != 'by_column'})}")
+    assert tiered_usage['segments'] > 0 and tiered_usage['caches'] > 0
+    assert tiered_usage['resident'] == sum(tiered_usage[k] for k in ('columns', 'indexes', 'caches', 'segments'))
+    print("✓ 测试通过\n")
+
+
+def test_memory_budget():
+    """测试超出预算时先丢弃缓存，仍然不足则拒绝写入"""
+    print("=" * 60)
+    print("测试 2: 内存预算")
+    print("=" * 60)
+
+    assert parse_size('512M') == 512 << 20 and parse_size('1.5G') == int(1.5 * (1 << 30))
+    assert parse_size('') is None
+
+    df = pd.DataFrame(generate_batch_records(1, 3000))
+    table = DataTable(df, generate_columns_config_from_dataframe(df))
+    tiered = TieredDataTable(df, generate_columns_config_from_dataframe(df), hot_rows=500, segment_rows=1000)
+    table.table_id = 'budget-table'
+    tiered.table_id = 'budget-tiered'
+    tiered.get_list(None, 1, 10, 'merchant', 'ascending')
+    cache = tiered.memory_usage()['caches']
+    gc.collect()
+    used = BUDGET.usage()
+    all_caches = sum(t.memory_usage()['caches'] for t in BUDGET.tables())
+    batch = _records(0, 200)
+    try:
+        # 预算只够容纳丢弃所有缓存后的用量：写入前需要先丢弃分层表的缓存
+        BUDGET.set_limit(used - all_caches + 10_000)
+        result = table.add_data(batch[:10])
+        assert result['success'] and table.total_count == 3010
+        assert tiered.memory_usage()['caches'] == 0
+        assert CACHE_SHED_BYTES.value(table='budget-tiered') == cache
+
+        # 没有可丢弃的缓存时拒绝写入，表格保持不变
+        try:
+            table.add_data(batch)
+            raise AssertionError('应当拒绝写入')
+        except MemoryBudgetExceeded as e:
+            print(f"拒绝写入: {e}")
+            assert 'budget-table' in str(e)
+        assert table.total_count == 3010
+        assert INGEST_REJECTED.value(table='budget-table') == 1
+
+        client = TestClient(create_app(table, 'budget-table'))
+        headers = {'x-table-id': 'budget-table'}
+        response = client.post('/add', json={'data': [{k: v.hex() if isinstance(v, bytes) else v
+                                                       for k, v in r.items()} for r in batch]}, headers=headers)
+        assert response.status_code == 507 and '内存预算不足' in response.json()['detail']
+
+        rows = {r['统计项']: r for r in client.get('/statistics', headers=headers).json()['data']['rows']}
+        assert '进程预算' in rows['内存占用']['描述']
+        text = client.get('/metrics').text
+        assert 'nice_table_memory_bytes{table="budget-table",kind="columns"}' in text
+        assert 'nice_table_memory_budget_bytes ' in text
+
+        # 共用同一个数据源的多个视图只统计一次，标签为数据源的名称（table_id）
+        other = create_app(client.app.state.table.source, 'budget-view')
+        text = client.get('/metrics').text
+        assert 'table="budget-view"' not in text
+        assert MEMORY_BYTES.value(table='budget-table', kind='columns') == table.memory_usage()['columns']
+        del other
+    finally:
+        BUDGET.set_limit(None)
+    assert table.add_data(batch)['success']
+    print("✓ 测试通过\n")
+
+
+if __name__ == '__main__':
+    print("\n开始测试内存统计...\n")
+
+    try:
+        test_memory_usage()
+        test_memory_budget()
+
+        print("=" * 60)
+        print("所有测试通过！✓")
+        print("=" * 60)
+
+    except AssertionError as e:
+        print(f"\n❌ 测试失败: {e}")
+        sys.exit(1)
@@ -0,0 +1,135 @@
+"""测试指标记录与 /metrics 导出"""
+
+import os
+import sys
+
+import pandas as pd
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from data_generator import generate_batch_records
+from data_table import DataTable, FilterParams, generate_columns_config_from_dataframe
+from loadtest import create_app
+from metrics import CLIENT_SECONDS, ROWS_INGESTED, STAGE_SECONDS, MetricsRegistry
+
+
+def test_prometheus_format():
+    """测试计数器和直方图的文本格式"""
+    print("=" * 60)
+    print("测试 1: Prometheus 文本格式")
+    print("=" * 60)
+
+    registry = MetricsRegistry()
+    counter = registry.counter('demo_total', '示例计数', ('table',))
+    histogram = registry.histogram('demo_seconds', '示例耗时', ('table',), buckets=(0.1, 1.0))
+    counter.inc(3, table='a')
+    counter.inc(table='a"b')
+    for value in (0.05, 0.5, 2.0):
+        histogram.observe(value, table='a')
+    text = registry.render()
+    print(text)
+    assert '# TYPE demo_total counter' in text
+    assert 'demo_total{table="a"} 3' in text
+    assert 'demo_total{table="a\\"b"} 1' in text
+    assert 'demo_seconds_bucket{table="a",le="0.1"} 1' in text
+    assert 'demo_seconds_bucket{table="a",le="1"} 2' in text
+    assert 'demo_seconds_bucket{table="a",le="+Inf"} 3' in text
+    assert 'demo_seconds_sum{table="a"} 2.55' in text
+    assert 'demo_seconds_count{table="a"} 3' in text
+
+    registry.remove(table='a')
+    assert 'table="a"' not in registry.render()
+    print("✓ 测试通过\n")
+
+
+def test_stage_and_request_metrics():
+    """测试 DataTable 阶段耗时、写入行数和路由请求指标"""
+    print("=" * 60)
+    print("测试 2: 阶段耗时与请求指标")
+    print("=" * 60)
+
+    df = pd.DataFrame(generate_batch_records(1, 500))
+    table = DataTable(df, generate_columns_config_from_dataframe(df))
+    table.table_id = 'metrics-test'
+    labels = {'table': 'metrics-test', 'operation': 'get_list'}
+
+    table.get_list(FilterParams(order_status=['已付款']), 1, 20, 'order_amount', 'descending')
+    for stage in ['filter', 'sort', 'slice', 'serialize']:
+        assert STAGE_SECONDS.count(stage=stage, **labels) == 1, stage
+    table.add_data(generate_batch_records(501, 30))
+    for stage in ['lock_wait', 'lock_hold', 'options']:
+        assert STAGE_SECONDS.count(table='metrics-test', operation='add_data', stage=stage) == 1, stage
+    assert ROWS_INGESTED.value(table='metrics-test') == 30
+
+    client = TestClient(create_app(table, 'metrics-test'))
+    headers = {'x-table-id': 'metrics-test'}
+    client.post('/list', json={'page': 1, 'pageSize': 10}, headers=headers)
+    client.post('/row-detail', json={'row': {}}, headers=headers)
+    client.post('/list', json={}, headers={'x-table-id': 'unknown'})
+    # 与 get_target_instance 相同，没有请求头时按 table_id 查询参数标记
+    client.post('/list?table_id=metrics-test', json={'page': 1, 'pageSize': 10})
+    text = client.get('/metrics').text
+    assert 'nice_table_requests_total{table="metrics-test",endpoint="list",status="200"} 2' in text
+    assert 'nice_table_requests_total{table="metrics-test",endpoint="row-detail",status="400"} 1' in text
+    assert 'nice_table_requests_total{table="-",endpoint="list",status="404"} 1' in text
+    assert 'nice_table_request_seconds_count{table="metrics-test",endpoint="list"} 2' in text
+    assert 'nice_table_stage_seconds_count{table="metrics-test",operation="get_list",stage="serialize"} 3' in text
+    assert 'nice_table_rows_ingested_total{table="metrics-test"} 30' in text
+    print("✓ 测试通过\n")
+
+
+def _server_timing(header):
+    return {name: float(dur[len('dur='):]) for name, dur in (entry.split(';') for entry in header.split(', '))}
+
+
+def test_server_timing_and_telemetry():
+    """测试 Server-Timing 响应头和前端耗时上报"""
+    print("=" * 60)
+    print("测试 3: Server-Timing 与前端耗时上报")
+    print("=" * 60)
+
+    df = pd.DataFrame(generate_batch_records(1, 500))
+    table = DataTable(df, generate_columns_config_from_dataframe(df))
+    client = TestClient(create_app(table, 'timing-test'))
+    headers = {'x-table-id': 'timing-test'}
+
+    response = client.post('/list', json={'filters': {'order_status': ['已付款']}, 'sortBy': 'order_amount'},
+                           headers=headers)
+    timing = _server_timing(response.headers['Server-Timing'])
+    print(f"/list Server-Timing: {response.headers['Server-Timing']}")
+    assert list(timing) == ['queue', 'filter', 'sort', 'slice', 'serialize', 'encode', 'total']
+    assert all(v >= 0 for v in timing.values())
+    assert timing['total'] >= sum(v for k, v in timing.items() if k != 'total') - 0.01
+
+    response = client.post('/row-detail', json={'row': {'id': 10}}, headers=headers)
+    assert list(_server_timing(response.headers['Server-Timing'])) == ['queue', 'lookup', 'serialize', 'encode', 'total']
+    # 请求之外（如后台任务）调用 DataTable 不受影响
+    table.get_row_detail(10)
+
+    samples = [{'fetch': 40, 'parse': 2, 'render': 30, 'server': 15, 'rows': 100},
+               {'fetch': 'x', 'render': -1}, 'bad', {'fetch': 20, 'render': 12}]
+    response = client.post('/telemetry', json={'tableId': 'timing-test', 'samples': samples})
+    assert response.json()['data'] == {'accepted': 2}
+    assert CLIENT_SECONDS.count(table='timing-test', phase='fetch') == 2
+    assert CLIENT_SECONDS.count(table='timing-test', phase='network') == 1
+    assert CLIENT_SECONDS.count(table='timing-test', phase='parse') == 1
+    assert client.post('/telemetry', json={}).status_code == 400
+    print("✓ 测试通过\n")
+
+
+if __name__ == '__main__':
+    print("\n开始测试指标...\n")
+
+    try:
+        test_prometheus_format()
+        test_stage_and_request_metrics()
+        test_server_timing_and_telemetry()
+
+        print("=" * 60)
+        print("所有测试通过！✓")
+        print("=" * 60)
+
+    except AssertionError as e:
+        print(f"\n❌ 测试失败: {e}")
+        sys.exit(1)
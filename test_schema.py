@@ -0,0 +1,280 @@
+"""测试列类型约束：列配置声明可空类型，稀疏批次、新字段和按 id 修改后列仍保持向量化类型"""
+
+import json
+import os
+import sys
+import tempfile
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+import polars_table
+from data_generator import generate_batch_records
+from data_table import (_STRING_DTYPE, ColumnConfig, DataTable, FilterParams, SchemaError,
+                        generate_columns_config_from_dataframe)
+from polars_table import PolarsDataTable
+
+_BASE = pd.DataFrame(generate_batch_records(1, 500))
+
+
+def _table():
+    return DataTable(_BASE.copy(), generate_columns_config_from_dataframe(_BASE))
+
+
+def _declared_table():
+    """列配置的类型由调用方声明（而不是推断），不符合的值被拒绝"""
+    columns_config = [c.model_copy(update={'inferred': False}) for c in generate_columns_config_from_dataframe(_BASE)]
+    return DataTable(_BASE.copy(), columns_config)
+
+
+def _sparse_records(start, count):
+    """只有部分字段的记录（缺少整数、浮点和时间戳字段，部分记录的 user_id 为 None）"""
+    records = generate_batch_records(start, count)
+    for i, record in enumerate(records):
+        del record['id']
+        del record['item_count']
+        del record['discount']
+        del record['ts']
+        record['payload'] = record['payload'].hex()
+        if i % 2:
+            record['user_id'] = None
+    return records
+
+
+def test_declared_dtypes():
+    """测试生成的列配置声明可空类型，没有缺失值的列保持 numpy 存储"""
+    print("=" * 60)
+    print("测试 1: 声明的类型")
+    print("=" * 60)
+
+    table = _table()
+    declared = {c.prop: c.dtype for c in table.columns_config}
+    print(f"声明的类型: {declared}")
+    assert declared['id'] == 'Int64' and declared['item_count'] == 'Int64'
+    assert declared['order_amount'] == 'Float64' and declared['ts'] == 'Float64'
+    assert declared['payload'] is None
+    # 数据没有缺失值，不需要转换
+    assert table.dataframe['item_count'].dtype == 'int64'
+    assert 'dtype' not in table.get_columns_config()['columns'][0]
+
+    # 空表按声明的类型建立列
+    empty = DataTable(pd.DataFrame(), [
+        ColumnConfig(prop='id', label='ID', type='number', filterType='number', dtype='Int64'),
+        ColumnConfig(prop='score', label='分数', type='number', filterType='number', dtype='Float64'),
+        ColumnConfig(prop='active', label='启用', type='string', dtype='boolean'),
+    ])
+    assert [str(t) for t in empty.dataframe.dtypes] == ['Int64', 'Float64', 'boolean']
+    empty.add_data([{'score': 1}, {'active': True}, {'score': None, 'active': None}])
+    print(f"空表写入后: {empty.dataframe.dtypes.to_dict()}")
+    assert empty.dataframe['id'].tolist() == [1, 2, 3]
+    assert str(empty.dataframe['score'].dtype) == 'Float64'
+    assert str(empty.dataframe['active'].dtype) == 'boolean'
+    print("✓ 测试通过\n")
+
+
+def test_sparse_batches():
+    """测试缺少字段的批次追加后数字列为 Int64、Float64，筛选、排序和序列化（缺失值为 null）正常"""
+    print("=" * 60)
+    print("测试 2: 稀疏批次")
+    print("=" * 60)
+
+    table = _table()
+    for start in (1000, 2000, 3000):
+        table.add_data(_sparse_records(start, 20))
+    dtypes = table.dataframe.dtypes
+    print(f"追加后: item_count={dtypes['item_count']}, user_id={dtypes['user_id']}, "
+          f"discount={dtypes['discount']}, ts={dtypes['ts']}")
+    assert str(dtypes['item_count']) == 'Int64' and str(dtypes['user_id']) == 'Int64'
+    assert str(dtypes['discount']) == 'Float64' and str(dtypes['ts']) == 'Float64' and dtypes['id'] == 'int64'
+    assert table.dataframe['item_count'].isna().sum() == 60 and table.dataframe['user_id'].isna().sum() == 30
+
+    # 缺失值不满足任何数字条件，排在最后
+    expected = int((_BASE['item_count'] > 50).sum())
+    assert table.get_list(FilterParams(item_count={'operator': '>', 'value': 50}))['total'] == expected
+    assert table.get_list(FilterParams(item_count={'operator': '<=', 'value': 50}))['total'] == 500 - expected
+    result = table.get_list(None, 1, 600, 'item_count', 'descending')
+    assert [r['item_count'] for r in result['list'][-60:]] == [None] * 60
+    json.dumps(result, allow_nan=False)
+
+    detail = {d['label']: d for d in table.get_row_detail(502)}
+    assert detail['item_count']['value'] is None and detail['item_count']['format'] == 'int'
+    assert table.get_row_position(560)['position'] == 559
+    print("✓ 测试通过\n")
+
+
+def test_new_columns_and_updates():
+    """测试只有部分记录带有的新字段，以及按 id 写入缺失值后整数列不退化为 float 或 object"""
+    print("=" * 60)
+    print("测试 3: 新字段与修改")
+    print("=" * 60)
+
+    table = _table()
+    records = _sparse_records(1000, 10)
+    records[0]['priority'] = 3
+    records[1]['vip'] = True
+    table.add_data(records)
+    dtypes = table.dataframe.dtypes
+    print(f"新字段: priority={dtypes['priority']}, vip={dtypes['vip']}")
+    assert str(dtypes['priority']) == 'Float64' and str(dtypes['vip']) == 'boolean'
+    assert table.dataframe['vip'].notna().sum() == 1
+
+    table.update_rows({1: {'item_count': None}, 2: {'user_id': 42}})
+    table.upsert([{'id': 3, 'shipping_cost': None, 'level': 2}])
+    dtypes = table.dataframe.dtypes
+    print(f"修改后: item_count={dtypes['item_count']}, shipping_cost={dtypes['shipping_cost']}, level={dtypes['level']}")
+    assert str(dtypes['item_count']) == 'Int64' and str(dtypes['shipping_cost']) == 'Float64'
+    assert str(dtypes['level']) in ('Int64', 'int64') and table.dataframe['level'].iloc[2] == 2
+    assert pd.isna(table.dataframe['item_count'].iloc[0]) and table.dataframe['user_id'].iloc[1] == 42
+
+    # 快照保存时可空整数列按 float 保存
+    with tempfile.TemporaryDirectory() as tmp:
+        table.save_snapshot(os.path.join(tmp, 'snap'))
+        restored = DataTable.load_snapshot(os.path.join(tmp, 'snap'))
+        assert restored.total_count == table.total_count
+        assert restored.get_row_detail(1)[5]['value'] is None
+    print("✓ 测试通过\n")
+
+
+def _expect_schema_error(write, *args):
+    try:
+        write(*args)
+    except SchemaError as e:
+        print(f"拒绝写入: {e}")
+        return
+    raise AssertionError(f'{args} 应该被拒绝')
+
+
+def test_invalid_values():
+    """测试无法按声明类型保存的值（整数列中的小数、数字列中的文本）被拒绝，不截断也不改变列类型"""
+    print("=" * 60)
+    print("测试 4: 不符合类型的值")
+    print("=" * 60)
+
+    table = _declared_table()
+    dtypes = table.dataframe.dtypes.copy()
+    _expect_schema_error(table.add_data, [{'item_count': 1.7}])
+    _expect_schema_error(table.add_data, [{'item_count': 'abc'}])
+    _expect_schema_error(table.add_data, [{'item_count': 2.9}, {'order_status': '已发货'}])
+    _expect_schema_error(table.add_data, [{'discount': '1.5x'}, {'order_status': '已发货'}])
+    _expect_schema_error(table.update_rows, {1: {'item_count': 0.5}})
+    _expect_schema_error(table.upsert, [{'id': 2, 'order_amount': 'n/a'}])
+    # 被拒绝的写入不修改数据
+    assert table.total_count == 500 and table.dataframe.dtypes.equals(dtypes)
+    assert table.dataframe['item_count'].iloc[0] == _BASE['item_count'].iloc[0]
+
+    # 整数值的小数、数字字符串按声明的类型保存
+    table.add_data([{'item_count': 3.0}, {'item_count': '7', 'discount': '0.25'}, {'order_status': '已发货'}])
+    dtypes = table.dataframe.dtypes
+    print(f"写入后: item_count={dtypes['item_count']}, discount={dtypes['discount']}")
+    assert str(dtypes['item_count']) == 'Int64' and str(dtypes['discount']) == 'Float64'
+    assert table.dataframe['item_count'].iloc[-3:].tolist()[:2] == [3, 7]
+    assert table.dataframe['discount'].iloc[-2] == 0.25
+    table.update_rows({1: {'item_count': 12.0}})
+    assert table.dataframe['item_count'].iloc[0] == 12 and str(table.dataframe['item_count'].dtype) == 'Int64'
+
+    # 没有缺失值的批次同样检查
+    clean = _declared_table()
+    _expect_schema_error(clean.add_data, [{'id': 9001, 'item_count': 4.5}])
+    assert clean.dataframe['item_count'].dtype == 'int64'
+
+    # 推断的类型遇到不符合的值时放宽：整数列中的小数转为 Float64，文本保留为 object
+    inferred = _table()
+    inferred.add_data([{'item_count': 2.5}, {'order_status': '已发货'}])
+    inferred.add_data([{'discount': 'n/a'}])
+    dtypes = inferred.dataframe.dtypes
+    print(f"推断的类型放宽后: item_count={dtypes['item_count']}, discount={dtypes['discount']}")
+    assert str(dtypes['item_count']) == 'Float64' and inferred.dataframe['item_count'].iloc[500] == 2.5
+    assert dtypes['discount'] == object and inferred.dataframe['discount'].iloc[-1] == 'n/a'
+    assert inferred.dataframe['item_count'].iloc[0] == _BASE['item_count'].iloc[0]
+    print("✓ 测试通过\n")
+
+
+def test_update_dataframe():
+    """测试 update_dataframe 传入的数据按声明的类型转换（整体替换和追加），不符合的值被拒绝"""
+    print("=" * 60)
+    print("测试 5: update_dataframe")
+    print("=" * 60)
+
+    table = _declared_table()
+    replaced = _BASE.copy()
+    replaced['item_count'] = replaced['item_count'].astype(float)
+    replaced.loc[3, 'item_count'] = None
+    table.update_dataframe(replaced)
+    print(f"整体替换后: item_count={table.dataframe['item_count'].dtype}")
+    assert str(table.dataframe['item_count'].dtype) == 'Int64'
+    assert pd.isna(table.dataframe['item_count'].iloc[3])
+
+    grown = pd.concat([table.dataframe, pd.DataFrame(_sparse_records(1000, 5)).assign(id=range(501, 506))],
+                      ignore_index=True)
+    result = table.update_dataframe(grown)
+    print(f"追加后: incremental={result['incremental']}, discount={table.dataframe['discount'].dtype}")
+    assert result['total_count'] == 505 and str(table.dataframe['discount'].dtype) == 'Float64'
+
+    # 追加时只转换新增的行，前缀沿用已转换的数据
+    before = table.dataframe
+    grown = pd.concat([grown, pd.DataFrame(_sparse_records(2000, 3)).assign(id=range(506, 509))], ignore_index=True)
+    result = table.update_dataframe(grown)
+    assert result['incremental'] and result['appended_count'] == 3
+    assert table.dataframe['item_count'].iloc[:505].equals(before['item_count'])
+
+    # 整体替换时推断的类型按新数据重新推断，列的类型可以改变
+    changed = _BASE.copy()
+    changed['item_count'] = changed['item_count'] + 0.5
+    changed['discount'] = 'n/a'
+    inferred = _table()
+    result = inferred.update_dataframe(changed)
+    config = {c.prop: c for c in inferred.columns_config}
+    print(f"类型改变的整体替换: item_count={inferred.dataframe['item_count'].dtype}, discount={config['discount'].dtype}")
+    assert not result['incremental'] and inferred.dataframe['item_count'].iloc[0] == _BASE['item_count'].iloc[0] + 0.5
+    assert config['item_count'].dtype == 'Float64' and config['discount'].dtype == _STRING_DTYPE
+
+    # 声明的类型在整体替换时同样检查，被拒绝时数据和列配置不变
+    declared = _declared_table()
+    columns = [c.model_dump() for c in declared.columns_config]
+    broken = declared.dataframe.copy()
+    broken['item_count'] = broken['item_count'].astype(object)
+    broken.loc[0, 'item_count'] = 1.5
+    broken['extra'] = 1
+    _expect_schema_error(declared.update_dataframe, broken)
+    assert declared.total_count == 500 and declared.dataframe['item_count'].dtype == 'int64'
+    assert [c.model_dump() for c in declared.columns_config] == columns
+    print("✓ 测试通过\n")
+
+
+def test_polars_sparse_batches():
+    """测试 Polars 后端写入包含可空类型列的批次"""
+    print("=" * 60)
+    print("测试 6: Polars 后端")
+    print("=" * 60)
+
+    if polars_table._pl is None:
+        print("未安装 polars，跳过")
+        return
+    table = PolarsDataTable(_BASE.copy(), generate_columns_config_from_dataframe(_BASE))
+    table.add_data(_sparse_records(1000, 20))
+    frame = table._frame
+    print(f"Polars 类型: item_count={frame['item_count'].dtype}, user_id={frame['user_id'].dtype}")
+    assert frame['item_count'].dtype.is_integer() and frame['user_id'].null_count() == 10
+    assert table.get_list(FilterParams(user_id={'operator': '>', 'value': 0}))['total'] == 510
+    print("✓ 测试通过\n")
+
+
+if __name__ == '__main__':
+    print("\n开始测试列类型约束...\n")
+
+    try:
+        test_declared_dtypes()
+        test_sparse_batches()
+        test_new_columns_and_updates()
+        test_invalid_values()
+        test_update_dataframe()
+        test_polars_sparse_batches()
+
+        print("=" * 60)
+        print("所有测试通过！✓")
+        print("=" * 60)
+
+    except AssertionError as e:
+        print(f"\n❌ 测试失败: {e}")
+        sys.exit(1)
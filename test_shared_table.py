@@ -0,0 +1,228 @@
+"""测试共享表格
+
+验证写入进程追加的数据能被其他进程中的 SharedDataTable 读取，且数值列不复制
+"""
+
+import multiprocessing
+import os
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+import column_store
+from column_store import ColumnStoreReader, ColumnStoreWriter
+from data_generator import generate_batch_records
+from data_table import FilterParams, generate_columns_config_from_dataframe
+from shared_table import SharedDataTable, SharedTableWriter
+
+
+def _writer_process(path: str, start_id: int, count: int):
+    """在子进程中打开已有的列存储并追加数据"""
+    initial = pd.DataFrame(generate_batch_records(1, 10))
+    writer = SharedTableWriter(path, initial, generate_columns_config_from_dataframe(initial))
+    writer.add_data(generate_batch_records(start_id, count))
+    writer.close()
+
+
+def test_reader_sees_published_rows():
+    """测试读取端能看到写入端发布的行"""
+    print("=" * 60)
+    print("测试 1: 读取端同步写入端发布的数据")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as path:
+        initial = pd.DataFrame(generate_batch_records(1, 10))
+        writer = SharedTableWriter(path, initial, generate_columns_config_from_dataframe(initial))
+        reader = SharedDataTable(path)
+
+        assert reader.get_list(page_size=100)['total'] == 10
+        version = reader.version
+
+        writer.add_data(generate_batch_records(11, 5))
+        result = reader.get_list(page_size=100)
+        print(f"同步后总数: {result['total']}, 版本: {version} -> {reader.version}")
+        assert result['total'] == 15
+        assert reader.version > version
+
+        # 数值列直接引用映射的文件
+        assert np.shares_memory(reader.dataframe['id'].values, reader._reader.fixed_array('id'))
+
+        # 查询语义与普通 DataTable 一致
+        expected = writer.get_list(filters=FilterParams(id={'operator': '>', 'value': 12}), page_size=100)
+        actual = reader.get_list(filters=FilterParams(id={'operator': '>', 'value': 12}), page_size=100)
+        assert actual['total'] == expected['total'] == 3
+        assert actual['list'] == expected['list']
+
+        writer.close()
+        reader.close()
+    print("✓ 测试通过：读取端同步了新增数据\n")
+
+
+def test_cross_process_writer():
+    """测试另一个进程中的写入端"""
+    print("=" * 60)
+    print("测试 2: 跨进程写入")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as path:
+        initial = pd.DataFrame(generate_batch_records(1, 10))
+        writer = SharedTableWriter(path, initial, generate_columns_config_from_dataframe(initial))
+        writer.close()
+        reader = SharedDataTable(path)
+
+        ctx = multiprocessing.get_context('spawn')
+        proc = ctx.Process(target=_writer_process, args=(path, 11, 20))
+        proc.start()
+        proc.join(timeout=60)
+        assert proc.exitcode == 0, f"写入进程退出码: {proc.exitcode}"
+
+        result = reader.get_list(page_size=100, sort_by='id', sort_order='descending')
+        print(f"跨进程同步后总数: {result['total']}")
+        assert result['total'] == 30
+        assert result['list'][0]['id'] == 30
+        assert reader.get_row_detail(25)[0]['value'] == 25
+        reader.close()
+    print("✓ 测试通过：跨进程写入的数据可见\n")
+
+
+def test_incremental_decode():
+    """测试同步时变长列只解码新增的行，各版本共用同一个缓冲区，不复制已解码的行"""
+    print("=" * 60)
+    print("测试 3: 变长列增量解码")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as path:
+        initial = pd.DataFrame(generate_batch_records(1, 100))
+        writer = SharedTableWriter(path, initial, generate_columns_config_from_dataframe(initial))
+        reader = SharedDataTable(path)
+        decoded = []
+        original = reader._reader.read_column
+
+        def recording(name, start=0, stop=None):
+            decoded.append((name, start, stop))
+            return original(name, start, stop)
+
+        reader._reader.read_column = recording
+        writer.add_data(generate_batch_records(101, 50))
+        reader.sync()
+        buffer = reader._decoded['order_status'][0]
+        first = reader.dataframe
+        writer.add_data(generate_batch_records(151, 10))
+        reader.sync()
+        print(f"解码的行范围: {sorted(set((start, stop) for _, start, stop in decoded))}")
+        assert all(start in (100, 150) for _, start, _ in decoded)
+        # 第二次同步写入已有的缓冲区，两个版本的 DataFrame 共用已解码的行
+        assert reader._decoded['order_status'][0] is buffer
+        assert np.shares_memory(first['order_status'].values, reader.dataframe['order_status'].values)
+        assert reader.dataframe['order_status'].tolist() == writer.dataframe['order_status'].tolist()
+        assert len(first) == 150 and reader.total_count == 160
+        writer.close()
+        reader.close()
+    print("✓ 测试通过\n")
+
+
+def test_promoted_column_keeps_old_file():
+    """测试整数列提升为浮点后旧数据文件保留一段时间，仍按旧 schema 读取的进程可以读取"""
+    print("=" * 60)
+    print("测试 4: 列文件替换")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as path:
+        writer = ColumnStoreWriter(path)
+        writer.append([{'id': 1, 'qty': 5}, {'id': 2, 'qty': 6}])
+        reader = ColumnStoreReader(path)
+        old_file = reader._columns['qty']['file']
+
+        writer.append([{'id': 3, 'qty': None}])  # qty 提升为 float64，写入新的数据文件
+        # reader 还没有同步，仍按旧 schema 映射旧文件
+        assert reader.read_column('qty').tolist() == [5, 6]
+        reader.refresh()
+        print(f"数据文件: {old_file} -> {reader._columns['qty']['file']}")
+        assert reader.read_column('qty')[:2].tolist() == [5.0, 6.0] and np.isnan(reader.read_column('qty')[2])
+
+        # 保留时间过后，下一次写入删除旧文件
+        assert os.path.exists(os.path.join(path, f'{old_file}.data'))
+        column_store.RETIRED_FILE_GRACE = 0
+        try:
+            writer.append([{'id': 4, 'qty': 7}])
+        finally:
+            column_store.RETIRED_FILE_GRACE = 60.0
+        assert not os.path.exists(os.path.join(path, f'{old_file}.data'))
+        reader.refresh()
+        assert reader.read_column('qty')[3] == 7
+        writer.close()
+        reader.close()
+    print("✓ 测试通过\n")
+
+
+def test_reader_is_read_only():
+    """测试读取端不允许写入"""
+    with tempfile.TemporaryDirectory() as path:
+        initial = pd.DataFrame(generate_batch_records(1, 3))
+        writer = SharedTableWriter(path, initial, generate_columns_config_from_dataframe(initial))
+        reader = SharedDataTable(path)
+        try:
+            reader.add_data(generate_batch_records(4, 1))
+            assert False, "读取端应该拒绝写入"
+        except RuntimeError:
+            pass
+        writer.close()
+        reader.close()
+
+
+def test_update_dataframe_append_only():
+    """测试 update_dataframe 只接受在已发布的行之后追加，修改、删除或重新排列已发布的行和列时报错"""
+    print("=" * 60)
+    print("测试 5: update_dataframe 只能追加")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as path:
+        initial = pd.DataFrame(generate_batch_records(1, 10))
+        writer = SharedTableWriter(path, initial, generate_columns_config_from_dataframe(initial))
+        reader = SharedDataTable(path)
+        version = writer.version
+
+        changed = pd.concat([initial, pd.DataFrame(generate_batch_records(11, 2))], ignore_index=True)
+        changed.loc[0, 'order_amount'] = 99.0
+        for rejected in (changed, changed.drop(columns=['city']), changed[list(reversed(changed.columns))],
+                         changed.iloc[::-1].reset_index(drop=True)):
+            try:
+                writer.update_dataframe(rejected)
+                raise AssertionError('修改已发布的行或列应该被拒绝')
+            except ValueError as e:
+                print(f"拒绝: {e}")
+        assert writer.version == version and writer.total_count == 10
+        assert writer.get_row_detail(1) == reader.get_row_detail(1)
+
+        grown = pd.concat([initial, pd.DataFrame(generate_batch_records(11, 2))], ignore_index=True)
+        result = writer.update_dataframe(grown)
+        assert result['incremental'] and result['version'] > version
+        assert reader.get_list(page_size=100)['total'] == 12
+        assert writer.get_row_detail(12) == reader.get_row_detail(12)
+        writer.close()
+        reader.close()
+    print("✓ 测试通过\n")
+
+
+if __name__ == '__main__':
+    print("\n开始测试共享表格...\n")
+
+    try:
+        test_reader_sees_published_rows()
+        test_cross_process_writer()
+        test_incremental_decode()
+        test_promoted_column_keeps_old_file()
+        test_reader_is_read_only()
+        test_update_dataframe_append_only()
+
+        print("=" * 60)
+        print("所有测试通过！✓")
+        print("=" * 60)
+
+    except AssertionError as e:
+        print(f"\n❌ 测试失败: {e}")
+        sys.exit(1)
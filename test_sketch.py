@@ -0,0 +1,135 @@
+"""测试不同值数量估计（HyperLogLog）和抽样推断列配置：结果与精确统计一致，高基数列不对整列求哈希"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+import data_table
+from data_generator import generate_batch_dataframe
+from data_table import generate_columns_config_from_dataframe
+from sketch import HyperLogLog
+
+
+def test_estimate():
+    """测试估计误差、缺失值和合并"""
+    print("=" * 60)
+    print("测试 1: HyperLogLog 估计")
+    print("=" * 60)
+
+    for count in (1, 10, 100, 1000, 50_000):
+        sketch = HyperLogLog()
+        values = np.array([f'v{i}' for i in range(count)], dtype=object)
+        for _ in range(3):  # 重复加入不改变估计
+            sketch.add(values)
+        estimate = sketch.estimate()
+        print(f"{count} 个不同值: 估计 {estimate:.1f}")
+        assert abs(estimate - count) <= max(1.0, count * 0.05), (count, estimate)
+        assert sketch.rows == count * 3
+
+    numbers = HyperLogLog()
+    numbers.add(pd.Series(np.arange(20_000) % 300))
+    assert abs(numbers.estimate() - 300) < 10
+
+    # 缺失值与 unique() 一样计为不同值
+    sketch = HyperLogLog()
+    sketch.add(np.array(['a', None, 'a', None], dtype=object))
+    assert round(sketch.estimate()) == 2
+
+    left, right = HyperLogLog(), HyperLogLog()
+    left.add(np.arange(0, 600))
+    right.add(np.arange(400, 1000))
+    left.merge(right)
+    assert abs(left.estimate() - 1000) < 50
+    try:
+        left.merge(HyperLogLog(precision=10))
+        raise AssertionError('不同精度不能合并')
+    except ValueError:
+        pass
+    print("✓ 测试通过\n")
+
+
+def test_sampled_inference():
+    """测试抽样推断的列配置与精确统计相同（包括只出现在抽样之外的少见值）"""
+    print("=" * 60)
+    print("测试 2: 抽样推断列配置")
+    print("=" * 60)
+
+    df = generate_batch_dataframe(1, 300_000, seed=3, extra_columns=2, cardinality=60)
+    rows = np.arange(len(df))
+    df['category'] = np.where(rows == len(df) - 7, 'rare', 'common')   # 抽样不会取到的少见值
+    df['region'] = pd.Series(rows % 101).map(lambda v: f'r{v}')       # 刚好超过上限
+    df['site'] = np.repeat(np.array([f's{i}' for i in range(1000)], dtype=object), len(df) // 1000)
+    df.loc[5, 'merchant'] = None
+
+    sampled = generate_columns_config_from_dataframe(df)
+    exact = generate_columns_config_from_dataframe(df, sample_rows=None)
+    assert [c.model_dump() for c in sampled] == [c.model_dump() for c in exact]
+    config = {c.prop: c for c in sampled}
+    for prop in ('category', 'region', 'site', 'merchant', 'extra_1'):
+        print(f"{prop}: {config[prop].filterType}, {len(config[prop].options or [])} 个选项")
+    assert config['category'].options == ['common', 'rare']
+    assert config['region'].filterType == 'text' and config['site'].filterType == 'text'
+    assert config['extra_1'].filterType == 'multi-select' and len(config['extra_1'].options) == 60
+    assert 'None' in config['merchant'].options  # 与 unique() 相同，缺失值也计入
+
+    # 小表（不超过抽样行数）的结果与原来逐列 unique() 相同
+    small = df.iloc[:500]
+    options = {c.prop: c.options for c in generate_columns_config_from_dataframe(small) if c.options}
+    assert options['order_status'] == [str(v) for v in small['order_status'].unique()]
+    print("✓ 测试通过\n")
+
+
+def test_high_cardinality_not_hashed():
+    """测试明显超过上限的列（包括按顺序聚集的取值）由抽样估计排除，不精确统计整列"""
+    print("=" * 60)
+    print("测试 3: 高基数列提前结束")
+    print("=" * 60)
+
+    rows = 2_000_000
+    df = pd.DataFrame({
+        # 按时间写入的数据中同一取值连续出现：逐块精确统计要读取大量行才能超过上限
+        'site': np.repeat(np.array([f'site-{i:04d}' for i in range(1000)], dtype=object), rows // 1000),
+        'status': np.resize(np.array(['ok', 'fail'], dtype=object), rows),
+    })
+    counted = []
+    original = data_table._distinct_values
+
+    def recording(series, limit, dropna=False):
+        counted.append(series.name)
+        return original(series, limit, dropna)
+
+    data_table._distinct_values = recording
+    try:
+        config = {c.prop: c for c in generate_columns_config_from_dataframe(df)}
+    finally:
+        data_table._distinct_values = original
+    print(f"精确统计的列: {counted}")
+    assert config['site'].filterType == 'text' and config['status'].options == ['ok', 'fail']
+    assert counted == ['status']
+
+    # _update_column_options 超过上限时同样提前结束
+    table = data_table.DataTable(df, [c.model_copy() for c in config.values()], copy=False)
+    table.columns_config[0].filterType = 'multi-select'
+    assert table._update_column_options() and table.columns_config[0].filterType == 'text'
+    print("✓ 测试通过\n")
+
+
+if __name__ == '__main__':
+    print("\n开始测试不同值数量估计...\n")
+
+    try:
+        test_estimate()
+        test_sampled_inference()
+        test_high_cardinality_not_hashed()
+
+        print("=" * 60)
+        print("所有测试通过！✓")
+        print("=" * 60)
+
+    except AssertionError as e:
+        print(f"\n❌ 测试失败: {e}")
+        sys.exit(1)
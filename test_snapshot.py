@@ -0,0 +1,94 @@
+"""测试 DataTable 快照保存与恢复
+
+验证恢复后的数据、列配置、筛选选项和 id 索引与保存前一致
+"""
+
+import os
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from data_generator import generate_batch_records
+from data_table import DataTable, FilterParams, generate_columns_config_from_dataframe
+from mapped_table import MappedDataTable
+
+
+def test_snapshot_roundtrip():
+    """测试快照往返"""
+    print("=" * 60)
+    print("测试 1: 快照保存与恢复")
+    print("=" * 60)
+
+    df = pd.DataFrame(generate_batch_records(1, 500))
+    table = DataTable(df, generate_columns_config_from_dataframe(df))
+    table.add_data([{'id': 501, 'order_status': '新状态'}])
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'snapshot')
+        result = table.save_snapshot(path)
+        print(f"保存结果: {result}")
+        assert result['row_count'] == 501
+        assert result['indexes'] == ['id']
+
+        restored = DataTable.load_snapshot(path)
+        assert restored.get_columns_config() == table.get_columns_config()
+
+        filters = FilterParams(order_status=['新状态', '已付款'])
+        for sort_by in [None, 'order_amount']:
+            assert restored.get_list(filters, 1, 50, sort_by) == table.get_list(filters, 1, 50, sort_by)
+
+        # id 索引以内存映射方式加载，无需重建
+        assert isinstance(restored._id_index[1], np.memmap)
+        assert restored.get_row_detail(7) == table.get_row_detail(7)
+        assert restored.get_row_detail(501)[2]['value'] == '新状态'
+        assert restored.get_row_position(501, filters) == table.get_row_position(501, filters)
+
+        # 恢复后可以继续追加
+        restored.add_data([{'order_status': '待付款'}])
+        assert restored.get_row_detail(502)[0]['value'] == 502
+
+        lazy = DataTable.load_snapshot(path, lazy=True)
+        assert isinstance(lazy, MappedDataTable)
+        assert lazy.get_list(filters, 1, 50) == table.get_list(filters, 1, 50)
+        lazy.close()
+    print("✓ 测试通过：快照恢复后数据一致\n")
+
+
+def test_snapshot_overwrite_and_empty():
+    """测试覆盖已有快照和空表快照"""
+    print("=" * 60)
+    print("测试 2: 覆盖快照与空表")
+    print("=" * 60)
+
+    df = pd.DataFrame(generate_batch_records(1, 10))
+    columns_config = generate_columns_config_from_dataframe(df)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'snapshot')
+        DataTable(df, columns_config).save_snapshot(path)
+        DataTable(df.iloc[0:0], columns_config).save_snapshot(path)
+
+        restored = DataTable.load_snapshot(path)
+        assert restored.total_count == 0
+        assert [c['prop'] for c in restored.get_columns_config()['columns']] == list(df.columns)
+        assert not os.path.exists(path + '.tmp') and not os.path.exists(path + '.old')
+    print("✓ 测试通过\n")
+
+
+if __name__ == '__main__':
+    print("\n开始测试快照...\n")
+
+    try:
+        test_snapshot_roundtrip()
+        test_snapshot_overwrite_and_empty()
+
+        print("=" * 60)
+        print("所有测试通过！✓")
+        print("=" * 60)
+
+    except AssertionError as e:
+        print(f"\n❌ 测试失败: {e}")
+        sys.exit(1)
@@ -0,0 +1,203 @@
+"""测试 SQLite 后端：筛选条件翻译为 SQL 的结果与 DataTable 一致、keyset 分页、增删改和文件数据库"""
+
+import os
+import sys
+import tempfile
+import threading
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from data_generator import generate_batch_records
+from data_table import DataTable, FilterGroup, FilterParams, NumberFilter, generate_columns_config_from_dataframe
+from sqlite_table import SqliteDataTable
+
+_BASE = pd.DataFrame(generate_batch_records(1, 2000))
+
+_FILTERS = [
+    None,
+    FilterParams(order_status=['已发货', '退款中']),
+    FilterParams(order_amount={'logic': 'or', 'filters': [{'operator': '<', 'value': 500},
+                                                          {'operator': '>', 'value': 9000}]}),
+    FilterParams(discount=FilterGroup(filters=[NumberFilter(operator='<=', value=0.1),
+                                               NumberFilter(operator='>', value='0.9')], logic='OR')),
+    FilterParams(item_count={'operator': '>=', 'value': '0x20'}, city='北京'),
+    FilterParams(order_number='0001'),
+    FilterParams(order_number='ORD0+12.'),   # 正则
+    FilterParams(payload='ab'),               # bytes 按十六进制匹配
+    FilterParams(ts='2025-06'),               # ts 按时间字符串匹配
+    FilterParams(order_date=_BASE['order_date'].iloc[5]),
+]
+
+
+def _tables():
+    config = generate_columns_config_from_dataframe(_BASE)
+    return DataTable(_BASE.copy(), config), SqliteDataTable(':memory:', _BASE.copy())
+
+
+def _wire_records(start, count):
+    records = generate_batch_records(start, count)
+    for record in records:
+        del record['id']
+        record['payload'] = record['payload'].hex()
+    return records
+
+
+def test_query_parity():
+    """测试各类筛选、排序和分页的结果与 DataTable 一致"""
+    print("=" * 60)
+    print("测试 1: 查询结果与 DataTable 一致")
+    print("=" * 60)
+
+    reference, table = _tables()
+    for filters in _FILTERS:
+        for sort_by, sort_order in [(None, None), ('order_amount', 'descending'), ('city', 'ascending')]:
+            for page in (1, 3):
+                expected = reference.get_list(filters, page, 50, sort_by, sort_order)
+                result = table.get_list(filters, page, 50, sort_by, sort_order)
+                assert result['total'] == expected['total'], (filters, result['total'], expected['total'])
+                if sort_by:
+                    # 取值相同的行之间 pandas 的顺序不固定，只比较排序值
+                    assert [r[sort_by] for r in result['list']] == [r[sort_by] for r in expected['list']]
+                else:
+                    assert result['list'] == expected['list'], (filters, sort_by, page)
+        print(f"{reference._canonical_filters(filters)}: {table.get_list(filters)['total']} 行")
+
+    for row_id in (1, 777, 1999):
+        for filters in _FILTERS[:4]:
+            assert table.get_row_position(row_id, filters) == reference.get_row_position(row_id, filters)
+        assert table.get_row_detail(row_id) == reference.get_row_detail(row_id)
+    reference._update_column_options()  # 生成列配置时的选项未排序
+    assert table.get_columns_config() == reference.get_columns_config()
+    assert sorted(table.distinct_values('city')) == sorted(reference.distinct_values('city'))
+    print("✓ 测试通过\n")
+
+
+def test_keyset_paging():
+    """测试顺序翻页改用 keyset 条件，结果与 OFFSET 分页一致，写入后重新使用 OFFSET"""
+    print("=" * 60)
+    print("测试 2: keyset 分页")
+    print("=" * 60)
+
+    _, table = _tables()
+    filters = FilterParams(order_status=['已发货', '已完成', '退款中'])
+    plan = table.explain(filters, 2, 100, 'order_amount', 'ascending')
+    assert plan['source']['paging'] == 'offset'
+
+    seen = []
+    page = 1
+    while True:
+        result = table.get_list(filters, page, 100, 'order_amount', 'ascending')
+        if not result['list']:
+            break
+        seen.extend(result['list'])
+        page += 1
+    plan = table.explain(filters, 3, 100, 'order_amount', 'ascending')
+    print(f"第 3 页: {plan['source']['paging']}, {plan['source']['plan']}")
+    assert plan['source']['paging'] == 'keyset'
+    assert len(seen) == result['total'] and len({r['id'] for r in seen}) == len(seen)
+    amounts = [r['order_amount'] for r in seen]
+    assert amounts == sorted(amounts)
+
+    # 与逐页使用 OFFSET 的新表结果一致
+    _, fresh = _tables()
+    assert fresh.get_list(filters, 4, 100, 'order_amount', 'ascending')['list'] == seen[300:400]
+
+    table.add_data(_wire_records(5000, 3))
+    assert table.explain(filters, 3, 100, 'order_amount', 'ascending')['source']['paging'] == 'offset'
+    print("✓ 测试通过\n")
+
+
+def test_writes():
+    """测试追加（含新字段）、按 id 修改、upsert 和删除的结果与 DataTable 一致"""
+    print("=" * 60)
+    print("测试 3: 写入")
+    print("=" * 60)
+
+    reference, table = _tables()
+    records = _wire_records(5000, 50)
+    for record in records[:5]:
+        record['channel'] = 'app'
+    for target in (reference, table):
+        result = target.add_data(records)
+        assert result['added_count'] == 50 and result['added_columns'] == ['channel']
+        target.update_rows({3: {'order_status': '已完成', 'discount': 0.5}, 99999: {'discount': 1}})
+        target.upsert([{'id': 4, 'city': '拉萨'}, {'id': 4, 'merchant': '商家Z'}, {'id': 3000, 'city': '西宁'}])
+        deleted = target.delete_rows([5, 6, 6, 123456])
+        assert deleted['deleted_count'] == 2 and deleted['missing_ids'] == [123456]
+
+    print(f"写入后 {table.total_count} 行，新增列配置: {table.columns_config[-1].prop}")
+    assert table.total_count == reference.total_count == 2049
+    assert isinstance(table.dataframe.set_index('id').loc[2050, 'payload'], bytes)
+    for filters in (None, FilterParams(city=['拉萨', '西宁']), FilterParams(channel='app')):
+        expected = reference.get_list(filters, 1, 3000)
+        result = table.get_list(filters, 1, 3000)
+        assert result['total'] == expected['total'], filters
+        # pandas 中有缺失值的整数列为可空的 Int64，SQLite 读回时为 float
+        pd.testing.assert_frame_equal(pd.DataFrame(result['list']), pd.DataFrame(expected['list']), check_dtype=False)
+    city = next(c for c in table.columns_config if c.prop == 'city')
+    assert '拉萨' in city.options and '西宁' in city.options
+    detail = [(d['label'], d['value']) for d in table.get_row_detail(4)]
+    assert detail == [(d['label'], d['value']) for d in reference.get_row_detail(4)]
+    print("✓ 测试通过\n")
+
+
+def test_file_database():
+    """测试文件数据库：重新打开时使用保存的列配置，追加检测和多线程读取"""
+    print("=" * 60)
+    print("测试 4: 文件数据库")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'orders.db')
+        table = SqliteDataTable(path, _BASE.iloc[:1000].copy())
+        result = table.update_dataframe(_BASE.copy())
+        assert result['incremental'] and result['appended_count'] == 1000
+        result = table.update_dataframe(_BASE.iloc[::2].copy())
+        assert not result['incremental'] and table.total_count == 1000
+        table.close()
+
+        reopened = SqliteDataTable(path)
+        print(f"重新打开: {reopened.total_count} 行，{reopened.memory_usage()['mapped']} 字节")
+        assert reopened.total_count == 1000 and reopened.memory_usage()['resident'] == 0
+        assert [c.prop for c in reopened.columns_config] == list(_BASE.columns)
+        assert reopened.get_row_detail(3)[0]['value'] == 3
+
+        errors = []
+
+        def read():
+            try:
+                for page in range(1, 6):
+                    reopened.get_list(FilterParams(city='北京'), page, 20, 'ts', 'descending')
+            except Exception as e:  # noqa: BLE001
+                errors.append(e)
+
+        threads = [threading.Thread(target=read) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        reopened.add_data(_wire_records(5000, 100))
+        for thread in threads:
+            thread.join()
+        assert not errors, errors
+        assert reopened.total_count == 1100
+        reopened.close()
+    print("✓ 测试通过\n")
+
+
+if __name__ == '__main__':
+    print("\n开始测试 SQLite 后端...\n")
+
+    try:
+        test_query_parity()
+        test_keyset_paging()
+        test_writes()
+        test_file_database()
+
+        print("=" * 60)
+        print("所有测试通过！✓")
+        print("=" * 60)
+
+    except AssertionError as e:
+        print(f"\n❌ 测试失败: {e}")
+        sys.exit(1)
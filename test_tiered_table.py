@@ -0,0 +1,148 @@
+"""测试 TieredDataTable 冷热分层
+
+验证封存后跨冷热数据的查询结果与普通 DataTable 一致，并且数据段摘要能跳过不匹配的数据段
+"""
+
+import os
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from data_generator import generate_batch_records
+from data_table import DataTable, FilterGroup, FilterParams, NumberFilter, generate_columns_config_from_dataframe
+from tiered_table import Segment, TieredDataTable
+
+
+def _normalized_columns(table):
+    """列配置（选项排序后比较，DataTable 初始化时的选项保持数据中的出现顺序）"""
+    columns = table.get_columns_config()['columns']
+    return [dict(c, options=sorted(c['options']) if c.get('options') else c.get('options')) for c in columns]
+
+
+def _matching_segments(table, filters):
+    filter_dict = table._get_filter_dict(filters)
+    return [seg.name for seg in table.segments
+            if seg.may_match(filter_dict, table.columns_config, table._parse_number_value)]
+
+
+def test_tiered_queries_match_datatable():
+    """测试分层后的查询结果与 DataTable 一致"""
+    print("=" * 60)
+    print("测试 1: 跨冷热数据查询")
+    print("=" * 60)
+
+    df = pd.DataFrame(generate_batch_records(1, 2000))
+    with tempfile.TemporaryDirectory() as tmp:
+        # 磁盘（内存映射）、内存中紧凑编码、内存中 zlib 压缩
+        for segment_dir, codec in [(tmp, None), (None, None), (None, 'zlib')]:
+            _check_tiered_queries(df, segment_dir, codec)
+    print("✓ 测试通过：分层后查询结果一致\n")
+
+
+def _check_tiered_queries(df, segment_dir, codec):
+    table = DataTable(df, generate_columns_config_from_dataframe(df))
+    tiered = TieredDataTable(df, generate_columns_config_from_dataframe(df), segment_dir,
+                             hot_rows=300, segment_rows=500, codec=codec)
+    print(f"segment_dir={segment_dir}, codec={codec}")
+    print(f"冷数据段: {len(tiered.segments)}, 冷数据 {tiered.cold_count} 行, 热数据 {len(tiered.dataframe)} 行")
+    assert len(tiered.segments) == 3
+    assert len(tiered.dataframe) == 500
+    assert tiered.total_count == 2000
+    assert _normalized_columns(tiered) == _normalized_columns(table)
+
+    cases = [
+        FilterParams(),
+        FilterParams(order_status=['已付款', '已发货']),
+        FilterParams(id=FilterGroup(filters=[NumberFilter(operator='>', value=1200)])),
+        FilterParams(order_number='ORD00000015'),
+    ]
+    for filters in cases:
+        for page, sort_by in [(1, None), (7, None), (3, 'order_amount')]:
+            assert tiered.get_list(filters, page, 100, sort_by) == table.get_list(filters, page, 100, sort_by)
+
+    for row_id in [3, 1600, 2000]:
+        assert tiered.get_row_detail(row_id) == table.get_row_detail(row_id)
+    filters = FilterParams(city=['北京'])
+    assert tiered.get_row_position(1999, filters) == table.get_row_position(1999, filters)
+
+    # 新增数据的 id 从冷数据中的最大 id 之后继续
+    for t in (table, tiered):
+        t.add_data([{'order_status': '新状态'}] * 300)
+    assert len(tiered.segments) == 4
+    detail = tiered.get_row_detail(2300)
+    assert [d['value'] for d in detail[:3]] == [d['value'] for d in table.get_row_detail(2300)[:3]]
+    assert _normalized_columns(tiered) == _normalized_columns(table)
+
+
+def test_segment_pruning_and_reopen():
+    """测试数据段摘要跳过与重新打开"""
+    print("=" * 60)
+    print("测试 2: 数据段跳过与重新打开")
+    print("=" * 60)
+
+    df = pd.DataFrame(generate_batch_records(1, 1000))
+    columns_config = generate_columns_config_from_dataframe(df)
+    with tempfile.TemporaryDirectory() as tmp:
+        tiered = TieredDataTable(df, columns_config, tmp, hot_rows=0, segment_rows=250)
+        assert len(tiered.dataframe) == 0
+
+        filters = FilterParams(id=FilterGroup(filters=[NumberFilter(operator='<=', value=100)]))
+        assert _matching_segments(tiered, filters) == ['seg_000000']
+        assert tiered.get_list(filters, 1, 200)['total'] == 100
+        assert _matching_segments(tiered, FilterParams(order_status=['不存在'])) == []
+        assert [seg.may_contain_id(900) for seg in tiered.segments] == [False, False, False, True]
+
+        reopened = TieredDataTable(df.iloc[0:0], generate_columns_config_from_dataframe(df), tmp)
+        assert reopened.total_count == 1000
+        assert reopened.get_list(filters, 1, 200) == tiered.get_list(filters, 1, 200)
+    print("✓ 测试通过\n")
+
+
+def test_segment_encodings():
+    """测试数据段的紧凑编码与解码"""
+    print("=" * 60)
+    print("测试 3: 紧凑编码")
+    print("=" * 60)
+
+    df = pd.DataFrame(generate_batch_records(1, 5000))
+    df.loc[3, ['order_number', 'payload', 'order_status']] = None
+    segment = Segment.build('seg_000000', df)
+    kinds = {c['name']: c['kind'] for c in segment.columns}
+    print(f"编码: {kinds}")
+    assert kinds['payload'] == 'fixed_bytes'
+    assert kinds['order_status'] == 'dict' and kinds['order_date'] == 'dict'
+    assert kinds['order_number'] == 'utf8'
+
+    decoded = segment.frame()
+    for name in df.columns:
+        assert decoded[name].tolist() == df[name].where(df[name].notna(), None).tolist(), name
+    positions = np.array([4999, 3, 0])
+    for name in ['payload', 'order_number', 'order_status']:
+        assert segment.take(name, positions).tolist() == segment.column(name)[positions].tolist()
+
+    object_bytes = df.memory_usage(index=False, deep=True).sum()
+    print(f"DataFrame: {object_bytes} 字节, 数据段: {segment.nbytes} 字节")
+    assert segment.nbytes * 3 < object_bytes
+    assert Segment.build('seg_000001', df, codec='zlib').nbytes < segment.nbytes
+    print("✓ 测试通过\n")
+
+
+if __name__ == '__main__':
+    print("\n开始测试冷热分层...\n")
+
+    try:
+        test_tiered_queries_match_datatable()
+        test_segment_pruning_and_reopen()
+        test_segment_encodings()
+
+        print("=" * 60)
+        print("所有测试通过！✓")
+        print("=" * 60)
+
+    except AssertionError as e:
+        print(f"\n❌ 测试失败: {e}")
+        sys.exit(1)
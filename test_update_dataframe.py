@@ -0,0 +1,189 @@
+"""测试 update_dataframe 对只追加了行的数据增量处理"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from data_generator import generate_batch_records
+import polars_table
+from data_table import DataTable, generate_columns_config_from_dataframe
+from polars_table import PolarsDataTable
+
+# 同样的测试在各个后端上运行（未安装 polars 时跳过 PolarsDataTable）
+_BACKENDS = [
+    pytest.param(DataTable, id='pandas'),
+    pytest.param(PolarsDataTable, id='polars',
+                 marks=pytest.mark.skipif(polars_table._pl is None, reason='未安装 polars')),
+]
+
+
+def _table(df, table_class=DataTable):
+    return table_class(df, generate_columns_config_from_dataframe(df))
+
+
+def _options(table):
+    return {c.prop: (c.filterType, c.options) for c in table.columns_config}
+
+
+@pytest.mark.parametrize('table_class', _BACKENDS)
+def test_append_detection(table_class):
+    """测试追加行时走增量路径，结果与整体替换一致"""
+    print("=" * 60)
+    print("测试 1: 追加检测")
+    print("=" * 60)
+
+    df = pd.DataFrame(generate_batch_records(1, 3000))
+    table = _table(df.iloc[:1000].reset_index(drop=True), table_class)
+    table._update_column_options()
+    table.get_row_detail(5)  # 构建 id 索引
+
+    source = df.iloc[:1000].reset_index(drop=True)
+    for end in (1500, 1500, 3000):
+        previous = len(source)
+        source = pd.concat([source, df.iloc[previous:end]], ignore_index=True)
+        result = table.update_dataframe(source)
+        print(f"更新到 {end} 行: {result}")
+        assert result['incremental'] and result['appended_count'] == end - previous
+        assert table.total_count == end
+
+    # id 索引随追加合并，与重新构建的结果一致（Polars 后端按 id 筛选，没有 id 索引）
+    if table_class is DataTable:
+        _, sorted_ids, positions = table._id_index
+        assert table._id_index[0] is source
+        expected = np.argsort(source['id'].to_numpy(), kind='stable')
+        assert np.array_equal(positions, expected) and np.array_equal(sorted_ids, source['id'].to_numpy()[expected])
+    assert table.get_row_detail(2999)
+
+    # 筛选选项与整体替换后的结果一致
+    rebuilt = _table(source, table_class)
+    rebuilt._update_column_options()
+    assert _options(table) == _options(rebuilt)
+    print("✓ 测试通过\n")
+
+
+@pytest.mark.parametrize('table_class', _BACKENDS)
+def test_replacement_fallback(table_class):
+    """测试前缀变化、列或类型变化、append_only=False 时按整体替换处理"""
+    print("=" * 60)
+    print("测试 2: 整体替换")
+    print("=" * 60)
+
+    df = pd.DataFrame(generate_batch_records(1, 2000))
+    table = _table(df.iloc[:1000], table_class)
+
+    changed = df.copy()
+    changed.loc[999, 'order_status'] = '新状态'
+    result = table.update_dataframe(changed)
+    assert not result['incremental']
+    assert '新状态' in next(c for c in table.columns_config if c.prop == 'order_status').options
+
+    grown = pd.concat([changed, pd.DataFrame(generate_batch_records(2001, 10))], ignore_index=True)
+    assert not table.update_dataframe(grown, append_only=False)['incremental']
+    assert not table.update_dataframe(grown[list(reversed(grown.columns))])['incremental']
+    assert [c.prop for c in table.columns_config] == list(reversed(grown.columns))
+
+    # 类型变化时整体替换（Polars 后端把 category 和 object 都保存为 String，类型没有变化）
+    categories = table.dataframe.astype({'order_status': 'category'})
+    result = table.update_dataframe(pd.concat([categories, categories.iloc[:1]], ignore_index=True))
+    assert result['incremental'] == (table_class is PolarsDataTable)
+
+    # 数据源的类型变化时（整数值的 float id），DataTable 整体替换并重新推断类型（Polars 后端按声明的类型
+    # 比较转换后的抽样，仍为追加）；之后按相同类型增长的数据源增量处理
+    floats = table.dataframe.astype({'id': float})
+    source = pd.concat([floats, floats.iloc[:1]], ignore_index=True)
+    assert table.update_dataframe(source)['incremental'] == (table_class is PolarsDataTable)
+    source = pd.concat([source, source.iloc[:2]], ignore_index=True)
+    assert table.update_dataframe(source)['appended_count'] == 2
+
+    # 调用方保证只追加时跳过抽样比较
+    current = table.dataframe
+    assert table.update_dataframe(pd.concat([current, current.iloc[:5]], ignore_index=True),
+                                  append_only=True)['appended_count'] == 5
+    print("✓ 测试通过\n")
+
+
+@pytest.mark.parametrize('table_class', _BACKENDS)
+def test_append_options_overflow(table_class):
+    """测试追加的新取值使选项超过 100 个时改为文本筛选"""
+    print("=" * 60)
+    print("测试 3: 选项增量合并")
+    print("=" * 60)
+
+    df = pd.DataFrame({'id': range(50), 'code': [f'c{i}' for i in range(50)]})
+    table = _table(df, table_class)
+    config = next(c for c in table.columns_config if c.prop == 'code')
+    config.filterType = 'multi-select'
+    table._update_column_options()
+
+    grown = pd.concat([df, pd.DataFrame({'id': range(50, 60), 'code': ['c1'] * 10})], ignore_index=True)
+    result = table.update_dataframe(grown)
+    assert result['incremental'] and not result['columns_updated'] and len(config.options) == 50
+
+    grown = pd.concat([grown, pd.DataFrame({'id': range(60, 120), 'code': [f'n{i}' for i in range(60)]})],
+                      ignore_index=True)
+    result = table.update_dataframe(grown)
+    print(f"选项数超过 100: {result}, filterType={config.filterType}")
+    assert result['columns_updated'] and config.filterType == 'text' and config.options is None
+
+    # add_data 同样只统计新增的行
+    added = table.add_data([{'id': 200, 'code': 'x'}])
+    assert added['success'] and not added['columns_updated']
+    print("✓ 测试通过\n")
+
+
+@pytest.mark.parametrize('table_class', _BACKENDS)
+def test_unsampled_prefix_change(table_class):
+    """测试抽样不到的前缀行的 id 变化时按整体替换处理，按 id 查找不会返回索引中过期的行"""
+    print("=" * 60)
+    print("测试 4: 前缀中未抽样的行变化")
+    print("=" * 60)
+
+    df = pd.DataFrame(generate_batch_records(1, 1000))
+    table = _table(df, table_class)
+    table.get_row_detail(1)  # 建立 id 索引
+
+    # 第 2 行不在抽样的 16 行中
+    changed = pd.concat([df, pd.DataFrame(generate_batch_records(1001, 10))], ignore_index=True)
+    changed.loc[1, 'id'] = 5000
+    result = table.update_dataframe(changed)
+    print(f"id 变化: incremental={result['incremental']}")
+    assert not result['incremental']
+    assert table.get_row_position(5000)['position'] == 1 and not table.get_row_position(2)['found']
+    assert table.get_row_detail(5000)[0]['value'] == 5000
+
+    # append_only=True 时信任调用方；调用方违反约定时，按 id 查找检查索引给出的行，不返回错误的行
+    # （Polars 后端只追加新增的行，没有 id 索引）
+    if table_class is DataTable:
+        lied = table.dataframe.copy()
+        lied.loc[3, 'id'] = 6000
+        lied = pd.concat([lied, pd.DataFrame(generate_batch_records(2001, 5))], ignore_index=True)
+        assert table.update_dataframe(lied, append_only=True)['incremental']
+        assert not table.get_row_position(4)['found']
+        assert table.get_row_position(6000)['position'] == 3
+        assert table.get_row_detail(6000)[0]['value'] == 6000
+    print("✓ 测试通过\n")
+
+
+if __name__ == '__main__':
+    print("\n开始测试增量更新...\n")
+
+    try:
+        for table_class in [DataTable] + ([PolarsDataTable] if polars_table._pl is not None else []):
+            print(f"后端: {table_class.__name__}")
+            test_append_detection(table_class)
+            test_replacement_fallback(table_class)
+            test_append_options_overflow(table_class)
+            test_unsampled_prefix_change(table_class)
+
+        print("=" * 60)
+        print("所有测试通过！✓")
+        print("=" * 60)
+
+    except AssertionError as e:
+        print(f"\n❌ 测试失败: {e}")
+        sys.exit(1)
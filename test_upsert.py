@@ -0,0 +1,170 @@
+"""测试按 id 写入、更新和删除（upsert、update_rows、delete_rows）以及 /upsert、/delete 接口"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from data_generator import generate_batch_records
+import polars_table
+from data_table import DataTable, FilterParams, SchemaError, generate_columns_config_from_dataframe
+from loadtest import create_app
+from polars_table import PolarsDataTable
+from tiered_table import TieredDataTable
+
+# 同样的测试在各个后端上运行（未安装 polars 时跳过 PolarsDataTable）
+_BACKENDS = [
+    pytest.param(DataTable, id='pandas'),
+    pytest.param(PolarsDataTable, id='polars',
+                 marks=pytest.mark.skipif(polars_table._pl is None, reason='未安装 polars')),
+]
+
+
+def _table(count=1000, table_class=DataTable):
+    df = pd.DataFrame(generate_batch_records(1, count))
+    return table_class(df, generate_columns_config_from_dataframe(df))
+
+
+def _assert_id_index(table):
+    """增量维护的 id 索引与重新构建的结果一致（Polars 后端没有 id 索引）"""
+    if type(table) is not DataTable:
+        return
+    df, sorted_ids, positions = table._id_index
+    assert df is table.dataframe
+    expected = np.argsort(df['id'].to_numpy(), kind='stable')
+    assert np.array_equal(positions, expected) and np.array_equal(sorted_ids, df['id'].to_numpy()[expected])
+
+
+@pytest.mark.parametrize('table_class', _BACKENDS)
+def test_update_and_upsert(table_class):
+    """测试按 id 更新和 upsert，重复投递不产生重复行"""
+    print("=" * 60)
+    print("测试 1: update_rows 与 upsert")
+    print("=" * 60)
+
+    table = _table(table_class=table_class)
+    table.get_row_detail(1)  # 构建 id 索引
+    before = table.dataframe
+    amount = before['order_amount'].copy()
+
+    result = table.update_rows({10: {'order_status': '已发货', 'order_amount': 1}, 99999: {'order_status': 'x'}})
+    print(f"update_rows: {result}")
+    assert result['updated_count'] == 1 and result['missing_ids'] == [99999]
+    assert table.get_row_detail(10)  # 索引沿用
+    row = table.dataframe[table.dataframe['id'] == 10].iloc[0]
+    assert row['order_status'] == '已发货' and row['order_amount'] == 1
+    # 不原地修改：读取中的快照不受影响
+    assert before['order_amount'].equals(amount) and table.dataframe is not before
+    assert table.dataframe['order_amount'].dtype == amount.dtype
+
+    batch = [{'id': 20, 'order_status': '已完成'}, {'id': 1001, 'order_status': '待付款', 'order_amount': 5.0},
+             {'id': 20, 'city': '新城市'}]
+    for _ in range(3):  # 重复投递
+        result = table.upsert(batch)
+        assert table.total_count == 1001
+    print(f"upsert: {result}")
+    assert result['updated_count'] == 2 and result['added_count'] == 0
+    row = table.dataframe[table.dataframe['id'] == 20].iloc[0]
+    assert row['order_status'] == '已完成' and row['city'] == '新城市'
+    assert '新城市' in next(c for c in table.columns_config if c.prop == 'city').options
+    assert table.get_list(FilterParams(city=['新城市']))['total'] == 1
+    _assert_id_index(table)
+
+    # 值无法按声明的类型保存时拒绝修改（不改为 object 列）；新字段追加列配置
+    next(c for c in table.columns_config if c.prop == 'item_count').inferred = False
+    dtype = table.dataframe['item_count'].dtype
+    try:
+        table.update_rows({30: {'item_count': 'many', 'note': '备注'}})
+        raise AssertionError('整数列写入文本应该被拒绝')
+    except SchemaError:
+        pass
+    assert table.dataframe['item_count'].dtype == dtype and 'note' not in table.dataframe.columns
+    result = table.update_rows({30: {'item_count': '12', 'note': '备注'}})
+    assert result['columns_updated'] and 'note' in [c.prop for c in table.columns_config]
+    assert table.dataframe.loc[table.dataframe['id'] == 30, 'item_count'].iloc[0] == 12
+
+    # 没有声明类型的列类型不兼容时改为 object 列
+    next(c for c in table.columns_config if c.prop == 'user_id').dtype = None
+    table.update_rows({31: {'user_id': 'guest'}})
+    assert table.dataframe.loc[table.dataframe['id'] == 31, 'user_id'].iloc[0] == 'guest'
+    print("✓ 测试通过\n")
+
+
+@pytest.mark.parametrize('table_class', _BACKENDS)
+def test_delete_rows(table_class):
+    """测试按 id 删除并平移 id 索引中的行位置"""
+    print("=" * 60)
+    print("测试 2: delete_rows")
+    print("=" * 60)
+
+    table = _table(table_class=table_class)
+    table.get_row_detail(1)
+    result = table.delete_rows([5, 500, 5, 123456])
+    print(f"delete_rows: {result}")
+    assert result['deleted_count'] == 2 and result['missing_ids'] == [123456] and result['total_count'] == 998
+    assert 5 not in table.dataframe['id'].values and 500 not in table.dataframe['id'].values
+    _assert_id_index(table)
+    assert table.get_row_position(600)['position'] == 597
+    try:
+        table.get_row_detail(500)
+        raise AssertionError('已删除的行不应存在')
+    except ValueError:
+        pass
+
+    # 已封存的数据段不能修改
+    df = pd.DataFrame(generate_batch_records(1, 3000))
+    tiered = TieredDataTable(df, generate_columns_config_from_dataframe(df), hot_rows=500, segment_rows=1000)
+    assert tiered.delete_rows([2900])['deleted_count'] == 1
+    try:
+        tiered.update_rows({5: {'order_status': '已发货'}})
+        raise AssertionError('数据段中的行不能修改')
+    except ValueError as e:
+        print(f"分层表: {e}")
+    print("✓ 测试通过\n")
+
+
+@pytest.mark.parametrize('table_class', _BACKENDS)
+def test_endpoints(table_class):
+    """测试 /upsert 和 /delete 接口"""
+    print("=" * 60)
+    print("测试 3: /upsert 与 /delete")
+    print("=" * 60)
+
+    table = _table(200, table_class)
+    client = TestClient(create_app(table, 'upsert-test'))
+    headers = {'x-table-id': 'upsert-test'}
+    response = client.post('/upsert', headers=headers,
+                           json={'data': [{'id': 1, 'order_status': '已取消'}, {'order_status': '待付款'}]})
+    data = response.json()['data']
+    print(f"/upsert: {data}")
+    assert data['updated_count'] == 1 and data['added_count'] == 1 and table.total_count == 201
+
+    data = client.post('/delete', headers=headers, json={'ids': [1, 2]}).json()['data']
+    assert data['deleted_count'] == 2 and data['total_count'] == 199
+    assert client.post('/delete', headers=headers, json={}).status_code == 400
+    assert client.post('/list', headers=headers, json={}).json()['total'] == 199
+    print("✓ 测试通过\n")
+
+
+if __name__ == '__main__':
+    print("\n开始测试按 id 修改数据...\n")
+
+    try:
+        for table_class in [DataTable] + ([PolarsDataTable] if polars_table._pl is not None else []):
+            print(f"后端: {table_class.__name__}")
+            test_update_and_upsert(table_class)
+            test_delete_rows(table_class)
+            test_endpoints(table_class)
+
+        print("=" * 60)
+        print("所有测试通过！✓")
+        print("=" * 60)
+
+    except AssertionError as e:
+        print(f"\n❌ 测试失败: {e}")
+        sys.exit(1)
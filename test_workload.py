@@ -0,0 +1,185 @@
+"""测试工作负载录制与回放"""
+
+import json
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from data_generator import generate_batch_records
+from data_table import DataTable, generate_columns_config_from_dataframe
+from loadtest import create_app
+from nice_table import NiceTable
+from workload import read_trace, replay
+
+
+def test_record_and_replay():
+    """测试路由录制请求，并回放到本地 DataTable"""
+    print("=" * 60)
+    print("测试 1: 录制与回放")
+    print("=" * 60)
+
+    df = pd.DataFrame(generate_batch_records(1, 1000))
+    table = DataTable(df, generate_columns_config_from_dataframe(df))
+    client = TestClient(create_app(table, 'recorded'))
+    headers = {'x-table-id': 'recorded'}
+    filters = {'order_status': ['已付款', '已发货']}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'trace.ndjson.gz')
+        NiceTable.start_recording(path)
+        try:
+            client.post('/list', json={'filters': filters, 'page': 2, 'pageSize': 50,
+                                       'sortBy': 'order_amount', 'sortOrder': 'descending'}, headers=headers)
+            time.sleep(0.05)
+            client.post('/row-position', json={'rowId': 10, 'filters': filters}, headers=headers)
+            client.post('/row-detail', json={'row': {'id': 10}}, headers=headers)
+            client.get('/filters', headers=headers)
+            records = generate_batch_records(0, 20)
+            for record in records:
+                del record['id']
+                record['payload'] = record['payload'].hex()
+            client.post('/add', json={'data': records}, headers=headers)
+        finally:
+            NiceTable.stop_recording()
+        client.post('/list', json={}, headers=headers)  # 停止后不再录制
+
+        events = list(read_trace(path))
+        print(f"录制 {len(events)} 个请求: {[e['endpoint'] for e in events]}")
+        assert [e['endpoint'] for e in events] == ['list', 'row-position', 'row-detail', 'filters', 'add']
+        assert all(e['table_id'] == 'recorded' and e['elapsed_ms'] >= 0 for e in events)
+        assert events[0]['filters'] == filters and events[0]['page'] == 2 and events[0]['pageSize'] == 50
+        assert events[0]['sortBy'] == 'order_amount' and events[0]['total'] > 0
+        assert events[1]['rowId'] == 10
+        assert events[4]['rows'] == 20 and 'order_status' in events[4]['columns'] and events[4]['bytes'] > 0
+        assert events[1]['ts'] - events[0]['ts'] >= 0.05
+
+        def table_factory():
+            return DataTable(df, generate_columns_config_from_dataframe(df))
+
+        result = replay(read_trace(path), table_factory, speed=0)
+        print(f"回放: {result['events']} 个请求，新增 {result['added_rows']} 行")
+        assert result['events'] == 5 and result['tables'] == 1
+        assert result['added_rows'] == 20
+        assert set(result['replayed']) == set(result['recorded'])
+
+        # 按原速回放时，总耗时不少于录制时长
+        result = replay(read_trace(path), table_factory, speed=1)
+        assert result['wall_seconds'] >= result['trace_seconds'] >= 0.05
+    print("✓ 测试通过\n")
+
+
+def test_query_param_table_id():
+    """测试通过 table_id 查询参数访问多个实例时，录制的 table_id 为实际访问的实例"""
+    print("=" * 60)
+    print("测试 2: 按查询参数录制 table_id")
+    print("=" * 60)
+
+    df = pd.DataFrame(generate_batch_records(1, 300))
+    apps = [create_app(DataTable(df, generate_columns_config_from_dataframe(df)), name)
+            for name in ('recorded-a', 'recorded-b')]
+    client = TestClient(apps[0])
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'trace.ndjson')
+        NiceTable.start_recording(path)
+        try:
+            for name in ('recorded-a', 'recorded-b', 'recorded-a'):
+                response = client.post(f'/list?table_id={name}', json={'page': 1, 'pageSize': 10})
+                assert response.status_code == 200
+            client.get('/filters?table_id=recorded-b')
+        finally:
+            NiceTable.stop_recording()
+
+        events = list(read_trace(path))
+        print(f"录制的 table_id: {[e['table_id'] for e in events]}")
+        assert [e['table_id'] for e in events] == ['recorded-a', 'recorded-b', 'recorded-a', 'recorded-b']
+        result = replay(read_trace(path), lambda: DataTable(df, generate_columns_config_from_dataframe(df)), speed=0)
+        assert result['events'] == 4 and result['tables'] == 2
+    print("✓ 测试通过\n")
+
+
+def test_replay_missing_rows():
+    """测试录制的 rowId 在回放表格中不存在时计为出错，不中断回放"""
+    print("=" * 60)
+    print("测试 3: 回放出错的请求")
+    print("=" * 60)
+
+    df = pd.DataFrame(generate_batch_records(1, 100))
+    events = [
+        {'ts': 0.0, 'endpoint': 'row-detail', 'table_id': 't', 'rowId': 10_000_000},
+        {'ts': 0.0, 'endpoint': 'row-position', 'table_id': 't', 'rowId': 10_000_000},
+        {'ts': 0.0, 'endpoint': 'row-detail', 'table_id': 't', 'rowId': 5},
+        {'ts': 0.0, 'endpoint': 'list', 'table_id': 't', 'page': 1, 'pageSize': 10},
+    ]
+    result = replay(iter(events), lambda: DataTable(df, generate_columns_config_from_dataframe(df)), speed=0)
+    print(f"出错: {result['errors']}")
+    assert result['events'] == 4 and result['replayed']['row-detail']['count'] == 2
+    assert result['errors']['row-detail']['count'] == 1 and 'list' not in result['errors']
+    print("✓ 测试通过\n")
+
+
+def test_record_writes():
+    """测试 /bulk、/upsert、/delete 按行数录制，回放时按录制的形状写入本地表格"""
+    print("=" * 60)
+    print("测试 4: 录制写入请求")
+    print("=" * 60)
+
+    df = pd.DataFrame(generate_batch_records(1, 200))
+    table = DataTable(df, generate_columns_config_from_dataframe(df))
+    client = TestClient(create_app(table, 'recorded-writes'))
+    headers = {'x-table-id': 'recorded-writes'}
+    records = generate_batch_records(1000, 30)
+    for record in records:
+        del record['id']
+        record['payload'] = record['payload'].hex()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'trace.ndjson')
+        NiceTable.start_recording(path)
+        try:
+            body = json.dumps({key: [r[key] for r in records] for key in records[0]})
+            response = client.post('/bulk', content=body, headers={**headers, 'content-type': 'application/json'})
+            assert response.status_code == 200
+            upserts = [{'id': 1, 'order_status': '已发货'}, {'id': 2, 'order_status': '已完成'}, records[0]]
+            assert client.post('/upsert', json={'data': upserts}, headers=headers).status_code == 200
+            assert client.post('/delete', json={'ids': [3, 4, 99999]}, headers=headers).status_code == 200
+        finally:
+            NiceTable.stop_recording()
+
+        events = list(read_trace(path))
+        print(f"录制: {[(e['endpoint'], e['rows']) for e in events]}")
+        assert [e['endpoint'] for e in events] == ['bulk', 'upsert', 'delete']
+        assert events[0]['rows'] == 30 and events[0]['format'] == 'columns' and events[0]['bytes'] == len(body)
+        assert events[1]['rows'] == 3 and events[1]['updated'] == 2 and events[1]['added'] == 1
+        assert events[2]['rows'] == 3 and events[2]['deleted'] == 2
+        assert all(e['table_id'] == 'recorded-writes' for e in events)
+
+        replayed = DataTable(df, generate_columns_config_from_dataframe(df))
+        result = replay(read_trace(path), lambda: replayed, speed=0)
+        assert not result['errors'] and result['added_rows'] == 31
+        assert replayed.total_count == table.total_count == 200 + 30 + 1 - 2
+    print("✓ 测试通过\n")
+
+
+if __name__ == '__main__':
+    print("\n开始测试工作负载录制与回放...\n")
+
+    try:
+        test_record_and_replay()
+        test_query_param_table_id()
+        test_replay_missing_rows()
+        test_record_writes()
+
+        print("=" * 60)
+        print("所有测试通过！✓")
+        print("=" * 60)
+
+    except AssertionError as e:
+        print(f"\n❌ 测试失败: {e}")
+        sys.exit(1)
@@ -0,0 +1,809 @@
+"""TieredDataTable - 冷热分层的 DataTable
+
+最近的数据（热数据）保存在内存中的 DataFrame 里，较旧的行被封存为不可变的数据段：
+- 数据段按列以紧凑格式编码：数值列为连续数组，低基数字符串列为字典编码，
+  其他字符串为连续的 UTF-8 缓冲区加偏移量，等长的 bytes（如 16 字节的 payload）为定宽数组
+- 可选用 zlib / lz4 / zstd 压缩（lz4、zstd 需要安装对应的包），适合很少访问的冷数据
+- 数据段可以保存在内存中，也可以写入磁盘（未压缩时通过内存映射读取，不占用常驻内存）
+- 每个数据段记录摘要：数值列的 min/max（zone map）、空值数量、少量不同值的列的取值集合
+
+查询时先用摘要跳过不可能匹配的数据段，再只解码筛选/排序涉及的列，
+分页时只解码当前页的行，因此 Python 对象只在需要时才创建。
+
+封存条件：热数据超过 hot_rows 行时按 segment_rows 封存最旧的行；
+或设置 hot_seconds 后，ts 列早于 (当前时间 - hot_seconds) 的行达到 segment_rows 行时封存。
+"""
+
+import json
+import re
+import shutil
+import time
+import zlib
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from column_store import (KIND_BINARY, KIND_FIXED, KIND_UTF8, decode_var_values, encode_var_values,
+                          infer_column_kind)
+from data_table import ColumnConfig, DataTable, FilterGroup, FilterParams, NumberFilter, PreparedBatch
+from memory import array_bytes, finish_usage, object_bytes
+
+try:
+    import lz4.frame as _lz4
+except ImportError:
+    _lz4 = None
+
+try:
+    import zstandard as _zstd
+except ImportError:
+    _zstd = None
+
+_SEGMENT_META = 'segment.json'
+# 不同值数量不超过该值（且不超过行数的一半）的字符串列使用字典编码
+_DICTIONARY_LIMIT = 32767
+# 不同值数量不超过该值的列在摘要中记录取值集合
+_SUMMARY_VALUES_LIMIT = 256
+# 长度相同且不超过该值的 bytes 列使用定宽编码
+_FIXED_BYTES_LIMIT = 64
+_DATE_PREFIX = re.compile(r'^(\d{4})-(\d{2})(?:-(\d{2}))?$')
+
+KIND_DICT = 'dict'
+KIND_FIXED_BYTES = 'fixed_bytes'
+CODECS = (None, 'zlib', 'lz4', 'zstd')
+
+
+def _check_codec(codec: Optional[str]):
+    if codec not in CODECS:
+        raise ValueError(f"不支持的压缩算法: {codec}，可选: {CODECS}")
+    if codec == 'lz4' and _lz4 is None:
+        raise ImportError("使用 lz4 压缩需要安装 lz4: pip install lz4")
+    if codec == 'zstd' and _zstd is None:
+        raise ImportError("使用 zstd 压缩需要安装 zstandard: pip install zstandard")
+
+
+def _compress(data: bytes, codec: str, level: int) -> bytes:
+    if codec == 'lz4':
+        return _lz4.compress(data)
+    if codec == 'zstd':
+        return _zstd.ZstdCompressor(level=level).compress(data)
+    return zlib.compress(data, level)
+
+
+def _decompress(data: bytes, codec: str) -> bytes:
+    if codec == 'lz4':
+        return _lz4.decompress(data)
+    if codec == 'zstd':
+        return _zstd.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+
+def _encode_column(series: pd.Series) -> Tuple[Dict[str, Any], Dict[str, np.ndarray]]:
+    """编码一列，返回 (列描述和摘要, 缓冲区)"""
+    kind, dtype = infer_column_kind(series)
+    null_count = int(series.isna().sum())
+    meta: Dict[str, Any] = {'name': series.name, 'kind': kind, 'dtype': dtype, 'null_count': null_count}
+
+    if kind == KIND_FIXED:
+        numeric = pd.to_numeric(series, errors='coerce') if series.dtype == object else series
+        values = numeric.to_numpy(dtype=dtype, na_value=np.nan) if np.dtype(dtype).kind == 'f' else numeric.to_numpy(dtype=dtype)
+        if np.dtype(dtype).kind in 'biuf' and null_count < len(values):
+            meta['min'] = float(np.nanmin(values))
+            meta['max'] = float(np.nanmax(values))
+            uniques = pd.unique(values[~pd.isna(values)])
+            if len(uniques) <= _SUMMARY_VALUES_LIMIT:
+                meta['values'] = sorted(str(v) for v in uniques)
+        return meta, {'values': np.ascontiguousarray(values)}
+
+    if kind == KIND_UTF8:
+        codes, uniques = pd.factorize(series)
+        if (len(uniques) <= min(_DICTIONARY_LIMIT, max(len(series) // 2, 1))
+                and all(isinstance(v, str) for v in uniques)):
+            meta['kind'] = KIND_DICT
+            meta['dictionary'] = list(uniques)
+            if len(uniques) <= _SUMMARY_VALUES_LIMIT:
+                meta['values'] = sorted(uniques)
+            code_dtype = np.int8 if len(uniques) <= 127 else np.int16
+            return meta, {'codes': codes.astype(code_dtype)}
+
+    values = series.tolist()
+    lengths, data, valid = encode_var_values(values, kind)
+    if kind == KIND_BINARY:
+        widths = np.unique(lengths[valid.astype(bool)])
+        if (len(widths) == 1 and 0 < widths[0] <= _FIXED_BYTES_LIMIT
+                and all(isinstance(v, (bytes, bytearray)) for v, ok in zip(values, valid) if ok)):
+            # 等长 bytes：空值位置补 0，按 width 定宽存储
+            width = int(widths[0])
+            meta['kind'] = KIND_FIXED_BYTES
+            meta['width'] = width
+            fixed = np.zeros((len(values), width), dtype=np.uint8)
+            fixed[valid.astype(bool)] = np.frombuffer(data, dtype=np.uint8).reshape(-1, width)
+            return meta, {'values': fixed.reshape(-1), 'valid': valid}
+    offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+    return meta, {'offsets': offsets, 'valid': valid, 'data': np.frombuffer(data, dtype=np.uint8)}
+
+
+class Segment:
+    """不可变的数据段
+
+    缓冲区保存在内存中（build 创建）或磁盘上（save/open）。
+    未压缩的磁盘数据段通过内存映射读取；压缩的数据段每次解码时读取并解压。
+    """
+
+    def __init__(self, meta: Dict[str, Any], buffers: Optional[Dict[str, Union[np.ndarray, bytes]]] = None,
+                 path: Optional[Path] = None):
+        self.meta = meta
+        self.name: str = meta['name']
+        self.row_count: int = meta['row_count']
+        self.codec: Optional[str] = meta.get('codec')
+        self.columns: List[Dict[str, Any]] = meta['columns']
+        self.path = path
+        self._by_name = {c['name']: c for c in self.columns}
+        self._buffers: Dict[str, Union[np.ndarray, bytes]] = buffers if buffers is not None else {}
+        self._dictionaries: Dict[str, np.ndarray] = {}
+
+    @classmethod
+    def build(cls, name: str, df: pd.DataFrame, codec: Optional[str] = None, level: int = 6) -> 'Segment':
+        """将 df 编码为内存中的数据段"""
+        _check_codec(codec)
+        columns = []
+        buffers: Dict[str, Union[np.ndarray, bytes]] = {}
+        for i, column in enumerate(df.columns):
+            meta, arrays = _encode_column(df[column])
+            meta['buffers'] = {}
+            for key, array in arrays.items():
+                file_name = f'c{i}.{key}'
+                meta['buffers'][key] = {'file': file_name, 'dtype': array.dtype.str, 'length': len(array)}
+                buffers[file_name] = array if codec is None else _compress(array.tobytes(), codec, level)
+            columns.append(meta)
+        meta = {'name': name, 'row_count': len(df), 'codec': codec, 'columns': columns}
+        return cls(meta, buffers)
+
+    @classmethod
+    def open(cls, path: Union[str, Path]) -> 'Segment':
+        path = Path(path)
+        with open(path / _SEGMENT_META, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        meta['name'] = path.name
+        return cls(meta, path=path)
+
+    def save(self, path: Union[str, Path]) -> 'Segment':
+        """写入磁盘（先写临时目录再改名），返回从磁盘打开的数据段"""
+        path = Path(path)
+        tmp_path = path.with_name(path.name + '.tmp')
+        if tmp_path.exists():
+            shutil.rmtree(tmp_path)
+        tmp_path.mkdir(parents=True)
+        for file_name, buffer in self._buffers.items():
+            (tmp_path / file_name).write_bytes(buffer if isinstance(buffer, bytes) else buffer.tobytes())
+        with open(tmp_path / _SEGMENT_META, 'w', encoding='utf-8') as f:
+            json.dump(self.meta, f, ensure_ascii=False)
+        tmp_path.rename(path)
+        return Segment.open(path)
+
+    @property
+    def nbytes(self) -> int:
+        """常驻内存的字节数（内存映射的缓冲区不计入）"""
+        return sum(len(b) if isinstance(b, bytes) else (0 if isinstance(b, np.memmap) else b.nbytes)
+                   for b in self._buffers.values())
+
+    @property
+    def mapped_bytes(self) -> int:
+        """内存映射的缓冲区字节数"""
+        return sum(b.nbytes for b in self._buffers.values() if isinstance(b, np.memmap))
+
+    @property
+    def disk_bytes(self) -> int:
+        if self.path is None:
+            return 0
+        return sum(f.stat().st_size for f in self.path.iterdir())
+
+    def column_meta(self, name: str) -> Optional[Dict[str, Any]]:
+        return self._by_name.get(name)
+
+    def column_dtype(self, name: str) -> np.dtype:
+        meta = self._by_name[name]
+        return np.dtype(meta['dtype']) if meta['kind'] == KIND_FIXED else np.dtype(object)
+
+    # ---------- 解码 ----------
+
+    def _buffer(self, meta: Dict[str, Any], key: str) -> np.ndarray:
+        info = meta['buffers'][key]
+        buffer = self._buffers.get(info['file'])
+        if buffer is None:
+            file_path = self.path / info['file']
+            if self.codec is None:
+                if info['length'] == 0:
+                    return np.empty(0, dtype=info['dtype'])
+                buffer = np.memmap(file_path, dtype=info['dtype'], mode='r', shape=(info['length'],))
+                self._buffers[info['file']] = buffer
+            else:
+                buffer = file_path.read_bytes()
+        if isinstance(buffer, bytes):
+            return np.frombuffer(_decompress(buffer, self.codec), dtype=info['dtype'])
+        return buffer
+
+    def _dictionary(self, meta: Dict[str, Any]) -> np.ndarray:
+        """字典编码列的取值数组，末尾为 None（对应编码 -1）"""
+        dictionary = self._dictionaries.get(meta['name'])
+        if dictionary is None:
+            dictionary = np.empty(len(meta['dictionary']) + 1, dtype=object)
+            dictionary[:-1] = meta['dictionary']
+            dictionary[-1] = None
+            self._dictionaries[meta['name']] = dictionary
+        return dictionary
+
+    def column(self, name: str, start: int = 0, stop: Optional[int] = None) -> np.ndarray:
+        """解码一列中 [start, stop) 范围的行；未压缩的定长列为零拷贝视图"""
+        meta = self._by_name[name]
+        stop = self.row_count if stop is None else min(stop, self.row_count)
+        kind = meta['kind']
+        if kind == KIND_FIXED:
+            return self._buffer(meta, 'values')[start:stop]
+        if kind == KIND_DICT:
+            return self._dictionary(meta)[self._buffer(meta, 'codes')[start:stop]]
+        if kind == KIND_FIXED_BYTES:
+            return self.take(name, np.arange(start, stop))
+        offsets = self._buffer(meta, 'offsets')[start:stop + 1]
+        data = self._buffer(meta, 'data')[offsets[0]:offsets[-1]] if stop > start else b''
+        return decode_var_values(offsets - offsets[0], data, self._buffer(meta, 'valid')[start:stop], kind)
+
+    def take(self, name: str, positions: np.ndarray) -> np.ndarray:
+        """只解码指定行位置的值"""
+        meta = self._by_name[name]
+        kind = meta['kind']
+        if kind == KIND_FIXED:
+            return self._buffer(meta, 'values')[positions]
+        if kind == KIND_DICT:
+            return self._dictionary(meta)[self._buffer(meta, 'codes')[positions]]
+        valid = self._buffer(meta, 'valid')
+        result = np.empty(len(positions), dtype=object)
+        if kind == KIND_FIXED_BYTES:
+            width = meta['width']
+            rows = self._buffer(meta, 'values').reshape(-1, width)
+            result[:] = [rows[p].tobytes() if valid[p] else None for p in positions.tolist()]
+            return result
+        offsets = self._buffer(meta, 'offsets')
+        data = self._buffer(meta, 'data')
+        values = [data[offsets[p]:offsets[p + 1]].tobytes() if valid[p] else None for p in positions.tolist()]
+        if kind == KIND_UTF8:
+            values = [v.decode('utf-8') if v is not None else None for v in values]
+        result[:] = values
+        return result
+
+    def frame(self) -> pd.DataFrame:
+        """解码整个数据段"""
+        data = {c['name']: self.column(c['name']) for c in self.columns}
+        return pd.DataFrame(data, columns=[c['name'] for c in self.columns], copy=False)
+
+    # ---------- 摘要检查 ----------
+
+    def may_contain_id(self, row_id: Any) -> bool:
+        meta = self.column_meta('id')
+        if meta is None or 'min' not in meta or not isinstance(row_id, (int, float)):
+            return meta is not None
+        return meta['min'] <= row_id <= meta['max']
+
+    def may_match(self, filter_dict: Dict[str, Any], columns_config: List[ColumnConfig],
+                  parse_number) -> bool:
+        """根据摘要判断数据段是否可能包含满足筛选条件的行（保守判断，不确定时返回 True）"""
+        for field_name, filter_value in filter_dict.items():
+            meta = self.column_meta(field_name)
+            col_config = next((c for c in columns_config if c.prop == field_name), None)
+            if meta is None or not col_config or not col_config.filterable:
+                continue
+            if not self._field_may_match(meta, col_config, filter_value, parse_number):
+                return False
+        return True
+
+    def _candidate_strings(self, meta: Dict[str, Any]) -> Optional[List[str]]:
+        """取值集合（含空值 astype(str) 后的表示），未记录时返回 None"""
+        if 'values' not in meta or meta['kind'] == KIND_FIXED:
+            return None
+        values = list(meta['values'])
+        if meta['null_count']:
+            values += ['None', 'nan']
+        return values
+
+    def _field_may_match(self, meta: Dict[str, Any], col_config: ColumnConfig, filter_value: Any,
+                         parse_number) -> bool:
+        filter_type = col_config.filterType
+        if filter_type == 'number':
+            return self._number_may_match(meta, filter_value, parse_number)
+
+        if filter_type in ('multi-select', 'select'):
+            filter_list = filter_value if isinstance(filter_value, list) else [filter_value]
+            values = self._candidate_strings(meta)
+            if values is None or not filter_list:
+                return True
+            return any(str(v) in values for v in filter_list)
+
+        if not isinstance(filter_value, str) or not filter_value:
+            return True
+
+        if filter_type == 'date' and col_config.prop == 'ts':
+            return self._ts_may_match(meta, filter_value)
+        if filter_type == 'date':
+            values = self._candidate_strings(meta)
+            return values is None or filter_value in values
+        if filter_type == 'text' and col_config.type != 'bytes':
+            values = self._candidate_strings(meta)
+            if values is None:
+                return True
+            try:
+                pattern = re.compile(filter_value, re.IGNORECASE)
+            except re.error:
+                return True
+            return any(pattern.search(v) for v in values)
+        return True
+
+    def _number_may_match(self, meta: Dict[str, Any], filter_value: Any, parse_number) -> bool:
+        if meta['kind'] != KIND_FIXED:
+            return True
+        if isinstance(filter_value, NumberFilter):
+            group = FilterGroup(filters=[filter_value], logic='AND')
+        elif isinstance(filter_value, FilterGroup):
+            group = filter_value
+        elif isinstance(filter_value, dict) and 'filters' in filter_value:
+            group = FilterGroup(**filter_value)
+        elif isinstance(filter_value, dict) and ('operator' in filter_value or 'value' in filter_value):
+            group = FilterGroup(filters=[NumberFilter(**filter_value)], logic='AND')
+        else:
+            return True
+
+        low, high = meta.get('min'), meta.get('max')
+        results = []
+        for num_filter in group.filters:
+            if not num_filter.operator or num_filter.value is None:
+                continue
+            value = parse_number(num_filter.value)
+            if value is None:
+                continue
+            if low is None:
+                # 整列为空值，任何比较都不成立
+                results.append(False)
+                continue
+            results.append({
+                '=': low <= value <= high,
+                '>': high > value,
+                '<': low < value,
+                '>=': high >= value,
+                '<=': low <= value,
+            }.get(num_filter.operator, True))
+        if not results:
+            return True
+        if (group.logic or 'AND').upper() == 'OR':
+            return any(results)
+        return all(results)
+
+    def _ts_may_match(self, meta: Dict[str, Any], filter_value: str) -> bool:
+        """ts 筛选为日期前缀（YYYY-MM 或 YYYY-MM-DD）时，用 min/max 判断时间范围是否重叠"""
+        match = _DATE_PREFIX.match(filter_value.strip())
+        if not match or 'min' not in meta:
+            return True
+        year, month, day = int(match.group(1)), int(match.group(2)), match.group(3)
+        try:
+            if day:
+                start = datetime(year, month, int(day))
+                end = start + pd.Timedelta(days=1)
+            else:
+                start = datetime(year, month, 1)
+                end = datetime(year + (month == 12), month % 12 + 1, 1)
+        except ValueError:
+            return True
+        return not (meta['max'] < start.timestamp() or meta['min'] >= end.timestamp())
+
+
+class TieredDataTable(DataTable):
+    """冷热分层的表格数据管理类
+
+    热数据保存在 self.dataframe 中，数据段保存在内存（segment_dir 为 None）或 segment_dir 下。
+    查询结果中数据段（按封存顺序）排在热数据之前。
+    update_dataframe 只替换热数据，不影响已封存的数据段。
+    """
+
+    def __init__(self,
+                 dataframe: pd.DataFrame,
+                 columns_config: List[ColumnConfig],
+                 segment_dir: Optional[Union[str, Path]] = None,
+                 hot_rows: int = 100_000,
+                 segment_rows: int = 50_000,
+                 hot_seconds: Optional[float] = None,
+                 ts_column: str = 'ts',
+                 codec: Optional[str] = None,
+                 compression_level: int = 6,
+                 cached_columns: int = 8,
+                 copy: bool = True):
+        """
+        Args:
+            dataframe: 初始热数据
+            columns_config: 列配置
+            segment_dir: 数据段目录，目录中已有的数据段会被加载；为 None 时数据段保存在内存中
+            hot_rows: 热数据最多保留的行数
+            segment_rows: 每个数据段的行数
+            hot_seconds: 按时间分层时，ts 列早于 (当前时间 - hot_seconds) 的行被封存
+            ts_column: 按时间分层使用的时间戳列
+            codec: 数据段的压缩算法（None、'zlib'、'lz4'、'zstd'），None 时只使用紧凑编码
+            compression_level: 压缩级别（zlib、zstd）
+            cached_columns: 最多缓存多少个已解码的数据段列（用于重复的筛选/排序）
+            copy: 是否复制传入的 DataFrame
+        """
+        _check_codec(codec)
+        super().__init__(dataframe, columns_config, copy=copy)
+        self.segment_dir = Path(segment_dir) if segment_dir is not None else None
+        self.hot_rows = hot_rows
+        self.segment_rows = segment_rows
+        self.hot_seconds = hot_seconds
+        self.ts_column = ts_column
+        self.codec = codec
+        self.compression_level = compression_level
+        self._cached_columns = cached_columns
+        # 已解码的数据段列: (数据段名称, 列名) -> 数组（LRU）
+        self._column_cache: 'OrderedDict[Tuple[str, str], np.ndarray]' = OrderedDict()
+        self._segments: List[Segment] = []
+        if self.segment_dir is not None:
+            self.segment_dir.mkdir(parents=True, exist_ok=True)
+            self._segments = [
+                Segment.open(p) for p in sorted(self.segment_dir.glob('seg_*'))
+                if p.is_dir() and not p.name.endswith('.tmp')
+            ]
+        self.seal()
+        self._update_column_options()
+
+    @property
+    def total_count(self) -> int:
+        return self.cold_count + len(self.dataframe)
+
+    @property
+    def cold_count(self) -> int:
+        return sum(seg.row_count for seg in self._segments)
+
+    @property
+    def segments(self) -> List[Segment]:
+        return list(self._segments)
+
+    def memory_usage(self, exact: bool = False) -> Dict[str, Any]:
+        """内存占用：热数据计入 columns，数据段缓冲区计入 segments（磁盘上未压缩的数据段为内存映射），
+        已解码的数据段列计入 caches
+        """
+        usage = super().memory_usage(exact)
+        for segment in list(self._segments):
+            usage['segments'] += segment.nbytes
+            usage['mapped'] += segment.mapped_bytes
+        for values in list(self._column_cache.values()):
+            usage['caches'] += array_bytes(values)[0]
+            if values.dtype == object:
+                usage['caches'] += object_bytes(values, exact)
+        return finish_usage(usage)
+
+    def shed_caches(self) -> int:
+        freed = self.memory_usage()['caches']
+        self._column_cache.clear()
+        return freed
+
+    # ---------- 封存 ----------
+
+    def _write_segment(self, df: pd.DataFrame) -> Segment:
+        index = int(self._segments[-1].name.split('_')[1]) + 1 if self._segments else 0
+        name = f'seg_{index:06d}'
+        segment = Segment.build(name, df.reset_index(drop=True), self.codec, self.compression_level)
+        if self.segment_dir is not None:
+            segment = segment.save(self.segment_dir / name)
+        self._segments.append(segment)
+        self._logger.info(
+            f"已封存数据段 {segment.name}: {segment.row_count} 行, "
+            f"常驻内存 {segment.nbytes} 字节, 磁盘 {segment.disk_bytes} 字节"
+        )
+        return segment
+
+    def seal(self, force: bool = False) -> int:
+        """将满足条件的热数据封存为数据段
+
+        Args:
+            force: 为 True 时不等待凑满 segment_rows，立即封存所有满足条件的行
+
+        Returns:
+            封存的行数
+        """
+        with self._lock:
+            hot = self.dataframe
+            if self.hot_seconds is not None and self.ts_column in hot.columns:
+                cutoff = time.time() - self.hot_seconds
+                ts_values = pd.to_numeric(hot[self.ts_column], errors='coerce').to_numpy()
+                cold_mask = ts_values < cutoff
+                cold_count = int(cold_mask.sum())
+                if cold_count == 0 or (cold_count < self.segment_rows and not force):
+                    return 0
+                cold_df = hot[cold_mask]
+                for start in range(0, cold_count, self.segment_rows):
+                    self._write_segment(cold_df.iloc[start:start + self.segment_rows])
+                self.dataframe = hot[~cold_mask].reset_index(drop=True)
+                return cold_count
+
+            sealed = 0
+            while len(hot) - self.hot_rows >= self.segment_rows or (force and len(hot) > self.hot_rows):
+                count = min(self.segment_rows, len(hot) - self.hot_rows)
+                self._write_segment(hot.iloc[:count])
+                hot = hot.iloc[count:]
+                sealed += count
+            if sealed:
+                self.dataframe = hot.reset_index(drop=True)
+            return sealed
+
+    def add_data(self, new_data: Union[Dict[str, Any], List[Dict[str, Any]], pd.DataFrame, PreparedBatch]) -> Dict[str, Any]:
+        batch = self._prepare_batch(new_data, self.dataframe.columns)
+        with self._lock:
+            result = super().add_data(batch)
+            result['sealed_count'] = self.seal()
+            return result
+
+    def _fill_missing_ids(self, new_df: pd.DataFrame, max_id: Any) -> Any:
+        cold_max = [seg.column_meta('id').get('max') for seg in self._segments if seg.column_meta('id')]
+        cold_max = [v for v in cold_max if v is not None]
+        if cold_max:
+            max_id = max(cold_max) if pd.isna(max_id) else max(max_id, max(cold_max))
+            if float(max_id).is_integer():
+                max_id = int(max_id)
+        return super()._fill_missing_ids(new_df, max_id)
+
+    # ---------- 跨层读取 ----------
+
+    def _tiers(self) -> Iterator[Tuple[int, Optional[Segment], int]]:
+        """依次返回各层的 (起始行位置, 数据段（热数据为 None）, 行数)"""
+        offset = 0
+        for segment in self._segments:
+            yield offset, segment, segment.row_count
+            offset += segment.row_count
+        yield offset, None, len(self.dataframe)
+
+    def _column_names(self) -> List[str]:
+        names = {}
+        for segment in self._segments:
+            names.update((c['name'], None) for c in segment.columns)
+        names.update((c, None) for c in self.dataframe.columns)
+        return list(names)
+
+    def _column_dtype(self, name: str) -> np.dtype:
+        """各层合并后的 dtype（与 pd.concat 一致：缺少该列的层按 NaN 计）"""
+        dtypes = []
+        for _, segment, count in self._tiers():
+            if count == 0:
+                continue
+            if segment is None:
+                dtype = self.dataframe[name].dtype if name in self.dataframe.columns else np.dtype(np.float64)
+            else:
+                dtype = segment.column_dtype(name) if segment.column_meta(name) else np.dtype(np.float64)
+            dtypes.append(dtype)
+        if not dtypes:
+            return np.dtype(object)
+        if any(not isinstance(d, np.dtype) or d.kind not in 'biufM' for d in dtypes):
+            return np.dtype(object)
+        kinds = {d.kind for d in dtypes}
+        if len(kinds) > 1 and ('b' in kinds or 'M' in kinds):
+            return np.dtype(object)
+        return np.result_type(*dtypes)
+
+    def _segment_column(self, segment: Segment, name: str) -> np.ndarray:
+        """数据段的整列数据：未压缩的定长列直接引用缓冲区，其他列解码后缓存"""
+        meta = segment.column_meta(name)
+        if meta is None:
+            return np.full(segment.row_count, np.nan)
+        if segment.codec is None and meta['kind'] == KIND_FIXED:
+            return segment.column(name)
+        key = (segment.name, name)
+        cached = self._column_cache.pop(key, None)
+        if cached is None:
+            cached = segment.column(name)
+        self._column_cache[key] = cached
+        while len(self._column_cache) > self._cached_columns:
+            self._column_cache.popitem(last=False)
+        return cached
+
+    def _tier_column(self, segment: Optional[Segment], name: str) -> np.ndarray:
+        if segment is not None:
+            return self._segment_column(segment, name)
+        if name in self.dataframe.columns:
+            return self.dataframe[name].to_numpy()
+        return np.full(len(self.dataframe), np.nan)
+
+    def _gather(self, name: str, positions: np.ndarray, full_scan: bool = False) -> np.ndarray:
+        """读取指定行位置（全局）的一列数据
+
+        full_scan 为 True 时（排序）解码并缓存整列；否则（分页）未压缩的数据段只解码这些行。
+        """
+        result = np.empty(len(positions), dtype=self._column_dtype(name))
+        order = np.argsort(positions, kind='stable')
+        sorted_positions = positions[order]
+        for offset, segment, count in self._tiers():
+            lo, hi = np.searchsorted(sorted_positions, [offset, offset + count])
+            if lo == hi:
+                continue
+            selected = order[lo:hi]
+            local = sorted_positions[lo:hi] - offset
+            if segment is None or full_scan or segment.codec is not None or segment.column_meta(name) is None:
+                values = self._tier_column(segment, name)[local]
+            else:
+                values = segment.take(name, local)
+            result[selected] = values
+        return result
+
+    def _take_rows(self, positions: np.ndarray) -> pd.DataFrame:
+        columns = self._column_names()
+        data = {name: self._gather(name, positions) for name in columns}
+        return pd.DataFrame(data, columns=columns)
+
+    def _filter_positions(self, filters: Optional[FilterParams]) -> np.ndarray:
+        """计算满足筛选条件的全局行位置（升序）：跳过摘要不匹配的数据段，只解码筛选涉及的列"""
+        filter_dict = self._get_filter_dict(filters)
+        all_columns = set(self._column_names())
+        columns = [name for name in filter_dict if name in all_columns]
+        parts = []
+        skipped = 0
+        for offset, segment, count in self._tiers():
+            if count == 0:
+                continue
+            if segment is not None and filter_dict and not segment.may_match(
+                    filter_dict, self.columns_config, self._parse_number_value):
+                skipped += 1
+                continue
+            if not columns:
+                parts.append(np.arange(offset, offset + count))
+                continue
+            subset = pd.DataFrame({name: self._tier_column(segment, name) for name in columns}, copy=False)
+            mask = self._build_pandas_filter(filters, df=subset).to_numpy()
+            parts.append(np.flatnonzero(mask) + offset)
+        if skipped:
+            self._logger.debug(f"根据数据段摘要跳过了 {skipped}/{len(self._segments)} 个数据段")
+        return np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+
+    def _plan_frame(self, columns: List[str], filter_dict: Dict[str, Any]) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+        """与 _filter_positions 相同地跳过摘要不匹配的数据段，只拼接剩余各层的相关列"""
+        with self._lock:
+            all_columns = set(self._column_names())
+            columns = [name for name in columns if name in all_columns]
+            parts = []
+            pruned = pruned_rows = cached = read = 0
+            for _, segment, count in self._tiers():
+                if count == 0:
+                    continue
+                if segment is not None and filter_dict and not segment.may_match(
+                        filter_dict, self.columns_config, self._parse_number_value):
+                    pruned += 1
+                    pruned_rows += count
+                    continue
+                if segment is not None:
+                    hits = sum((segment.name, name) in self._column_cache for name in columns)
+                    cached += hits
+                    read += len(columns) - hits
+                parts.append(pd.DataFrame({name: self._tier_column(segment, name) for name in columns},
+                                          index=pd.RangeIndex(count), copy=False))
+        frame = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=columns)
+        return frame, {
+            'storage': 'tiered',
+            'segments': len(self._segments),
+            'segments_pruned': pruned,
+            'rows_pruned': pruned_rows,
+            'segment_columns_cached': cached,
+            'segment_columns_read': read,
+        }
+
+    def _find_row(self, row_id: Any) -> np.ndarray:
+        """查找 id 等于 row_id 的全局行位置（升序）"""
+        found = []
+        for offset, segment, count in self._tiers():
+            if count == 0:
+                continue
+            if segment is None:
+                local = self._find_id_positions(self.dataframe, row_id)
+            elif segment.may_contain_id(row_id):
+                ids = pd.Series(self._segment_column(segment, 'id'), copy=False)
+                local = np.flatnonzero((ids == row_id).to_numpy())
+            else:
+                continue
+            found.append(local + offset)
+        return np.concatenate(found) if found else np.empty(0, dtype=np.int64)
+
+    def _locate_rows(self, ids: List[Any]) -> Dict[Any, np.ndarray]:
+        """只能修改或删除热数据中的行：id 位于已封存的数据段时抛出 ValueError"""
+        for row_id in ids:
+            for segment in self._segments:
+                if not segment.may_contain_id(row_id):
+                    continue
+                ids_in_segment = pd.Series(self._segment_column(segment, 'id'), copy=False)
+                if (ids_in_segment == row_id).any():
+                    raise ValueError(f"ID为 {row_id} 的记录位于已封存的数据段 {segment.name} 中，不能修改或删除")
+        return super()._locate_rows(ids)
+
+    # ---------- 查询 ----------
+
+    def get_list(self,
+                 filters: Optional[FilterParams] = None,
+                 page: int = 1,
+                 page_size: int = 100,
+                 sort_by: Optional[str] = None,
+                 sort_order: Optional[str] = None) -> Dict[str, Any]:
+        query_start = time.perf_counter()
+        with self._lock:
+            start_index = (page - 1) * page_size
+            needs_sort = sort_by and sort_by in self._column_names()
+            if not self._get_filter_dict(filters) and not needs_sort:
+                # 无筛选、无排序：直接按行位置定位当前页
+                total_count = self.total_count
+                page_positions = np.arange(min(start_index, total_count), min(start_index + page_size, total_count))
+            else:
+                positions = self._filter_positions(filters)
+                total_count = len(positions)
+                if needs_sort and total_count > 0:
+                    ascending = sort_order == 'ascending' if sort_order else True
+                    sort_values = pd.Series(self._gather(sort_by, positions, full_scan=True), index=positions)
+                    positions = sort_values.sort_values(ascending=ascending, na_position='last').index.to_numpy()
+                page_positions = positions[start_index:start_index + page_size]
+            page_df = self._take_rows(page_positions)
+
+        data_list = self._serialize_records(page_df)
+        self._check_slow_query(time.perf_counter() - query_start, filters, page, page_size, sort_by, sort_order)
+        return {
+            "list": data_list,
+            "total": total_count,
+            "page": page,
+            "pageSize": page_size
+        }
+
+    def get_row_position(self, row_id: Any, filters: Optional[FilterParams] = None) -> Dict[str, Any]:
+        with self._lock:
+            candidates = self._find_row(row_id)
+            if len(candidates) == 0:
+                return {"found": False, "position": -1}
+            positions = self._filter_positions(filters)
+        if len(positions) == 0:
+            return {"found": False, "position": -1}
+        # 位置 = 该行在筛选结果（升序行位置）中的序号
+        index = np.searchsorted(positions, candidates)
+        matched = positions[np.minimum(index, len(positions) - 1)] == candidates
+        if not matched.any():
+            return {"found": False, "position": -1}
+        return {"found": True, "position": int(index[np.argmax(matched)])}
+
+    def get_row_detail(self, row_id: Any) -> List[Dict[str, Any]]:
+        start = time.perf_counter()
+        with self._lock:
+            candidates = self._find_row(row_id)
+            if len(candidates) == 0:
+                raise ValueError(f"未找到ID为 {row_id} 的记录")
+            row_df = self._take_rows(candidates[:1])
+        self._observe('get_row_detail', 'lookup', time.perf_counter() - start)
+        return self._row_detail(row_df)
+
+    def _update_column_options(self) -> bool:
+        """更新筛选选项：合并热数据和所有数据段摘要中的取值集合"""
+        if not getattr(self, '_segments', None):
+            return super()._update_column_options()
+        columns_updated = False
+        for col_config in self.columns_config:
+            if col_config.filterType not in ['multi-select', 'select']:
+                continue
+            values = set()
+            if col_config.prop in self.dataframe.columns:
+                values.update(str(v) for v in self.dataframe[col_config.prop].dropna().unique())
+            for segment in self._segments:
+                meta = segment.column_meta(col_config.prop)
+                if meta is None or meta['null_count'] == segment.row_count:
+                    continue
+                if 'values' not in meta:
+                    values = None
+                    break
+                values.update(meta['values'])
+            if values is None or len(values) > 100:
+                if col_config.filterType != 'text':
+                    col_config.options = None
+                    col_config.filterType = 'text'
+                    columns_updated = True
+                continue
+            options = sorted(values)
+            if col_config.options != options:
+                col_config.options = options
+                columns_updated = True
+        return columns_updated
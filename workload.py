@@ -0,0 +1,264 @@
+"""工作负载录制与回放
+
+录制：NiceTable 的 API 路由和 add_data 在开启录制后，把每个请求写成一行 JSON（NDJSON，
+路径以 .gz 结尾时使用 gzip 压缩），字段包括：
+- ts（请求开始时间戳）、endpoint、table_id、elapsed_ms（服务端耗时）
+- 查询参数：filters、page、pageSize、sortBy、sortOrder、rowId
+- 写入批次的形状：rows、columns、bytes（估算的 JSON 大小，/bulk 为请求体大小）；/bulk 还记录 format，
+  /upsert 记录 updated、added（更新和追加的行数），/delete 记录 deleted（删除的行数）
+
+开启方式：NiceTable.start_recording(path)，或启动前设置环境变量 NICE_TABLE_RECORD=path。
+
+回放：按录制顺序对本地 DataTable 重放请求，可按原速（--speed 1）、加速（--speed 10）
+或不等待（--speed 0）执行。写入批次按录制的形状用 data_generator 重新生成。
+DataTable 的调用在服务端事件循环中是串行执行的，因此回放也按顺序单线程执行。
+
+用法：
+    python workload.py trace.ndjson.gz --rows 100000 --speed 10 --output replay.json
+    python workload.py trace.ndjson --snapshot snapshots/orders --speed 0
+"""
+
+import argparse
+import atexit
+import gzip
+import json
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from benchmark import build_dataframe, summarize
+from data_generator import generate_batch_records
+from data_table import DataTable, FilterParams, generate_columns_config_from_dataframe
+
+# 估算批次大小时最多序列化的行数
+_SIZE_SAMPLE_ROWS = 100
+
+
+def _open_trace(path: Union[str, Path], mode: str):
+    path = Path(path)
+    if path.suffix == '.gz':
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+def batch_shape(records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """写入批次的形状：行数、列名和估算的 JSON 大小（按前若干行推算）"""
+    columns: Dict[str, None] = {}
+    for record in records:
+        columns.update(dict.fromkeys(record))
+    sample = records[:_SIZE_SAMPLE_ROWS]
+    sample_bytes = len(json.dumps(sample, ensure_ascii=False, default=str).encode('utf-8')) if sample else 0
+    return {
+        'rows': len(records),
+        'columns': list(columns),
+        'bytes': int(sample_bytes * len(records) / len(sample)) if sample else 0,
+    }
+
+
+class WorkloadRecorder:
+    """将请求追加写入 NDJSON 文件（线程安全，后台任务中的 add_data 也会录制）"""
+
+    def __init__(self, path: Union[str, Path], flush_every: int = 100):
+        self.path = Path(path)
+        self.flush_every = flush_every
+        self.count = 0
+        self._lock = threading.Lock()
+        self._file = _open_trace(self.path, 'a')
+        atexit.register(self.close)
+
+    def record(self, endpoint: str, table_id: Optional[str], start: float, **fields: Any):
+        """记录一个请求；start 为请求开始时的 time.time()"""
+        event = {'ts': start, 'endpoint': endpoint, 'table_id': table_id,
+                 'elapsed_ms': round((time.time() - start) * 1000, 3)}
+        event.update({k: v for k, v in fields.items() if v is not None})
+        line = json.dumps(event, ensure_ascii=False, default=str) + '\n'
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(line)
+            self.count += 1
+            if self.count % self.flush_every == 0:
+                self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def read_trace(path: Union[str, Path]) -> Iterator[Dict[str, Any]]:
+    """逐行读取录制文件（跳过写入中断导致的不完整行）"""
+    with _open_trace(path, 'r') as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+def _filter_options(table: DataTable) -> Dict[str, List[str]]:
+    """与 /filters 路由相同：下拉筛选列的选项"""
+    return {col.prop: col.options or sorted(str(v) for v in table.dataframe[col.prop].dropna().unique())
+            for col in table.columns_config if col.filterType in {'select', 'multi-select'}}
+
+
+def _existing_ids(table: DataTable, count: int, seed: int) -> List[Any]:
+    """随机选取本地表格中已有的 count 个 id（录制的 id 在回放表格中通常不存在）"""
+    ids = table.dataframe['id'].to_numpy() if 'id' in table.dataframe.columns else []
+    if count <= 0 or len(ids) == 0:
+        return []
+    chosen = np.random.default_rng(seed).choice(len(ids), size=min(count, len(ids)), replace=False)
+    return ids[chosen].tolist()
+
+
+def _replay_event(table: DataTable, event: Dict[str, Any], seed: int):
+    endpoint = event['endpoint']
+    filters = event.get('filters')
+    filter_params = FilterParams(**filters) if filters else None
+    if endpoint == 'list':
+        table.get_list(filter_params, event.get('page', 1), event.get('pageSize', 100),
+                       event.get('sortBy'), event.get('sortOrder'))
+    elif endpoint == 'row-position':
+        table.get_row_position(event['rowId'], filter_params)
+    elif endpoint == 'row-detail':
+        table.get_row_detail(event['rowId'])
+    elif endpoint == 'filters':
+        _filter_options(table)
+    elif endpoint == 'add':
+        columns = [c for c in event.get('columns', []) if c != 'id']
+        records = generate_batch_records(0, event['rows'], seed=seed)
+        table.add_data([{c: record.get(c) for c in columns} for record in records])
+    elif endpoint == 'bulk':
+        if event['rows']:
+            table.add_data(pd.DataFrame(generate_batch_records(0, event['rows'], seed=seed)).drop(columns='id'))
+    elif endpoint == 'upsert':
+        # 按录制的更新行数选取本地表格中已有的 id，其余记录没有 id（追加）
+        columns = [c for c in event.get('columns', []) if c != 'id']
+        ids = _existing_ids(table, event.get('updated', 0), seed)
+        records = [{c: record.get(c) for c in columns}
+                   for record in generate_batch_records(0, len(ids) + event.get('added', 0), seed=seed)]
+        for record, row_id in zip(records, ids):
+            record['id'] = row_id
+        if records:
+            table.upsert(records)
+    elif endpoint == 'delete':
+        ids = _existing_ids(table, event.get('deleted', 0), seed)
+        if ids:
+            table.delete_rows(ids)
+    else:
+        raise ValueError(f'未知的 endpoint: {endpoint}')
+
+
+def replay(events: Iterator[Dict[str, Any]], table_factory: Callable[[], DataTable], speed: float = 1.0,
+           seed: int = 0) -> Dict[str, Any]:
+    """按顺序回放录制的请求
+
+    Args:
+        events: 录制的请求（按时间顺序）
+        table_factory: 为每个录制的 table_id 创建本地 DataTable
+        speed: 回放速度倍数，0 表示不等待、尽快执行
+        seed: 生成写入批次的随机种子
+
+    Returns:
+        每个 endpoint 的回放耗时与录制耗时统计、回放落后于计划的时间，以及回放出错的请求数
+        （如录制的 rowId 在本地表格中不存在，出错的请求同样计入耗时，不中断回放）
+    """
+    tables: Dict[Optional[str], DataTable] = {}
+    replayed: Dict[str, List[float]] = {}
+    recorded: Dict[str, List[float]] = {}
+    errors: Dict[str, Dict[str, Any]] = {}
+    added_rows = 0
+    max_lag = 0.0
+    first_ts = None
+    start = time.perf_counter()
+    for i, event in enumerate(events):
+        if first_ts is None:
+            first_ts = event['ts']
+        if speed > 0:
+            delay = (event['ts'] - first_ts) / speed - (time.perf_counter() - start)
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                max_lag = max(max_lag, -delay)
+        table = tables.get(event.get('table_id'))
+        if table is None:
+            table = tables[event.get('table_id')] = table_factory()
+        endpoint = event['endpoint']
+        begin = time.perf_counter()
+        try:
+            _replay_event(table, event, seed + i)
+        except Exception as e:
+            error = errors.setdefault(endpoint, {'count': 0, 'first': f'{type(e).__name__}: {e}'})
+            error['count'] += 1
+        else:
+            if endpoint in ('add', 'bulk'):
+                added_rows += event['rows']
+            elif endpoint == 'upsert':
+                added_rows += event.get('added', 0)
+        replayed.setdefault(endpoint, []).append(time.perf_counter() - begin)
+        if 'elapsed_ms' in event:
+            recorded.setdefault(endpoint, []).append(event['elapsed_ms'] / 1000)
+
+    return {
+        'events': sum(len(v) for v in replayed.values()),
+        'tables': len(tables),
+        'speed': speed,
+        'wall_seconds': time.perf_counter() - start,
+        'trace_seconds': (event['ts'] - first_ts) if first_ts is not None else 0.0,
+        'max_lag_seconds': max_lag,
+        'added_rows': added_rows,
+        'errors': errors,
+        'replayed': {name: summarize(samples) for name, samples in replayed.items()},
+        'recorded': {name: summarize(samples) for name, samples in recorded.items()},
+    }
+
+
+def print_replay(result: Dict[str, Any]):
+    print(f"{'endpoint':<14} {'次数':>7} {'录制 p50':>10} {'回放 p50':>10} {'录制 p99':>10} {'回放 p99':>10}")
+    for name, stats in result['replayed'].items():
+        rec = result['recorded'].get(name)
+        rec_p50 = f"{rec['p50_ms']:.2f}" if rec else '-'
+        rec_p99 = f"{rec['p99_ms']:.2f}" if rec else '-'
+        print(f"{name:<14} {stats['count']:>7} {rec_p50:>10} {stats['p50_ms']:>10.2f} "
+              f"{rec_p99:>10} {stats['p99_ms']:>10.2f}")
+    print(f"\n回放 {result['events']} 个请求，耗时 {result['wall_seconds']:.2f} 秒"
+          f"（录制时长 {result['trace_seconds']:.2f} 秒，最大落后 {result['max_lag_seconds']:.3f} 秒）")
+    for name, error in result['errors'].items():
+        print(f"{name}: {error['count']} 个请求回放出错，如 {error['first']}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='回放录制的 NiceTable 工作负载')
+    parser.add_argument('trace', help='录制文件（.ndjson 或 .ndjson.gz）')
+    parser.add_argument('--rows', type=int, default=100_000, help='未指定快照时，初始表格的行数')
+    parser.add_argument('--snapshot', help='从 DataTable 快照恢复初始表格')
+    parser.add_argument('--speed', type=float, default=1.0, help='回放速度倍数，0 表示不等待')
+    parser.add_argument('--seed', type=int, default=0, help='随机种子')
+    parser.add_argument('--output', help='将结果保存为 JSON 文件')
+    args = parser.parse_args(argv)
+
+    if args.snapshot:
+        def table_factory():
+            return DataTable.load_snapshot(args.snapshot)
+    else:
+        base = build_dataframe(args.rows, seed=args.seed)
+
+        def table_factory():
+            return DataTable(base, generate_columns_config_from_dataframe(base))
+
+    result = replay(read_trace(args.trace), table_factory, args.speed, args.seed)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+    print_replay(result)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())